@@ -9,12 +9,19 @@
 #include <limits.h>
 #include <assert.h>
 #include <wchar.h>
+#include <wctype.h>
+#include <locale.h>
+#include <math.h>
+#include <pthread.h>
+#include <unistd.h>
 
+#ifdef BS_REFERENCE_PARSER
 /* set code unit width to 8 so we can use generic macros like 'pcre2_compile'
  * instead of 'pcre2_compile_8'
  */
 #define PCRE2_CODE_UNIT_WIDTH 8
 #include <pcre2.h>
+#endif
 
 #include "bs_size.h"
 #include "gettext.h"
@@ -24,6 +31,30 @@
 
 #define ERROR_BUFFER_LEN 256
 
+/* size of the stack buffers used to format numbers, longer strings need to be
+   allocated */
+#define NUM_BUFFER_LEN 512
+
+/* number of significant decimal digits GMP prints for floating-point numbers
+   with BS_FLOAT_PREC_BITS bits of precision (2 + 256 * log10(2)) */
+#define MPF_SIGNIFICANT_DIGITS 79
+/* number of decimal digits that fit into a 64bit limb */
+#define DIGITS_PER_LIMB 19
+/* number of significant digits needed to print a double so that it can be
+   read back without loss */
+#define DOUBLE_DIGITS 17
+
+/* number of unit names (untranslated and translated) looked up when parsing */
+#define N_UNIT_NAMES (2 * (BS_BUNIT_UNDEF + (BS_DUNIT_UNDEF - BS_DUNIT_B)))
+/* maximum length (in characters, including the trailing '\0') of a unit name
+   in the lookup table */
+#define UNIT_NAME_LEN 32
+/* number of buckets in the lookup table (must be a power of 2) */
+#define UNIT_TABLE_BUCKETS 64
+/* maximum length of a locale name (including the trailing '\0') we cache the
+   lookup table for */
+#define LOCALE_NAME_LEN 96
+
 /**
  * SECTION: bs_size
  * @title: BSSize
@@ -102,16 +133,86 @@ static char const * const d_units[BS_DUNIT_UNDEF] = {
  * accessed.
  */
 struct _BSSize {
+    /* the value is kept in @small whenever it fits into 64 bits, @bytes is
+       only initialized (and used) if @big is %TRUE */
+    bool big;
+    int64_t small;
     mpz_t bytes;
 };
 
+/**
+ * UnitName: (skip)
+ *
+ * A lower-cased unit name in the lookup table.
+ */
+typedef struct _UnitName {
+    wchar_t name[UNIT_NAME_LEN];
+    size_t len;
+    uint64_t pwr;
+    bool decimal;
+    int next;
+} UnitName;
+
+/**
+ * UnitTable: (skip)
+ * @locale: names of the locale categories and the LANGUAGE setting the table
+ *          was created for
+ * @valid: whether the table can be used for lookups or not (if not, the unit
+ *         names need to be compared one by one)
+ * @names: the unit names in the order they are supposed to be tried
+ * @buckets: index of the first name (or -1) for each lower-cased first
+ *           character (modulo %UNIT_TABLE_BUCKETS), the names are chained by
+ *           their @next index
+ * @b_units_xlated: translated binary unit names
+ *
+ * Unit names resolved for a particular locale.
+ */
+typedef struct _UnitTable {
+    char locale[3][LOCALE_NAME_LEN];
+    bool valid;
+    UnitName names[N_UNIT_NAMES];
+    int buckets[UNIT_TABLE_BUCKETS];
+    const char *b_units_xlated[BS_BUNIT_UNDEF];
+} UnitTable;
+
+/**
+ * ThreadState: (skip)
+ *
+ * Per-thread scratch data reused by the parsing functions.
+ */
+typedef struct _ThreadState {
+    UnitTable units;
+    BSErrorInfo last_error;
+} ThreadState;
+
+
+/****************
+ * GLOBAL STATE *
+ ****************/
+static pthread_key_t thread_state_key;
+static pthread_once_t thread_state_key_once = PTHREAD_ONCE_INIT;
+
+/* 1024^n and 1000^n for all the units, read-only once initialized */
+static mpz_t b_unit_pows[BS_BUNIT_UNDEF];
+static mpz_t d_unit_pows[BS_DUNIT_UNDEF - BS_DUNIT_B];
+static pthread_once_t unit_pows_once = PTHREAD_ONCE_INIT;
+
+/* the "C" locale used by the *_l() functions for %NULL */
+static locale_t c_locale = (locale_t) 0;
+static pthread_once_t c_locale_once = PTHREAD_ONCE_INIT;
+
+/* maximum number of threads the batch functions may use (0 means the number of
+   online CPUs), accessed atomically */
+static unsigned int batch_threads = 1;
+
 
 /********************
  * HELPER FUNCTIONS *
  ********************/
 static void bs_size_init (BSSize size) {
-    /* let's start with 64 bits of space */
-    mpz_init2 (size->bytes, (mp_bitcnt_t) 64);
+    /* no GMP number needed until the value grows beyond 64 bits */
+    size->big = false;
+    size->small = 0;
 }
 
 static char *strdup_printf (const char *fmt, ...) {
@@ -170,41 +271,27 @@ static char *replace_char_with_str (const char *str, char orig, const char *new)
 
 
 /**
- * replace_str_with_str: (skip)
+ * replace_str_with_char: (skip)
  *
- * Replaces the first appearance of @orig in @str with @new.
+ * Replaces the first appearance of @orig in @str with @new in place.
  */
-static char *replace_str_with_str (const char *str, const char *orig, const char *new) {
-    const char *pos = NULL;
-    int str_len = 0;
-    int orig_len = 0;
-    int new_len = 0;
-    char *ret = NULL;
-    int ret_size = 0;
-    char *dest = NULL;
+static void replace_str_with_char (char *str, const char *orig, char new) {
+    char *pos = NULL;
+    size_t orig_len = 0;
+
+    orig_len = strlen (orig);
+    if (orig_len == 0)
+        return;
 
     pos = strstr (str, orig);
     if (!pos)
-        /* nothing to do, just return a copy */
-        return strdup (str);
-
-    str_len = strlen (str);
-    orig_len = strlen (orig);
-    new_len = strlen (new);
-    ret_size = str_len + new_len - orig_len + 1;
-    ret = malloc (sizeof(char) * ret_size);
-    if (!ret)
-        return NULL;
-    memset (ret, 0, ret_size);
-    memcpy (ret, str, pos - str);
-    dest = ret + (pos - str);
-    memcpy (dest, new, new_len);
-    dest = dest + new_len;
-    memcpy (dest, pos + orig_len, str_len - (pos - str) - orig_len);
+        return;
 
-    return ret;
+    *pos = new;
+    memmove (pos + 1, pos + orig_len, strlen (pos + orig_len) + 1);
 }
 
+#ifdef BS_REFERENCE_PARSER
 /**
  * strstrip: (skip)
  *
@@ -225,6 +312,7 @@ static void strstrip(char *str) {
 
     str[i-begin] = '\0';
 }
+#endif
 
 /* Case-insensitive comparison that handles multibyte UTF-8 (e.g. Cyrillic) */
 static int u8_casecmp (const char *s1, const char *s2, size_t n1) {
@@ -256,82 +344,432 @@ static int u8_casecmp (const char *s1, const char *s2, size_t n1) {
     return ret;
 }
 
-static bool multiply_size_by_unit (mpq_t size, char *unit_str) {
+/**
+ * set_error: (skip)
+ *
+ * Sets @error to @code and @msg (if not %NULL). **TAKES OVER @msg.**
+ */
+static void set_error (BSError **error, BSErrorCode code, char *msg) {
+    if (error == NULL) {
+        free (msg);
+        return;
+    }
+
+    *error = (BSError *) malloc (sizeof(BSError));
+    if (*error == NULL) {
+        free (msg);
+        return;
+    }
+    (*error)->code = code;
+    (*error)->msg = msg;
+    return;
+}
+
+static void thread_state_key_init (void) {
+    if (pthread_key_create (&thread_state_key, free) != 0)
+        /* no thread-local state, everything will just be a bit slower */
+        thread_state_key = (pthread_key_t) -1;
+}
+
+/**
+ * get_thread_state: (skip)
+ *
+ * Returns: (transfer none): scratch data of the current thread or %NULL if
+ *                           it couldn't be allocated
+ */
+static ThreadState *get_thread_state (void) {
+    ThreadState *state = NULL;
+
+    pthread_once (&thread_state_key_once, thread_state_key_init);
+    if (thread_state_key == (pthread_key_t) -1)
+        return NULL;
+
+    state = (ThreadState *) pthread_getspecific (thread_state_key);
+    if (state)
+        return state;
+
+    state = (ThreadState *) calloc (1, sizeof(ThreadState));
+    if (!state)
+        return NULL;
+    if (pthread_setspecific (thread_state_key, state) != 0) {
+        free (state);
+        return NULL;
+    }
+
+    return state;
+}
+
+/**
+ * set_error_info: (skip)
+ * @error: (nullable): place to store the error to, the error of the calling
+ *         thread (see bs_get_last_error_info()) if %NULL
+ * @msg: static error message
+ *
+ * Reports an error without any allocations (except for the first error in a
+ * thread without @error).
+ */
+static void set_error_info (BSErrorInfo *error, BSErrorCode code, const char *msg) {
+    ThreadState *state = NULL;
+
+    if (!error) {
+        state = get_thread_state ();
+        if (!state)
+            return;
+        error = &(state->last_error);
+    }
+    error->code = code;
+    error->msg = msg;
+}
+
+/**
+ * find_unit_linear: (skip)
+ *
+ * Looks up the unit @unit_str refers to by comparing it with all the unit names
+ * one by one, see find_unit().
+ */
+static bool find_unit_linear (const char *unit_str, uint64_t *pwr, bool *decimal) {
     BSBunit bunit = BS_BUNIT_UNDEF;
     BSDunit dunit = BS_DUNIT_UNDEF;
-    uint64_t pwr = 0;
-    mpq_t dec_mul;
-    mpz_t pow_1000;
     size_t unit_str_len = 0;
 
     unit_str_len = strlen (unit_str);
 
     for (bunit=BS_BUNIT_B; bunit < BS_BUNIT_UNDEF; bunit++)
         if (u8_casecmp (unit_str, b_units[bunit-BS_BUNIT_B], unit_str_len) == 0) {
-            pwr = (uint64_t) bunit - BS_BUNIT_B;
-            mpz_mul_2exp (mpq_numref (size), mpq_numref (size), 10 * pwr);
+            *pwr = (uint64_t) bunit - BS_BUNIT_B;
+            *decimal = false;
             return true;
         }
 
-    mpq_init (dec_mul);
-    mpz_init (pow_1000);
     for (dunit=BS_DUNIT_B; dunit < BS_DUNIT_UNDEF; dunit++)
         if (u8_casecmp (unit_str, d_units[dunit-BS_DUNIT_B], unit_str_len) == 0) {
-            pwr = (uint64_t) (dunit - BS_DUNIT_B);
-            mpz_ui_pow_ui (pow_1000, 1000, pwr);
-            mpq_set_z (dec_mul, pow_1000);
-            mpq_mul (size, size, dec_mul);
-            mpz_clear (pow_1000);
-            mpq_clear (dec_mul);
+            *pwr = (uint64_t) (dunit - BS_DUNIT_B);
+            *decimal = true;
             return true;
         }
 
     for (bunit=BS_BUNIT_B; bunit < BS_BUNIT_UNDEF; bunit++)
         if (u8_casecmp (unit_str, _(b_units[bunit-BS_BUNIT_B]), unit_str_len) == 0) {
-            pwr = (uint64_t) bunit - BS_BUNIT_B;
-            mpz_mul_2exp (mpq_numref (size), mpq_numref (size), 10 * pwr);
-            mpz_clear (pow_1000);
-            mpq_clear (dec_mul);
+            *pwr = (uint64_t) bunit - BS_BUNIT_B;
+            *decimal = false;
             return true;
         }
 
     for (dunit=BS_DUNIT_B; dunit < BS_DUNIT_UNDEF; dunit++)
         if (u8_casecmp (unit_str, _(d_units[dunit-BS_DUNIT_B]), unit_str_len) == 0) {
-            pwr = (uint64_t) (dunit - BS_DUNIT_B);
-            mpz_ui_pow_ui (pow_1000, 1000, pwr);
-            mpq_set_z (dec_mul, pow_1000);
-            mpq_mul (size, size, dec_mul);
-            mpz_clear (pow_1000);
-            mpq_clear (dec_mul);
+            *pwr = (uint64_t) (dunit - BS_DUNIT_B);
+            *decimal = true;
             return true;
         }
 
-    mpz_clear (pow_1000);
-    mpq_clear (dec_mul);
     return false;
 }
 
 /**
- * set_error: (skip)
+ * get_locale_name: (skip)
  *
- * Sets @error to @code and @msg (if not %NULL). **TAKES OVER @msg.**
+ * Returns: (transfer none): name of the locale currently used (by this thread)
+ *                           for @category
  */
-static void set_error (BSError **error, BSErrorCode code, char *msg) {
-    if (error == NULL) {
-        free (msg);
-        return;
+static const char *get_locale_name (int category) {
+#ifdef _NL_LOCALE_NAME
+    /* respects uselocale() */
+    return nl_langinfo (_NL_LOCALE_NAME (category));
+#else
+    return setlocale (category, NULL);
+#endif
+}
+
+static void c_locale_init (void) {
+    /* if this fails, the *_l() functions just use the current locale for %NULL */
+    c_locale = newlocale (LC_ALL_MASK, "C", (locale_t) 0);
+}
+
+/**
+ * use_locale: (skip)
+ * @loc: (nullable): locale to use or %NULL for the "C" locale
+ *
+ * Makes the current thread use @loc (see uselocale()). Everything depending on
+ * the locale (the radix character, the translations of the unit names,
+ * multibyte strings,...) then follows @loc without affecting the other
+ * threads.
+ *
+ * Returns: the locale to restore with uselocale() afterwards
+ */
+static locale_t use_locale (locale_t loc) {
+    if (!loc) {
+        pthread_once (&c_locale_once, c_locale_init);
+        loc = c_locale;
     }
 
-    *error = (BSError *) malloc (sizeof(BSError));
-    if (*error == NULL) {
-        free (msg);
-        return;
+    /* uselocale((locale_t) 0) only returns the current locale */
+    return uselocale (loc);
+}
+
+static bool unit_table_current (const UnitTable *table, const char *locale[3]) {
+    int i = 0;
+
+    if (!table->locale[0][0])
+        /* never initialized */
+        return false;
+
+    for (i=0; i < 3; i++)
+        if (strcmp (table->locale[i], locale[i]) != 0)
+            return false;
+
+    return true;
+}
+
+/**
+ * unit_table_add: (skip)
+ *
+ * Adds the (lower-cased) unit name @name to @table.
+ *
+ * Returns: whether the name could be added or not
+ */
+static bool unit_table_add (UnitTable *table, int idx, const char *name, uint64_t pwr, bool decimal) {
+    UnitName *entry = &(table->names[idx]);
+    size_t i = 0;
+    int *link = NULL;
+
+    entry->len = mbstowcs (entry->name, name, UNIT_NAME_LEN);
+    if (entry->len == (size_t) -1 || entry->len == 0 || entry->len >= UNIT_NAME_LEN)
+        return false;
+    for (i=0; i < entry->len; i++)
+        entry->name[i] = towlower (entry->name[i]);
+    entry->pwr = pwr;
+    entry->decimal = decimal;
+    entry->next = -1;
+
+    /* append to keep the order in which the names are tried */
+    for (link=&(table->buckets[entry->name[0] & (UNIT_TABLE_BUCKETS - 1)]); *link != -1;
+         link=&(table->names[*link].next));
+    *link = idx;
+
+    return true;
+}
+
+/**
+ * get_unit_table: (skip)
+ *
+ * Gets the unit lookup table of the current thread, (re)creating it if needed
+ * (e.g. after a locale change). The unit names are tried in the same order as
+ * by find_unit_linear(): untranslated binary and decimal units first, then the
+ * translated ones.
+ *
+ * Returns: (transfer none): the lookup table for the current locale
+ */
+static const UnitTable *get_unit_table (ThreadState *state) {
+    UnitTable *table = &(state->units);
+    const char *locale[3];
+    const char *language = NULL;
+    bool valid = true;
+    int idx = 0;
+    int i = 0;
+
+    language = getenv ("LANGUAGE");
+    locale[0] = get_locale_name (LC_CTYPE);
+    locale[1] = get_locale_name (LC_MESSAGES);
+    locale[2] = language ? language : "";
+    if (unit_table_current (table, locale))
+        return table;
+
+    for (i=0; i < UNIT_TABLE_BUCKETS; i++)
+        table->buckets[i] = -1;
+
+    for (i=BS_BUNIT_B; i < BS_BUNIT_UNDEF; i++)
+        valid = unit_table_add (table, idx++, b_units[i - BS_BUNIT_B], i - BS_BUNIT_B, false) && valid;
+    for (i=BS_DUNIT_B; i < BS_DUNIT_UNDEF; i++)
+        valid = unit_table_add (table, idx++, d_units[i - BS_DUNIT_B], i - BS_DUNIT_B, true) && valid;
+    for (i=BS_BUNIT_B; i < BS_BUNIT_UNDEF; i++) {
+        table->b_units_xlated[i - BS_BUNIT_B] = _(b_units[i - BS_BUNIT_B]);
+        valid = unit_table_add (table, idx++, table->b_units_xlated[i - BS_BUNIT_B], i - BS_BUNIT_B, false) && valid;
+    }
+    for (i=BS_DUNIT_B; i < BS_DUNIT_UNDEF; i++)
+        valid = unit_table_add (table, idx++, _(d_units[i - BS_DUNIT_B]), i - BS_DUNIT_B, true) && valid;
+    table->valid = valid;
+
+    /* don't remember locales with too long names, the table will just be
+       recreated next time */
+    for (i=0; i < 3; i++) {
+        if (strlen (locale[i]) >= LOCALE_NAME_LEN) {
+            table->locale[0][0] = '\0';
+            break;
+        }
+        strcpy (table->locale[i], locale[i]);
+    }
+
+    return table;
+}
+
+/**
+ * get_current_unit_table: (skip)
+ *
+ * Returns: (transfer none) (nullable): the lookup table for the locale
+ *                                      currently used by this thread or %NULL
+ *                                      if there's no per-thread state
+ */
+static const UnitTable *get_current_unit_table (void) {
+    ThreadState *state = NULL;
+
+    state = get_thread_state ();
+    if (!state)
+        return NULL;
+
+    return get_unit_table (state);
+}
+
+/**
+ * find_unit_in_table: (skip)
+ * @table: (nullable): the lookup table to use (see get_current_unit_table())
+ * @pwr: (out): power of the unit's base (1024 or 1000)
+ * @decimal: (out): whether the unit is a decimal one or not
+ *
+ * Looks up the unit @unit_str refers to. The comparison is case-insensitive,
+ * translated unit names are accepted too and so are prefixes of the unit
+ * names (e.g. "k" for "KiB").
+ *
+ * Returns: whether a unit was found or not
+ */
+static bool find_unit_in_table (const UnitTable *table, const char *unit_str, uint64_t *pwr, bool *decimal) {
+    wchar_t wunit[UNIT_NAME_LEN];
+    size_t len = 0;
+    size_t i = 0;
+    int idx = 0;
+
+    if (!table || !table->valid)
+        return find_unit_linear (unit_str, pwr, decimal);
+
+    len = mbstowcs (wunit, unit_str, UNIT_NAME_LEN);
+    if (len == (size_t) -1)
+        /* not a valid multibyte string, needs byte-by-byte comparison */
+        return find_unit_linear (unit_str, pwr, decimal);
+    if (len == 0 || len >= UNIT_NAME_LEN)
+        /* longer than any of the names */
+        return false;
+
+    for (i=0; i < len; i++)
+        wunit[i] = towlower (wunit[i]);
+
+    for (idx=table->buckets[wunit[0] & (UNIT_TABLE_BUCKETS - 1)]; idx != -1; idx=table->names[idx].next)
+        if (len <= table->names[idx].len && wmemcmp (wunit, table->names[idx].name, len) == 0) {
+            *pwr = table->names[idx].pwr;
+            *decimal = table->names[idx].decimal;
+            return true;
+        }
+
+    return false;
+}
+
+#ifdef BS_REFERENCE_PARSER
+/**
+ * find_unit: (skip)
+ *
+ * Same as find_unit_in_table() with the table for the current locale.
+ */
+static bool find_unit (const char *unit_str, uint64_t *pwr, bool *decimal) {
+    return find_unit_in_table (get_current_unit_table (), unit_str, pwr, decimal);
+}
+#endif
+
+/**
+ * get_bunit_names: (skip)
+ * @xlated: (out caller-allocates): space for %BS_BUNIT_UNDEF translated names
+ *                                  in case there's no per-thread state
+ *
+ * Returns: (transfer none): names of the binary units, translated if @xlate
+ */
+static const char * const *get_bunit_names (bool xlate, const char **xlated) {
+    const UnitTable *table = NULL;
+    int i = 0;
+
+    if (!xlate)
+        return b_units;
+
+    table = get_current_unit_table ();
+    if (table)
+        return table->b_units_xlated;
+
+    for (i=0; i < BS_BUNIT_UNDEF; i++)
+        xlated[i] = _(b_units[i]);
+    return xlated;
+}
+
+static void unit_pows_init (void) {
+    int i = 0;
+
+    for (i=0; i < BS_BUNIT_UNDEF; i++) {
+        mpz_init (b_unit_pows[i]);
+        mpz_ui_pow_ui (b_unit_pows[i], 1024, i);
+    }
+    for (i=0; i < BS_DUNIT_UNDEF - BS_DUNIT_B; i++) {
+        mpz_init (d_unit_pows[i]);
+        mpz_ui_pow_ui (d_unit_pows[i], 1000, i);
     }
-    (*error)->code = code;
-    (*error)->msg = msg;
-    return;
 }
 
+/**
+ * get_unit_pow: (skip)
+ * @pwr: power of the unit's base
+ * @decimal: whether to get 1000^@pwr or 1024^@pwr
+ *
+ * Returns: (transfer none): 1000^@pwr or 1024^@pwr
+ */
+static const mpz_t *get_unit_pow (uint64_t pwr, bool decimal) {
+    pthread_once (&unit_pows_once, unit_pows_init);
+
+    return decimal ? &(d_unit_pows[pwr]) : &(b_unit_pows[pwr]);
+}
+
+/* 1024^n and 1000^n as doubles (1000^8 is not exactly representable, this is
+   the closest double) */
+static const double b_unit_pows_dbl[BS_BUNIT_UNDEF] = {
+    1.0, 1024.0, 1048576.0, 1073741824.0, 1099511627776.0, 1125899906842624.0,
+    1152921504606846976.0, 1180591620717411303424.0, 1208925819614629174706176.0
+};
+static const double d_unit_pows_dbl[BS_DUNIT_UNDEF - BS_DUNIT_B] = {
+    1e0, 1e3, 1e6, 1e9, 1e12, 1e15, 1e18, 1e21, 1e24
+};
+
+/**
+ * unit_get_pow: (skip)
+ * @pwr: (out): power of the unit's base
+ * @decimal: (out): whether @unit is a decimal unit or not
+ *
+ * Returns: whether @unit is a valid unit or not
+ */
+static bool unit_get_pow (BSUnit unit, uint64_t *pwr, bool *decimal) {
+    int val = (int) unit.bunit;
+
+    if (val >= BS_BUNIT_B && val < BS_BUNIT_UNDEF) {
+        *pwr = val - BS_BUNIT_B;
+        *decimal = false;
+        return true;
+    }
+    if (val >= BS_DUNIT_B && val < BS_DUNIT_UNDEF) {
+        *pwr = val - BS_DUNIT_B;
+        *decimal = true;
+        return true;
+    }
+
+    return false;
+}
+
+#ifdef BS_REFERENCE_PARSER
+static bool multiply_size_by_unit (mpq_t size, char *unit_str) {
+    uint64_t pwr = 0;
+    bool decimal = false;
+
+    if (!find_unit (unit_str, &pwr, &decimal))
+        return false;
+
+    mpz_mul (mpq_numref (size), mpq_numref (size), *get_unit_pow (pwr, decimal));
+    mpq_canonicalize (size);
+
+    return true;
+}
+#endif
+
 typedef void (*MpzOp) (mpz_t ROP, const mpz_t OP1, unsigned long int OP2);
 static void do_64bit_add_sub (MpzOp op, mpz_t rop, const mpz_t op1, uint64_t op2) {
     uint64_t i = 0;
@@ -385,94 +823,781 @@ static void mul_64bit (mpz_t rop, const mpz_t op1, uint64_t op2) {
 
 
 
-/***************
- * DESTRUCTORS *
- * *************/
 /**
- * bs_size_free:
- * @size: (nullable): %BSSize to free
+ * mpz_set_u64: (skip)
  *
- * Clears @size and frees the allocated resources.
+ * Sets @rop to @val (which may not fit into unsigned long on some platforms).
  */
-void bs_size_free (BSSize size) {
-    if (size) {
-        mpz_clear (size->bytes);
-        free (size);
-    }
-    return;
+static void mpz_set_u64 (mpz_t rop, uint64_t val) {
+    if (val <= ULONG_MAX)
+        mpz_set_ui (rop, (unsigned long int) val);
+    else
+        mpz_import (rop, 1, 1, sizeof(uint64_t), 0, 0, &val);
 }
 
+/* number of limbs needed for a 64bit number */
+#define U64_LIMBS ((64 + GMP_NUMB_BITS - 1) / GMP_NUMB_BITS)
+
 /**
- * bs_clear_error:
- * @error: (nullable): %BSError to clear
+ * MpzView: (skip)
  *
- * Clears @error and frees the allocated resources.
+ * Read-only GMP number pointing to the value of a #BSSize stored in 64 bits,
+ * see size_get_mpz().
  */
-void bs_clear_error (BSError **error) {
-    if (error && *error) {
-        free ((*error)->msg);
-        free (*error);
-        *error = NULL;
-    }
-    return;
-}
+typedef struct _MpzView {
+    mp_limb_t limbs[U64_LIMBS];
+    mpz_t z;
+} MpzView;
 
+static uint64_t abs_i64 (int64_t val) {
+    return val < 0 ? -((uint64_t) val) : (uint64_t) val;
+}
 
-/****************
- * CONSTRUCTORS *
- ****************/
 /**
- * bs_size_new: (constructor)
+ * mpz_get_i64: (skip)
+ * @val: (out): place to store the value of @op
  *
- * Creates a new #BSSize instance initialized to 0.
+ * Returns: whether @op fits into int64_t (and was stored in @val) or not
+ */
+static bool mpz_get_i64 (const mpz_t op, int64_t *val) {
+    uint64_t abs_val = 0;
+    size_t count = 0;
+
+    if (mpz_sizeinbase (op, 2) > 64)
+        return false;
+
+    mpz_export (&abs_val, &count, 1, sizeof(uint64_t), 0, 0, op);
+    if (mpz_sgn (op) >= 0) {
+        if (abs_val > (uint64_t) INT64_MAX)
+            return false;
+        *val = (int64_t) abs_val;
+    } else {
+        if (abs_val > (uint64_t) INT64_MAX + 1)
+            return false;
+        *val = -((int64_t) (abs_val - 1)) - 1;
+    }
+
+    return true;
+}
+
+/**
+ * size_set_i64: (skip)
  *
- * Returns: a new #BSSize initialized to 0.
+ * Sets @size to @val.
  */
-BSSize bs_size_new (void) {
-    BSSize ret = (BSSize) malloc (sizeof(struct _BSSize));
-    assert (ret);
-    bs_size_init (ret);
-    return ret;
+static void size_set_i64 (BSSize size, int64_t val) {
+    if (size->big) {
+        mpz_clear (size->bytes);
+        size->big = false;
+    }
+    size->small = val;
 }
 
 /**
- * bs_size_new_from_bytes: (constructor)
- * @bytes: number of bytes
- * @sgn: sign of the size -- if being -1, the size is initialized to
- *       -@bytes, other values are ignored
+ * size_get_mpz_rop: (skip)
  *
- * Creates a new #BSSize instance.
+ * Gets a GMP number the new value of @size can be stored to. size_normalize()
+ * has to be called once the value is stored.
+ */
+static mpz_ptr size_get_mpz_rop (BSSize size) {
+    if (!size->big) {
+        mpz_init (size->bytes);
+        size->big = true;
+    }
+    return size->bytes;
+}
+
+/**
+ * size_normalize: (skip)
  *
- * Returns: a new #BSSize
+ * Moves the value of @size to 64 bits if it fits there.
  */
-BSSize bs_size_new_from_bytes (uint64_t bytes, int sgn) {
-    char *num_str = NULL;
-    BSSize ret = bs_size_new ();
-    int ok = 0;
+static void size_normalize (BSSize size) {
+    int64_t val = 0;
 
-    ok = asprintf (&num_str, "%"PRIu64, bytes);
-    if (ok == -1)
-        /* probably cannot allocate memory, there's nothing more we can do */
-        return ret;
-    mpz_set_str (ret->bytes, num_str, 10);
-    free (num_str);
-    if (sgn == -1)
-        mpz_neg (ret->bytes, ret->bytes);
-    return ret;
+    if (size->big && mpz_get_i64 (size->bytes, &val))
+        size_set_i64 (size, val);
 }
 
-
 /**
- * bs_size_new_from_str: (constructor)
- * @size_str: string representing the size as a number and an optional unit
- *            (e.g. "1 GiB")
- * @error: (out) (optional): place to store error (if any)
+ * size_set_u64: (skip)
+ * @sgn: sign of the value -- if being -1, @size is set to -@val
  *
- * Creates a new #BSSize instance.
+ * Sets @size to @val (or -@val).
+ */
+static void size_set_u64 (BSSize size, uint64_t val, int sgn) {
+    if (val <= (uint64_t) INT64_MAX)
+        size_set_i64 (size, sgn == -1 ? -((int64_t) val) : (int64_t) val);
+    else if (sgn == -1 && val == (uint64_t) INT64_MAX + 1)
+        size_set_i64 (size, INT64_MIN);
+    else {
+        mpz_set_u64 (size_get_mpz_rop (size), val);
+        if (sgn == -1)
+            mpz_neg (size->bytes, size->bytes);
+    }
+}
+
+#ifdef __SIZEOF_INT128__
+/**
+ * size_set_i128: (skip)
+ *
+ * Sets @size to @val.
+ */
+static void size_set_i128 (BSSize size, __int128 val) {
+    unsigned __int128 abs_val = val < 0 ? -((unsigned __int128) val) : (unsigned __int128) val;
+    mpz_ptr rop = NULL;
+
+    if (val >= INT64_MIN && val <= INT64_MAX) {
+        size_set_i64 (size, (int64_t) val);
+        return;
+    }
+
+    rop = size_get_mpz_rop (size);
+    mpz_set_u64 (rop, (uint64_t) (abs_val >> 64));
+    mpz_mul_2exp (rop, rop, 64);
+    if ((uint64_t) abs_val <= ULONG_MAX)
+        mpz_add_ui (rop, rop, (unsigned long int) (uint64_t) abs_val);
+    else
+        do_64bit_add_sub (mpz_add_ui, rop, rop, (uint64_t) abs_val);
+    if (val < 0)
+        mpz_neg (rop, rop);
+}
+
+/* division rounding towards negative infinity */
+static __int128 fdiv_i128 (__int128 n, __int128 d) {
+    __int128 q = n / d;
+
+    if ((n % d != 0) && ((n < 0) != (d < 0)))
+        q--;
+    return q;
+}
+
+/* division rounding towards positive infinity */
+static __int128 cdiv_i128 (__int128 n, __int128 d) {
+    __int128 q = n / d;
+
+    if ((n % d != 0) && ((n < 0) == (d < 0)))
+        q++;
+    return q;
+}
+#endif
+
+/**
+ * u64_get_mpz: (skip)
+ * @negative: whether to get -@val instead of @val
+ * @view: place for the GMP number
+ *
+ * Returns: (transfer none): a read-only GMP number with the value of @val (or
+ *                           -@val), valid as long as @view is
+ */
+static mpz_srcptr u64_get_mpz (uint64_t val, bool negative, MpzView *view) {
+    int i = 0;
+
+    for (i=0; i < U64_LIMBS; i++) {
+        view->limbs[i] = (mp_limb_t) (val & GMP_NUMB_MASK);
+        /* two shifts to avoid shifting by the full width of the type */
+        val = (val >> 1) >> (GMP_NUMB_BITS - 1);
+    }
+
+    return mpz_roinit_n (view->z, view->limbs, negative ? -U64_LIMBS : U64_LIMBS);
+}
+
+/**
+ * size_get_mpz: (skip)
+ * @view: place for the GMP number if the value of @size is stored in 64 bits
+ *
+ * Returns: (transfer none): a read-only GMP number with the value of @size,
+ *                           valid as long as @size and @view are
+ */
+static mpz_srcptr size_get_mpz (const BSSize size, MpzView *view) {
+    if (size->big)
+        return size->bytes;
+
+    return u64_get_mpz (abs_i64 (size->small), size->small < 0, view);
+}
+
+/**
+ * size_get_double: (skip)
+ *
+ * Returns: the value of @size as a double (possibly with loss of precision)
+ */
+static double size_get_double (const BSSize size) {
+    if (size->big)
+        return mpz_get_d (size->bytes);
+    return (double) size->small;
+}
+
+/**
+ * size_set_double: (skip)
+ *
+ * Sets @size to @val truncated towards zero.
+ */
+static void size_set_double (BSSize size, double val) {
+    /* -2^63 <= @val < 2^63 */
+    if (val >= -9223372036854775808.0 && val < 9223372036854775808.0) {
+        size_set_i64 (size, (int64_t) val);
+        return;
+    }
+
+    mpz_set_d (size_get_mpz_rop (size), val);
+    size_normalize (size);
+}
+
+/**
+ * size_set_mpz: (skip)
+ *
+ * Sets @size to @val.
+ */
+static void size_set_mpz (BSSize size, mpz_srcptr val) {
+    int64_t small = 0;
+
+    if (mpz_get_i64 (val, &small))
+        size_set_i64 (size, small);
+    else
+        mpz_set (size_get_mpz_rop (size), val);
+}
+
+/**
+ * size_negate: (skip)
+ *
+ * Negates @size in-place.
+ */
+static void size_negate (BSSize size) {
+    if (!size->big) {
+        if (size->small == INT64_MIN)
+            size_set_u64 (size, (uint64_t) INT64_MAX + 1, 1);
+        else
+            size->small = -size->small;
+        return;
+    }
+
+    mpz_neg (size->bytes, size->bytes);
+    size_normalize (size);
+}
+
+/**
+ * ratio_to_double: (skip)
+ * @den: a positive number
+ *
+ * Returns: @num / @den correctly rounded (to nearest, ties to even) to a double
+ */
+static double ratio_to_double (mpz_srcptr num, mpz_srcptr den) {
+    mpz_t quot;
+    mpz_t rem;
+    long shift = 0;
+    uint64_t bits = 0;
+    size_t count = 0;
+    double ret = 0.0;
+
+    if (mpz_sgn (num) == 0)
+        return 0.0;
+
+    /* doubles have 53 bits of mantissa, so both are represented exactly and
+       the division is rounded correctly */
+    if (mpz_sizeinbase (num, 2) <= 53 && mpz_sizeinbase (den, 2) <= 53)
+        return mpz_get_d (num) / mpz_get_d (den);
+
+    /* scale the quotient to 55 or 56 bits so that there are two more bits than
+       the double can hold, the lowest one is then used as a sticky bit
+       telling whether anything non-zero was cut off */
+    shift = 55 - ((long) mpz_sizeinbase (num, 2) - (long) mpz_sizeinbase (den, 2));
+    mpz_inits (quot, rem, NULL);
+    if (shift >= 0) {
+        mpz_mul_2exp (quot, num, shift);
+        mpz_tdiv_qr (quot, rem, quot, den);
+    } else {
+        mpz_mul_2exp (rem, den, -shift);
+        mpz_tdiv_qr (quot, rem, num, rem);
+    }
+    /* the sign is applied at the end */
+    mpz_abs (quot, quot);
+    if (mpz_sgn (rem) != 0)
+        mpz_setbit (quot, 0);
+
+    mpz_export (&bits, &count, 1, sizeof(uint64_t), 0, 0, quot);
+    /* the conversion rounds to nearest, ties to even */
+    ret = ldexp ((double) bits, -shift);
+    if (mpz_sgn (num) < 0)
+        ret = -ret;
+    mpz_clears (quot, rem, NULL);
+
+    return ret;
+}
+
+/**
+ * set_ratio: (skip)
+ * @num: (out): place to store the numerator of the fraction
+ * @den: (out): place to store the (positive) denominator of the fraction
+ * @den_val: a non-zero number
+ *
+ * Sets @num and @den to the fraction @num_val / @den_val in lowest terms.
+ */
+static void set_ratio (BSSize num, BSSize den, mpz_srcptr num_val, mpz_srcptr den_val) {
+    mpq_t ratio;
+
+    mpq_init (ratio);
+    mpz_set (mpq_numref (ratio), num_val);
+    mpz_set (mpq_denref (ratio), den_val);
+    mpq_canonicalize (ratio);
+
+    size_set_mpz (num, mpq_numref (ratio));
+    size_set_mpz (den, mpq_denref (ratio));
+    mpq_clear (ratio);
+}
+
+/**
+ * digits_to_prec: (skip)
+ *
+ * Returns: precision (in bits) of floating-point numbers sufficient to get
+ *          @digits significant decimal digits right
+ */
+static mp_bitcnt_t digits_to_prec (int digits) {
+    /* log2(10) < 4 bits per digit plus some guard bits for the rounding
+       errors */
+    return (mp_bitcnt_t) digits * 4 + 32;
+}
+
+/**
+ * check_digits: (skip)
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Returns: whether @digits is a valid number of significant digits (or
+ *          %BS_DIGITS_DOUBLE) or not
+ */
+static bool check_digits (int digits, BSError **error) {
+    if (digits < 0) {
+        set_error (error, BS_ERROR_INVALID_SPEC, strdup_printf ("Invalid number of digits: %d", digits));
+        return false;
+    }
+
+    return true;
+}
+
+/**
+ * SizeSpec: (skip)
+ *
+ * Parts of a size spec as found by scan_size_spec(). The digits and the unit
+ * point to the original string (they are not '\0'-terminated), leading zeros
+ * of the integer part and trailing zeros of the fractional part are not
+ * included (@has_digits tells whether there were any digits at all).
+ */
+typedef struct _SizeSpec {
+    int sign;
+    bool has_digits;
+    const char *int_digits;
+    size_t int_len;
+    const char *frac_digits;
+    size_t frac_len;
+    long exp;
+    const char *unit;
+    size_t unit_len;
+} SizeSpec;
+
+/* powers of 10 that fit into uint64_t */
+static const uint64_t pow10_u64[] = {
+    1ULL, 10ULL, 100ULL, 1000ULL, 10000ULL, 100000ULL, 1000000ULL, 10000000ULL,
+    100000000ULL, 1000000000ULL, 10000000000ULL, 100000000000ULL,
+    1000000000000ULL, 10000000000000ULL, 100000000000000ULL,
+    1000000000000000ULL, 10000000000000000ULL, 100000000000000000ULL,
+    1000000000000000000ULL, 10000000000000000000ULL
+};
+#define POW10_U64_MAX 19
+/* maximum number of decimal digits a unit adds to a number (1024^8 < 10^25) */
+#define UNIT_DIGITS_MAX 25
+
+/* the same characters '\s' matches in PCRE2 */
+static inline bool is_spec_space (char c) {
+    return c == ' ' || (c >= '\t' && c <= '\r');
+}
+
+static inline bool is_spec_digit (char c) {
+    return c >= '0' && c <= '9';
+}
+
+/**
+ * scan_size_spec: (skip)
+ * @spec: (out): place to store the parts of the spec
+ *
+ * Splits @str into the parts of a size spec in a single pass without any
+ * allocations. The accepted grammar is exactly the one of the regular
+ * expression used by bs_size_new_from_str_reference() (where '.' is replaced by
+ * @radix_char in @str before matching):
+ *
+ *   \s* [-+]? [0-9]* (RADIX [0-9]*)? ([eE] [-+]? [0-9]+)? \s* [^\s]* \s*
+ *
+ * Returns: whether @str matches the grammar or not (which doesn't mean it has
+ *          any digits or a valid unit)
+ */
+static bool scan_size_spec (const char *str, const char *radix_char, SizeSpec *spec) {
+    const char *pos = str;
+    const char *exp_pos = NULL;
+    int exp_sign = 1;
+    size_t radix_len = 0;
+
+    memset (spec, 0, sizeof(SizeSpec));
+    spec->sign = 1;
+
+    while (is_spec_space (*pos))
+        pos++;
+
+    if (*pos == '-' || *pos == '+') {
+        spec->sign = (*pos == '-') ? -1 : 1;
+        pos++;
+    }
+
+    /* integer part */
+    spec->int_digits = pos;
+    while (is_spec_digit (*pos))
+        pos++;
+    spec->int_len = pos - spec->int_digits;
+    spec->has_digits = spec->int_len > 0;
+    /* leading zeros don't change the value */
+    while (spec->int_len > 0 && spec->int_digits[0] == '0') {
+        spec->int_digits++;
+        spec->int_len--;
+    }
+
+    /* fractional part ('.' is always accepted, see above) */
+    radix_len = strlen (radix_char);
+    if (*pos == '.' || (radix_len > 0 && strncmp (pos, radix_char, radix_len) == 0)) {
+        pos += (*pos == '.') ? 1 : radix_len;
+        spec->frac_digits = pos;
+        while (is_spec_digit (*pos))
+            pos++;
+        spec->frac_len = pos - spec->frac_digits;
+        spec->has_digits = spec->has_digits || spec->frac_len > 0;
+        /* trailing zeros don't change the value */
+        while (spec->frac_len > 0 && spec->frac_digits[spec->frac_len - 1] == '0')
+            spec->frac_len--;
+    }
+
+    /* exponent (only if there are some digits) */
+    if (*pos == 'e' || *pos == 'E') {
+        exp_pos = pos + 1;
+        if (*exp_pos == '-' || *exp_pos == '+') {
+            exp_sign = (*exp_pos == '-') ? -1 : 1;
+            exp_pos++;
+        }
+        if (is_spec_digit (*exp_pos)) {
+            for (pos=exp_pos; is_spec_digit (*pos); pos++)
+                /* saturate the same way strtol() does */
+                if (spec->exp > (LONG_MAX - (*pos - '0')) / 10)
+                    spec->exp = LONG_MAX;
+                else
+                    spec->exp = spec->exp * 10 + (*pos - '0');
+            spec->exp *= exp_sign;
+        }
+    }
+
+    while (is_spec_space (*pos))
+        pos++;
+
+    spec->unit = pos;
+    while (*pos && !is_spec_space (*pos))
+        pos++;
+    spec->unit_len = pos - spec->unit;
+
+    while (is_spec_space (*pos))
+        pos++;
+
+    return *pos == '\0';
+}
+
+/**
+ * ParseContext: (skip)
+ * @radix_char: radix character accepted (besides '.')
+ * @xlate: whether to accept the translated unit names too or just the
+ *         untranslated ones (see find_unit_c())
+ * @units: (nullable): unit lookup table for the current locale (if @xlate)
+ *
+ * Everything parsing size specs depends on, resolved once for any number of
+ * them.
+ */
+typedef struct _ParseContext {
+    const char *radix_char;
+    bool xlate;
+    const UnitTable *units;
+} ParseContext;
+
+/**
+ * parse_context_init: (skip)
+ * @xlate: whether to parse in the current locale (or in the "C" locale)
+ */
+static void parse_context_init (ParseContext *ctx, bool xlate) {
+    ctx->xlate = xlate;
+    ctx->radix_char = xlate ? nl_langinfo (RADIXCHAR) : ".";
+    ctx->units = xlate ? get_current_unit_table () : NULL;
+}
+
+static inline char ascii_tolower (char c) {
+    return (c >= 'A' && c <= 'Z') ? c - 'A' + 'a' : c;
+}
+
+/**
+ * find_unit_c: (skip)
+ * @unit_str: the unit (not '\0'-terminated)
+ * @len: length of @unit_str
+ *
+ * Looks up the unit @unit_str refers to in the "C" locale, i.e. only among the
+ * untranslated unit names (comparing them as ASCII), see find_unit(). Needs no
+ * locale data and no per-thread state.
+ */
+static bool find_unit_c (const char *unit_str, size_t len, uint64_t *pwr, bool *decimal) {
+    const char *name = NULL;
+    size_t i = 0;
+    size_t j = 0;
+
+    /* binary units first, same order as everywhere else */
+    for (i=0; i < BS_BUNIT_UNDEF + (BS_DUNIT_UNDEF - BS_DUNIT_B); i++) {
+        name = i < BS_BUNIT_UNDEF ? b_units[i] : d_units[i - BS_BUNIT_UNDEF];
+        for (j=0; j < len && name[j] && ascii_tolower (unit_str[j]) == ascii_tolower (name[j]); j++);
+        if (j == len) {
+            *pwr = i < BS_BUNIT_UNDEF ? i : i - BS_BUNIT_UNDEF;
+            *decimal = i >= BS_BUNIT_UNDEF;
+            return true;
+        }
+    }
+
+    return false;
+}
+
+/**
+ * find_unit_in_spec: (skip)
+ *
+ * Looks up the unit of @spec, see find_unit_in_table() and find_unit_c().
+ */
+static bool find_unit_in_spec (const SizeSpec *spec, const ParseContext *ctx, uint64_t *pwr, bool *decimal) {
+    char buf[64];
+    char *unit_str = buf;
+    const char *radix_char = ctx->radix_char;
+    size_t radix_len = strlen (radix_char);
+    size_t len = 0;
+    size_t i = 0;
+    bool ret = false;
+
+    if (!ctx->xlate)
+        return find_unit_c (spec->unit, spec->unit_len, pwr, decimal);
+
+    /* '.' is replaced with the radix character everywhere in the spec (see
+       scan_size_spec()), including the unit */
+    for (i=0; i < spec->unit_len; i++)
+        len += (spec->unit[i] == '.') ? radix_len : 1;
+
+    if (len >= sizeof(buf)) {
+        unit_str = malloc (len + 1);
+        if (!unit_str)
+            return false;
+    }
+
+    for (i=0, len=0; i < spec->unit_len; i++) {
+        if (spec->unit[i] == '.') {
+            memcpy (unit_str + len, radix_char, radix_len);
+            len += radix_len;
+        } else
+            unit_str[len++] = spec->unit[i];
+    }
+    unit_str[len] = '\0';
+
+    ret = find_unit_in_table (ctx->units, unit_str, pwr, decimal);
+    if (unit_str != buf)
+        free (unit_str);
+
+    return ret;
+}
+
+/* *digits* are at most POW10_U64_MAX digits long */
+static uint64_t digits_to_u64 (const char *digits, size_t len) {
+    uint64_t ret = 0;
+    size_t i = 0;
+
+    for (i=0; i < len; i++)
+        ret = ret * 10 + (digits[i] - '0');
+
+    return ret;
+}
+
+/**
+ * spec_to_u64: (skip)
+ * @bytes: (out): place to store the absolute value of the size in bytes
+ *
+ * Computes the number of bytes @spec represents using just 64bit integer
+ * arithmetic.
+ *
+ * Returns: whether the number of bytes could be computed this way or not (in
+ *          which case spec_to_mpz() needs to be used)
+ */
+static bool spec_to_u64 (const SizeSpec *spec, uint64_t unit_pwr, bool decimal_unit, uint64_t *bytes) {
+    uint64_t num = 0;
+    long scale = 0;
+
+    if (spec->int_len + spec->frac_len > POW10_U64_MAX)
+        return false;
+    num = digits_to_u64 (spec->int_digits, spec->int_len) * pow10_u64[spec->frac_len] +
+          digits_to_u64 (spec->frac_digits, spec->frac_len);
+
+    /* num * 10^scale * 1024^unit_pwr (or 1000^unit_pwr), num * 1024^unit_pwr
+       always fits into uint64_t if we get to the division and we can't get
+       any bytes out of it if we divide by more than 10^POW10_U64_MAX */
+    if (num == 0 || spec->exp < -1000) {
+        *bytes = 0;
+        return true;
+    }
+    if (spec->exp > 1000)
+        return false;
+
+    scale = spec->exp - (long) spec->frac_len;
+    if (decimal_unit)
+        scale += 3 * unit_pwr;
+    else if (unit_pwr > 0) {
+        if (10 * unit_pwr >= 64 || num > (UINT64_MAX >> (10 * unit_pwr)))
+            return false;
+        num <<= 10 * unit_pwr;
+    }
+
+    if (scale >= 0) {
+        if (scale > POW10_U64_MAX || __builtin_mul_overflow (num, pow10_u64[scale], &num))
+            return false;
+    } else if (-scale > POW10_U64_MAX)
+        num = 0;
+    else
+        /* rational to int, round towards zero (see bs_size_new_from_str_reference()) */
+        num /= pow10_u64[-scale];
+
+    *bytes = num;
+    return true;
+}
+
+/* *rop* = *digits* */
+static void mpz_set_digits (mpz_t rop, const char *digits, size_t len) {
+    size_t chunk = 0;
+
+    mpz_set_ui (rop, 0);
+    while (len > 0) {
+        /* 10^9 fits into unsigned long everywhere */
+        chunk = len > 9 ? 9 : len;
+        mpz_mul_ui (rop, rop, (unsigned long int) pow10_u64[chunk]);
+        mpz_add_ui (rop, rop, (unsigned long int) digits_to_u64 (digits, chunk));
+        digits += chunk;
+        len -= chunk;
+    }
+}
+
+/**
+ * spec_to_mpz: (skip)
+ *
+ * Computes the number of bytes @spec represents (the slow way). Gives the same
+ * results as bs_size_new_from_str_reference().
+ */
+static void spec_to_mpz (mpz_t rop, const SizeSpec *spec, uint64_t unit_pwr, bool decimal_unit) {
+    mpz_t num, den, aux;
+    long scale = 0;
+
+    mpz_inits (num, den, aux, NULL);
+
+    mpz_set_digits (num, spec->int_digits, spec->int_len);
+    mpz_ui_pow_ui (den, 10, spec->frac_len);
+    mpz_mul (num, num, den);
+    mpz_set_digits (aux, spec->frac_digits, spec->frac_len);
+    mpz_add (num, num, aux);
+
+    mpz_mul (num, num, *get_unit_pow (unit_pwr, decimal_unit));
+
+    scale = spec->exp;
+    if (scale > 0) {
+        mpz_ui_pow_ui (aux, 10, scale);
+        mpz_mul (num, num, aux);
+    } else if (scale < 0) {
+        mpz_ui_pow_ui (aux, 10, -scale);
+        mpz_mul (den, den, aux);
+    }
+
+    /* rational to int, round towards zero (see bs_size_new_from_str_reference()) */
+    mpz_tdiv_q (rop, num, den);
+    if (spec->sign == -1)
+        mpz_neg (rop, rop);
+
+    mpz_clears (num, den, aux, NULL);
+}
+
+/***************
+ * DESTRUCTORS *
+ * *************/
+/**
+ * bs_size_free:
+ * @size: (nullable): %BSSize to free
+ *
+ * Clears @size and frees the allocated resources.
+ */
+void bs_size_free (BSSize size) {
+    if (size) {
+        if (size->big)
+            mpz_clear (size->bytes);
+        free (size);
+    }
+    return;
+}
+
+/**
+ * bs_clear_error:
+ * @error: (nullable): %BSError to clear
+ *
+ * Clears @error and frees the allocated resources.
+ */
+void bs_clear_error (BSError **error) {
+    if (error && *error) {
+        free ((*error)->msg);
+        free (*error);
+        *error = NULL;
+    }
+    return;
+}
+
+
+/****************
+ * CONSTRUCTORS *
+ ****************/
+/**
+ * bs_size_new: (constructor)
+ *
+ * Creates a new #BSSize instance initialized to 0.
+ *
+ * Returns: a new #BSSize initialized to 0.
+ */
+BSSize bs_size_new (void) {
+    BSSize ret = (BSSize) malloc (sizeof(struct _BSSize));
+    assert (ret);
+    bs_size_init (ret);
+    return ret;
+}
+
+/**
+ * bs_size_new_from_bytes: (constructor)
+ * @bytes: number of bytes
+ * @sgn: sign of the size -- if being -1, the size is initialized to
+ *       -@bytes, other values are ignored
+ *
+ * Creates a new #BSSize instance.
  *
  * Returns: a new #BSSize
  */
-BSSize bs_size_new_from_str (const char *size_str, BSError **error) {
+BSSize bs_size_new_from_bytes (uint64_t bytes, int sgn) {
+    BSSize ret = bs_size_new ();
+
+    size_set_u64 (ret, bytes, sgn);
+    return ret;
+}
+
+
+#ifdef BS_REFERENCE_PARSER
+/**
+ * bs_size_new_from_str_reference: (skip)
+ *
+ * The original PCRE2-based implementation of bs_size_new_from_str() kept as a
+ * reference for the hand-written parser (see scan_size_spec()). Only built
+ * into the library used by the tests (with %BS_REFERENCE_PARSER defined), not
+ * part of the API.
+ */
+BSSize bs_size_new_from_str_reference (const char *size_str, BSError **error) {
     char const * const pattern = "^\\s*         # white space \n" \
                                   "(?P<sign>(-|\\+)?)     # optional sign character \n" \
                                   "(?P<int_part>[0-9]*)   # integer part \n" \
@@ -678,755 +1803,3248 @@ BSSize bs_size_new_from_str (const char *size_str, BSError **error) {
 
     ret = bs_size_new ();
     /* Rational to int, round towards zero for preserving previous behaviour */
-    mpz_tdiv_q (ret->bytes, mpq_numref (size), mpq_denref (size));
+    mpz_tdiv_q (size_get_mpz_rop (ret), mpq_numref (size), mpq_denref (size));
+    size_normalize (ret);
 
     free (loc_size_str);
     mpq_clear (size);
 
     return ret;
 }
+#endif
 
 /**
- * bs_size_new_from_size: (constructor)
- * @size: the size to create a new instance from (a copy of)
+ * scan_str: (skip)
+ * @spec: (out): place to store the parts of the spec to
+ * @unit_pwr: (out): place to store the power of the unit to
+ * @decimal_unit: (out): place to store whether the unit is a decimal one to
+ * @bad_unit: (out): whether scanning failed because of an unknown unit
  *
- * Creates a new instance of #BSSize.
+ * Splits @size_str into the parts of a size spec and looks up its unit.
  *
- * Returns: (transfer full): a new #BSSize instance which is copy of @size.
+ * Returns: whether @size_str is a valid size spec or not
  */
-BSSize bs_size_new_from_size (const BSSize size) {
-    BSSize ret = NULL;
-
-    ret = bs_size_new ();
-    mpz_set (ret->bytes, size->bytes);
+static bool scan_str (const char *size_str, const ParseContext *ctx, SizeSpec *spec, uint64_t *unit_pwr,
+                      bool *decimal_unit, bool *bad_unit) {
+    *bad_unit = false;
+    *unit_pwr = 0;
+    *decimal_unit = false;
+    if (!scan_size_spec (size_str, ctx->radix_char, spec) || !spec->has_digits)
+        return false;
+
+    if (spec->unit_len > 0 && !find_unit_in_spec (spec, ctx, unit_pwr, decimal_unit)) {
+        *bad_unit = true;
+        return false;
+    }
 
-    return ret;
+    return true;
 }
 
-
-/*****************
- * QUERY METHODS *
- *****************/
 /**
- * bs_size_get_bytes:
- * @sgn: (out) (optional): sign of the @size - -1, 0 or 1 for negative, zero or positive
- *                         size respectively
- * @error: (out) (optional): place to store error (if any)
- *
- * Get the number of bytes of the @size.
+ * spec_to_size: (skip)
+ * @rop: where to store the number of bytes
  *
- * Returns: the @size in a number of bytes
+ * Computes the number of bytes @spec represents.
  */
-uint64_t bs_size_get_bytes (const BSSize size, int *sgn, BSError **error) {
-    char *num_str = NULL;
-    mpz_t max;
-    uint64_t ret = 0;
-    int ok = 0;
-
-    mpz_init2 (max, (mp_bitcnt_t) 64);
-    ok = asprintf (&num_str, "%"PRIu64, UINT64_MAX);
-    if (ok == -1) {
-        /* we probably cannot allocate memory so we are doomed */
-        set_error (error, BS_ERROR_FAIL, strdup("Failed to allocate memory"));
-        mpz_clear (max);
-        return 0;
-    }
-    mpz_set_str (max, num_str, 10);
-    free (num_str);
-    if (mpz_cmp (size->bytes, max) > 0) {
-        mpz_clear (max);
-        set_error (error, BS_ERROR_OVER, strdup("The size is too big, cannot be returned as a 64bit number of bytes"));
-        return 0;
-    }
-    mpz_clear (max);
-    if (sgn)
-        *sgn = mpz_sgn (size->bytes);
-    if (mpz_cmp_ui (size->bytes, UINT64_MAX) <= 0)
-        return (uint64_t) mpz_get_ui (size->bytes);
+static void spec_to_size (BSSize rop, const SizeSpec *spec, uint64_t unit_pwr, bool decimal_unit) {
+    uint64_t bytes = 0;
+
+    if (spec_to_u64 (spec, unit_pwr, decimal_unit, &bytes))
+        size_set_u64 (rop, bytes, spec->sign);
     else {
-        num_str = bs_size_get_bytes_str (size);
-        ret = strtoull (num_str, NULL, 10);
-        free (num_str);
-        return ret;
+        spec_to_mpz (size_get_mpz_rop (rop), spec, unit_pwr, decimal_unit);
+        size_normalize (rop);
     }
 }
 
 /**
- * bs_size_sgn:
+ * spec_magnitude: (skip)
+ * @zero: (out): whether all the digits in @spec are zeros
  *
- * Get the sign of the size.
+ * Gets the decimal exponent of the most significant non-zero digit of the
+ * number in @spec (without the unit), i.e. the @mag for which
+ * 10^@mag <= |number| < 10^(@mag + 1). Saturates at %LONG_MAX and %LONG_MIN.
  *
- * Returns: -1, 0 or 1 if @size is negative, zero or positive, respectively
+ * Returns: the decimal exponent (0 if @zero)
  */
-int bs_size_sgn (const BSSize size) {
-    return mpz_sgn (size->bytes);
-}
+static long spec_magnitude (const SizeSpec *spec, bool *zero) {
+    size_t i = 0;
+    long mag = 0;
+
+    *zero = false;
+    for (i=0; i < spec->int_len && spec->int_digits[i] == '0'; i++);
+    if (i < spec->int_len) {
+        /* (at most) the lengths of the strings, no overflow */
+        mag = (long) (spec->int_len - i - 1);
+        if (__builtin_add_overflow (spec->exp, mag, &mag))
+            mag = LONG_MAX;
+        return mag;
+    }
 
-/**
- * bs_size_get_bytes_str:
- *
- * Get the number of bytes in @size as a string. This way, the caller doesn't
- * have to care about the limitations of some particular integer type.
- *
- * Returns: (transfer full): the string representing the @size as a number of bytes.
- */
-char* bs_size_get_bytes_str (const BSSize size) {
-    return mpz_get_str (NULL, 10, size->bytes);
+    for (i=0; i < spec->frac_len && spec->frac_digits[i] == '0'; i++);
+    if (i < spec->frac_len) {
+        mag = -(long) (i + 1);
+        if (__builtin_add_overflow (spec->exp, mag, &mag))
+            mag = LONG_MIN;
+        return mag;
+    }
+
+    *zero = true;
+    return 0;
 }
 
 /**
- * bs_size_convert_to:
- * @unit: the unit to convert @size to
- * @error: (out) (optional): place to store error (if any)
+ * spec_get_u64: (skip)
+ * @bytes: (out): place to store the absolute value of the size in bytes to
+ * @sgn: (out): place to store the sign of the size to
  *
- * Get the @size converted to @unit as a string representing a floating-point
- * number.
+ * Computes the number of bytes @spec represents without creating a #BSSize
+ * (unless the number in @spec is too long for spec_to_u64()). Sizes that are
+ * clearly too big (or smaller than a byte) are recognized from the magnitude
+ * of the number, so a huge exponent doesn't make this compute a huge number.
  *
- * Returns: (transfer full): a string representing the floating-point number
- *                           that equals to @size converted to @unit
+ * Returns: whether the absolute value of the size fits into #uint64_t (and
+ *          @bytes and @sgn were set) or not
  */
-char* bs_size_convert_to (const BSSize size, BSUnit unit, BSError **error) {
-    BSBunit b_unit = BS_BUNIT_B;
-    BSDunit d_unit = BS_DUNIT_B;
-    mpf_t divisor;
-    mpf_t result;
-    bool found_match = false;
-    char *ret = NULL;
-
-    mpf_init2 (divisor, BS_FLOAT_PREC_BITS);
-    for (b_unit = BS_BUNIT_B; !found_match && b_unit != BS_BUNIT_UNDEF; b_unit++) {
-        if (unit.bunit == b_unit) {
-            found_match = true;
-            mpf_set_ui (divisor, 1);
-            mpf_mul_2exp (divisor, divisor, 10 * (b_unit - BS_BUNIT_B));
-        }
-    }
-
-    for (d_unit = BS_DUNIT_B; !found_match && d_unit != BS_DUNIT_UNDEF; d_unit++) {
-        if (unit.dunit == d_unit) {
-            found_match = true;
-            mpf_set_ui (divisor, 1000);
-            mpf_pow_ui (divisor, divisor, (d_unit - BS_DUNIT_B));
-        }
+static bool spec_get_u64 (const SizeSpec *spec, uint64_t unit_pwr, bool decimal_unit, uint64_t *bytes, int *sgn) {
+    struct _BSSize size;
+    size_t count = 0;
+    bool zero = false;
+    long mag = 0;
+    bool ret = true;
+
+    if (spec_to_u64 (spec, unit_pwr, decimal_unit, bytes)) {
+        *sgn = *bytes == 0 ? 1 : spec->sign;
+        return true;
     }
 
-    if (!found_match) {
-        set_error (error, BS_ERROR_INVALID_SPEC, strdup ("Invalid unit spec given"));
-        mpf_clear (divisor);
-        return NULL;
+    mag = spec_magnitude (spec, &zero);
+    if (zero || mag < -UNIT_DIGITS_MAX) {
+        /* |number| * unit < 10^(mag + 1 + UNIT_DIGITS_MAX) <= 1 */
+        *bytes = 0;
+        *sgn = 1;
+        return true;
     }
+    if (mag > POW10_U64_MAX)
+        /* |number| >= 10^20 > UINT64_MAX */
+        return false;
+
+    /* close to the limits, the exponent is now bounded by the number of digits */
+    bs_size_init (&size);
+    spec_to_size (&size, spec, unit_pwr, decimal_unit);
+    if (!size.big) {
+        *bytes = abs_i64 (size.small);
+        *sgn = size.small < 0 ? -1 : 1;
+    } else if (mpz_sizeinbase (size.bytes, 2) <= 64) {
+        mpz_export (bytes, &count, 1, sizeof (uint64_t), 0, 0, size.bytes);
+        *sgn = mpz_sgn (size.bytes);
+    } else
+        ret = false;
 
-    mpf_init2 (result, BS_FLOAT_PREC_BITS);
-    mpf_set_z (result, size->bytes);
-
-    mpf_div (result, result, divisor);
-
-    gmp_asprintf (&ret, "%.*Fg", BS_FLOAT_PREC_BITS/3, result);
-    mpf_clears (divisor, result, NULL);
+    if (size.big)
+        mpz_clear (size.bytes);
 
     return ret;
 }
 
 /**
- * bs_size_human_readable:
- * @min_unit: the smallest unit the returned representation should use
- * @max_places: maximum number of decimal places the representation should use
- * @xlate: whether to try to translate the representation or not
+ * parse_str: (skip)
+ * @rop: where to store the number of bytes
+ * @bad_unit: (out): whether parsing failed because of an unknown unit
  *
- * Get a human-readable representation of @size.
+ * Parses @size_str with the hand-written parser.
  *
- * Returns: (transfer full): a string which is human-readable representation of
- *                           @size according to the restrictions given by the
- *                           other parameters
+ * Returns: whether @size_str was a valid size spec (and @rop was set) or not
  */
-char* bs_size_human_readable (const BSSize size, BSBunit min_unit, int max_places, bool xlate) {
-    mpf_t cur_val;
-    char *num_str = NULL;
-    char *ret = NULL;
-    int len = 0;
-    char *zero = NULL;
-    char *radix_char = NULL;
-    int sign = 0;
-    char *loc_num_str = NULL;
-    bool at_radix = false;
-
-    mpf_init2 (cur_val, BS_FLOAT_PREC_BITS);
-    mpf_set_z (cur_val, size->bytes);
+static bool parse_str (BSSize rop, const char *size_str, const ParseContext *ctx, bool *bad_unit) {
+    SizeSpec spec;
+    uint64_t unit_pwr = 0;
+    bool decimal_unit = false;
 
-    if (min_unit == BS_BUNIT_UNDEF)
-        min_unit = BS_BUNIT_B;
+    if (!scan_str (size_str, ctx, &spec, &unit_pwr, &decimal_unit, bad_unit))
+        return false;
 
-    sign = mpf_sgn (cur_val);
-    mpf_abs (cur_val, cur_val);
+    spec_to_size (rop, &spec, unit_pwr, decimal_unit);
+    return true;
+}
 
-    mpf_div_2exp (cur_val, cur_val, 10 * (min_unit - BS_BUNIT_B));
-    while ((mpf_cmp_ui (cur_val, 1024) > 0) && min_unit != BS_BUNIT_YiB) {
-        mpf_div_2exp (cur_val, cur_val, 10);
-        min_unit++;
+/**
+ * parse_str_u64: (skip)
+ * @loc: (nullable): locale to parse @size_str in or %NULL for the "C" locale
+ * @bytes: (out): place to store the absolute value of the size in bytes to
+ * @sgn: (out): place to store the sign of the size to
+ * @error: (nullable): place to store the error to (see set_error_info())
+ *
+ * Parses @size_str with the hand-written parser without creating a #BSSize,
+ * reporting errors without any allocations. Sizes with the absolute value not
+ * fitting into #uint64_t are reported as %BS_ERROR_OVER.
+ *
+ * Returns: whether @size_str was parsed (and @bytes and @sgn were set) or not
+ */
+static bool parse_str_u64 (const char *size_str, locale_t loc, uint64_t *bytes, int *sgn, BSErrorInfo *error) {
+    SizeSpec spec;
+    ParseContext ctx;
+    locale_t orig_loc = (locale_t) 0;
+    uint64_t unit_pwr = 0;
+    bool decimal_unit = false;
+    bool bad_unit = false;
+    bool ret = false;
+
+    if (!size_str) {
+        set_error_info (error, BS_ERROR_INVALID_SPEC, "No size spec given");
+        return false;
     }
 
-    if (sign == -1)
-        mpf_neg (cur_val, cur_val);
-
-    len = gmp_asprintf (&num_str, "%.*Ff", max_places >= 0 ? max_places : BS_FLOAT_PREC_BITS,
-                        cur_val);
-    mpf_clear (cur_val);
-
-    /* should use the proper radix char according to @xlate */
-    radix_char = nl_langinfo (RADIXCHAR);
-    if (!xlate) {
-        loc_num_str = replace_str_with_str (num_str, radix_char, ".");
-        free (num_str);
-        radix_char = ".";
-    } else
-        loc_num_str = num_str;
-
-    /* remove trailing zeros and the radix char */
-    /* if max_places == 0, there can't be anything trailing */
-    if (max_places != 0) {
-        zero = loc_num_str + (len - 1);
-        while ((zero != loc_num_str) && ((*zero == '0') || (*zero == *radix_char)) && !at_radix) {
-            at_radix = *zero == *radix_char;
-            zero--;
-        }
-        zero[1] = '\0';
+    if (loc)
+        orig_loc = use_locale (loc);
+    parse_context_init (&ctx, loc != NULL);
+    ret = scan_str (size_str, &ctx, &spec, &unit_pwr, &decimal_unit, &bad_unit);
+    if (loc)
+        uselocale (orig_loc);
+
+    if (!ret) {
+        set_error_info (error, BS_ERROR_INVALID_SPEC,
+                        bad_unit ? "Failed to recognize unit from the spec" : "Failed to parse size spec");
+        return false;
     }
 
-    ret = strdup_printf ("%s %s", loc_num_str, xlate ? _(b_units[min_unit - BS_BUNIT_B]) : b_units[min_unit - BS_BUNIT_B]);
-    free (loc_num_str);
+    if (!spec_get_u64 (&spec, unit_pwr, decimal_unit, bytes, sgn)) {
+        set_error_info (error, BS_ERROR_OVER, "The size is too big, cannot be returned as a 64bit number of bytes");
+        return false;
+    }
 
-    return ret;
+    return true;
 }
 
-
-/***************
- * ARITHMETIC *
- ***************/
 /**
- * bs_size_add:
- *
- * Add two sizes.
+ * new_from_str: (skip)
  *
- * Returns: (transfer full): a new instance of #BSSize which is a sum of @size1 and @size2
+ * Implementation of bs_size_new_from_str() and bs_size_new_from_str_l() using
+ * the hand-written parser.
  */
-BSSize bs_size_add (const BSSize size1, const BSSize size2) {
-    BSSize ret = bs_size_new ();
-    mpz_add (ret->bytes, size1->bytes, size2->bytes);
+static BSSize new_from_str (const char *size_str, const ParseContext *ctx, BSError **error) {
+    BSSize ret = NULL;
+    bool bad_unit = false;
+
+    ret = bs_size_new ();
+    if (!parse_str (ret, size_str, ctx, &bad_unit)) {
+        if (bad_unit)
+            set_error (error, BS_ERROR_INVALID_SPEC, strdup_printf ("Failed to recognize unit from the spec: %s", size_str));
+        else
+            set_error (error, BS_ERROR_INVALID_SPEC, strdup_printf ("Failed to parse size spec: %s", size_str));
+        bs_size_free (ret);
+        return NULL;
+    }
 
     return ret;
 }
 
 /**
- * bs_size_grow:
- *
- * Grows @size1 by @size2. IOW, adds @size2 to @size1 in-place (modifying
- * @size1).
+ * bs_size_new_from_str: (constructor)
+ * @size_str: string representing the size as a number and an optional unit
+ *            (e.g. "1 GiB")
+ * @error: (out) (optional): place to store error (if any)
  *
- * Basically an in-place variant of bs_size_add().
+ * Creates a new #BSSize instance.
  *
- * Returns: (transfer none): @size1 modified by adding @size2 to it
+ * Returns: a new #BSSize
  */
-BSSize bs_size_grow (BSSize size1, const BSSize size2) {
-    mpz_add (size1->bytes, size1->bytes, size2->bytes);
+BSSize bs_size_new_from_str (const char *size_str, BSError **error) {
+    ParseContext ctx;
 
-    return size1;
+    parse_context_init (&ctx, true);
+    return new_from_str (size_str, &ctx, error);
 }
 
 /**
- * bs_size_add_bytes:
+ * bs_size_new_from_str_l: (constructor)
+ * @size_str: string representing the size as a number and an optional unit
+ *            (e.g. "1 GiB")
+ * @loc: (nullable): locale to parse @size_str in or %NULL for the "C" locale
+ * @error: (out) (optional): place to store error (if any)
  *
- * Add @bytes to the @size. To add a negative number of bytes use
- * bs_size_sub_bytes().
+ * Same as bs_size_new_from_str(), but uses the radix character and the
+ * translations of the unit names of @loc instead of the ones of the locale
+ * currently used by the calling thread. Unlike switching the locale with
+ * setlocale(), this doesn't affect any other threads.
  *
- * Returns: (transfer full): a new instance of #BSSize which is a sum of @size and @bytes
+ * Parsing in the "C" locale (with %NULL) needs no locale data at all and is
+ * faster than parsing in any other locale.
+ *
+ * Returns: a new #BSSize
  */
-BSSize bs_size_add_bytes (const BSSize size, uint64_t bytes) {
-    BSSize ret = bs_size_new ();
-    do_64bit_add_sub (mpz_add_ui, ret->bytes, size->bytes, bytes);
+BSSize bs_size_new_from_str_l (const char *size_str, locale_t loc, BSError **error) {
+    locale_t orig_loc = (locale_t) 0;
+    ParseContext ctx;
+    BSSize ret = NULL;
+
+    if (!loc) {
+        parse_context_init (&ctx, false);
+        return new_from_str (size_str, &ctx, error);
+    }
+
+    orig_loc = use_locale (loc);
+    ret = bs_size_new_from_str (size_str, error);
+    uselocale (orig_loc);
 
     return ret;
 }
 
 /**
- * bs_size_grow_bytes:
- *
- * Grows @size by @bytes. IOW, adds @bytes to @size in-place (modifying @size).
+ * bs_size_validate_str:
+ * @size_str: string representing the size as a number and an optional unit
+ *            (e.g. "1 GiB")
+ * @loc: (nullable): locale to parse @size_str in or %NULL for the "C" locale
+ *       (use `uselocale ((locale_t) 0)` for the current locale)
+ * @magnitude: (out) (optional): place to store the magnitude class of the size
+ *             to (if valid)
+ * @error: (out caller-allocates) (optional): place to store the error to (if
+ *         any), the error of the calling thread returned by
+ *         bs_get_last_error_info() is set if %NULL
  *
- * Basically an in-place variant of bs_size_add_bytes().
+ * Checks whether @size_str is a valid size spec (see bs_size_new_from_str_l())
+ * without creating a #BSSize. Unlike with the functions taking #BSError, the
+ * error has a static message and reporting it needs no allocations, so this is
+ * suitable for checking many specs of which a lot may be invalid. There are no
+ * allocations at all unless the number in @size_str has more than 19 digits.
  *
- * Returns: (transfer none): @size modified by adding @bytes to it
+ * Returns: whether @size_str is a valid size spec or not
  */
-BSSize bs_size_grow_bytes (BSSize size, const uint64_t bytes) {
-    do_64bit_add_sub (mpz_add_ui, size->bytes, size->bytes, bytes);
+bool bs_size_validate_str (const char *size_str, locale_t loc, BSMagnitude *magnitude, BSErrorInfo *error) {
+    BSErrorInfo parse_error;
+    uint64_t bytes = 0;
+    int sgn = 0;
+
+    if (!parse_str_u64 (size_str, loc, &bytes, &sgn, &parse_error)) {
+        if (parse_error.code != BS_ERROR_OVER) {
+            set_error_info (error, parse_error.code, parse_error.msg);
+            return false;
+        }
+        /* valid, just too big for 64 bits */
+        if (magnitude)
+            *magnitude = BS_MAGNITUDE_BIG;
+        return true;
+    }
 
-    return size;
+    if (magnitude) {
+        if (sgn < 0)
+            *magnitude = bytes <= (uint64_t) INT64_MAX + 1 ? BS_MAGNITUDE_INT64 : BS_MAGNITUDE_BIG;
+        else
+            *magnitude = bytes <= (uint64_t) INT64_MAX ? BS_MAGNITUDE_INT64 : BS_MAGNITUDE_UINT64;
+    }
+
+    return true;
 }
 
 /**
- * bs_size_sub:
+ * bs_get_last_error_info:
  *
- * Subtract @size2 from @size1.
+ * Gets the last error reported by the functions taking #BSErrorInfo in the
+ * calling thread when called without a place to store the error to. The error
+ * is only ever set, not cleared (like `errno`), so only check it after a failed
+ * call.
  *
- * Returns: (transfer full): a new instance of #BSSize which is equals to @size1 - @size2
+ * Returns: (transfer none) (nullable): the last error of the calling thread or
+ *          %NULL if there was no such error
  */
-BSSize bs_size_sub (const BSSize size1, const BSSize size2) {
-    BSSize ret = bs_size_new ();
-    mpz_sub (ret->bytes, size1->bytes, size2->bytes);
+const BSErrorInfo* bs_get_last_error_info (void) {
+    ThreadState *state = get_thread_state ();
 
-    return ret;
+    if (!state || !state->last_error.msg)
+        return NULL;
+    return &(state->last_error);
 }
 
 /**
- * bs_size_shrink:
- *
- * Shrinks @size1 by @size2. IOW, subtracts @size2 from @size1 in-place
- * (modifying @size1).
+ * bs_size_new_from_size: (constructor)
+ * @size: the size to create a new instance from (a copy of)
  *
- * Basically an in-place variant of bs_size_sub().
+ * Creates a new instance of #BSSize.
  *
- * Returns: (transfer none): @size1 modified by subtracting @size2 from it
+ * Returns: (transfer full): a new #BSSize instance which is copy of @size.
  */
-BSSize bs_size_shrink (BSSize size1, const BSSize size2) {
-    mpz_sub (size1->bytes, size1->bytes, size2->bytes);
+BSSize bs_size_new_from_size (const BSSize size) {
+    BSSize ret = NULL;
 
-    return size1;
+    ret = bs_size_new ();
+    if (size->big) {
+        mpz_init_set (ret->bytes, size->bytes);
+        ret->big = true;
+    } else
+        ret->small = size->small;
+
+    return ret;
 }
 
 /**
- * bs_size_sub_bytes:
+ * bs_size_new_from_double: (constructor)
+ * @bytes: number of bytes (truncated towards zero)
+ * @error: (out) (optional): place to store error (if any)
  *
- * Subtract @bytes from the @size. To subtract a negative number of bytes use
- * bs_size_add_bytes().
+ * Creates a new instance of #BSSize.
  *
- * Returns: (transfer full): a new instance of #BSSize which equals to @size - @bytes
+ * Returns: (transfer full): a new #BSSize instance with the value of @bytes
+ *                           (without the fractional part) or %NULL in case of
+ *                           error (@bytes not being finite)
  */
-BSSize bs_size_sub_bytes (const BSSize size, uint64_t bytes) {
-    BSSize ret = bs_size_new ();
-    do_64bit_add_sub (mpz_sub_ui, ret->bytes, size->bytes, bytes);
+BSSize bs_size_new_from_double (double bytes, BSError **error) {
+    BSSize ret = NULL;
+
+    if (!isfinite (bytes)) {
+        set_error (error, BS_ERROR_INVALID_SPEC, strdup_printf ("'%g' is not a valid number of bytes", bytes));
+        return NULL;
+    }
+
+    ret = bs_size_new ();
+    size_set_double (ret, bytes);
 
     return ret;
 }
 
 /**
- * bs_size_shrink_bytes:
- *
- * Shrinks @size by @bytes. IOW, subtracts @bytes from @size in-place
- * (modifying @size). To shrink by a negative number of bytes use
- * bs_size_grow_bytes().
+ * bs_size_new_from_rational: (constructor)
+ * @num: numerator of the fraction
+ * @den: denominator of the fraction
+ * @error: (out) (optional): place to store error (if any)
  *
- * Basically an in-place variant of bs_size_sub_bytes().
+ * Creates a new instance of #BSSize.
  *
- * Returns: (transfer none): @size modified by subtracting @bytes from it
+ * Returns: (transfer full): a new #BSSize instance with the value of @num /
+ *                           @den (truncated towards zero) or %NULL in case of
+ *                           error (zero @den)
  */
-BSSize bs_size_shrink_bytes (BSSize size, uint64_t bytes) {
-    do_64bit_add_sub (mpz_sub_ui, size->bytes, size->bytes, bytes);
+BSSize bs_size_new_from_rational (const BSSize num, const BSSize den, BSError **error) {
+    MpzView view1;
+    MpzView view2;
+    BSSize ret = NULL;
 
-    return size;
-}
+    if (bs_size_sgn (den) == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return NULL;
+    }
 
-/**
- * bs_size_mul_int:
- *
- * Multiply @size by @times.
- *
- * Returns: (transfer full): a new instance of #BSSize which equals to @size * @times
- */
-BSSize bs_size_mul_int (const BSSize size, uint64_t times) {
-    BSSize ret = bs_size_new ();
-    mul_64bit (ret->bytes, size->bytes, times);
+    ret = bs_size_new ();
+    /* the only overflow possible is INT64_MIN / -1 */
+    if (!num->big && !den->big && !(num->small == INT64_MIN && den->small == -1)) {
+        ret->small = num->small / den->small;
+        return ret;
+    }
+
+    mpz_tdiv_q (size_get_mpz_rop (ret), size_get_mpz (num, &view1), size_get_mpz (den, &view2));
+    size_normalize (ret);
 
     return ret;
 }
 
 /**
- * bs_size_grow_mul_int:
+ * bs_size_import: (constructor)
+ * @data: (array length=data_len): the bytes of an unsigned binary number
+ * @data_len: number of bytes in @data
+ * @order: 1 if the most significant byte is first in @data, -1 if the least
+ *         significant one is first
+ * @sgn: sign of the size -- if being -1, the size is negative
  *
- * Grow @size @times times. IOW, multiply @size by @times in-place.
- *
- * Basically an in-place variant of bs_size_mul_int().
+ * Creates a new instance of #BSSize from an unsigned binary number of any size
+ * (like mpz_import() does), see also bs_size_export().
  *
- * Returns: (transfer none): @size modified by growing it @times times
+ * Returns: (transfer full): a new #BSSize instance
  */
-BSSize bs_size_grow_mul_int (BSSize size, uint64_t times) {
-    mul_64bit (size->bytes, size->bytes, times);
+BSSize bs_size_import (const void *data, size_t data_len, int order, int sgn) {
+    const uint8_t *bytes = data;
+    uint64_t val = 0;
+    size_t i = 0;
+    BSSize ret = NULL;
 
-    return size;
-}
+    ret = bs_size_new ();
 
-/**
- * bs_size_mul_float_str:
- * @error: (out) (optional): place to store error (if any)
+    /* skip the leading zero bytes */
+    if (order == 1)
+        for (; data_len > 0 && bytes[0] == 0; bytes++, data_len--);
+    else
+        for (; data_len > 0 && bytes[data_len - 1] == 0; data_len--);
+
+    if (data_len <= sizeof(uint64_t)) {
+        for (i=0; i < data_len; i++)
+            val = (val << 8) | bytes[order == 1 ? i : data_len - 1 - i];
+        size_set_u64 (ret, val, sgn);
+        return ret;
+    }
+
+    mpz_import (size_get_mpz_rop (ret), data_len, order, 1, 0, 0, bytes);
+    if (sgn == -1)
+        mpz_neg (ret->bytes, ret->bytes);
+
+    return ret;
+}
+
+
+/*****************
+ * QUERY METHODS *
+ *****************/
+/**
+ * bs_size_get_bytes:
+ * @sgn: (out) (optional): sign of the @size - -1, 0 or 1 for negative, zero or positive
+ *                         size respectively
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Get the number of bytes of the @size.
+ *
+ * Returns: the @size in a number of bytes
+ */
+uint64_t bs_size_get_bytes (const BSSize size, int *sgn, BSError **error) {
+    uint64_t ret = 0;
+    size_t count = 0;
+
+    if (!size->big) {
+        if (sgn)
+            *sgn = (size->small > 0) - (size->small < 0);
+        return abs_i64 (size->small);
+    }
+
+    /* the absolute value has to fit into 64 bits (for negative sizes too) */
+    if (mpz_sizeinbase (size->bytes, 2) > 64) {
+        set_error (error, BS_ERROR_OVER, strdup("The size is too big, cannot be returned as a 64bit number of bytes"));
+        return 0;
+    }
+    if (sgn)
+        *sgn = mpz_sgn (size->bytes);
+    mpz_export (&ret, &count, 1, sizeof(uint64_t), 0, 0, size->bytes);
+
+    return ret;
+}
+
+/**
+ * bs_size_export:
+ * @data: (out caller-allocates) (array length=data_len) (nullable): buffer to
+ *        write the bytes to
+ * @data_len: size of @data
+ * @order: 1 to write the most significant byte first, -1 to write the least
+ *         significant byte first
+ * @sgn: (out) (optional): sign of the @size - -1, 0 or 1 for negative, zero or positive
+ *                         size respectively
+ *
+ * Writes the absolute value of @size as an unsigned binary number (like
+ * mpz_export() does) to @data if it is big enough. Works for sizes of any
+ * magnitude, unlike bs_size_get_bytes().
+ *
+ * Returns: number of bytes the absolute value of @size needs (0 for a zero
+ *          size), nothing is written if it is bigger than @data_len
+ */
+size_t bs_size_export (const BSSize size, void *data, size_t data_len, int order, int *sgn) {
+    MpzView view;
+    mpz_srcptr bytes = NULL;
+    size_t len = 0;
+    size_t count = 0;
+
+    bytes = size_get_mpz (size, &view);
+    if (sgn)
+        *sgn = mpz_sgn (bytes);
+    if (mpz_sgn (bytes) == 0)
+        return 0;
+
+    len = (mpz_sizeinbase (bytes, 2) + 7) / 8;
+    if (data && len <= data_len)
+        mpz_export (data, &count, order, 1, 0, 0, bytes);
+
+    return len;
+}
+
+/**
+ * bs_size_sgn:
+ *
+ * Get the sign of the size.
+ *
+ * Returns: -1, 0 or 1 if @size is negative, zero or positive, respectively
+ */
+int bs_size_sgn (const BSSize size) {
+    if (!size->big)
+        return (size->small > 0) - (size->small < 0);
+    return mpz_sgn (size->bytes);
+}
+
+/**
+ * bs_size_get_bytes_str:
+ *
+ * Get the number of bytes in @size as a string. This way, the caller doesn't
+ * have to care about the limitations of some particular integer type.
+ *
+ * Returns: (transfer full): the string representing the @size as a number of bytes.
+ */
+char* bs_size_get_bytes_str (const BSSize size) {
+    char buf[NUM_BUFFER_LEN];
+    char *ret = NULL;
+    int len = 0;
+
+    len = bs_size_get_bytes_str_buf (size, buf, sizeof(buf));
+    if ((size_t) len < sizeof(buf))
+        return strdup (buf);
+
+    ret = malloc (len + 1);
+    bs_size_get_bytes_str_buf (size, ret, len + 1);
+    return ret;
+}
+
+/**
+ * bs_size_get_bytes_str_buf:
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the string to
+ * @buf_len: size of @buf
+ *
+ * Writes the number of bytes in @size as a string to @buf. Works like
+ * snprintf(): at most @buf_len bytes (including the terminating '\0') are
+ * written, no memory is allocated for the result.
+ *
+ * Returns: length of the whole string (not including the terminating '\0'),
+ *          the result was truncated if it is not smaller than @buf_len
+ */
+int bs_size_get_bytes_str_buf (const BSSize size, char *buf, size_t buf_len) {
+    if (!size->big)
+        return snprintf (buf, buf_len, "%"PRId64, size->small);
+    return gmp_snprintf (buf, buf_len, "%Zd", size->bytes);
+}
+
+/**
+ * bs_size_convert_to_double:
+ * @unit: the unit to convert @size to
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Get the @size converted to @unit as a double.
+ *
+ * Returns: @size converted to @unit rounded to the nearest double or 0.0 in
+ *          case of error
+ */
+double bs_size_convert_to_double (const BSSize size, BSUnit unit, BSError **error) {
+    MpzView view;
+    uint64_t pwr = 0;
+    bool decimal = false;
+
+    if (!unit_get_pow (unit, &pwr, &decimal)) {
+        set_error (error, BS_ERROR_INVALID_SPEC, strdup ("Invalid unit spec given"));
+        return 0.0;
+    }
+
+    return ratio_to_double (size_get_mpz (size, &view), *get_unit_pow (pwr, decimal));
+}
+
+/**
+ * bs_size_convert_to_rational:
+ * @unit: the unit to convert @size to
+ * @num: (out) (transfer full): place to store the numerator of the result
+ * @den: (out) (transfer full): place to store the (positive) denominator of the result
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Get the @size converted to @unit exactly as the fraction @num / @den in
+ * lowest terms.
+ *
+ * Returns: whether the conversion was done (and @num and @den were set) or not
+ */
+bool bs_size_convert_to_rational (const BSSize size, BSUnit unit, BSSize *num, BSSize *den, BSError **error) {
+    MpzView view;
+    uint64_t pwr = 0;
+    bool decimal = false;
+
+    if (!unit_get_pow (unit, &pwr, &decimal)) {
+        set_error (error, BS_ERROR_INVALID_SPEC, strdup ("Invalid unit spec given"));
+        return false;
+    }
+
+    *num = bs_size_new ();
+    *den = bs_size_new ();
+    set_ratio (*num, *den, size_get_mpz (size, &view), *get_unit_pow (pwr, decimal));
+
+    return true;
+}
+
+/**
+ * convert_to_buf: (skip)
+ * @prec: precision (in bits) to compute the result with
+ * @digits: number of significant digits to print or %BS_DIGITS_DOUBLE to
+ *          compute the result with doubles instead
+ *
+ * Implementation of bs_size_convert_to_buf() and bs_size_convert_to_prec_buf().
+ */
+static int convert_to_buf (const BSSize size, BSUnit unit, mp_bitcnt_t prec, int digits,
+                           char *buf, size_t buf_len, BSError **error) {
+    mpf_t divisor;
+    mpf_t result;
+    MpzView view;
+    uint64_t pwr = 0;
+    bool decimal = false;
+    int ret = 0;
+
+    if (!unit_get_pow (unit, &pwr, &decimal)) {
+        set_error (error, BS_ERROR_INVALID_SPEC, strdup ("Invalid unit spec given"));
+        return -1;
+    }
+
+    if (digits == BS_DIGITS_DOUBLE)
+        return snprintf (buf, buf_len, "%.*g", DOUBLE_DIGITS,
+                         size_get_double (size) / (decimal ? d_unit_pows_dbl[pwr] : b_unit_pows_dbl[pwr]));
+
+    mpf_init2 (divisor, prec);
+    mpf_set_z (divisor, *get_unit_pow (pwr, decimal));
+
+    mpf_init2 (result, prec);
+    mpf_set_z (result, size_get_mpz (size, &view));
+
+    mpf_div (result, result, divisor);
+
+    ret = gmp_snprintf (buf, buf_len, "%.*Fg", digits, result);
+    mpf_clears (divisor, result, NULL);
+
+    return ret;
+}
+
+/**
+ * bs_size_convert_to:
+ * @unit: the unit to convert @size to
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Get the @size converted to @unit as a string representing a floating-point
+ * number.
+ *
+ * Returns: (transfer full): a string representing the floating-point number
+ *                           that equals to @size converted to @unit
+ */
+char* bs_size_convert_to (const BSSize size, BSUnit unit, BSError **error) {
+    char buf[NUM_BUFFER_LEN];
+    char *ret = NULL;
+    int len = 0;
+
+    len = bs_size_convert_to_buf (size, unit, buf, sizeof(buf), error);
+    if (len < 0)
+        return NULL;
+    if ((size_t) len < sizeof(buf))
+        return strdup (buf);
+
+    ret = malloc (len + 1);
+    bs_size_convert_to_buf (size, unit, ret, len + 1, NULL);
+    return ret;
+}
+
+/**
+ * bs_size_convert_to_buf:
+ * @unit: the unit to convert @size to
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the string to
+ * @buf_len: size of @buf
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Writes @size converted to @unit as a string representing a floating-point
+ * number to @buf. Works like snprintf(), see bs_size_get_bytes_str_buf().
+ *
+ * Returns: length of the whole string (not including the terminating '\0') or
+ *          -1 in case of error
+ */
+int bs_size_convert_to_buf (const BSSize size, BSUnit unit, char *buf, size_t buf_len, BSError **error) {
+    return convert_to_buf (size, unit, BS_FLOAT_PREC_BITS, BS_FLOAT_PREC_BITS/3, buf, buf_len, error);
+}
+
+/**
+ * bs_size_convert_to_prec:
+ * @unit: the unit to convert @size to
+ * @digits: number of significant digits of the result or %BS_DIGITS_DOUBLE
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Same as bs_size_convert_to(), but computes (and prints) the result with
+ * only @digits significant digits. With %BS_DIGITS_DOUBLE the computation is
+ * done with doubles which is fast, but only gives double precision.
+ *
+ * Returns: (transfer full): a string representing the floating-point number
+ *                           that equals to @size converted to @unit
+ */
+char* bs_size_convert_to_prec (const BSSize size, BSUnit unit, int digits, BSError **error) {
+    char buf[NUM_BUFFER_LEN];
+    char *ret = NULL;
+    int len = 0;
+
+    len = bs_size_convert_to_prec_buf (size, unit, digits, buf, sizeof(buf), error);
+    if (len < 0)
+        return NULL;
+    if ((size_t) len < sizeof(buf))
+        return strdup (buf);
+
+    ret = malloc (len + 1);
+    bs_size_convert_to_prec_buf (size, unit, digits, ret, len + 1, NULL);
+    return ret;
+}
+
+/**
+ * bs_size_convert_to_prec_buf:
+ * @unit: the unit to convert @size to
+ * @digits: number of significant digits of the result or %BS_DIGITS_DOUBLE
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the string to
+ * @buf_len: size of @buf
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Same as bs_size_convert_to_buf(), but with the precision given by @digits,
+ * see bs_size_convert_to_prec().
+ *
+ * Returns: length of the whole string (not including the terminating '\0') or
+ *          -1 in case of error
+ */
+int bs_size_convert_to_prec_buf (const BSSize size, BSUnit unit, int digits, char *buf, size_t buf_len, BSError **error) {
+    if (!check_digits (digits, error))
+        return -1;
+
+    return convert_to_buf (size, unit, digits_to_prec (digits), digits, buf, buf_len, error);
+}
+
+/**
+ * human_readable_unit: (skip)
+ *
+ * Returns: the unit @bytes should be represented in by bs_size_human_readable()
+ *          -- the smallest unit (but at least @min_unit) in which the value is
+ *          not bigger than 1024
+ */
+static BSBunit human_readable_unit (mpz_srcptr bytes, BSBunit min_unit) {
+    size_t bits = 0;
+    int unit = BS_BUNIT_B;
+
+    if (mpz_sgn (bytes) == 0)
+        return min_unit;
+
+    /* ceil (log2 (|bytes|)) */
+    bits = mpz_sizeinbase (bytes, 2);
+    if (mpz_scan1 (bytes, 0) == bits - 1)
+        /* a power of 2 */
+        bits--;
+
+    /* |bytes| <= 1024^(unit+1) */
+    if (bits > 10)
+        unit = (bits + 9) / 10 - 1;
+    if (unit > BS_BUNIT_YiB)
+        unit = BS_BUNIT_YiB;
+    if (unit < (int) min_unit)
+        unit = min_unit;
+
+    return unit;
+}
+
+#if defined(__SIZEOF_INT128__) && GMP_NUMB_BITS == 64
+/**
+ * round_digits: (skip)
+ * @digits: decimal digits, the first one is a spare for the carry (and has to
+ *          be '0')
+ * @len: (inout): number of @digits
+ * @cut: index of the first digit to drop
+ *
+ * Rounds @digits (half up) to the first @cut digits.
+ */
+static void round_digits (char *digits, int *len, int cut) {
+    int i = 0;
+
+    if (cut >= *len)
+        return;
+
+    if (digits[cut] >= '5')
+        for (i=cut - 1; i >= 0; i--) {
+            if (digits[i] == '9')
+                digits[i] = '0';
+            else {
+                digits[i]++;
+                break;
+            }
+        }
+    *len = cut;
+}
+
+/**
+ * format_fixed_exact: (skip)
+ * @bytes: number to format
+ * @shift: the value to format is @bytes / 2^@shift
+ * @places: number of decimal places
+ * @radix_char: radix character to use
+ *
+ * Formats @bytes / 2^@shift exactly like "%.*Ff" with gmp_snprintf() and a
+ * #BS_FLOAT_PREC_BITS-precision number would, but using only integer
+ * arithmetic. GMP first rounds the number to a number of significant digits
+ * (depending on @places and the magnitude of the number, but at most
+ * %MPF_SIGNIFICANT_DIGITS) and then to @places decimal places, so the same is
+ * done here. Trailing zeros of the decimal places are left out, but at least
+ * one decimal place is written if @places is not 0.
+ *
+ * Returns: length of the string written to @num_buf or -1 if the value is too
+ *          big for this function
+ */
+static int format_fixed_exact (mpz_srcptr bytes, unsigned int shift, int places, const char *radix_char,
+                               char *num_buf, size_t num_buf_len) {
+    unsigned __int128 frac = 0;
+    unsigned __int128 int_part = 0;
+    unsigned __int128 mask = 0;
+    /* a spare digit, 39 digits of the integer part and at most 120 decimal places */
+    char digits[160];
+    char tmp = '\0';
+    int len = 0;
+    int point = 0;
+    int first = 0;
+    int start = 0;
+    long exp = 0;
+    long n_digits = 0;
+    size_t bits = 0;
+    size_t i = 0;
+    size_t radix_len = 0;
+    char *pos = num_buf;
+
+    /* the fraction is multiplied by 10 in 128 bits, the integer part has to
+       fit into 128 bits */
+    bits = mpz_sizeinbase (bytes, 2);
+    radix_len = strlen (radix_char);
+    if (shift > 120 || bits > 128 || radix_len > 16 || num_buf_len < sizeof(digits) + radix_len + 2)
+        return -1;
+
+    for (i=0; i < mpz_size (bytes); i++)
+        frac |= ((unsigned __int128) mpz_getlimbn (bytes, i)) << (i * GMP_NUMB_BITS);
+    mask = (((unsigned __int128) 1) << shift) - 1;
+    int_part = frac >> shift;
+    frac &= mask;
+
+    /* the integer part (in reverse order first) */
+    digits[len++] = '0';
+    do {
+        digits[len++] = '0' + (char) (int_part % 10);
+        int_part /= 10;
+    } while (int_part > 0);
+    for (first=1, start=len - 1; first < start; first++, start--) {
+        tmp = digits[first];
+        digits[first] = digits[start];
+        digits[start] = tmp;
+    }
+    point = len;
+
+    /* @bytes / 2^@shift has exactly @shift decimal places */
+    while (frac > 0) {
+        frac *= 10;
+        digits[len++] = '0' + (char) (frac >> shift);
+        frac &= mask;
+    }
+
+    if (mpz_sgn (bytes) != 0) {
+        /* number of significant digits GMP uses (see the "F" conversion in
+           printf/doprntf.c and mpf/get_str.c in GMP), 'exp' is the exponent
+           of the number in limbs */
+        if (bits > shift)
+            exp = (bits - shift + GMP_NUMB_BITS - 1) / GMP_NUMB_BITS;
+        else
+            exp = -(long) ((shift - bits) / GMP_NUMB_BITS);
+        n_digits = places + 3 + exp * (DIGITS_PER_LIMB + (exp >= 0));
+        if (n_digits < 1)
+            n_digits = 1;
+        if (n_digits > MPF_SIGNIFICANT_DIGITS)
+            n_digits = MPF_SIGNIFICANT_DIGITS;
+
+        for (first=1; digits[first] == '0'; first++);
+        if (first + n_digits < point)
+            /* would need to replace digits of the integer part with zeros */
+            return -1;
+        round_digits (digits, &len, first + n_digits);
+    }
+    round_digits (digits, &len, point + places);
+
+    if (mpz_sgn (bytes) < 0)
+        *pos++ = '-';
+    start = digits[0] == '0' ? 1 : 0;
+    memcpy (pos, digits + start, point - start);
+    pos += point - start;
+    if (places > 0) {
+        memcpy (pos, radix_char, radix_len);
+        pos += radix_len;
+        if (len > point) {
+            memcpy (pos, digits + point, len - point);
+            pos += len - point;
+        } else
+            *pos++ = '0';
+    }
+    *pos = '\0';
+
+    return pos - num_buf;
+}
+#else
+static int format_fixed_exact (mpz_srcptr bytes __attribute__((unused)), unsigned int shift __attribute__((unused)),
+                               int places __attribute__((unused)), const char *radix_char __attribute__((unused)),
+                               char *num_buf __attribute__((unused)), size_t num_buf_len __attribute__((unused))) {
+    /* no 128bit integers (or GMP limbs of different size), let the caller use MPF */
+    return -1;
+}
+#endif
+
+/**
+ * format_fixed_mpf: (skip)
+ * @min_unit: the smallest unit requested
+ * @unit: the unit to use (see human_readable_unit())
+ * @len: (out): length of the returned string
+ *
+ * Same as format_fixed_exact(), but uses floating-point numbers with
+ * %BS_FLOAT_PREC_BITS bits of precision and writes all the decimal places.
+ * @num_buf (of @num_buf_len bytes) is used if the string fits into it.
+ *
+ * Returns: (transfer full): @num_buf or a newly allocated string
+ */
+static char *format_fixed_mpf (mpz_srcptr bytes, BSBunit min_unit, BSBunit unit, int places, bool xlate,
+                               char *num_buf, size_t num_buf_len, int *len) {
+    mpf_t cur_val;
+    char *num_str = num_buf;
+    const char *radix_char = NULL;
+
+    mpf_init2 (cur_val, BS_FLOAT_PREC_BITS);
+    mpf_set_z (cur_val, bytes);
+    /* numbers this big don't fit into the precision, divide step by step to
+       get the same (truncated) results as always */
+    mpf_div_2exp (cur_val, cur_val, 10 * (min_unit - BS_BUNIT_B));
+    for (; min_unit < unit; min_unit++)
+        mpf_div_2exp (cur_val, cur_val, 10);
+
+    *len = gmp_snprintf (num_buf, num_buf_len, "%.*Ff", places, cur_val);
+    if ((size_t) *len >= num_buf_len) {
+        num_str = malloc (*len + 1);
+        gmp_snprintf (num_str, *len + 1, "%.*Ff", places, cur_val);
+    }
+    mpf_clear (cur_val);
+
+    radix_char = nl_langinfo (RADIXCHAR);
+    if (!xlate && strcmp (radix_char, ".") != 0) {
+        replace_str_with_char (num_str, radix_char, '.');
+        *len = strlen (num_str);
+    }
+
+    return num_str;
+}
+
+/**
+ * bs_size_human_readable:
+ * @min_unit: the smallest unit the returned representation should use
+ * @max_places: maximum number of decimal places the representation should use
+ * @xlate: whether to try to translate the representation or not
+ *
+ * Get a human-readable representation of @size.
+ *
+ * Returns: (transfer full): a string which is human-readable representation of
+ *                           @size according to the restrictions given by the
+ *                           other parameters
+ */
+char* bs_size_human_readable (const BSSize size, BSBunit min_unit, int max_places, bool xlate) {
+    char buf[NUM_BUFFER_LEN];
+    char *ret = NULL;
+    int len = 0;
+
+    len = bs_size_human_readable_buf (size, min_unit, max_places, xlate, buf, sizeof(buf));
+    if ((size_t) len < sizeof(buf))
+        return strdup (buf);
+
+    ret = malloc (len + 1);
+    bs_size_human_readable_buf (size, min_unit, max_places, xlate, ret, len + 1);
+    return ret;
+}
+
+/**
+ * human_readable_buf: (skip)
+ * @bytes: the number of bytes to get the representation of
+ * @radix_char: radix character to use (the current one if @xlate)
+ * @unit_names: names of the binary units to use (see get_bunit_names())
+ *
+ * Implementation of bs_size_human_readable_buf() with everything depending on
+ * the locale resolved by the caller.
+ */
+static int human_readable_buf (mpz_srcptr bytes, BSBunit min_unit, int max_places, bool xlate, const char *radix_char,
+                               const char * const *unit_names, char *buf, size_t buf_len) {
+    BSBunit unit = BS_BUNIT_B;
+    char num_buf[NUM_BUFFER_LEN];
+    char *num_str = num_buf;
+    int places = 0;
+    int len = 0;
+    char *zero = NULL;
+    bool at_radix = false;
+    int ret = 0;
+
+    if (min_unit == BS_BUNIT_UNDEF)
+        min_unit = BS_BUNIT_B;
+
+    unit = human_readable_unit (bytes, min_unit);
+    places = max_places >= 0 ? max_places : BS_FLOAT_PREC_BITS;
+
+    len = format_fixed_exact (bytes, 10 * (unit - BS_BUNIT_B), places, radix_char, num_buf, sizeof(num_buf));
+    if (len < 0)
+        num_str = format_fixed_mpf (bytes, min_unit, unit, places, xlate, num_buf, sizeof(num_buf), &len);
+
+    /* remove trailing zeros and the radix char */
+    /* if max_places == 0, there can't be anything trailing */
+    if (max_places != 0) {
+        zero = num_str + (len - 1);
+        while ((zero != num_str) && ((*zero == '0') || (*zero == *radix_char)) && !at_radix) {
+            at_radix = *zero == *radix_char;
+            zero--;
+        }
+        zero[1] = '\0';
+    }
+
+    ret = snprintf (buf, buf_len, "%s %s", num_str, unit_names[unit - BS_BUNIT_B]);
+    if (num_str != num_buf)
+        free (num_str);
+
+    return ret;
+}
+
+/**
+ * bs_size_human_readable_buf:
+ * @min_unit: the smallest unit the returned representation should use
+ * @max_places: maximum number of decimal places the representation should use
+ * @xlate: whether to try to translate the representation or not
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the string to
+ * @buf_len: size of @buf
+ *
+ * Writes a human-readable representation of @size to @buf. Works like
+ * snprintf(), see bs_size_get_bytes_str_buf().
+ *
+ * Returns: length of the whole string (not including the terminating '\0')
+ */
+int bs_size_human_readable_buf (const BSSize size, BSBunit min_unit, int max_places, bool xlate, char *buf, size_t buf_len) {
+    const char *xlated[BS_BUNIT_UNDEF];
+    MpzView view;
+
+    return human_readable_buf (size_get_mpz (size, &view), min_unit, max_places, xlate,
+                               xlate ? nl_langinfo (RADIXCHAR) : ".", get_bunit_names (xlate, xlated), buf, buf_len);
+}
+
+/**
+ * bs_size_human_readable_l:
+ * @min_unit: the smallest unit the returned representation should use
+ * @max_places: maximum number of decimal places the representation should use
+ * @loc: (nullable): locale to use or %NULL for the "C" locale
+ *
+ * Same as bs_size_human_readable() with @xlate being %TRUE, but uses the radix
+ * character and the translations of the unit names of @loc instead of the
+ * ones of the locale currently used by the calling thread. With %NULL, the
+ * representation is not translated at all (like with @xlate being %FALSE).
+ *
+ * Returns: (transfer full): a string which is human-readable representation of
+ *                           @size according to the restrictions given by the
+ *                           other parameters
+ */
+char* bs_size_human_readable_l (const BSSize size, BSBunit min_unit, int max_places, locale_t loc) {
+    char buf[NUM_BUFFER_LEN];
+    char *ret = NULL;
+    int len = 0;
+
+    len = bs_size_human_readable_buf_l (size, min_unit, max_places, loc, buf, sizeof(buf));
+    if ((size_t) len < sizeof(buf))
+        return strdup (buf);
+
+    ret = malloc (len + 1);
+    bs_size_human_readable_buf_l (size, min_unit, max_places, loc, ret, len + 1);
+    return ret;
+}
+
+/**
+ * bs_size_human_readable_buf_l:
+ * @min_unit: the smallest unit the returned representation should use
+ * @max_places: maximum number of decimal places the representation should use
+ * @loc: (nullable): locale to use or %NULL for the "C" locale
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the string to
+ * @buf_len: size of @buf
+ *
+ * Writes a human-readable representation of @size to @buf, see
+ * bs_size_human_readable_l() and bs_size_human_readable_buf().
+ *
+ * Returns: length of the whole string (not including the terminating '\0')
+ */
+int bs_size_human_readable_buf_l (const BSSize size, BSBunit min_unit, int max_places, locale_t loc, char *buf, size_t buf_len) {
+    locale_t orig_loc = (locale_t) 0;
+    int ret = 0;
+
+    if (!loc)
+        /* nothing depends on the locale without the translation */
+        return bs_size_human_readable_buf (size, min_unit, max_places, false, buf, buf_len);
+
+    orig_loc = use_locale (loc);
+    ret = bs_size_human_readable_buf (size, min_unit, max_places, true, buf, buf_len);
+    uselocale (orig_loc);
+
+    return ret;
+}
+
+/***************
+ * ARITHMETIC *
+ ***************/
+/**
+ * bs_size_add:
+ *
+ * Add two sizes.
+ *
+ * Returns: (transfer full): a new instance of #BSSize which is a sum of @size1 and @size2
+ */
+BSSize bs_size_add (const BSSize size1, const BSSize size2) {
+    BSSize ret = bs_size_new ();
+    MpzView view1;
+    MpzView view2;
+    int64_t result = 0;
+
+    if (!size1->big && !size2->big && !__builtin_add_overflow (size1->small, size2->small, &result)) {
+        ret->small = result;
+        return ret;
+    }
+
+    mpz_add (size_get_mpz_rop (ret), size_get_mpz (size1, &view1), size_get_mpz (size2, &view2));
+    size_normalize (ret);
+
+    return ret;
+}
+
+/**
+ * bs_size_grow:
+ *
+ * Grows @size1 by @size2. IOW, adds @size2 to @size1 in-place (modifying
+ * @size1).
+ *
+ * Basically an in-place variant of bs_size_add().
+ *
+ * Returns: (transfer none): @size1 modified by adding @size2 to it
+ */
+BSSize bs_size_grow (BSSize size1, const BSSize size2) {
+    MpzView view1;
+    MpzView view2;
+    int64_t result = 0;
+
+    if (!size1->big && !size2->big && !__builtin_add_overflow (size1->small, size2->small, &result)) {
+        size1->small = result;
+        return size1;
+    }
+
+    mpz_add (size_get_mpz_rop (size1), size_get_mpz (size1, &view1), size_get_mpz (size2, &view2));
+    size_normalize (size1);
+
+    return size1;
+}
+
+/**
+ * bs_size_add_bytes:
+ *
+ * Add @bytes to the @size. To add a negative number of bytes use
+ * bs_size_sub_bytes().
+ *
+ * Returns: (transfer full): a new instance of #BSSize which is a sum of @size and @bytes
+ */
+BSSize bs_size_add_bytes (const BSSize size, uint64_t bytes) {
+    BSSize ret = bs_size_new ();
+    MpzView view;
+    int64_t result = 0;
+
+    if (!size->big && !__builtin_add_overflow (size->small, bytes, &result)) {
+        ret->small = result;
+        return ret;
+    }
+
+    do_64bit_add_sub (mpz_add_ui, size_get_mpz_rop (ret), size_get_mpz (size, &view), bytes);
+    size_normalize (ret);
+
+    return ret;
+}
+
+/**
+ * bs_size_grow_bytes:
+ *
+ * Grows @size by @bytes. IOW, adds @bytes to @size in-place (modifying @size).
+ *
+ * Basically an in-place variant of bs_size_add_bytes().
+ *
+ * Returns: (transfer none): @size modified by adding @bytes to it
+ */
+BSSize bs_size_grow_bytes (BSSize size, const uint64_t bytes) {
+    MpzView view;
+    int64_t result = 0;
+
+    if (!size->big && !__builtin_add_overflow (size->small, bytes, &result)) {
+        size->small = result;
+        return size;
+    }
+
+    do_64bit_add_sub (mpz_add_ui, size_get_mpz_rop (size), size_get_mpz (size, &view), bytes);
+    size_normalize (size);
+
+    return size;
+}
+
+/**
+ * bs_size_sub:
+ *
+ * Subtract @size2 from @size1.
+ *
+ * Returns: (transfer full): a new instance of #BSSize which is equals to @size1 - @size2
+ */
+BSSize bs_size_sub (const BSSize size1, const BSSize size2) {
+    BSSize ret = bs_size_new ();
+    MpzView view1;
+    MpzView view2;
+    int64_t result = 0;
+
+    if (!size1->big && !size2->big && !__builtin_sub_overflow (size1->small, size2->small, &result)) {
+        ret->small = result;
+        return ret;
+    }
+
+    mpz_sub (size_get_mpz_rop (ret), size_get_mpz (size1, &view1), size_get_mpz (size2, &view2));
+    size_normalize (ret);
+
+    return ret;
+}
+
+/**
+ * bs_size_shrink:
+ *
+ * Shrinks @size1 by @size2. IOW, subtracts @size2 from @size1 in-place
+ * (modifying @size1).
+ *
+ * Basically an in-place variant of bs_size_sub().
+ *
+ * Returns: (transfer none): @size1 modified by subtracting @size2 from it
+ */
+BSSize bs_size_shrink (BSSize size1, const BSSize size2) {
+    MpzView view1;
+    MpzView view2;
+    int64_t result = 0;
+
+    if (!size1->big && !size2->big && !__builtin_sub_overflow (size1->small, size2->small, &result)) {
+        size1->small = result;
+        return size1;
+    }
+
+    mpz_sub (size_get_mpz_rop (size1), size_get_mpz (size1, &view1), size_get_mpz (size2, &view2));
+    size_normalize (size1);
+
+    return size1;
+}
+
+/**
+ * bs_size_sub_bytes:
+ *
+ * Subtract @bytes from the @size. To subtract a negative number of bytes use
+ * bs_size_add_bytes().
+ *
+ * Returns: (transfer full): a new instance of #BSSize which equals to @size - @bytes
+ */
+BSSize bs_size_sub_bytes (const BSSize size, uint64_t bytes) {
+    BSSize ret = bs_size_new ();
+    MpzView view;
+    int64_t result = 0;
+
+    if (!size->big && !__builtin_sub_overflow (size->small, bytes, &result)) {
+        ret->small = result;
+        return ret;
+    }
+
+    do_64bit_add_sub (mpz_sub_ui, size_get_mpz_rop (ret), size_get_mpz (size, &view), bytes);
+    size_normalize (ret);
+
+    return ret;
+}
+
+/**
+ * bs_size_sub_from_bytes:
+ *
+ * Subtract @size from @bytes.
+ *
+ * Returns: (transfer full): a new instance of #BSSize which equals to @bytes - @size
+ */
+BSSize bs_size_sub_from_bytes (const BSSize size, uint64_t bytes) {
+    BSSize ret = NULL;
+
+    /* @bytes - @size == -(@size - @bytes) */
+    ret = bs_size_sub_bytes (size, bytes);
+    size_negate (ret);
+
+    return ret;
+}
+
+/**
+ * bs_size_neg:
+ *
+ * Negate @size.
+ *
+ * Returns: (transfer full): a new instance of #BSSize which equals to -@size
+ */
+BSSize bs_size_neg (const BSSize size) {
+    BSSize ret = NULL;
+
+    ret = bs_size_new_from_size (size);
+    size_negate (ret);
+
+    return ret;
+}
+
+/**
+ * bs_size_shrink_bytes:
+ *
+ * Shrinks @size by @bytes. IOW, subtracts @bytes from @size in-place
+ * (modifying @size). To shrink by a negative number of bytes use
+ * bs_size_grow_bytes().
+ *
+ * Basically an in-place variant of bs_size_sub_bytes().
+ *
+ * Returns: (transfer none): @size modified by subtracting @bytes from it
+ */
+BSSize bs_size_shrink_bytes (BSSize size, uint64_t bytes) {
+    MpzView view;
+    int64_t result = 0;
+
+    if (!size->big && !__builtin_sub_overflow (size->small, bytes, &result)) {
+        size->small = result;
+        return size;
+    }
+
+    do_64bit_add_sub (mpz_sub_ui, size_get_mpz_rop (size), size_get_mpz (size, &view), bytes);
+    size_normalize (size);
+
+    return size;
+}
+
+/**
+ * bs_size_mul_int:
+ *
+ * Multiply @size by @times.
+ *
+ * Returns: (transfer full): a new instance of #BSSize which equals to @size * @times
+ */
+BSSize bs_size_mul_int (const BSSize size, uint64_t times) {
+    BSSize ret = bs_size_new ();
+    MpzView view;
+    int64_t result = 0;
+
+    if (!size->big && !__builtin_mul_overflow (size->small, times, &result)) {
+        ret->small = result;
+        return ret;
+    }
+
+    mul_64bit (size_get_mpz_rop (ret), size_get_mpz (size, &view), times);
+    size_normalize (ret);
+
+    return ret;
+}
+
+/**
+ * bs_size_grow_mul_int:
+ *
+ * Grow @size @times times. IOW, multiply @size by @times in-place.
+ *
+ * Basically an in-place variant of bs_size_mul_int().
+ *
+ * Returns: (transfer none): @size modified by growing it @times times
+ */
+BSSize bs_size_grow_mul_int (BSSize size, uint64_t times) {
+    MpzView view;
+    int64_t result = 0;
+
+    if (!size->big && !__builtin_mul_overflow (size->small, times, &result)) {
+        size->small = result;
+        return size;
+    }
+
+    mul_64bit (size_get_mpz_rop (size), size_get_mpz (size, &view), times);
+    size_normalize (size);
+
+    return size;
+}
+
+/**
+ * bs_size_mul_int64:
+ *
+ * Multiply @size by the (possibly negative) @times.
+ *
+ * Returns: (transfer full): a new instance of #BSSize which equals to @size * @times
+ */
+BSSize bs_size_mul_int64 (const BSSize size, int64_t times) {
+    BSSize ret = NULL;
+    int64_t result = 0;
+
+    if (!size->big && !__builtin_mul_overflow (size->small, times, &result)) {
+        ret = bs_size_new ();
+        ret->small = result;
+        return ret;
+    }
+
+    ret = bs_size_mul_int (size, abs_i64 (times));
+    if (times < 0)
+        size_negate (ret);
+
+    return ret;
+}
+
+/**
+ * bs_size_mul_rational:
+ * @num: numerator of the factor
+ * @den: denominator of the factor
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Multiply @size by the fraction @num / @den. The result is computed exactly
+ * and truncated towards zero, so for example multiplying by 1 / @den is the
+ * same as dividing by @den.
+ *
+ * Returns: (transfer full): a new instance of #BSSize which equals to
+ *                           @size * @num / @den (truncated towards zero) or
+ *                           %NULL in case of error (zero @den)
+ */
+BSSize bs_size_mul_rational (const BSSize size, const BSSize num, const BSSize den, BSError **error) {
+    MpzView view1;
+    MpzView view2;
+    MpzView view3;
+    BSSize ret = NULL;
+    int64_t prod = 0;
+    mpz_t result;
+
+    if (bs_size_sgn (den) == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return NULL;
+    }
+
+    ret = bs_size_new ();
+    if (!size->big && !num->big && !den->big) {
+        /* the only overflow possible in the division is INT64_MIN / -1 */
+        if (!__builtin_mul_overflow (size->small, num->small, &prod) && !(prod == INT64_MIN && den->small == -1)) {
+            ret->small = prod / den->small;
+            return ret;
+        }
+#ifdef __SIZEOF_INT128__
+        /* |@size * @num| <= 2^126 so it cannot overflow */
+        size_set_i128 (ret, (__int128) size->small * num->small / den->small);
+        return ret;
+#endif
+    }
+
+    mpz_init (result);
+    mpz_mul (result, size_get_mpz (size, &view1), size_get_mpz (num, &view2));
+    mpz_tdiv_q (result, result, size_get_mpz (den, &view3));
+    size_set_mpz (ret, result);
+    mpz_clear (result);
+
+    return ret;
+}
+
+/**
+ * mul_float_str: (skip)
+ * @rop: where to store the result (can be @size)
+ * @prec: precision (in bits) to compute the result with
+ * @digits: %BS_DIGITS_DOUBLE to compute the result with doubles instead
+ *
+ * Implementation of the bs_size_mul_float_str() family of functions.
+ *
+ * Returns: whether @float_str was a valid number (and @rop was set) or not
+ */
+static bool mul_float_str (BSSize rop, const BSSize size, const char *float_str, mp_bitcnt_t prec, int digits,
+                           BSError **error) {
+    mpf_t op1, op2;
+    MpzView view;
+    int status = 0;
+    double val = 0.0;
+    char *end = NULL;
+    const char *radix_char = NULL;
+    char *loc_float_str = NULL;
+
+    radix_char = nl_langinfo (RADIXCHAR);
+    loc_float_str = replace_char_with_str (float_str, '.', radix_char);
+
+    if (digits == BS_DIGITS_DOUBLE) {
+        val = strtod (loc_float_str, &end);
+        /* no hexadecimal numbers, infinity or NaN */
+        if (end == loc_float_str || *end != '\0' || !isfinite (val) || strpbrk (loc_float_str, "xX")) {
+            set_error (error, BS_ERROR_INVALID_SPEC, strdup_printf ("'%s' is not a valid floating point number string", loc_float_str));
+            free (loc_float_str);
+            return false;
+        }
+        free (loc_float_str);
+
+        val *= size_get_double (size);
+        if (!isfinite (val)) {
+            set_error (error, BS_ERROR_OVER, strdup_printf ("The result is too big to be computed with doubles"));
+            return false;
+        }
+        size_set_double (rop, val);
+        return true;
+    }
+
+    mpf_init2 (op1, prec);
+    mpf_init2 (op2, prec);
+
+    mpf_set_z (op1, size_get_mpz (size, &view));
+    status = mpf_set_str (op2, loc_float_str, 10);
+    if (status != 0) {
+        set_error (error, BS_ERROR_INVALID_SPEC, strdup_printf ("'%s' is not a valid floating point number string", loc_float_str));
+        free (loc_float_str);
+        mpf_clears (op1, op2, NULL);
+        return false;
+    }
+    free (loc_float_str);
+
+    mpf_mul (op1, op1, op2);
+
+    mpz_set_f (size_get_mpz_rop (rop), op1);
+    size_normalize (rop);
+    mpf_clears (op1, op2, NULL);
+
+    return true;
+}
+
+/**
+ * bs_size_mul_float_str:
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Multiply @size by the floating-point number @float_str represents.
+ *
+ * Returns: (transfer full): a new #BSSize instance which equals to
+ *                           @size * @times_str
+ *
+ */
+BSSize bs_size_mul_float_str (const BSSize size, const char *float_str, BSError **error) {
+    BSSize ret = NULL;
+
+    ret = bs_size_new ();
+    if (!mul_float_str (ret, size, float_str, BS_FLOAT_PREC_BITS, BS_FLOAT_PREC_BITS/3, error)) {
+        bs_size_free (ret);
+        return NULL;
+    }
+
+    return ret;
+}
+
+/**
+ * bs_size_mul_float_str_l:
+ * @loc: (nullable): locale to parse @float_str in or %NULL for the "C" locale
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Same as bs_size_mul_float_str(), but uses the radix character of @loc
+ * instead of the one of the locale currently used by the calling thread.
+ *
+ * Returns: (transfer full): a new #BSSize instance which equals to
+ *                           @size * @times_str
+ */
+BSSize bs_size_mul_float_str_l (const BSSize size, const char *float_str, locale_t loc, BSError **error) {
+    locale_t orig_loc = (locale_t) 0;
+    BSSize ret = NULL;
+
+    orig_loc = use_locale (loc);
+    ret = bs_size_mul_float_str (size, float_str, error);
+    uselocale (orig_loc);
+
+    return ret;
+}
+
+/**
+ * bs_size_mul_float_str_prec:
+ * @digits: number of significant digits to compute with or %BS_DIGITS_DOUBLE
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Same as bs_size_mul_float_str(), but computes the result with only @digits
+ * significant digits. With %BS_DIGITS_DOUBLE, @float_str is parsed with
+ * strtod() and the multiplication is done with doubles which is fast, but
+ * the result is only precise for sizes and results smaller than 2^53 bytes.
+ *
+ * Returns: (transfer full): a new #BSSize instance which equals to
+ *                           @size * @times_str
+ */
+BSSize bs_size_mul_float_str_prec (const BSSize size, const char *float_str, int digits, BSError **error) {
+    BSSize ret = NULL;
+
+    if (!check_digits (digits, error))
+        return NULL;
+
+    ret = bs_size_new ();
+    if (!mul_float_str (ret, size, float_str, digits_to_prec (digits), digits, error)) {
+        bs_size_free (ret);
+        return NULL;
+    }
+
+    return ret;
+}
+
+/**
+ * bs_size_grow_mul_float_str:
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Grow @size by the floating-point number @float_str represents times. IOW,
+ * multiply @size by @float_str in-place.
+ *
+ * Basically an in-place variant of bs_size_grow_mul_float_str().
+ *
+ * Returns: (transfer none): @size modified by growing it @float_str times.
+ */
+BSSize bs_size_grow_mul_float_str (BSSize size, const char *float_str, BSError **error) {
+    if (!mul_float_str (size, size, float_str, BS_FLOAT_PREC_BITS, BS_FLOAT_PREC_BITS/3, error))
+        return NULL;
+
+    return size;
+}
+
+/**
+ * bs_size_grow_mul_float_str_prec:
+ * @digits: number of significant digits to compute with or %BS_DIGITS_DOUBLE
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * In-place variant of bs_size_mul_float_str_prec().
+ *
+ * Returns: (transfer none): @size modified by growing it @float_str times.
+ */
+BSSize bs_size_grow_mul_float_str_prec (BSSize size, const char *float_str, int digits, BSError **error) {
+    if (!check_digits (digits, error))
+        return NULL;
+
+    if (!mul_float_str (size, size, float_str, digits_to_prec (digits), digits, error))
+        return NULL;
+
+    return size;
+}
+
+/**
+ * bs_size_div:
+ * @sgn: (out) (optional): sign of the result
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Divide @size1 by @size2. Gives the answer to the question "How many times
+ * does @size2 fit in @size1?".
+ *
+ * Returns: integer number x so that x * @size1 < @size2 and (x+1) * @size1 > @size2
+ *          (IOW, @size1 / @size2 using integer division)
+ */
+uint64_t bs_size_div (const BSSize size1, const BSSize size2, int *sgn, BSError **error) {
+    mpz_t result;
+    uint64_t ret = 0;
+    MpzView view1;
+    MpzView view2;
+
+    if (bs_size_sgn (size2) == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return 0;
+    }
+
+    if (sgn)
+        *sgn = bs_size_sgn (size1) * bs_size_sgn (size2);
+    if (!size1->big && !size2->big)
+        return abs_i64 (size1->small) / abs_i64 (size2->small);
+
+    mpz_init (result);
+    mpz_tdiv_q (result, size_get_mpz (size1, &view1), size_get_mpz (size2, &view2));
+
+    if (mpz_cmpabs_ui (result, UINT64_MAX) > 0) {
+        set_error (error, BS_ERROR_OVER, strdup_printf ("The size is too big, cannot be returned as a 64bit number"));
+        mpz_clear (result);
+        return 0;
+    }
+    ret = (uint64_t) mpz_get_ui (result);
+
+    mpz_clear (result);
+    return ret;
+}
+
+/**
+ * bs_size_div_int:
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Divide @size by @divisor. Gives the answer to the question "What is the size
+ * of each chunk if @size is split into a @divisor number of pieces?"
+ *
+ * Note: Due to the limitations of the current implementation the maximum value
+ * @divisor is ULONG_MAX (which can differ from UINT64_MAX). An error
+ * (BS_ERROR_OVER) is returned if overflow happens.
+ *
+ * Returns: (transfer full): a #BSSize instance x so that x * @divisor = @size,
+ *                           rounded to a number of bytes
+ */
+BSSize bs_size_div_int (const BSSize size, uint64_t divisor, BSError **error) {
+    BSSize ret = NULL;
+
+    if (divisor == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return NULL;
+    } else if (divisor > ULONG_MAX) {
+        set_error (error, BS_ERROR_OVER, strdup_printf ("Divisor too big, must be less or equal to %lu", ULONG_MAX));
+        return NULL;
+    }
+    ret = bs_size_new ();
+    if (!size->big) {
+        size_set_u64 (ret, abs_i64 (size->small) / divisor, bs_size_sgn (size));
+        return ret;
+    }
+    mpz_tdiv_q_ui (size_get_mpz_rop (ret), size->bytes, divisor);
+    size_normalize (ret);
+
+    return ret;
+}
+
+/**
+ * bs_size_shrink_div_int:
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Shrink @size by dividing by @divisor. IOW, divide @size by @divisor in-place.
+ *
+ * Basically an in-place variant of bs_size_div_int().
+ *
+ * Note: Due to the limitations of the current implementation the maximum value
+ * @divisor is ULONG_MAX (which can differ from UINT64_MAX). An error
+ * (BS_ERROR_OVER) is returned if overflow happens.
+ *
+ * Returns: (transfer none): @size modified by division by @divisor
+ */
+BSSize bs_size_shrink_div_int (BSSize size, uint64_t divisor, BSError **error) {
+    if (divisor == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return NULL;
+    } else if (divisor > ULONG_MAX) {
+        set_error (error, BS_ERROR_OVER, strdup_printf ("Divisor too big, must be less or equal to %lu", ULONG_MAX));
+        return NULL;
+    }
+
+    if (!size->big) {
+        size_set_u64 (size, abs_i64 (size->small) / divisor, bs_size_sgn (size));
+        return size;
+    }
+    mpz_tdiv_q_ui (size->bytes, size->bytes, divisor);
+    size_normalize (size);
+
+    return size;
+}
+
+/**
+ * true_div_buf: (skip)
+ * @prec: precision (in bits) to compute the result with
+ * @digits: number of significant digits to print or %BS_DIGITS_DOUBLE to
+ *          compute the result with doubles instead
+ *
+ * Implementation of bs_size_true_div_buf() and bs_size_true_div_prec_buf().
+ */
+static int true_div_buf (const BSSize size1, const BSSize size2, mp_bitcnt_t prec, int digits,
+                         char *buf, size_t buf_len, BSError **error) {
+    mpf_t op1;
+    mpf_t op2;
+    int ret = 0;
+    MpzView view1;
+    MpzView view2;
+
+    if (bs_size_sgn (size2) == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf("Division by zero"));
+        return -1;
+    }
+
+    if (digits == BS_DIGITS_DOUBLE)
+        return snprintf (buf, buf_len, "%.*g", DOUBLE_DIGITS, size_get_double (size1) / size_get_double (size2));
+
+    mpf_init2 (op1, prec);
+    mpf_init2 (op2, prec);
+    mpf_set_z (op1, size_get_mpz (size1, &view1));
+    mpf_set_z (op2, size_get_mpz (size2, &view2));
+
+    mpf_div (op1, op1, op2);
+
+    ret = gmp_snprintf (buf, buf_len, "%.*Fg", digits, op1);
+
+    mpf_clears (op1, op2, NULL);
+
+    return ret;
+}
+
+/**
+ * bs_size_true_div:
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Divides @size1 by @size2.
+ *
+ * Returns: (transfer full): a string representing the floating-point number
+ *                           that equals to @size1 / @size2
+ */
+char* bs_size_true_div (const BSSize size1, const BSSize size2, BSError **error) {
+    char buf[NUM_BUFFER_LEN];
+    char *ret = NULL;
+    int len = 0;
+
+    len = bs_size_true_div_buf (size1, size2, buf, sizeof(buf), error);
+    if (len < 0)
+        return NULL;
+    if ((size_t) len < sizeof(buf))
+        return strdup (buf);
+
+    ret = malloc (len + 1);
+    bs_size_true_div_buf (size1, size2, ret, len + 1, NULL);
+    return ret;
+}
+
+/**
+ * bs_size_true_div_buf:
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the string to
+ * @buf_len: size of @buf
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Divides @size1 by @size2 and writes the result as a string representing a
+ * floating-point number to @buf. Works like snprintf(), see
+ * bs_size_get_bytes_str_buf().
+ *
+ * Returns: length of the whole string (not including the terminating '\0') or
+ *          -1 in case of error
+ */
+int bs_size_true_div_buf (const BSSize size1, const BSSize size2, char *buf, size_t buf_len, BSError **error) {
+    return true_div_buf (size1, size2, BS_FLOAT_PREC_BITS, BS_FLOAT_PREC_BITS/3, buf, buf_len, error);
+}
+
+/**
+ * bs_size_true_div_prec:
+ * @digits: number of significant digits of the result or %BS_DIGITS_DOUBLE
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Same as bs_size_true_div(), but computes (and prints) the result with only
+ * @digits significant digits, see bs_size_convert_to_prec().
+ *
+ * Returns: (transfer full): a string representing the floating-point number
+ *                           that equals to @size1 / @size2
+ */
+char* bs_size_true_div_prec (const BSSize size1, const BSSize size2, int digits, BSError **error) {
+    char buf[NUM_BUFFER_LEN];
+    char *ret = NULL;
+    int len = 0;
+
+    len = bs_size_true_div_prec_buf (size1, size2, digits, buf, sizeof(buf), error);
+    if (len < 0)
+        return NULL;
+    if ((size_t) len < sizeof(buf))
+        return strdup (buf);
+
+    ret = malloc (len + 1);
+    bs_size_true_div_prec_buf (size1, size2, digits, ret, len + 1, NULL);
+    return ret;
+}
+
+/**
+ * bs_size_true_div_prec_buf:
+ * @digits: number of significant digits of the result or %BS_DIGITS_DOUBLE
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the string to
+ * @buf_len: size of @buf
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Same as bs_size_true_div_buf(), but with the precision given by @digits,
+ * see bs_size_convert_to_prec().
+ *
+ * Returns: length of the whole string (not including the terminating '\0') or
+ *          -1 in case of error
+ */
+int bs_size_true_div_prec_buf (const BSSize size1, const BSSize size2, int digits, char *buf, size_t buf_len, BSError **error) {
+    if (!check_digits (digits, error))
+        return -1;
+
+    return true_div_buf (size1, size2, digits_to_prec (digits), digits, buf, buf_len, error);
+}
+
+/**
+ * true_div_int_buf: (skip)
+ * @prec: precision (in bits) to compute the result with
+ * @digits: number of significant digits to print or %BS_DIGITS_DOUBLE to
+ *          compute the result with doubles instead
+ *
+ * Implementation of bs_size_true_div_int_buf() and
+ * bs_size_true_div_int_prec_buf().
+ */
+static int true_div_int_buf (const BSSize size, uint64_t divisor, mp_bitcnt_t prec, int digits,
+                             char *buf, size_t buf_len, BSError **error) {
+    mpf_t op1;
+    int ret = 0;
+    MpzView view;
+
+    if (divisor == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return -1;
+    } else if (divisor > ULONG_MAX) {
+        set_error (error, BS_ERROR_OVER, strdup_printf ("Divisor too big, must be less or equal to %lu", ULONG_MAX));
+        return -1;
+    }
+
+    if (digits == BS_DIGITS_DOUBLE)
+        return snprintf (buf, buf_len, "%.*g", DOUBLE_DIGITS, size_get_double (size) / (double) divisor);
+
+    mpf_init2 (op1, prec);
+    mpf_set_z (op1, size_get_mpz (size, &view));
+
+    mpf_div_ui (op1, op1, divisor);
+
+    ret = gmp_snprintf (buf, buf_len, "%.*Fg", digits, op1);
+
+    mpf_clear (op1);
+
+    return ret;
+}
+
+/**
+ * bs_size_true_div_int:
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Divides @size by @divisor.
+ *
+ * Note: Due to the limitations of the current implementation the maximum value
+ * @divisor is ULONG_MAX (which can differ from UINT64_MAX). An error
+ * (BS_ERROR_OVER) is returned if overflow happens.
+ *
+ * Returns: (transfer full): a string representing the floating-point number
+ *                           that equals to @size / @divisor
+ */
+char* bs_size_true_div_int (const BSSize size, uint64_t divisor, BSError **error) {
+    char buf[NUM_BUFFER_LEN];
+    char *ret = NULL;
+    int len = 0;
+
+    len = bs_size_true_div_int_buf (size, divisor, buf, sizeof(buf), error);
+    if (len < 0)
+        return NULL;
+    if ((size_t) len < sizeof(buf))
+        return strdup (buf);
+
+    ret = malloc (len + 1);
+    bs_size_true_div_int_buf (size, divisor, ret, len + 1, NULL);
+    return ret;
+}
+
+/**
+ * bs_size_true_div_int_buf:
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the string to
+ * @buf_len: size of @buf
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Divides @size by @divisor and writes the result as a string representing a
+ * floating-point number to @buf. Works like snprintf(), see
+ * bs_size_get_bytes_str_buf().
+ *
+ * Note: Due to the limitations of the current implementation the maximum value
+ * @divisor is ULONG_MAX (which can differ from UINT64_MAX). An error
+ * (BS_ERROR_OVER) is returned if overflow happens.
+ *
+ * Returns: length of the whole string (not including the terminating '\0') or
+ *          -1 in case of error
+ */
+int bs_size_true_div_int_buf (const BSSize size, uint64_t divisor, char *buf, size_t buf_len, BSError **error) {
+    return true_div_int_buf (size, divisor, BS_FLOAT_PREC_BITS, BS_FLOAT_PREC_BITS/3, buf, buf_len, error);
+}
+
+/**
+ * bs_size_true_div_int_prec:
+ * @digits: number of significant digits of the result or %BS_DIGITS_DOUBLE
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Same as bs_size_true_div_int(), but computes (and prints) the result with
+ * only @digits significant digits, see bs_size_convert_to_prec().
+ *
+ * Returns: (transfer full): a string representing the floating-point number
+ *                           that equals to @size / @divisor
+ */
+char* bs_size_true_div_int_prec (const BSSize size, uint64_t divisor, int digits, BSError **error) {
+    char buf[NUM_BUFFER_LEN];
+    char *ret = NULL;
+    int len = 0;
+
+    len = bs_size_true_div_int_prec_buf (size, divisor, digits, buf, sizeof(buf), error);
+    if (len < 0)
+        return NULL;
+    if ((size_t) len < sizeof(buf))
+        return strdup (buf);
+
+    ret = malloc (len + 1);
+    bs_size_true_div_int_prec_buf (size, divisor, digits, ret, len + 1, NULL);
+    return ret;
+}
+
+/**
+ * bs_size_true_div_int_prec_buf:
+ * @digits: number of significant digits of the result or %BS_DIGITS_DOUBLE
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the string to
+ * @buf_len: size of @buf
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Same as bs_size_true_div_int_buf(), but with the precision given by
+ * @digits, see bs_size_convert_to_prec().
+ *
+ * Returns: length of the whole string (not including the terminating '\0') or
+ *          -1 in case of error
+ */
+int bs_size_true_div_int_prec_buf (const BSSize size, uint64_t divisor, int digits, char *buf, size_t buf_len, BSError **error) {
+    if (!check_digits (digits, error))
+        return -1;
+
+    return true_div_int_buf (size, divisor, digits_to_prec (digits), digits, buf, buf_len, error);
+}
+
+/**
+ * bs_size_true_div_double:
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Divides @size1 by @size2.
+ *
+ * Returns: @size1 / @size2 rounded to the nearest double or 0.0 in case of
+ *          error
+ */
+double bs_size_true_div_double (const BSSize size1, const BSSize size2, BSError **error) {
+    MpzView view1;
+    MpzView view2;
+    mpz_t den;
+    double ret = 0.0;
+
+    if (bs_size_sgn (size2) == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return 0.0;
+    }
+
+    if (bs_size_sgn (size2) > 0)
+        return ratio_to_double (size_get_mpz (size1, &view1), size_get_mpz (size2, &view2));
+
+    mpz_init (den);
+    mpz_neg (den, size_get_mpz (size2, &view2));
+    ret = -ratio_to_double (size_get_mpz (size1, &view1), den);
+    mpz_clear (den);
+
+    return ret;
+}
+
+/**
+ * bs_size_true_div_int_double:
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Divides @size by @divisor.
+ *
+ * Returns: @size / @divisor rounded to the nearest double or 0.0 in case of
+ *          error
+ */
+double bs_size_true_div_int_double (const BSSize size, uint64_t divisor, BSError **error) {
+    MpzView view;
+    mpz_t den;
+    double ret = 0.0;
+
+    if (divisor == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return 0.0;
+    }
+
+    mpz_init (den);
+    mpz_set_u64 (den, divisor);
+    ret = ratio_to_double (size_get_mpz (size, &view), den);
+    mpz_clear (den);
+
+    return ret;
+}
+
+/**
+ * bs_size_true_div_rational:
+ * @num: (out) (transfer full): place to store the numerator of the result
+ * @den: (out) (transfer full): place to store the (positive) denominator of the result
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Divides @size1 by @size2 exactly. The result is the fraction @num / @den in
+ * lowest terms.
+ *
+ * Returns: whether the division was done (and @num and @den were set) or not
+ */
+bool bs_size_true_div_rational (const BSSize size1, const BSSize size2, BSSize *num, BSSize *den, BSError **error) {
+    MpzView view1;
+    MpzView view2;
+
+    if (bs_size_sgn (size2) == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return false;
+    }
+
+    *num = bs_size_new ();
+    *den = bs_size_new ();
+    set_ratio (*num, *den, size_get_mpz (size1, &view1), size_get_mpz (size2, &view2));
+
+    return true;
+}
+
+/**
+ * bs_size_mod:
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Gives @size1 modulo @size2 (i.e. the remainder of integer division @size1 /
+ * @size2). Gives the answer to the question "If I split @size1 into chunks of
+ * size @size2, what will be the remainder?"
+ * **This function ignores the signs of the sizes.**
+ *
+ * Returns: (transfer full): a #BSSize instance that is a remainder of
+ *                           @size1 / @size2 using integer division
+ */
+BSSize bs_size_mod (const BSSize size1, const BSSize size2, BSError **error) {
+    mpz_t aux;
+    BSSize ret = NULL;
+    MpzView view1;
+    MpzView view2;
+
+    if (bs_size_sgn (size2) == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return 0;
+    }
+
+    ret = bs_size_new ();
+    if (!size1->big && !size2->big) {
+        size_set_u64 (ret, abs_i64 (size1->small) % abs_i64 (size2->small), 1);
+        return ret;
+    }
+
+    /* negative @size1, get the absolute value so that we get results
+       matching the specification/documentation of this function */
+    mpz_init (aux);
+    mpz_abs (aux, size_get_mpz (size1, &view1));
+
+    mpz_mod (size_get_mpz_rop (ret), aux, size_get_mpz (size2, &view2));
+    size_normalize (ret);
+    mpz_clear (aux);
+
+    return ret;
+}
+
+/**
+ * round_to_nearest: (skip)
+ * @rop: where to store the result (can be @size)
+ * @round_to: a non-zero size
  *
- * Multiply @size by the floating-point number @float_str represents.
+ * Implementation of bs_size_round_to_nearest().
+ */
+static void round_to_nearest (BSSize rop, const BSSize size, const BSSize round_to, BSRoundDir dir) {
+    mpz_t q;
+    mpz_t aux_size;
+    MpzView size_view;
+    MpzView round_to_view;
+    mpz_srcptr size_bytes = NULL;
+    mpz_srcptr round_to_bytes = NULL;
+
+#ifdef __SIZEOF_INT128__
+    if (!size->big && !round_to->big) {
+        /* the result may not fit into 64 bits, but it always fits into 128 bits */
+        __int128 size_val = size->small;
+        __int128 round_to_val = round_to->small;
+
+        if (dir == BS_ROUND_DIR_UP)
+            size_set_i128 (rop, cdiv_i128 (size_val, round_to_val) * round_to_val);
+        else if (dir == BS_ROUND_DIR_HALF_UP)
+            size_set_i128 (rop, fdiv_i128 (fdiv_i128 (round_to_val, 2) + size_val, round_to_val) * round_to_val);
+        else
+            size_set_i128 (rop, fdiv_i128 (size_val, round_to_val) * round_to_val);
+        return;
+    }
+#endif
+
+    size_bytes = size_get_mpz (size, &size_view);
+    round_to_bytes = size_get_mpz (round_to, &round_to_view);
+    mpz_init (q);
+
+    if (dir == BS_ROUND_DIR_UP) {
+        mpz_cdiv_q (q, size_bytes, round_to_bytes);
+    } else if (dir == BS_ROUND_DIR_HALF_UP) {
+        /* round half up == add half of what to round to and round down */
+        mpz_init (aux_size);
+        mpz_fdiv_q_ui (aux_size, round_to_bytes, 2);
+        mpz_add (aux_size, aux_size, size_bytes);
+        mpz_fdiv_q (q, aux_size, round_to_bytes);
+        mpz_clear (aux_size);
+    } else
+        mpz_fdiv_q (q, size_bytes, round_to_bytes);
+
+    mpz_mul (size_get_mpz_rop (rop), q, round_to_bytes);
+    size_normalize (rop);
+
+    mpz_clear (q);
+}
+
+/**
+ * bs_size_round_to_nearest:
+ * @round_to: to a multiple of what to round @size
+ * @dir: %BS_ROUND_DIR_UP to round up (to the nearest multiple of @round_to
+ *       bigger than @size) or %BS_ROUND_DIR_DOWN to round down (to the
+ *       nearest multiple of @round_to smaller than @size)
+ * @error: (out) (optional): place to store error (if any)
  *
- * Returns: (transfer full): a new #BSSize instance which equals to
- *                           @size * @times_str
+ * Round @size to the nearest multiple of @round_to according to the direction
+ * given by @dir.
  *
+ * Returns: (transfer full): a new instance of #BSSize that is @size rounded to
+ *                           a multiple of @round_to according to @dir
  */
-BSSize bs_size_mul_float_str (const BSSize size, const char *float_str, BSError **error) {
-    mpf_t op1, op2;
-    int status = 0;
+BSSize bs_size_round_to_nearest (const BSSize size, const BSSize round_to, BSRoundDir dir, BSError **error) {
     BSSize ret = NULL;
-    const char *radix_char = NULL;
-    char *loc_float_str = NULL;
 
-    radix_char = nl_langinfo (RADIXCHAR);
+    if (bs_size_sgn (round_to) == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
+        return NULL;
+    }
+
+    ret = bs_size_new ();
+    round_to_nearest (ret, size, round_to, dir);
 
-    mpf_init2 (op1, BS_FLOAT_PREC_BITS);
-    mpf_init2 (op2, BS_FLOAT_PREC_BITS);
+    return ret;
+}
 
-    mpf_set_z (op1, size->bytes);
-    loc_float_str = replace_char_with_str (float_str, '.', radix_char);
-    status = mpf_set_str (op2, loc_float_str, 10);
-    if (status != 0) {
-        set_error (error, BS_ERROR_INVALID_SPEC, strdup_printf ("'%s' is not a valid floating point number string", loc_float_str));
-        free (loc_float_str);
-        mpf_clears (op1, op2, NULL);
-        return NULL;
+
+/***************
+ * COMPARISONS *
+ ***************/
+/**
+ * bs_size_cmp:
+ * @abs: whether to compare absolute values of @size1 and @size2 instead
+ *
+ * Compare @size1 and @size2. This function behaves like the standard *cmp*()
+ * functions.
+ *
+ * Returns: -1, 0, or 1 if @size1 is smaller, equal to or bigger than
+ *          @size2 respectively comparing absolute values if @abs is %TRUE
+ */
+int bs_size_cmp (const BSSize size1, const BSSize size2, bool abs) {
+    int ret = 0;
+    MpzView view1;
+    MpzView view2;
+
+    if (!size1->big && !size2->big) {
+        if (abs)
+            return (abs_i64 (size1->small) > abs_i64 (size2->small)) - (abs_i64 (size1->small) < abs_i64 (size2->small));
+        return (size1->small > size2->small) - (size1->small < size2->small);
     }
-    free (loc_float_str);
 
-    mpf_mul (op1, op1, op2);
+    if (abs)
+        ret = mpz_cmpabs (size_get_mpz (size1, &view1), size_get_mpz (size2, &view2));
+    else
+        ret = mpz_cmp (size_get_mpz (size1, &view1), size_get_mpz (size2, &view2));
+    /* make sure we don't return things like 2 or -2 (which GMP can give us) */
+    if (ret > 0)
+        ret = 1;
+    else if (ret < 0)
+        ret = -1;
+    return ret;
+}
 
-    ret = bs_size_new ();
-    mpz_set_f (ret->bytes, op1);
-    mpf_clears (op1, op2, NULL);
+/**
+ * bs_size_cmp_bytes:
+ * @abs: whether to compare absolute values of @size and @bytes instead.
+ *
+ * Compare @size and @bytes, i.e. the number of bytes @size has with
+ * @bytes. This function behaves like the standard *cmp*() functions.
+ *
+ * Returns: -1, 0, or 1 if @size is smaller, equal to or bigger than
+ *          @bytes respectively comparing absolute values if @abs is %TRUE
+ */
+int bs_size_cmp_bytes (const BSSize size, uint64_t bytes, bool abs) {
+    int ret = 0;
+    uint64_t abs_val = 0;
 
+    if (!size->big) {
+        if (!abs && size->small < 0)
+            return -1;
+        abs_val = abs_i64 (size->small);
+        return (abs_val > bytes) - (abs_val < bytes);
+    }
+
+    if (abs)
+        ret = mpz_cmpabs_ui (size->bytes, bytes);
+    else
+        ret = mpz_cmp_ui (size->bytes, bytes);
+    /* make sure we don't return things like 2 or -2 (which GMP can give us) */
+    if (ret > 0)
+        ret = 1;
+    else if (ret < 0)
+        ret = -1;
     return ret;
 }
 
 /**
- * bs_size_grow_mul_float_str:
- * @error: (out) (optional): place to store error (if any)
+ * bs_size_cmp_int64:
+ * @abs: whether to compare absolute values of @size and @val instead.
  *
- * Grow @size by the floating-point number @float_str represents times. IOW,
- * multiply @size by @float_str in-place.
+ * Compare @size and the (possibly negative) number of bytes @val. This
+ * function behaves like the standard *cmp*() functions.
  *
- * Basically an in-place variant of bs_size_grow_mul_float_str().
+ * Returns: -1, 0, or 1 if @size is smaller, equal to or bigger than
+ *          @val respectively comparing absolute values if @abs is %TRUE
+ */
+int bs_size_cmp_int64 (const BSSize size, int64_t val, bool abs) {
+    if (val >= 0 || abs)
+        return bs_size_cmp_bytes (size, abs_i64 (val), abs);
+
+    if (!size->big)
+        return (size->small > val) - (size->small < val);
+    /* doesn't fit into 64 bits so it's either bigger or smaller than anything that does */
+    return mpz_sgn (size->bytes);
+}
+
+
+/**************
+ * REDUCTIONS *
+ **************/
+/**
+ * mpz_add_i64: (skip)
  *
- * Returns: (transfer none): @size modified by growing it @float_str times.
+ * Adds the (possibly negative) @val to @rop in-place.
  */
-BSSize bs_size_grow_mul_float_str (BSSize size, const char *float_str, BSError **error) {
-    mpf_t op1, op2;
-    int status = 0;
-    const char *radix_char = NULL;
-    char *loc_float_str = NULL;
+static void mpz_add_i64 (mpz_t rop, int64_t val) {
+    if (val >= 0)
+        do_64bit_add_sub (mpz_add_ui, rop, rop, (uint64_t) val);
+    else
+        do_64bit_add_sub (mpz_sub_ui, rop, rop, abs_i64 (val));
+}
 
-    radix_char = nl_langinfo (RADIXCHAR);
+/**
+ * bs_size_sum:
+ * @sizes: (array length=n_sizes): sizes to sum
+ * @n_sizes: number of sizes in @sizes
+ *
+ * Sum all the sizes in @sizes. This is the same as adding them one by one with
+ * bs_size_add(), but doesn't create any intermediate sizes.
+ *
+ * Returns: (transfer full): a new instance of #BSSize which is the sum of
+ *                           @sizes (0 if @n_sizes is 0)
+ */
+BSSize bs_size_sum (const BSSize *sizes, size_t n_sizes) {
+    BSSize ret = bs_size_new ();
+    mpz_ptr rop = NULL;
+    int64_t small = 0;
+    int64_t result = 0;
+    size_t i = 0;
+
+    /* sum in 64 bits as long as possible, moving the partial sum to a GMP
+       number only when it would overflow */
+    for (i=0; i < n_sizes; i++) {
+        if (!sizes[i]->big && !__builtin_add_overflow (small, sizes[i]->small, &result)) {
+            small = result;
+            continue;
+        }
+        if (!rop)
+            rop = size_get_mpz_rop (ret);
+        if (sizes[i]->big)
+            mpz_add (rop, rop, sizes[i]->bytes);
+        else {
+            mpz_add_i64 (rop, small);
+            small = sizes[i]->small;
+        }
+    }
 
-    mpf_init2 (op1, BS_FLOAT_PREC_BITS);
-    mpf_init2 (op2, BS_FLOAT_PREC_BITS);
+    if (!rop) {
+        ret->small = small;
+        return ret;
+    }
+    mpz_add_i64 (rop, small);
+    size_normalize (ret);
 
-    mpf_set_z (op1, size->bytes);
-    loc_float_str = replace_char_with_str (float_str, '.', radix_char);
-    status = mpf_set_str (op2, loc_float_str, 10);
-    if (status != 0) {
-        set_error (error, BS_ERROR_INVALID_SPEC, strdup_printf ("'%s' is not a valid floating point number string", loc_float_str));
-        free (loc_float_str);
-        mpf_clears (op1, op2, NULL);
+    return ret;
+}
+
+/**
+ * size_extreme: (skip)
+ * @sgn: 1 to get the biggest size, -1 to get the smallest one
+ *
+ * Returns: (transfer full): a copy of the first biggest or smallest size in
+ *                           @sizes or %NULL if @n_sizes is 0
+ */
+static BSSize size_extreme (const BSSize *sizes, size_t n_sizes, int sgn) {
+    BSSize best = NULL;
+    size_t i = 0;
+
+    if (n_sizes == 0)
+        return NULL;
+
+    best = sizes[0];
+    for (i=1; i < n_sizes; i++)
+        if (bs_size_cmp (sizes[i], best, false) == sgn)
+            best = sizes[i];
+
+    return bs_size_new_from_size (best);
+}
+
+/**
+ * bs_size_min:
+ * @sizes: (array length=n_sizes): sizes to get the smallest one from
+ * @n_sizes: number of sizes in @sizes
+ *
+ * Returns: (transfer full): a copy of the smallest size in @sizes (the first
+ *                           one of them if there are more) or %NULL if
+ *                           @n_sizes is 0
+ */
+BSSize bs_size_min (const BSSize *sizes, size_t n_sizes) {
+    return size_extreme (sizes, n_sizes, -1);
+}
+
+/**
+ * bs_size_max:
+ * @sizes: (array length=n_sizes): sizes to get the biggest one from
+ * @n_sizes: number of sizes in @sizes
+ *
+ * Returns: (transfer full): a copy of the biggest size in @sizes (the first
+ *                           one of them if there are more) or %NULL if
+ *                           @n_sizes is 0
+ */
+BSSize bs_size_max (const BSSize *sizes, size_t n_sizes) {
+    return size_extreme (sizes, n_sizes, 1);
+}
+
+/**
+ * bs_size_mean:
+ * @sizes: (array length=n_sizes): sizes to get the mean of
+ * @n_sizes: number of sizes in @sizes
+ * @dir: rounding direction for the result (in the same way as
+ *       bs_size_round_to_nearest() rounds)
+ * @error: (out) (optional): place to store error (if any)
+ *
+ * Get the (arithmetic) mean of @sizes rounded to whole bytes in the @dir
+ * direction. The mean is computed exactly, only the result is rounded.
+ *
+ * Returns: (transfer full): a new instance of #BSSize which is the mean of
+ *                           @sizes or %NULL in case of error (@n_sizes being
+ *                           0)
+ */
+BSSize bs_size_mean (const BSSize *sizes, size_t n_sizes, BSRoundDir dir, BSError **error) {
+    BSSize ret = NULL;
+    BSSize count = NULL;
+    mpz_t q;
+    MpzView sum_view;
+    MpzView count_view;
+    mpz_srcptr sum_bytes = NULL;
+    mpz_srcptr count_bytes = NULL;
+
+    if (n_sizes == 0) {
+        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Mean of no sizes"));
         return NULL;
     }
-    free (loc_float_str);
 
-    mpf_mul (op1, op1, op2);
+    ret = bs_size_sum (sizes, n_sizes);
+    count = bs_size_new_from_bytes (n_sizes, 1);
+    sum_bytes = size_get_mpz (ret, &sum_view);
+    count_bytes = size_get_mpz (count, &count_view);
+    mpz_init (q);
+
+    if (dir == BS_ROUND_DIR_UP)
+        mpz_cdiv_q (q, sum_bytes, count_bytes);
+    else if (dir == BS_ROUND_DIR_HALF_UP) {
+        /* round half up == add half of the count and round down */
+        mpz_fdiv_q_ui (q, count_bytes, 2);
+        mpz_add (q, q, sum_bytes);
+        mpz_fdiv_q (q, q, count_bytes);
+    } else
+        mpz_fdiv_q (q, sum_bytes, count_bytes);
+
+    size_set_mpz (ret, q);
+    mpz_clear (q);
+    bs_size_free (count);
+
+    return ret;
+}
+
+
+/*******************
+ * BATCH FUNCTIONS *
+ *******************/
+/* batches are only split into chunks of at least this many elements, smaller
+   ones are not worth starting a thread for */
+#define BATCH_MIN_CHUNK 4096
+
+/**
+ * BatchFunc: (skip)
+ * @job: data of the batch job
+ * @chunk: index of the chunk to process
+ * @start: index of the first element of the chunk to process
+ * @end: index after the last element of the chunk to process
+ *
+ * Processes the elements of a batch job from @start to @end. Different chunks
+ * of the same job may be processed in parallel.
+ */
+typedef void (*BatchFunc) (void *job, size_t chunk, size_t start, size_t end);
+
+/**
+ * BatchChunk: (skip)
+ *
+ * A chunk of a batch job processed by a (worker) thread.
+ */
+typedef struct _BatchChunk {
+    BatchFunc func;
+    void *job;
+    size_t chunk;
+    size_t start;
+    size_t end;
+    pthread_t thread;
+    bool started;
+} BatchChunk;
+
+/**
+ * get_batch_n_chunks: (skip)
+ * @n_items: number of elements of the batch
+ *
+ * Returns: number of chunks (and threads) a batch of @n_items elements should
+ *          be split into
+ */
+static size_t get_batch_n_chunks (size_t n_items) {
+    size_t n_threads = __atomic_load_n (&batch_threads, __ATOMIC_RELAXED);
+    size_t max_chunks = n_items / BATCH_MIN_CHUNK;
+    long n_cpus = 0;
+
+    if (n_threads == 0) {
+        n_cpus = sysconf (_SC_NPROCESSORS_ONLN);
+        n_threads = n_cpus > 0 ? (size_t) n_cpus : 1;
+    }
+
+    if (max_chunks <= 1)
+        return 1;
+    return n_threads < max_chunks ? n_threads : max_chunks;
+}
+
+/**
+ * get_batch_chunk_start: (skip)
+ *
+ * Returns: index of the first element of the chunk @chunk of @n_chunks chunks
+ *          of a batch with @n_items elements (or @n_items for @n_chunks)
+ */
+static size_t get_batch_chunk_start (size_t n_items, size_t n_chunks, size_t chunk) {
+    /* the first n_items % n_chunks chunks get one more element */
+    return chunk * (n_items / n_chunks) + (chunk < n_items % n_chunks ? chunk : n_items % n_chunks);
+}
+
+static void *run_batch_chunk (void *data) {
+    BatchChunk *chunk = (BatchChunk *) data;
+
+    chunk->func (chunk->job, chunk->chunk, chunk->start, chunk->end);
+    return NULL;
+}
+
+/**
+ * run_batch: (skip)
+ * @func: function processing the chunks of the job
+ * @job: data of the job passed to @func
+ * @n_items: number of elements of the batch
+ * @n_chunks: number of chunks to split the batch into (see get_batch_n_chunks())
+ *
+ * Runs @func on @n_chunks consecutive chunks of the batch, each chunk in its own
+ * thread. The calling thread processes the first chunk itself and waits for all
+ * the others to be processed. If threads cannot be started, the chunks are
+ * processed in the calling thread one after another.
+ */
+static void run_batch (BatchFunc func, void *job, size_t n_items, size_t n_chunks) {
+    BatchChunk *chunks = NULL;
+    size_t i = 0;
+
+    if (n_chunks > 1)
+        chunks = calloc (n_chunks, sizeof (BatchChunk));
+    if (!chunks) {
+        for (i=0; i < n_chunks; i++)
+            func (job, i, get_batch_chunk_start (n_items, n_chunks, i), get_batch_chunk_start (n_items, n_chunks, i + 1));
+        return;
+    }
+
+    for (i=0; i < n_chunks; i++) {
+        chunks[i].func = func;
+        chunks[i].job = job;
+        chunks[i].chunk = i;
+        chunks[i].start = get_batch_chunk_start (n_items, n_chunks, i);
+        chunks[i].end = get_batch_chunk_start (n_items, n_chunks, i + 1);
+    }
+    for (i=1; i < n_chunks; i++)
+        chunks[i].started = pthread_create (&(chunks[i].thread), NULL, run_batch_chunk, &(chunks[i])) == 0;
+
+    run_batch_chunk (&(chunks[0]));
+    for (i=1; i < n_chunks; i++) {
+        if (chunks[i].started)
+            pthread_join (chunks[i].thread, NULL);
+        else
+            run_batch_chunk (&(chunks[i]));
+    }
+
+    free (chunks);
+}
+
+/**
+ * bs_set_batch_threads:
+ * @n_threads: maximum number of threads the batch functions may use or 0 for
+ *             the number of online CPUs
+ *
+ * Sets how many threads the batch functions (bs_size_parse_int64_batch(),
+ * bs_size_human_readable_batch(),...) may split big batches across. The default
+ * is 1, processing all batches in the calling thread. The results are the same
+ * (and in the same order) no matter how many threads are used.
+ */
+void bs_set_batch_threads (unsigned int n_threads) {
+    __atomic_store_n (&batch_threads, n_threads, __ATOMIC_RELAXED);
+}
+
+/**
+ * bs_get_batch_threads:
+ *
+ * Returns: maximum number of threads the batch functions may use (see
+ *          bs_set_batch_threads())
+ */
+unsigned int bs_get_batch_threads (void) {
+    return __atomic_load_n (&batch_threads, __ATOMIC_RELAXED);
+}
+
+/**
+ * StoreFunc: (skip)
+ * @results: array to store the value of @size to
+ * @idx: index in @results to store the value at
+ *
+ * Stores the value of @size to @results (or 0 if it doesn't fit).
+ *
+ * Returns: whether the value fits into the type of @results or not
+ */
+typedef bool (*StoreFunc) (const BSSize size, void *results, size_t idx);
+
+static bool store_int64 (const BSSize size, void *results, size_t idx) {
+    ((int64_t *) results)[idx] = size->big ? 0 : size->small;
+    return !size->big;
+}
 
-    mpz_set_f (size->bytes, op1);
-    mpf_clears (op1, op2, NULL);
+static bool store_uint64 (const BSSize size, void *results, size_t idx) {
+    uint64_t *u64_results = (uint64_t *) results;
+    size_t count = 0;
 
-    return size;
+    u64_results[idx] = 0;
+    if (!size->big) {
+        if (size->small < 0)
+            return false;
+        u64_results[idx] = (uint64_t) size->small;
+        return true;
+    }
+
+    if (mpz_sgn (size->bytes) < 0 || mpz_sizeinbase (size->bytes, 2) > 64)
+        return false;
+    mpz_export (&(u64_results[idx]), &count, 1, sizeof(uint64_t), 0, 0, size->bytes);
+    return true;
 }
 
 /**
- * bs_size_div:
- * @sgn: (out) (optional): sign of the result
- * @error: (out) (optional): place to store error (if any)
+ * ParseBatchJob: (skip)
  *
- * Divide @size1 by @size2. Gives the answer to the question "How many times
- * does @size2 fit in @size1?".
+ * Data of the bs_size_parse_*_batch() functions shared by the threads.
+ */
+typedef struct _ParseBatchJob {
+    const char * const *size_strs;
+    locale_t loc;
+    StoreFunc store;
+    void *results;
+    BSBatchStatus *statuses;
+    size_t n_ok;
+} ParseBatchJob;
+
+static void parse_batch_chunk (void *data, size_t chunk __attribute__((unused)), size_t start, size_t end) {
+    ParseBatchJob *job = (ParseBatchJob *) data;
+    struct _BSSize size;
+    ParseContext ctx;
+    locale_t orig_loc = (locale_t) 0;
+    BSBatchStatus status = BS_BATCH_OK;
+    bool bad_unit = false;
+    size_t n_ok = 0;
+    size_t i = 0;
+
+    /* the locale, the radix character and the unit table are only looked up
+       once for the whole chunk, the same size is reused for all the specs (the
+       locale is per-thread so every chunk needs to set it) */
+    if (job->loc)
+        orig_loc = use_locale (job->loc);
+    parse_context_init (&ctx, job->loc != NULL);
+    bs_size_init (&size);
+
+    for (i=start; i < end; i++) {
+        if (!job->size_strs[i] || !parse_str (&size, job->size_strs[i], &ctx, &bad_unit)) {
+            size_set_i64 (&size, 0);
+            job->store (&size, job->results, i);
+            status = BS_BATCH_INVALID_SPEC;
+        } else if (!job->store (&size, job->results, i))
+            status = BS_BATCH_OVER;
+        else {
+            status = BS_BATCH_OK;
+            n_ok++;
+        }
+        if (job->statuses)
+            job->statuses[i] = status;
+    }
+
+    if (size.big)
+        mpz_clear (size.bytes);
+    if (job->loc)
+        uselocale (orig_loc);
+
+    __atomic_add_fetch (&(job->n_ok), n_ok, __ATOMIC_RELAXED);
+}
+
+/**
+ * parse_batch: (skip)
+ * @store: function storing the parsed values to @results
  *
- * Returns: integer number x so that x * @size1 < @size2 and (x+1) * @size1 > @size2
- *          (IOW, @size1 / @size2 using integer division)
+ * Implementation of the bs_size_parse_*_batch() functions.
  */
-uint64_t bs_size_div (const BSSize size1, const BSSize size2, int *sgn, BSError **error) {
-    mpz_t result;
-    uint64_t ret = 0;
+static size_t parse_batch (const char * const *size_strs, size_t n_strs, locale_t loc, StoreFunc store,
+                           void *results, BSBatchStatus *statuses) {
+    ParseBatchJob job = {size_strs, loc, store, results, statuses, 0};
 
-    if (mpz_cmp_ui (size2->bytes, 0) == 0) {
-        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
-        return 0;
-    }
+    run_batch (parse_batch_chunk, &job, n_strs, get_batch_n_chunks (n_strs));
 
-    if (sgn)
-        *sgn = mpz_sgn (size1->bytes) * mpz_sgn (size2->bytes);
-    mpz_init (result);
-    mpz_tdiv_q (result, size1->bytes, size2->bytes);
+    return job.n_ok;
+}
 
-    if (mpz_cmp_ui (result, UINT64_MAX) > 0) {
-        set_error (error, BS_ERROR_OVER, strdup_printf ("The size is too big, cannot be returned as a 64bit number"));
-        mpz_clear (result);
-        return 0;
-    }
-    ret = (uint64_t) mpz_get_ui (result);
+/**
+ * bs_size_parse_int64_batch:
+ * @size_strs: (array length=n_strs): strings representing sizes (see
+ *             bs_size_new_from_str())
+ * @n_strs: number of strings in @size_strs
+ * @loc: (nullable): locale to parse the strings in or %NULL for the "C" locale
+ *       (use `uselocale ((locale_t) 0)` for the current locale)
+ * @results: (out caller-allocates) (array length=n_strs): place to store the
+ *           numbers of bytes to, 0 for the strings that failed to be parsed
+ * @statuses: (out caller-allocates) (array length=n_strs) (optional): place to
+ *            store the results of parsing the individual strings to
+ *
+ * Parses @n_strs size specs at once. Works like bs_size_new_from_str_l() for
+ * every string, but needs no allocations for the individual strings and looks
+ * everything depending on the locale up only once. Strings not representing
+ * valid sizes (or %NULL) get %BS_BATCH_INVALID_SPEC, sizes not fitting into
+ * #int64_t get %BS_BATCH_OVER.
+ *
+ * Big batches are parsed in multiple threads if allowed by
+ * bs_set_batch_threads(), the results are the same as with a single thread.
+ *
+ * Returns: number of successfully parsed strings
+ */
+size_t bs_size_parse_int64_batch (const char * const *size_strs, size_t n_strs, locale_t loc, int64_t *results,
+                                  BSBatchStatus *statuses) {
+    return parse_batch (size_strs, n_strs, loc, store_int64, results, statuses);
+}
 
-    mpz_clear (result);
-    return ret;
+/**
+ * bs_size_parse_uint64_batch:
+ * @size_strs: (array length=n_strs): strings representing sizes (see
+ *             bs_size_new_from_str())
+ * @n_strs: number of strings in @size_strs
+ * @loc: (nullable): locale to parse the strings in or %NULL for the "C" locale
+ *       (use `uselocale ((locale_t) 0)` for the current locale)
+ * @results: (out caller-allocates) (array length=n_strs): place to store the
+ *           numbers of bytes to, 0 for the strings that failed to be parsed
+ * @statuses: (out caller-allocates) (array length=n_strs) (optional): place to
+ *            store the results of parsing the individual strings to
+ *
+ * Same as bs_size_parse_int64_batch(), but for sizes fitting into #uint64_t
+ * (negative sizes get %BS_BATCH_OVER).
+ *
+ * Returns: number of successfully parsed strings
+ */
+size_t bs_size_parse_uint64_batch (const char * const *size_strs, size_t n_strs, locale_t loc, uint64_t *results,
+                                   BSBatchStatus *statuses) {
+    return parse_batch (size_strs, n_strs, loc, store_uint64, results, statuses);
 }
 
 /**
- * bs_size_div_int:
- * @error: (out) (optional): place to store error (if any)
+ * HumanReadableChunk: (skip)
+ * @buf: (nullable): buffer with the strings of the chunk (%NULL if it could not
+ *       be allocated)
+ * @len: length of the strings of the chunk in @buf
  *
- * Divide @size by @divisor. Gives the answer to the question "What is the size
- * of each chunk if @size is split into a @divisor number of pieces?"
+ * Output of a chunk of bs_size_human_readable_batch() formatted by a thread.
+ */
+typedef struct _HumanReadableChunk {
+    char *buf;
+    size_t len;
+} HumanReadableChunk;
+
+/**
+ * HumanReadableBatchJob: (skip)
+ * @chunks: (array length=n_chunks): outputs of the chunks
  *
- * Note: Due to the limitations of the current implementation the maximum value
- * @divisor is ULONG_MAX (which can differ from UINT64_MAX). An error
- * (BS_ERROR_OVER) is returned if overflow happens.
+ * Data of bs_size_human_readable_batch() shared by the threads.
+ */
+typedef struct _HumanReadableBatchJob {
+    const BSSize *sizes;
+    BSBunit min_unit;
+    int max_places;
+    locale_t loc;
+    size_t *offsets;
+    HumanReadableChunk *chunks;
+} HumanReadableBatchJob;
+
+/**
+ * human_readable_range: (skip)
+ * @pos: position in @buf to write the first string to
  *
- * Returns: (transfer full): a #BSSize instance x so that x * @divisor = @size,
- *                           rounded to a number of bytes
+ * Writes the human-readable representations of the sizes from @start to @end
+ * to @buf, see bs_size_human_readable_batch().
+ *
+ * Returns: position after the last string (written or not)
  */
-BSSize bs_size_div_int (const BSSize size, uint64_t divisor, BSError **error) {
-    BSSize ret = NULL;
+static size_t human_readable_range (const HumanReadableBatchJob *job, size_t start, size_t end, char *buf,
+                                    size_t buf_len, size_t pos) {
+    const char *xlated[BS_BUNIT_UNDEF];
+    const char * const *unit_names = NULL;
+    const char *radix_char = NULL;
+    locale_t orig_loc = (locale_t) 0;
+    MpzView view;
+    size_t i = 0;
+    int len = 0;
 
-    if (divisor == 0) {
-        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
-        return NULL;
-    } else if (divisor > ULONG_MAX) {
-        set_error (error, BS_ERROR_OVER, strdup_printf ("Divisor too big, must be less or equal to %lu", ULONG_MAX));
-        return NULL;
+    if (job->loc)
+        orig_loc = use_locale (job->loc);
+    radix_char = job->loc ? nl_langinfo (RADIXCHAR) : ".";
+    unit_names = get_bunit_names (job->loc != NULL, xlated);
+
+    for (i=start; i < end; i++) {
+        if (job->offsets)
+            job->offsets[i] = pos;
+        len = human_readable_buf (size_get_mpz (job->sizes[i], &view), job->min_unit, job->max_places, job->loc != NULL, radix_char,
+                                  unit_names, pos < buf_len ? buf + pos : NULL, pos < buf_len ? buf_len - pos : 0);
+        pos += (len > 0 ? (size_t) len : 0) + 1;
     }
-    ret = bs_size_new ();
-    mpz_tdiv_q_ui (ret->bytes, size->bytes, divisor);
 
-    return ret;
+    if (job->loc)
+        uselocale (orig_loc);
+
+    return pos;
+}
+
+static void human_readable_batch_chunk (void *data, size_t chunk_idx, size_t start, size_t end) {
+    HumanReadableBatchJob *job = (HumanReadableBatchJob *) data;
+    HumanReadableChunk *chunk = &(job->chunks[chunk_idx]);
+    size_t buf_len = 16 * (end - start);
+    char *buf = NULL;
+
+    /* format the chunk into its own buffer, enlarged to the exact size needed
+       if the first attempt doesn't fit */
+    chunk->buf = malloc (buf_len);
+    if (!chunk->buf)
+        return;
+    chunk->len = human_readable_range (job, start, end, chunk->buf, buf_len, 0);
+    if (chunk->len > buf_len) {
+        buf = realloc (chunk->buf, chunk->len);
+        if (!buf) {
+            free (chunk->buf);
+            chunk->buf = NULL;
+            return;
+        }
+        chunk->buf = buf;
+        human_readable_range (job, start, end, chunk->buf, chunk->len, 0);
+    }
 }
 
 /**
- * bs_size_shrink_div_int:
- * @error: (out) (optional): place to store error (if any)
+ * bs_size_human_readable_batch:
+ * @sizes: (array length=n_sizes): sizes to get the representations of
+ * @n_sizes: number of sizes in @sizes
+ * @min_unit: the smallest unit the representations should use
+ * @max_places: maximum number of decimal places the representations should use
+ * @loc: (nullable): locale to use or %NULL for the "C" locale (see
+ *       bs_size_human_readable_l())
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the
+ *       strings to
+ * @buf_len: size of @buf
+ * @offsets: (out caller-allocates) (array length=n_sizes) (optional): place to
+ *           store the offsets of the strings in @buf to
  *
- * Shrink @size by dividing by @divisor. IOW, divide @size by @divisor in-place.
+ * Writes human-readable representations of @sizes to @buf, one after another,
+ * each of them terminated by '\0'. Works like bs_size_human_readable_buf_l()
+ * for every size, but looks everything depending on the locale up only once.
  *
- * Basically an in-place variant of bs_size_div_int().
+ * If the returned length is bigger than @buf_len, the strings that didn't fit
+ * were truncated or left out. The @offsets are those of the complete output
+ * anyway.
  *
- * Note: Due to the limitations of the current implementation the maximum value
- * @divisor is ULONG_MAX (which can differ from UINT64_MAX). An error
- * (BS_ERROR_OVER) is returned if overflow happens.
+ * Big batches are formatted in multiple threads if allowed by
+ * bs_set_batch_threads(), the output is the same as with a single thread.
  *
- * Returns: (transfer none): @size modified by division by @divisor
+ * Returns: length of the complete output (including all the terminating '\0'
+ *          characters)
  */
-BSSize bs_size_shrink_div_int (BSSize size, uint64_t divisor, BSError **error) {
-    if (divisor == 0) {
-        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
-        return NULL;
-    } else if (divisor > ULONG_MAX) {
-        set_error (error, BS_ERROR_OVER, strdup_printf ("Divisor too big, must be less or equal to %lu", ULONG_MAX));
-        return NULL;
+size_t bs_size_human_readable_batch (const BSSize *sizes, size_t n_sizes, BSBunit min_unit, int max_places, locale_t loc,
+                                     char *buf, size_t buf_len, size_t *offsets) {
+    HumanReadableBatchJob job = {sizes, min_unit, max_places, loc, offsets, NULL};
+    HumanReadableChunk *chunk = NULL;
+    size_t start = 0;
+    size_t end = 0;
+    size_t n_chunks = get_batch_n_chunks (n_sizes);
+    size_t pos = 0;
+    size_t i = 0;
+    size_t j = 0;
+
+    if (n_chunks > 1)
+        job.chunks = calloc (n_chunks, sizeof (HumanReadableChunk));
+    if (!job.chunks)
+        /* the whole batch in this thread, right into @buf */
+        return human_readable_range (&job, 0, n_sizes, buf, buf_len, 0);
+
+    /* the chunks don't know where their strings will end up so they are
+       formatted into separate buffers and copied to @buf in order */
+    run_batch (human_readable_batch_chunk, &job, n_sizes, n_chunks);
+    for (i=0; i < n_chunks; i++) {
+        chunk = &(job.chunks[i]);
+        start = get_batch_chunk_start (n_sizes, n_chunks, i);
+        end = get_batch_chunk_start (n_sizes, n_chunks, i + 1);
+        if (!chunk->buf) {
+            /* failed to allocate the buffer for the chunk, format it here */
+            pos = human_readable_range (&job, start, end, buf, buf_len, pos);
+            continue;
+        }
+
+        if (pos < buf_len) {
+            memcpy (buf + pos, chunk->buf, chunk->len < buf_len - pos ? chunk->len : buf_len - pos);
+            /* truncated the same way as the strings formatted right into @buf */
+            if (chunk->len > buf_len - pos)
+                buf[buf_len - 1] = '\0';
+        }
+        if (offsets && pos > 0)
+            for (j=start; j < end; j++)
+                offsets[j] += pos;
+        pos += chunk->len;
+        free (chunk->buf);
     }
+    free (job.chunks);
 
-    mpz_tdiv_q_ui (size->bytes, size->bytes, divisor);
+    return pos;
+}
 
-    return size;
+/**
+ * ConvertBatchJob: (skip)
+ *
+ * Data of bs_size_convert_to_double_batch() shared by the threads.
+ */
+typedef struct _ConvertBatchJob {
+    const BSSize *sizes;
+    const mpz_t *unit_pow;
+    double *results;
+} ConvertBatchJob;
+
+static void convert_batch_chunk (void *data, size_t chunk __attribute__((unused)), size_t start, size_t end) {
+    ConvertBatchJob *job = (ConvertBatchJob *) data;
+    MpzView view;
+    size_t i = 0;
+
+    for (i=start; i < end; i++)
+        job->results[i] = ratio_to_double (size_get_mpz (job->sizes[i], &view), *(job->unit_pow));
 }
 
 /**
- * bs_size_true_div:
+ * bs_size_convert_to_double_batch:
+ * @sizes: (array length=n_sizes): sizes to convert
+ * @n_sizes: number of sizes in @sizes
+ * @unit: the unit to convert @sizes to
+ * @results: (out caller-allocates) (array length=n_sizes): place to store the
+ *           converted sizes to
  * @error: (out) (optional): place to store error (if any)
  *
- * Divides @size1 by @size2.
+ * Get @sizes converted to @unit as doubles, see bs_size_convert_to_double().
+ * Big batches are converted in multiple threads if allowed by
+ * bs_set_batch_threads().
  *
- * Returns: (transfer full): a string representing the floating-point number
- *                           that equals to @size1 / @size2
+ * Returns: whether the sizes were converted (and @results set) or not
  */
-char* bs_size_true_div (const BSSize size1, const BSSize size2, BSError **error) {
-    mpf_t op1;
-    mpf_t op2;
-    char *ret = NULL;
+bool bs_size_convert_to_double_batch (const BSSize *sizes, size_t n_sizes, BSUnit unit, double *results, BSError **error) {
+    ConvertBatchJob job = {sizes, NULL, results};
+    uint64_t pwr = 0;
+    bool decimal = false;
 
-    if (mpz_cmp_ui (size2->bytes, 0) == 0) {
-        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf("Division by zero"));
-        return NULL;
+    if (!unit_get_pow (unit, &pwr, &decimal)) {
+        set_error (error, BS_ERROR_INVALID_SPEC, strdup ("Invalid unit spec given"));
+        return false;
     }
 
-    mpf_init2 (op1, BS_FLOAT_PREC_BITS);
-    mpf_init2 (op2, BS_FLOAT_PREC_BITS);
-    mpf_set_z (op1, size1->bytes);
-    mpf_set_z (op2, size2->bytes);
+    job.unit_pow = get_unit_pow (pwr, decimal);
+    run_batch (convert_batch_chunk, &job, n_sizes, get_batch_n_chunks (n_sizes));
 
-    mpf_div (op1, op1, op2);
-
-    gmp_asprintf (&ret, "%.*Fg", BS_FLOAT_PREC_BITS/3, op1);
-
-    mpf_clears (op1, op2, NULL);
+    return true;
+}
 
-    return ret;
+/**
+ * RoundBatchJob: (skip)
+ *
+ * Data of bs_size_round_to_nearest_batch() shared by the threads.
+ */
+typedef struct _RoundBatchJob {
+    BSSize *sizes;
+    BSSize round_to;
+    BSRoundDir dir;
+} RoundBatchJob;
+
+static void round_batch_chunk (void *data, size_t chunk __attribute__((unused)), size_t start, size_t end) {
+    RoundBatchJob *job = (RoundBatchJob *) data;
+    size_t i = 0;
+
+    for (i=start; i < end; i++)
+        round_to_nearest (job->sizes[i], job->sizes[i], job->round_to, job->dir);
 }
 
 /**
- * bs_size_true_div_int:
+ * bs_size_round_to_nearest_batch:
+ * @sizes: (array length=n_sizes): sizes to round
+ * @n_sizes: number of sizes in @sizes
+ * @round_to: to a multiple of what to round @sizes
+ * @dir: rounding direction (see bs_size_round_to_nearest())
  * @error: (out) (optional): place to store error (if any)
  *
- * Divides @size by @divisor.
+ * Round all @sizes to the nearest multiple of @round_to according to the
+ * direction given by @dir **in-place** (modifying @sizes), see
+ * bs_size_round_to_nearest().
  *
- * Note: Due to the limitations of the current implementation the maximum value
- * @divisor is ULONG_MAX (which can differ from UINT64_MAX). An error
- * (BS_ERROR_OVER) is returned if overflow happens.
+ * Big batches are rounded in multiple threads if allowed by
+ * bs_set_batch_threads(), so @sizes must not contain the same size more than
+ * once (or @round_to) then.
  *
- * Returns: (transfer full): a string representing the floating-point number
- *                           that equals to @size / @divisor
+ * Returns: whether the sizes were rounded or not
  */
-char* bs_size_true_div_int (const BSSize size, uint64_t divisor, BSError **error) {
-    mpf_t op1;
-    char *ret = NULL;
+bool bs_size_round_to_nearest_batch (BSSize *sizes, size_t n_sizes, const BSSize round_to, BSRoundDir dir, BSError **error) {
+    RoundBatchJob job = {sizes, round_to, dir};
 
-    if (divisor == 0) {
+    if (bs_size_sgn (round_to) == 0) {
         set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
-        return NULL;
-    } else if (divisor > ULONG_MAX) {
-        set_error (error, BS_ERROR_OVER, strdup_printf ("Divisor too big, must be less or equal to %lu", ULONG_MAX));
-        return NULL;
+        return false;
     }
 
-    mpf_init2 (op1, BS_FLOAT_PREC_BITS);
-    mpf_set_z (op1, size->bytes);
+    run_batch (round_batch_chunk, &job, n_sizes, get_batch_n_chunks (n_sizes));
 
-    mpf_div_ui (op1, op1, divisor);
-
-    gmp_asprintf (&ret, "%.*Fg", BS_FLOAT_PREC_BITS/3, op1);
-
-    mpf_clear (op1);
-
-    return ret;
+    return true;
 }
 
+
+/********************
+ * SCALAR FUNCTIONS *
+ ********************/
 /**
- * bs_size_mod:
- * @error: (out) (optional): place to store error (if any)
+ * bs_parse_u64:
+ * @size_str: string representing the size as a number and an optional unit
+ *            (e.g. "1 GiB")
+ * @loc: (nullable): locale to parse @size_str in or %NULL for the "C" locale
+ *       (use `uselocale ((locale_t) 0)` for the current locale)
+ * @bytes: (out): place to store the number of bytes to (0 in case of error)
+ * @error: (out caller-allocates) (optional): place to store the error to (if
+ *         any), see bs_size_validate_str()
  *
- * Gives @size1 modulo @size2 (i.e. the remainder of integer division @size1 /
- * @size2). Gives the answer to the question "If I split @size1 into chunks of
- * size @size2, what will be the remainder?"
- * **This function ignores the signs of the sizes.**
+ * Parses @size_str like bs_size_new_from_str_l() does, but without creating a
+ * #BSSize and without any allocations (unless the number in @size_str has
+ * more than 19 digits).
+ * Negative sizes and sizes too big for #uint64_t are reported as
+ * %BS_ERROR_OVER.
  *
- * Returns: (transfer full): a #BSSize instance that is a remainder of
- *                           @size1 / @size2 using integer division
+ * Returns: whether @size_str was parsed (and @bytes set) or not
  */
-BSSize bs_size_mod (const BSSize size1, const BSSize size2, BSError **error) {
-    mpz_t aux;
-    BSSize ret = NULL;
-    if (mpz_cmp_ui (size2->bytes, 0) == 0) {
-        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
-        return 0;
-    }
+bool bs_parse_u64 (const char *size_str, locale_t loc, uint64_t *bytes, BSErrorInfo *error) {
+    int sgn = 0;
 
-    mpz_init (aux);
-    mpz_set (aux, size1->bytes);
-    if (mpz_sgn (size1->bytes) == -1)
-        /* negative @size1, get the absolute value so that we get results
-           matching the specification/documentation of this function */
-        mpz_neg (aux, aux);
+    if (!parse_str_u64 (size_str, loc, bytes, &sgn, error)) {
+        *bytes = 0;
+        return false;
+    }
 
-    ret = bs_size_new ();
-    mpz_mod (ret->bytes, aux, size2->bytes);
+    if (sgn < 0) {
+        *bytes = 0;
+        set_error_info (error, BS_ERROR_OVER, "The size is negative, cannot be returned as an unsigned number of bytes");
+        return false;
+    }
 
-    return ret;
+    return true;
 }
 
 /**
- * bs_size_round_to_nearest:
- * @round_to: to a multiple of what to round @size
- * @dir: %BS_ROUND_DIR_UP to round up (to the nearest multiple of @round_to
- *       bigger than @size) or %BS_ROUND_DIR_DOWN to round down (to the
- *       nearest multiple of @round_to smaller than @size)
- * @error: (out) (optional): place to store error (if any)
+ * bs_parse_i64:
+ * @size_str: string representing the size as a number and an optional unit
+ *            (e.g. "1 GiB")
+ * @loc: (nullable): locale to parse @size_str in or %NULL for the "C" locale
+ *       (use `uselocale ((locale_t) 0)` for the current locale)
+ * @bytes: (out): place to store the number of bytes to (0 in case of error)
+ * @error: (out caller-allocates) (optional): place to store the error to (if
+ *         any), see bs_size_validate_str()
  *
- * Round @size to the nearest multiple of @round_to according to the direction
- * given by @dir.
+ * Same as bs_parse_u64(), but for (possibly negative) sizes fitting into
+ * #int64_t.
  *
- * Returns: (transfer full): a new instance of #BSSize that is @size rounded to
- *                           a multiple of @round_to according to @dir
+ * Returns: whether @size_str was parsed (and @bytes set) or not
  */
-BSSize bs_size_round_to_nearest (const BSSize size, const BSSize round_to, BSRoundDir dir, BSError **error) {
-    BSSize ret = NULL;
-    mpz_t q;
-    mpz_t aux_size;
+bool bs_parse_i64 (const char *size_str, locale_t loc, int64_t *bytes, BSErrorInfo *error) {
+    uint64_t abs_bytes = 0;
+    int sgn = 0;
 
-    if (mpz_cmp_ui (round_to->bytes, 0) == 0) {
-        set_error (error, BS_ERROR_ZERO_DIV, strdup_printf ("Division by zero"));
-        return NULL;
+    *bytes = 0;
+    if (!parse_str_u64 (size_str, loc, &abs_bytes, &sgn, error))
+        return false;
+
+    if (abs_bytes > (uint64_t) INT64_MAX + (sgn < 0 ? 1 : 0)) {
+        set_error_info (error, BS_ERROR_OVER, "The size is too big, cannot be returned as a 64bit number of bytes");
+        return false;
     }
 
-    mpz_init (q);
+    /* negate in uint64_t to avoid the overflow for INT64_MIN */
+    *bytes = sgn < 0 ? (int64_t) (0 - abs_bytes) : (int64_t) abs_bytes;
+    return true;
+}
 
-    if (dir == BS_ROUND_DIR_UP) {
-        mpz_cdiv_q (q, size->bytes, round_to->bytes);
-    } else if (dir == BS_ROUND_DIR_HALF_UP) {
-        /* round half up == add half of what to round to and round down */
-        mpz_init (aux_size);
-        mpz_fdiv_q_ui (aux_size, round_to->bytes, 2);
-        mpz_add (aux_size, aux_size, size->bytes);
-        mpz_fdiv_q (q, aux_size, round_to->bytes);
-        mpz_clear (aux_size);
-    } else
-        mpz_fdiv_q (q, size->bytes, round_to->bytes);
+/**
+ * bs_format_u64_human:
+ * @bytes: the number of bytes to get the representation of
+ * @min_unit: the smallest unit the representation should use
+ * @max_places: maximum number of decimal places the representation should use
+ * @loc: (nullable): locale to use or %NULL for the "C" locale (see
+ *       bs_size_human_readable_l())
+ * @buf: (out caller-allocates) (array length=buf_len): buffer to write the
+ *       string to
+ * @buf_len: size of @buf
+ *
+ * Writes the same human-readable representation of @bytes to @buf as
+ * bs_size_human_readable_buf_l() does for a #BSSize with the same value. Works
+ * like snprintf(), see bs_size_get_bytes_str_buf().
+ *
+ * Returns: length of the whole string (not including the terminating '\0')
+ */
+int bs_format_u64_human (uint64_t bytes, BSBunit min_unit, int max_places, locale_t loc, char *buf, size_t buf_len) {
+    const char *xlated[BS_BUNIT_UNDEF];
+    locale_t orig_loc = (locale_t) 0;
+    MpzView view;
+    int ret = 0;
 
-    ret = bs_size_new ();
-    mpz_mul (ret->bytes, q, round_to->bytes);
+    if (!loc)
+        /* nothing depends on the locale without the translation */
+        return human_readable_buf (u64_get_mpz (bytes, false, &view), min_unit, max_places, false, ".",
+                                   get_bunit_names (false, xlated), buf, buf_len);
 
-    mpz_clear (q);
+    orig_loc = use_locale (loc);
+    ret = human_readable_buf (u64_get_mpz (bytes, false, &view), min_unit, max_places, true, nl_langinfo (RADIXCHAR),
+                              get_bunit_names (true, xlated), buf, buf_len);
+    uselocale (orig_loc);
 
     return ret;
 }
 
-
-/***************
- * COMPARISONS *
- ***************/
 /**
- * bs_size_cmp:
- * @abs: whether to compare absolute values of @size1 and @size2 instead
+ * bs_convert_u64:
+ * @bytes: the number of bytes to convert
+ * @unit: the unit to convert @bytes to
+ * @error: (out caller-allocates) (optional): place to store the error to (if
+ *         any), see bs_size_validate_str()
  *
- * Compare @size1 and @size2. This function behaves like the standard *cmp*()
- * functions.
+ * Get @bytes converted to @unit as a double, the same value
+ * bs_size_convert_to_double() gives for a #BSSize with the same value.
  *
- * Returns: -1, 0, or 1 if @size1 is smaller, equal to or bigger than
- *          @size2 respectively comparing absolute values if @abs is %TRUE
+ * Returns: @bytes converted to @unit or 0.0 in case of error
  */
-int bs_size_cmp (const BSSize size1, const BSSize size2, bool abs) {
-    int ret = 0;
-    if (abs)
-        ret = mpz_cmpabs (size1->bytes, size2->bytes);
-    else
-        ret = mpz_cmp (size1->bytes, size2->bytes);
-    /* make sure we don't return things like 2 or -2 (which GMP can give us) */
-    if (ret > 0)
-        ret = 1;
-    else if (ret < 0)
-        ret = -1;
-    return ret;
+double bs_convert_u64 (uint64_t bytes, BSUnit unit, BSErrorInfo *error) {
+    MpzView view;
+    uint64_t pwr = 0;
+    bool decimal = false;
+
+    if (!unit_get_pow (unit, &pwr, &decimal)) {
+        set_error_info (error, BS_ERROR_INVALID_SPEC, "Invalid unit spec given");
+        return 0.0;
+    }
+
+    if (!decimal)
+        /* dividing by a power of 2 is exact, only the conversion of @bytes to
+           double is rounded (correctly) */
+        return ldexp ((double) bytes, -10 * (int) pwr);
+
+    return ratio_to_double (u64_get_mpz (bytes, false, &view), *get_unit_pow (pwr, decimal));
 }
 
 /**
- * bs_size_cmp_bytes:
- * @abs: whether to compare absolute values of @size and @bytes instead.
+ * bs_round_u64:
+ * @bytes: the number of bytes to round
+ * @round_to: to a multiple of what to round @bytes
+ * @dir: rounding direction (see bs_size_round_to_nearest())
+ * @result: (out): place to store the rounded number of bytes to
+ * @error: (out caller-allocates) (optional): place to store the error to (if
+ *         any), see bs_size_validate_str()
  *
- * Compare @size and @bytes, i.e. the number of bytes @size has with
- * @bytes. This function behaves like the standard *cmp*() functions.
+ * Round @bytes to the nearest multiple of @round_to according to the direction
+ * given by @dir, like bs_size_round_to_nearest() does. See also
+ * bs_round_u64_inline().
  *
- * Returns: -1, 0, or 1 if @size is smaller, equal to or bigger than
- *          @bytes respectively comparing absolute values if @abs is %TRUE
+ * Returns: whether @bytes was rounded (and @result set) or not (@round_to being
+ *          0 or the result not fitting into #uint64_t)
  */
-int bs_size_cmp_bytes (const BSSize size, uint64_t bytes, bool abs) {
-    int ret = 0;
-    if (abs)
-        ret = mpz_cmpabs_ui (size->bytes, bytes);
-    else
-        ret = mpz_cmp_ui (size->bytes, bytes);
-    /* make sure we don't return things like 2 or -2 (which GMP can give us) */
-    if (ret > 0)
-        ret = 1;
-    else if (ret < 0)
-        ret = -1;
-    return ret;
+bool bs_round_u64 (uint64_t bytes, uint64_t round_to, BSRoundDir dir, uint64_t *result, BSErrorInfo *error) {
+    if (round_to == 0) {
+        set_error_info (error, BS_ERROR_ZERO_DIV, "Division by zero");
+        return false;
+    }
+
+    if (!bs_round_u64_inline (bytes, round_to, dir, result)) {
+        set_error_info (error, BS_ERROR_OVER, "The result is too big, cannot be returned as a 64bit number");
+        return false;
+    }
+
+    return true;
 }
@@ -1,6 +1,10 @@
 #ifndef _BS_SIZE_H
 #define _BS_SIZE_H
 
+/* locale_t is only available with POSIX.1-2008 (which also defines
+ * LC_GLOBAL_LOCALE), the functions taking it are only declared if it is */
+#include <locale.h>
+#include <stddef.h>
 #include <stdint.h>
 #include <stdbool.h>
 
@@ -39,6 +43,19 @@ typedef struct _BSError {
     char *msg;
 } BSError;
 
+/**
+ * BSErrorInfo:
+ * @code: error code
+ * @msg: static error message (never to be freed)
+ *
+ * Error record filled by the functions reporting errors without any
+ * allocations (see bs_size_validate_str()).
+ */
+typedef struct _BSErrorInfo {
+    BSErrorCode code;
+    const char *msg;
+} BSErrorInfo;
+
 /**
  * BSBunit:
  *
@@ -70,6 +87,36 @@ typedef enum {
     BS_ROUND_DIR_HALF_UP = 2
 } BSRoundDir;
 
+/**
+ * BSBatchStatus:
+ * @BS_BATCH_OK: the element was processed successfully
+ * @BS_BATCH_INVALID_SPEC: invalid size spec provided
+ * @BS_BATCH_OVER: the value is over the limits imposed by the result type
+ *
+ * Results of the batch functions for the individual elements.
+ */
+typedef enum {
+    BS_BATCH_OK,
+    BS_BATCH_INVALID_SPEC,
+    BS_BATCH_OVER
+} BSBatchStatus;
+
+/**
+ * BSMagnitude:
+ * @BS_MAGNITUDE_INT64: the number of bytes fits into #int64_t
+ * @BS_MAGNITUDE_UINT64: the number of bytes doesn't fit into #int64_t, but
+ *                       fits into #uint64_t
+ * @BS_MAGNITUDE_BIG: the number of bytes fits into neither #int64_t nor
+ *                    #uint64_t
+ *
+ * Classes of sizes by the smallest type their number of bytes fits into.
+ */
+typedef enum {
+    BS_MAGNITUDE_INT64,
+    BS_MAGNITUDE_UINT64,
+    BS_MAGNITUDE_BIG
+} BSMagnitude;
+
 /**
  * BSUnit:
  * @bunit: a binary unit
@@ -91,11 +138,31 @@ typedef union {
  */
 #define BS_FLOAT_PREC_BITS 256
 
+/**
+ * BS_DIGITS_DOUBLE:
+ *
+ * Special number of significant digits for the *_prec() functions telling
+ * them to compute with doubles (fast, but only double precision).
+ */
+#define BS_DIGITS_DOUBLE 0
+
 /* Constructors */
 BSSize bs_size_new (void);
 BSSize bs_size_new_from_bytes (uint64_t bytes, int sgn);
 BSSize bs_size_new_from_str (const char *size_str, BSError **error);
+#ifdef LC_GLOBAL_LOCALE
+BSSize bs_size_new_from_str_l (const char *size_str, locale_t loc, BSError **error);
+#endif
 BSSize bs_size_new_from_size (const BSSize size);
+BSSize bs_size_new_from_double (double bytes, BSError **error);
+BSSize bs_size_new_from_rational (const BSSize num, const BSSize den, BSError **error);
+BSSize bs_size_import (const void *data, size_t data_len, int order, int sgn);
+
+/* Validation */
+#ifdef LC_GLOBAL_LOCALE
+bool bs_size_validate_str (const char *size_str, locale_t loc, BSMagnitude *magnitude, BSErrorInfo *error);
+#endif
+const BSErrorInfo* bs_get_last_error_info (void);
 
 /* Destructors */
 void bs_size_free (BSSize size);
@@ -105,8 +172,20 @@ void bs_clear_error (BSError **error);
 uint64_t bs_size_get_bytes (const BSSize size, int *sgn, BSError **error);
 int bs_size_sgn (const BSSize size);
 char* bs_size_get_bytes_str (const BSSize size);
+size_t bs_size_export (const BSSize size, void *data, size_t data_len, int order, int *sgn);
 char* bs_size_convert_to (const BSSize size, BSUnit unit, BSError **error);
 char* bs_size_human_readable (const BSSize size, BSBunit min_unit, int max_places, bool xlate);
+int bs_size_get_bytes_str_buf (const BSSize size, char *buf, size_t buf_len);
+int bs_size_convert_to_buf (const BSSize size, BSUnit unit, char *buf, size_t buf_len, BSError **error);
+int bs_size_human_readable_buf (const BSSize size, BSBunit min_unit, int max_places, bool xlate, char *buf, size_t buf_len);
+#ifdef LC_GLOBAL_LOCALE
+char* bs_size_human_readable_l (const BSSize size, BSBunit min_unit, int max_places, locale_t loc);
+int bs_size_human_readable_buf_l (const BSSize size, BSBunit min_unit, int max_places, locale_t loc, char *buf, size_t buf_len);
+#endif
+char* bs_size_convert_to_prec (const BSSize size, BSUnit unit, int digits, BSError **error);
+int bs_size_convert_to_prec_buf (const BSSize size, BSUnit unit, int digits, char *buf, size_t buf_len, BSError **error);
+double bs_size_convert_to_double (const BSSize size, BSUnit unit, BSError **error);
+bool bs_size_convert_to_rational (const BSSize size, BSUnit unit, BSSize *num, BSSize *den, BSError **error);
 
 /* Arithmetic */
 BSSize bs_size_add (const BSSize size1, const BSSize size2);
@@ -117,20 +196,97 @@ BSSize bs_size_sub (const BSSize size1, const BSSize size2);
 BSSize bs_size_shrink (BSSize size1, const BSSize size2);
 BSSize bs_size_sub_bytes (const BSSize size, uint64_t bytes);
 BSSize bs_size_shrink_bytes (BSSize size, uint64_t bytes);
+BSSize bs_size_sub_from_bytes (const BSSize size, uint64_t bytes);
+BSSize bs_size_neg (const BSSize size);
 BSSize bs_size_mul_int (const BSSize size, uint64_t times);
 BSSize bs_size_grow_mul_int (BSSize size, uint64_t times);
+BSSize bs_size_mul_int64 (const BSSize size, int64_t times);
+BSSize bs_size_mul_rational (const BSSize size, const BSSize num, const BSSize den, BSError **error);
 BSSize bs_size_mul_float_str (const BSSize size, const char *float_str, BSError **error);
+#ifdef LC_GLOBAL_LOCALE
+BSSize bs_size_mul_float_str_l (const BSSize size, const char *float_str, locale_t loc, BSError **error);
+#endif
 BSSize bs_size_grow_mul_float_str (BSSize size, const char *float_str, BSError **error);
+BSSize bs_size_mul_float_str_prec (const BSSize size, const char *float_str, int digits, BSError **error);
+BSSize bs_size_grow_mul_float_str_prec (BSSize size, const char *float_str, int digits, BSError **error);
 uint64_t bs_size_div (const BSSize size1, const BSSize size2, int *sgn, BSError **error);
 BSSize bs_size_div_int (const BSSize size, uint64_t divisor, BSError **error);
 BSSize bs_size_shrink_div_int (BSSize size, uint64_t shrink_divisor, BSError **error);
 char* bs_size_true_div (const BSSize size1, const BSSize size2, BSError **error);
 char* bs_size_true_div_int (const BSSize size, uint64_t divisor, BSError **error);
+int bs_size_true_div_buf (const BSSize size1, const BSSize size2, char *buf, size_t buf_len, BSError **error);
+int bs_size_true_div_int_buf (const BSSize size, uint64_t divisor, char *buf, size_t buf_len, BSError **error);
+char* bs_size_true_div_prec (const BSSize size1, const BSSize size2, int digits, BSError **error);
+char* bs_size_true_div_int_prec (const BSSize size, uint64_t divisor, int digits, BSError **error);
+int bs_size_true_div_prec_buf (const BSSize size1, const BSSize size2, int digits, char *buf, size_t buf_len, BSError **error);
+int bs_size_true_div_int_prec_buf (const BSSize size, uint64_t divisor, int digits, char *buf, size_t buf_len, BSError **error);
+double bs_size_true_div_double (const BSSize size1, const BSSize size2, BSError **error);
+double bs_size_true_div_int_double (const BSSize size, uint64_t divisor, BSError **error);
+bool bs_size_true_div_rational (const BSSize size1, const BSSize size2, BSSize *num, BSSize *den, BSError **error);
 BSSize bs_size_mod (const BSSize size1, const BSSize size2, BSError **error);
 BSSize bs_size_round_to_nearest (const BSSize size, const BSSize round_to, BSRoundDir dir, BSError **error);
 
 /* Comparisons */
 int bs_size_cmp (const BSSize size1, const BSSize size2, bool abs);
 int bs_size_cmp_bytes (const BSSize size1, uint64_t bytes, bool abs);
+int bs_size_cmp_int64 (const BSSize size, int64_t val, bool abs);
+
+/* Reductions */
+BSSize bs_size_sum (const BSSize *sizes, size_t n_sizes);
+BSSize bs_size_min (const BSSize *sizes, size_t n_sizes);
+BSSize bs_size_max (const BSSize *sizes, size_t n_sizes);
+BSSize bs_size_mean (const BSSize *sizes, size_t n_sizes, BSRoundDir dir, BSError **error);
+
+/* Batch functions */
+void bs_set_batch_threads (unsigned int n_threads);
+unsigned int bs_get_batch_threads (void);
+#ifdef LC_GLOBAL_LOCALE
+size_t bs_size_parse_int64_batch (const char * const *size_strs, size_t n_strs, locale_t loc, int64_t *results, BSBatchStatus *statuses);
+size_t bs_size_parse_uint64_batch (const char * const *size_strs, size_t n_strs, locale_t loc, uint64_t *results, BSBatchStatus *statuses);
+size_t bs_size_human_readable_batch (const BSSize *sizes, size_t n_sizes, BSBunit min_unit, int max_places, locale_t loc, char *buf, size_t buf_len, size_t *offsets);
+#endif
+bool bs_size_convert_to_double_batch (const BSSize *sizes, size_t n_sizes, BSUnit unit, double *results, BSError **error);
+bool bs_size_round_to_nearest_batch (BSSize *sizes, size_t n_sizes, const BSSize round_to, BSRoundDir dir, BSError **error);
+
+/* Scalar functions */
+#ifdef LC_GLOBAL_LOCALE
+bool bs_parse_u64 (const char *size_str, locale_t loc, uint64_t *bytes, BSErrorInfo *error);
+bool bs_parse_i64 (const char *size_str, locale_t loc, int64_t *bytes, BSErrorInfo *error);
+int bs_format_u64_human (uint64_t bytes, BSBunit min_unit, int max_places, locale_t loc, char *buf, size_t buf_len);
+#endif
+double bs_convert_u64 (uint64_t bytes, BSUnit unit, BSErrorInfo *error);
+bool bs_round_u64 (uint64_t bytes, uint64_t round_to, BSRoundDir dir, uint64_t *result, BSErrorInfo *error);
+
+/**
+ * bs_round_u64_inline:
+ * @bytes: the number of bytes to round
+ * @round_to: to a multiple of what to round @bytes
+ * @dir: rounding direction (see bs_size_round_to_nearest())
+ * @result: (out): place to store the rounded number of bytes to
+ *
+ * Inline version of bs_round_u64() without the error reporting.
+ *
+ * Returns: whether @bytes was rounded (and @result set) or not (@round_to being
+ *          0 or the result not fitting into #uint64_t)
+ */
+static inline bool bs_round_u64_inline (uint64_t bytes, uint64_t round_to, BSRoundDir dir, uint64_t *result) {
+    uint64_t rem = 0;
+
+    if (round_to == 0)
+        return false;
+
+    /* rounding half up == rounding up if the remainder is at least the bigger
+       half of @round_to (avoids the overflow of @bytes + @round_to / 2) */
+    rem = bytes % round_to;
+    if (rem == 0 || dir == BS_ROUND_DIR_DOWN || (dir == BS_ROUND_DIR_HALF_UP && rem < round_to - round_to / 2)) {
+        *result = bytes - rem;
+        return true;
+    }
+
+    if (bytes - rem > UINT64_MAX - round_to)
+        return false;
+    *result = bytes - rem + round_to;
+    return true;
+}
 
 #endif  /* _BS_SIZE_H */
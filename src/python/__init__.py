@@ -1,4 +1,14 @@
-from .bytesize import Size
+from .bytesize import Size, SizeAccumulator
 from .bytesize import B, KiB, MiB, GiB, TiB, PiB, EiB, ZiB, YiB, KB, MB, GB, TB, PB, EB, ZB, YB
 from .bytesize import ROUND_UP, ROUND_DOWN, ROUND_HALF_UP
 from .bytesize import SizeError, InvalidSpecError, OverflowError, ZeroDivisionError
+from .bytesize import set_alloc_debug, get_alloc_counts
+from .bytesize import DIGITS_DOUBLE, set_default_digits, get_default_digits
+from .bytesize import get_backend, set_backend
+from .bytesize import sum_sizes, min_size, max_size, mean_size
+from .bytesize import SIZE_ZERO, SIZE_B, SIZE_KiB, SIZE_MiB, SIZE_GiB, SIZE_TiB, SIZE_PiB, SIZE_EiB, SIZE_ZiB, SIZE_YiB
+from .bytesize import SIZE_KB, SIZE_MB, SIZE_GB, SIZE_TB, SIZE_PB, SIZE_EB, SIZE_ZB, SIZE_YB
+from .bytesize import intern_size, set_intern_cache_size, get_intern_cache_size, clear_intern_cache
+from .bytesize import set_parse_cache_size, get_parse_cache_stats, clear_parse_cache
+from .bytesize import set_batch_threads, get_batch_threads
+from .bytesize import MAGNITUDE_INT64, MAGNITUDE_UINT64, MAGNITUDE_BIG, validate_size_str
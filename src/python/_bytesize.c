@@ -0,0 +1,1893 @@
+/*
+ * Native implementation of the bytesize.Size type
+ *
+ * This module implements the same Size class as the ctypes bindings in
+ * bytesize.py (with the same semantics and exceptions), but calls libbytesize
+ * directly. bytesize.py uses it if it's available and falls back to the ctypes
+ * implementation otherwise.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <langinfo.h>
+#include <stdbool.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "bs_size.h"
+
+#define MAXUINT64 UINT64_MAX
+
+/* the same value as BS_DIGITS_DOUBLE, used for 'None' (the full precision) */
+#define DIGITS_FULL -1
+
+typedef struct {
+    PyObject_HEAD
+    BSSize size;
+    /* whether the size is included in the allocation counts */
+    bool counted;
+} SizeObject;
+
+static PyTypeObject SizeType;
+
+static PyObject *decimal_type = NULL;
+static PyObject *fraction_type = NULL;
+
+/* exception classes from bytesize.py (see _set_error_classes()) */
+static PyObject *size_error_cls = NULL;
+static PyObject *error_clss[BS_ERROR_FAIL] = { NULL, NULL, NULL };
+
+/* see bytesize.set_default_digits() */
+static int default_digits = DIGITS_FULL;
+
+/* see bytesize.set_alloc_debug() */
+static bool alloc_debug = false;
+static Py_ssize_t alloc_count = 0;
+static Py_ssize_t alloc_total = 0;
+
+/* used for None operands, negation and new objects not initialized yet,
+   never freed */
+static BSSize zero_size = NULL;
+
+static const struct {
+    const char *name;
+    BSUnit unit;
+} unit_strs[] = {
+    {"B", {BS_BUNIT_B}}, {"KiB", {BS_BUNIT_KiB}}, {"MiB", {BS_BUNIT_MiB}},
+    {"GiB", {BS_BUNIT_GiB}}, {"TiB", {BS_BUNIT_TiB}}, {"PiB", {BS_BUNIT_PiB}},
+    {"EiB", {BS_BUNIT_EiB}}, {"ZiB", {BS_BUNIT_ZiB}}, {"YiB", {BS_BUNIT_YiB}},
+    {"KB", {.dunit=BS_DUNIT_KB}}, {"MB", {.dunit=BS_DUNIT_MB}}, {"GB", {.dunit=BS_DUNIT_GB}},
+    {"TB", {.dunit=BS_DUNIT_TB}}, {"PB", {.dunit=BS_DUNIT_PB}}, {"EB", {.dunit=BS_DUNIT_EB}},
+    {"ZB", {.dunit=BS_DUNIT_ZB}}, {"YB", {.dunit=BS_DUNIT_YB}},
+};
+
+#define N_UNITS (sizeof (unit_strs) / sizeof (unit_strs[0]))
+
+/* sizes of 1 of the units in unit_strs used for rounding, never freed */
+static BSSize unit_sizes[N_UNITS] = { NULL };
+
+#define Size_Check(op) PyObject_TypeCheck (op, &SizeType)
+#define SIZE(op) (((SizeObject *) (op))->size)
+
+
+/**
+ * raise_error: (skip)
+ *
+ * Raises the Python exception corresponding to @error and clears @error.
+ *
+ * Returns: %NULL
+ */
+static PyObject* raise_error (BSError *error) {
+    PyObject *cls = NULL;
+
+    if (error->code < BS_ERROR_FAIL)
+        cls = error_clss[error->code];
+    else
+        cls = size_error_cls;
+    if (!cls)
+        cls = PyExc_ValueError;
+
+    PyErr_SetString (cls, error->msg ? error->msg : "");
+    bs_clear_error (&error);
+    return NULL;
+}
+
+/**
+ * raise_as_value_error: (skip)
+ *
+ * Replaces the currently raised SizeError with a ValueError, like the Size
+ * constructor does.
+ */
+static void raise_as_value_error (void) {
+    PyObject *type = NULL;
+    PyObject *value = NULL;
+    PyObject *traceback = NULL;
+
+    if (!size_error_cls || !PyErr_ExceptionMatches (size_error_cls))
+        return;
+
+    PyErr_Fetch (&type, &value, &traceback);
+    PyErr_NormalizeException (&type, &value, &traceback);
+    PyErr_SetObject (PyExc_ValueError, value);
+    Py_XDECREF (type);
+    Py_XDECREF (value);
+    Py_XDECREF (traceback);
+}
+
+/**
+ * size_set: (skip)
+ *
+ * Makes @self own @size (freeing the size it owned before unless it was the
+ * shared zero size set by Size_new()).
+ */
+static void size_set (SizeObject *self, BSSize size) {
+    if (self->counted) {
+        alloc_count--;
+        self->counted = false;
+    }
+    if (self->size != zero_size)
+        bs_size_free (self->size);
+    self->size = size;
+    if (alloc_debug) {
+        alloc_count++;
+        alloc_total++;
+        self->counted = true;
+    }
+}
+
+/**
+ * count_temp: (skip)
+ *
+ * Counts the newly allocated temporary @size (see bytesize.get_alloc_counts()).
+ *
+ * Returns: @size
+ */
+static BSSize count_temp (BSSize size) {
+    if (alloc_debug && size)
+        alloc_total++;
+    return size;
+}
+
+/**
+ * size_wrap: (skip)
+ *
+ * Creates a new Size object owning @size (which is freed if that fails).
+ */
+static PyObject* size_wrap (BSSize size) {
+    SizeObject *self = NULL;
+
+    if (!size)
+        return PyErr_NoMemory ();
+
+    self = (SizeObject *) SizeType.tp_alloc (&SizeType, 0);
+    if (!self) {
+        bs_size_free (size);
+        return NULL;
+    }
+    size_set (self, size);
+
+    return (PyObject *) self;
+}
+
+/**
+ * size_new_from_long: (skip)
+ *
+ * Creates a new BSSize from the Python int @val.
+ *
+ * Returns: (transfer full): the new size or %NULL with an exception raised
+ */
+static BSSize size_new_from_long (PyObject *val) {
+    long long small = 0;
+    int overflow = 0;
+    PyObject *abs_val = NULL;
+    PyObject *n_bits = NULL;
+    PyObject *byts = NULL;
+    Py_ssize_t n_bytes = 0;
+    BSSize ret = NULL;
+
+    small = PyLong_AsLongLongAndOverflow (val, &overflow);
+    if (small == -1 && PyErr_Occurred ())
+        return NULL;
+    if (!overflow)
+        return bs_size_new_from_bytes (small < 0 ? -(uint64_t) small : (uint64_t) small, small < 0 ? -1 : 1);
+
+    /* a big number, go through its bytes */
+    abs_val = PyNumber_Absolute (val);
+    if (!abs_val)
+        return NULL;
+    n_bits = PyObject_CallMethod (abs_val, "bit_length", NULL);
+    if (!n_bits)
+        goto out;
+    n_bytes = (PyLong_AsSsize_t (n_bits) + 7) / 8;
+    byts = PyObject_CallMethod (abs_val, "to_bytes", "ns", n_bytes, "little");
+    if (!byts)
+        goto out;
+    ret = bs_size_import (PyBytes_AS_STRING (byts), PyBytes_GET_SIZE (byts), -1, overflow < 0 ? -1 : 1);
+
+ out:
+    Py_DECREF (abs_val);
+    Py_XDECREF (n_bits);
+    Py_XDECREF (byts);
+    return ret;
+}
+
+/**
+ * size_to_long: (skip)
+ *
+ * Returns: (transfer full): the number of bytes in @size as a Python int
+ */
+static PyObject* size_to_long (const BSSize size) {
+    int sgn = 0;
+    BSError *error = NULL;
+    uint64_t val = 0;
+    size_t len = 0;
+    char *buf = NULL;
+    PyObject *abs_val = NULL;
+    PyObject *ret = NULL;
+
+    val = bs_size_get_bytes (size, &sgn, &error);
+    if (!error) {
+        if (sgn >= 0)
+            return PyLong_FromUnsignedLongLong (val);
+        if (val <= INT64_MAX)
+            return PyLong_FromLongLong (-(long long) val);
+        abs_val = PyLong_FromUnsignedLongLong (val);
+    } else {
+        /* too big for 64 bits */
+        bs_clear_error (&error);
+        len = bs_size_export (size, NULL, 0, -1, &sgn);
+        buf = PyMem_Malloc (len);
+        if (!buf)
+            return PyErr_NoMemory ();
+        bs_size_export (size, buf, len, -1, NULL);
+        abs_val = PyObject_CallMethod ((PyObject *) &PyLong_Type, "from_bytes", "y#s", buf, (Py_ssize_t) len, "little");
+        PyMem_Free (buf);
+    }
+    if (!abs_val || sgn >= 0)
+        return abs_val;
+
+    ret = PyNumber_Negative (abs_val);
+    Py_DECREF (abs_val);
+    return ret;
+}
+
+static int is_decimal (PyObject *val) {
+    return PyObject_IsInstance (val, decimal_type);
+}
+
+static int is_fraction (PyObject *val) {
+    return PyObject_IsInstance (val, fraction_type);
+}
+
+/**
+ * is_number: (skip)
+ *
+ * Returns: whether @val is an int, float, Decimal or Fraction number (or -1
+ *          with an exception raised)
+ */
+static int is_number (PyObject *val) {
+    int ret = 0;
+
+    if (PyLong_Check (val) || PyFloat_Check (val))
+        return 1;
+    ret = is_decimal (val);
+    if (ret != 0)
+        return ret;
+    return is_fraction (val);
+}
+
+/**
+ * get_u64: (skip)
+ *
+ * Returns: whether @other is an int between 0 and %MAXUINT64 (stored in @val)
+ */
+static bool get_u64 (PyObject *other, uint64_t *val) {
+    if (!PyLong_Check (other))
+        return false;
+    *val = PyLong_AsUnsignedLongLong (other);
+    if (*val == (uint64_t) -1 && PyErr_Occurred ()) {
+        PyErr_Clear ();
+        return false;
+    }
+    return true;
+}
+
+/**
+ * get_i64: (skip)
+ *
+ * Returns: whether @other is an int that fits into int64_t (stored in @val)
+ */
+static bool get_i64 (PyObject *other, int64_t *val) {
+    long long small = 0;
+    int overflow = 0;
+
+    if (!PyLong_Check (other))
+        return false;
+    small = PyLong_AsLongLongAndOverflow (other, &overflow);
+    if (overflow || (small == -1 && PyErr_Occurred ())) {
+        PyErr_Clear ();
+        return false;
+    }
+    *val = (int64_t) small;
+    return true;
+}
+
+/**
+ * get_ratio: (skip)
+ * @num_obj: (out): place for the numerator (a new reference)
+ * @den_obj: (out): place for the (positive) denominator (a new reference)
+ *
+ * Gets the exact value of the int, float, Decimal or Fraction number @val as
+ * a fraction in the same way as _number_to_ratio() in bytesize.py does.
+ *
+ * Returns: whether the fraction was stored in @num_obj and @den_obj or not
+ *          (with an exception raised)
+ */
+static bool get_ratio (PyObject *val, PyObject **num_obj, PyObject **den_obj) {
+    PyObject *dec = NULL;
+    PyObject *repr = NULL;
+    PyObject *ratio = NULL;
+    PyObject *finite = NULL;
+    int is_dec = 0;
+    bool ret = false;
+
+    *num_obj = NULL;
+    *den_obj = NULL;
+
+    if (PyLong_Check (val)) {
+        Py_INCREF (val);
+        *num_obj = val;
+        *den_obj = PyLong_FromLong (1);
+        return *den_obj != NULL;
+    }
+
+    if (PyFloat_Check (val)) {
+        /* floats are taken as their shortest decimal representation */
+        repr = PyObject_Repr (val);
+        if (!repr)
+            return false;
+        dec = PyObject_CallFunctionObjArgs (decimal_type, repr, NULL);
+        Py_DECREF (repr);
+        if (!dec)
+            return false;
+        val = dec;
+        is_dec = 1;
+    } else {
+        is_dec = is_decimal (val);
+        if (is_dec < 0)
+            return false;
+    }
+
+    if (is_dec) {
+        finite = PyObject_CallMethod (val, "is_finite", NULL);
+        if (!finite)
+            goto out;
+        if (!PyObject_IsTrue (finite)) {
+            PyErr_Format (error_clss[BS_ERROR_INVALID_SPEC] ? error_clss[BS_ERROR_INVALID_SPEC] : PyExc_ValueError,
+                          "'%S' is not a valid size", val);
+            goto out;
+        }
+        ratio = PyObject_CallMethod (val, "as_integer_ratio", NULL);
+        if (!ratio)
+            goto out;
+        if (!PyArg_ParseTuple (ratio, "OO", num_obj, den_obj))
+            goto out;
+        Py_INCREF (*num_obj);
+        Py_INCREF (*den_obj);
+    } else {
+        *num_obj = PyObject_GetAttrString (val, "numerator");
+        *den_obj = PyObject_GetAttrString (val, "denominator");
+        if (!*num_obj || !*den_obj)
+            goto out;
+    }
+    ret = true;
+
+ out:
+    if (!ret) {
+        Py_CLEAR (*num_obj);
+        Py_CLEAR (*den_obj);
+    }
+    Py_XDECREF (dec);
+    Py_XDECREF (finite);
+    Py_XDECREF (ratio);
+    return ret;
+}
+
+/**
+ * size_new_from_number: (skip)
+ *
+ * Creates a new BSSize from an int, float, Decimal or Fraction number in the
+ * same way as _number_to_size_struct() in bytesize.py does.
+ *
+ * Returns: (transfer full): the new size or %NULL with an exception raised
+ */
+static BSSize size_new_from_number (PyObject *val) {
+    double dbl = 0.0;
+    PyObject *num_obj = NULL;
+    PyObject *den_obj = NULL;
+    BSSize num = NULL;
+    BSSize den = NULL;
+    BSError *error = NULL;
+    BSSize ret = NULL;
+
+    if (PyLong_Check (val))
+        return size_new_from_long (val);
+
+    if (PyFloat_Check (val)) {
+        dbl = PyFloat_AS_DOUBLE (val);
+        /* floats smaller than 2^53 have the same integer part as their shortest
+           decimal representation */
+        if (-9007199254740992.0 < dbl && dbl < 9007199254740992.0) {
+            ret = bs_size_new_from_double (dbl, &error);
+            if (error)
+                raise_error (error);
+            return ret;
+        }
+    }
+
+    if (!get_ratio (val, &num_obj, &den_obj))
+        return NULL;
+    num = count_temp (size_new_from_long (num_obj));
+    if (!num)
+        goto out;
+    den = count_temp (size_new_from_long (den_obj));
+    if (!den)
+        goto out;
+    ret = bs_size_new_from_rational (num, den, &error);
+    if (error)
+        raise_error (error);
+
+ out:
+    Py_DECREF (num_obj);
+    Py_DECREF (den_obj);
+    bs_size_free (num);
+    bs_size_free (den);
+    return ret;
+}
+
+/**
+ * decimal_from_str: (skip)
+ *
+ * Creates a new Decimal number from the string @num_str (formatted by the
+ * library using the locale's radix character) and frees the string.
+ */
+static PyObject* decimal_from_str (char *num_str) {
+    const char *radix = nl_langinfo (RADIXCHAR);
+    size_t radix_len = strlen (radix);
+    char *src = num_str;
+    char *dst = num_str;
+    PyObject *ret = NULL;
+
+    if (radix_len > 0 && strcmp (radix, ".") != 0) {
+        /* replacing with a single character, so it can be done in place */
+        while (*src) {
+            if (strncmp (src, radix, radix_len) == 0) {
+                *dst++ = '.';
+                src += radix_len;
+            } else
+                *dst++ = *src++;
+        }
+        *dst = '\0';
+    }
+
+    ret = PyObject_CallFunction (decimal_type, "s", num_str);
+    free (num_str);
+    return ret;
+}
+
+/**
+ * fraction_from_sizes: (skip)
+ *
+ * Creates a new Fraction from @num and @den and frees them.
+ */
+static PyObject* fraction_from_sizes (BSSize num, BSSize den) {
+    PyObject *num_obj = NULL;
+    PyObject *den_obj = NULL;
+    PyObject *ret = NULL;
+
+    num_obj = size_to_long (num);
+    den_obj = size_to_long (den);
+    if (num_obj && den_obj)
+        ret = PyObject_CallFunctionObjArgs (fraction_type, num_obj, den_obj, NULL);
+
+    Py_XDECREF (num_obj);
+    Py_XDECREF (den_obj);
+    bs_size_free (num);
+    bs_size_free (den);
+    return ret;
+}
+
+/**
+ * parse_unit: (skip)
+ *
+ * Gets the unit given either as its name or its value.
+ *
+ * Returns: whether the unit was successfully parsed or not (with an exception
+ *          raised)
+ */
+static bool parse_unit (PyObject *unit_obj, BSUnit *unit) {
+    const char *name = NULL;
+    long val = 0;
+
+    if (PyUnicode_Check (unit_obj)) {
+        name = PyUnicode_AsUTF8 (unit_obj);
+        if (!name)
+            return false;
+        for (size_t i = 0; i < N_UNITS; i++)
+            if (strcmp (unit_strs[i].name, name) == 0) {
+                *unit = unit_strs[i].unit;
+                return true;
+            }
+        PyErr_Format (PyExc_ValueError, "Invalid unit specification: '%U'", unit_obj);
+        return false;
+    }
+
+    val = PyLong_AsLong (unit_obj);
+    if (val == -1 && PyErr_Occurred ())
+        return false;
+    unit->bunit = (BSBunit) val;
+    return true;
+}
+
+/**
+ * parse_digits: (skip)
+ *
+ * Gets the number of digits given as an int or None (meaning the default).
+ */
+static bool parse_digits (PyObject *digits_obj, int *digits) {
+    if (!digits_obj || digits_obj == Py_None) {
+        *digits = default_digits;
+        return true;
+    }
+    *digits = PyLong_AsLong (digits_obj);
+    return !(*digits == -1 && PyErr_Occurred ());
+}
+
+
+/* construction and destruction */
+
+static PyObject* Size_new (PyTypeObject *type, PyObject *args __attribute__((unused)),
+                           PyObject *kwds __attribute__((unused))) {
+    SizeObject *self = NULL;
+
+    self = (SizeObject *) type->tp_alloc (type, 0);
+    if (!self)
+        return NULL;
+    /* Size_init() sets the real size, no need to allocate one here */
+    self->size = zero_size;
+
+    return (PyObject *) self;
+}
+
+/**
+ * size_new_from_spec: (skip)
+ *
+ * Creates a new BSSize from anything Size() accepts (a size specification,
+ * Size, number or None).
+ *
+ * Returns: (transfer full): the new size or %NULL with a ValueError (or
+ *                           MemoryError) raised
+ */
+static BSSize size_new_from_spec (PyObject *spec) {
+    const char *spec_str = NULL;
+    BSError *error = NULL;
+    BSSize size = NULL;
+    int number = 0;
+
+    if (PyUnicode_Check (spec)) {
+        spec_str = PyUnicode_AsUTF8 (spec);
+        if (!spec_str)
+            return NULL;
+        size = bs_size_new_from_str (spec_str, &error);
+        if (error)
+            raise_error (error);
+    } else if (Size_Check (spec))
+        size = bs_size_new_from_size (SIZE (spec));
+    else if (spec == Py_None)
+        size = bs_size_new ();
+    else {
+        number = is_number (spec);
+        if (number < 0)
+            return NULL;
+        if (!number) {
+            PyErr_Format (PyExc_ValueError, "Cannot construct new size from '%S'", spec);
+            return NULL;
+        }
+        size = size_new_from_number (spec);
+    }
+
+    if (!size) {
+        if (!PyErr_Occurred ())
+            PyErr_NoMemory ();
+        raise_as_value_error ();
+    }
+    return size;
+}
+
+static int Size_init (SizeObject *self, PyObject *args, PyObject *kwds) {
+    static char *kwlist[] = {"spec", NULL};
+    PyObject *spec = Py_None;
+    BSSize size = NULL;
+
+    if (!PyArg_ParseTupleAndKeywords (args, kwds, "|O:Size", kwlist, &spec))
+        return -1;
+
+    size = size_new_from_spec (spec);
+    if (!size)
+        return -1;
+    size_set (self, size);
+
+    return 0;
+}
+
+static void Size_dealloc (SizeObject *self) {
+    if (self->counted)
+        alloc_count--;
+    if (self->size != zero_size)
+        bs_size_free (self->size);
+    Py_TYPE (self)->tp_free ((PyObject *) self);
+}
+
+
+/* methods */
+
+static PyObject* Size_get_bytes (SizeObject *self, PyObject *Py_UNUSED (ignored)) {
+    return size_to_long (self->size);
+}
+
+static PyObject* Size_convert_to (SizeObject *self, PyObject *args, PyObject *kwds) {
+    static char *kwlist[] = {"unit", "digits", "exact", NULL};
+    PyObject *unit_obj = NULL;
+    PyObject *digits_obj = Py_None;
+    int exact = 0;
+    BSUnit unit;
+    int digits = DIGITS_FULL;
+    BSError *error = NULL;
+    BSSize num = NULL;
+    BSSize den = NULL;
+    double dbl = 0.0;
+    char *str = NULL;
+
+    if (!PyArg_ParseTupleAndKeywords (args, kwds, "O|Op:convert_to", kwlist, &unit_obj, &digits_obj, &exact))
+        return NULL;
+    if (!parse_digits (digits_obj, &digits) || !parse_unit (unit_obj, &unit))
+        return NULL;
+
+    if (exact) {
+        bs_size_convert_to_rational (self->size, unit, &num, &den, &error);
+        if (error)
+            return raise_error (error);
+        return fraction_from_sizes (num, den);
+    }
+
+    if (digits == BS_DIGITS_DOUBLE) {
+        dbl = bs_size_convert_to_double (self->size, unit, &error);
+        if (error)
+            return raise_error (error);
+        return PyFloat_FromDouble (dbl);
+    }
+
+    if (digits == DIGITS_FULL)
+        str = bs_size_convert_to (self->size, unit, &error);
+    else
+        str = bs_size_convert_to_prec (self->size, unit, digits, &error);
+    if (error)
+        return raise_error (error);
+    return decimal_from_str (str);
+}
+
+static PyObject* Size_ratio (SizeObject *self, PyObject *other) {
+    PyObject *other_size = NULL;
+    BSError *error = NULL;
+    BSSize num = NULL;
+    BSSize den = NULL;
+
+    if (Size_Check (other)) {
+        Py_INCREF (other);
+        other_size = other;
+    } else {
+        other_size = PyObject_CallFunctionObjArgs ((PyObject *) &SizeType, other, NULL);
+        if (!other_size)
+            return NULL;
+    }
+
+    bs_size_true_div_rational (self->size, SIZE (other_size), &num, &den, &error);
+    Py_DECREF (other_size);
+    if (error)
+        return raise_error (error);
+    return fraction_from_sizes (num, den);
+}
+
+static PyObject* human_readable (SizeObject *self, BSBunit min_unit, int max_places, bool xlate) {
+    char *str = NULL;
+    PyObject *ret = NULL;
+
+    str = bs_size_human_readable (self->size, min_unit, max_places, xlate);
+    if (!str)
+        return PyErr_NoMemory ();
+    ret = PyUnicode_FromString (str);
+    free (str);
+    return ret;
+}
+
+static PyObject* Size_human_readable (SizeObject *self, PyObject *args, PyObject *kwds) {
+    static char *kwlist[] = {"min_unit", "max_places", "xlate", NULL};
+    PyObject *min_unit_obj = NULL;
+    PyObject *max_places_obj = NULL;
+    int xlate = 1;
+    BSUnit min_unit = {BS_BUNIT_B};
+    long max_places = 2;
+
+    if (!PyArg_ParseTupleAndKeywords (args, kwds, "|OOp:human_readable", kwlist,
+                                      &min_unit_obj, &max_places_obj, &xlate))
+        return NULL;
+    if (min_unit_obj && !parse_unit (min_unit_obj, &min_unit))
+        return NULL;
+    if (max_places_obj) {
+        if (!PyLong_Check (max_places_obj)) {
+            PyErr_SetString (PyExc_ValueError, "max_places has to be an integer number");
+            return NULL;
+        }
+        max_places = PyLong_AsLong (max_places_obj);
+        if (max_places == -1 && PyErr_Occurred ())
+            return NULL;
+    }
+
+    return human_readable (self, min_unit.bunit, (int) max_places, xlate);
+}
+
+/**
+ * find_unit: (skip)
+ *
+ * Finds the unit @unit_obj (a unit value or name) stands for in #unit_strs.
+ *
+ * Returns: index of the unit, -1 if not found and -2 with an exception raised
+ */
+static int find_unit (PyObject *unit_obj) {
+    PyObject *unit_val = NULL;
+    long val = 0;
+    int overflow = 0;
+    int match = 0;
+
+    /* the common cases first */
+    if (PyLong_CheckExact (unit_obj)) {
+        val = PyLong_AsLongAndOverflow (unit_obj, &overflow);
+        if (val == -1 && PyErr_Occurred ())
+            return -2;
+        for (size_t i = 0; i < N_UNITS && !overflow; i++)
+            if (val == unit_strs[i].unit.bunit)
+                return (int) i;
+        return -1;
+    }
+    if (PyUnicode_CheckExact (unit_obj)) {
+        for (size_t i = 0; i < N_UNITS; i++)
+            if (PyUnicode_CompareWithASCIIString (unit_obj, unit_strs[i].name) == 0)
+                return (int) i;
+        if (PyErr_Occurred ())
+            return -2;
+        return -1;
+    }
+
+    /* anything else equal to a unit value or name (like 1.0 for KiB) */
+    for (size_t i = 0; i < N_UNITS; i++) {
+        unit_val = PyLong_FromLong (unit_strs[i].unit.bunit);
+        if (!unit_val)
+            return -2;
+        match = PyObject_RichCompareBool (unit_obj, unit_val, Py_EQ);
+        Py_DECREF (unit_val);
+        if (match == 0) {
+            unit_val = PyUnicode_FromString (unit_strs[i].name);
+            if (!unit_val)
+                return -2;
+            match = PyObject_RichCompareBool (unit_obj, unit_val, Py_EQ);
+            Py_DECREF (unit_val);
+        }
+        if (match < 0)
+            return -2;
+        if (match)
+            return (int) i;
+    }
+    return -1;
+}
+
+static PyObject* Size_round_to_nearest (SizeObject *self, PyObject *args, PyObject *kwds) {
+    static char *kwlist[] = {"round_to", "rounding", NULL};
+    PyObject *round_to = NULL;
+    int rounding = 0;
+    int unit_idx = 0;
+    BSSize ret = NULL;
+    BSError *error = NULL;
+
+    if (!PyArg_ParseTupleAndKeywords (args, kwds, "Oi:round_to_nearest", kwlist, &round_to, &rounding))
+        return NULL;
+
+    if (Size_Check (round_to)) {
+        ret = bs_size_round_to_nearest (self->size, SIZE (round_to), rounding, &error);
+        if (error)
+            return raise_error (error);
+        return size_wrap (ret);
+    }
+
+    /* else it has to be a unit */
+    unit_idx = find_unit (round_to);
+    if (unit_idx == -2)
+        return NULL;
+    if (unit_idx == -1) {
+        PyErr_Format (PyExc_ValueError, "Invalid size specification: '%S'", round_to);
+        return NULL;
+    }
+
+    ret = bs_size_round_to_nearest (self->size, unit_sizes[unit_idx], rounding, &error);
+    if (error)
+        return raise_error (error);
+    return size_wrap (ret);
+}
+
+/**
+ * size_cmp: (skip)
+ *
+ * Compares @self with @other in the same way as Size.cmp() does.
+ *
+ * Returns: -1, 0 or 1, -2 if @other is not supported (without an exception
+ *          raised) and -3 with an exception raised
+ */
+static int size_cmp (SizeObject *self, PyObject *other, bool abs_vals) {
+    uint64_t bytes = 0;
+    int number = 0;
+    int64_t small = 0;
+    BSSize other_size = NULL;
+    int ret = 0;
+
+    if (Size_Check (other))
+        return bs_size_cmp (self->size, SIZE (other), abs_vals);
+    if (other == Py_None)
+        return 1;
+
+    if (PyLong_Check (other)) {
+        if (get_i64 (other, &small))
+            return bs_size_cmp_int64 (self->size, small, abs_vals);
+        if (get_u64 (other, &bytes))
+            return bs_size_cmp_bytes (self->size, bytes, abs_vals);
+    } else {
+        number = is_number (other);
+        if (number < 0)
+            return -3;
+        if (!number)
+            return -2;
+    }
+
+    other_size = count_temp (size_new_from_number (other));
+    if (!other_size)
+        return -3;
+    ret = bs_size_cmp (self->size, other_size, abs_vals);
+    bs_size_free (other_size);
+    return ret;
+}
+
+static PyObject* Size_cmp (SizeObject *self, PyObject *args, PyObject *kwds) {
+    static char *kwlist[] = {"other", "abs_vals", NULL};
+    PyObject *other = NULL;
+    int abs_vals = 0;
+    int ret = 0;
+
+    if (!PyArg_ParseTupleAndKeywords (args, kwds, "O|p:cmp", kwlist, &other, &abs_vals))
+        return NULL;
+
+    ret = size_cmp (self, other, abs_vals);
+    if (ret == -3)
+        return NULL;
+    if (ret == -2) {
+        PyErr_Format (PyExc_TypeError, "Cannot compare Size with '%s'", Py_TYPE (other)->tp_name);
+        return NULL;
+    }
+    return PyLong_FromLong (ret);
+}
+
+static PyObject* Size_deepcopy (SizeObject *self, PyObject *Py_UNUSED (memo)) {
+    return size_wrap (bs_size_new_from_size (self->size));
+}
+
+static PyObject* Size_reduce (SizeObject *self, PyObject *Py_UNUSED (ignored)) {
+    PyObject *bytes = NULL;
+
+    bytes = size_to_long (self->size);
+    if (!bytes)
+        return NULL;
+    return Py_BuildValue ("O(N)", (PyObject *) Py_TYPE (self), bytes);
+}
+
+
+/* protocols */
+
+static PyObject* Size_richcompare (PyObject *self, PyObject *other, int op) {
+    int ret = 0;
+
+    ret = size_cmp ((SizeObject *) self, other, false);
+    if (ret == -3)
+        return NULL;
+    if (ret == -2)
+        Py_RETURN_NOTIMPLEMENTED;
+    Py_RETURN_RICHCOMPARE (ret, 0, op);
+}
+
+static PyObject* Size_repr (SizeObject *self) {
+    PyObject *hr = NULL;
+    PyObject *ret = NULL;
+
+    hr = human_readable (self, BS_BUNIT_B, -1, false);
+    if (!hr)
+        return NULL;
+    ret = PyUnicode_FromFormat ("Size (%U)", hr);
+    Py_DECREF (hr);
+    return ret;
+}
+
+static PyObject* Size_str (SizeObject *self) {
+    return human_readable (self, BS_BUNIT_B, 2, true);
+}
+
+static Py_hash_t Size_hash (SizeObject *self) {
+    PyObject *bytes = NULL;
+    Py_hash_t ret = 0;
+
+    /* the number of bytes, in the same way as for __hash__() returning it */
+    bytes = size_to_long (self->size);
+    if (!bytes)
+        return -1;
+    ret = PyLong_AsSsize_t (bytes);
+    if (ret == -1 && PyErr_Occurred ()) {
+        PyErr_Clear ();
+        ret = PyObject_Hash (bytes);
+    }
+    Py_DECREF (bytes);
+    return ret == -1 ? -2 : ret;
+}
+
+static int Size_bool (SizeObject *self) {
+    return bs_size_sgn (self->size) != 0;
+}
+
+static PyObject* Size_int (SizeObject *self) {
+    return size_to_long (self->size);
+}
+
+static PyObject* Size_float (SizeObject *self) {
+    PyObject *bytes = NULL;
+    PyObject *ret = NULL;
+
+    bytes = size_to_long (self->size);
+    if (!bytes)
+        return NULL;
+    ret = PyNumber_Float (bytes);
+    Py_DECREF (bytes);
+    return ret;
+}
+
+static PyObject* Size_abs (SizeObject *self) {
+    if (bs_size_sgn (self->size) >= 0)
+        return size_wrap (bs_size_new_from_size (self->size));
+    return size_wrap (bs_size_neg (self->size));
+}
+
+static PyObject* Size_neg (SizeObject *self) {
+    return size_wrap (bs_size_neg (self->size));
+}
+
+/**
+ * get_operand: (skip)
+ * @tmp: (out): place for the temporary size created for @other (if any)
+ *
+ * Gets the BSSize for the Size, number or None (treated as Size(0)) @other
+ * for the arithmetic operations. Only numbers need a new (temporary) size
+ * which is returned in @tmp to be freed by the caller.
+ *
+ * Returns: (transfer none): the size, %NULL with no exception raised if
+ *                           @other is not supported
+ */
+static BSSize get_operand (PyObject *other, BSSize *tmp) {
+    int number = 0;
+
+    *tmp = NULL;
+    if (Size_Check (other))
+        return SIZE (other);
+    if (other == Py_None)
+        return zero_size;
+    number = is_number (other);
+    if (number <= 0)
+        return NULL;
+    *tmp = count_temp (size_new_from_number (other));
+    return *tmp;
+}
+
+static PyObject* Size_add (PyObject *left, PyObject *right) {
+    SizeObject *self = NULL;
+    PyObject *other = NULL;
+    BSSize other_size = NULL;
+    BSSize tmp = NULL;
+    uint64_t bytes = 0;
+    int64_t small = 0;
+    BSSize ret = NULL;
+
+    /* addition is commutative so 'other + size' is the same as 'size + other' */
+    if (Size_Check (left)) {
+        self = (SizeObject *) left;
+        other = right;
+    } else {
+        self = (SizeObject *) right;
+        other = left;
+    }
+
+    if (get_u64 (other, &bytes))
+        return size_wrap (bs_size_add_bytes (self->size, bytes));
+    /* negative (the non-negative ones are handled above) */
+    if (get_i64 (other, &small))
+        return size_wrap (bs_size_sub_bytes (self->size, -(uint64_t) small));
+    if (Size_Check (other))
+        return size_wrap (bs_size_add (self->size, SIZE (other)));
+
+    other_size = get_operand (other, &tmp);
+    if (!other_size) {
+        if (PyErr_Occurred ())
+            return NULL;
+        Py_RETURN_NOTIMPLEMENTED;
+    }
+    ret = bs_size_add (self->size, other_size);
+    bs_size_free (tmp);
+    return size_wrap (ret);
+}
+
+static PyObject* Size_sub (PyObject *left, PyObject *right) {
+    BSSize other_size = NULL;
+    BSSize tmp = NULL;
+    const char *other_str = NULL;
+    PyObject *str = NULL;
+    BSError *error = NULL;
+    uint64_t bytes = 0;
+    int64_t small = 0;
+    BSSize ret = NULL;
+
+    if (Size_Check (left)) {
+        if (get_u64 (right, &bytes))
+            return size_wrap (bs_size_sub_bytes (SIZE (left), bytes));
+        if (get_i64 (right, &small))
+            return size_wrap (bs_size_add_bytes (SIZE (left), -(uint64_t) small));
+        if (Size_Check (right))
+            return size_wrap (bs_size_sub (SIZE (left), SIZE (right)));
+
+        other_size = get_operand (right, &tmp);
+        if (!other_size) {
+            if (PyErr_Occurred ())
+                return NULL;
+            Py_RETURN_NOTIMPLEMENTED;
+        }
+        ret = bs_size_sub (SIZE (left), other_size);
+        bs_size_free (tmp);
+        return size_wrap (ret);
+    }
+
+    /* 'other - size', anything else than a number is parsed as a size spec */
+    if (get_u64 (left, &bytes))
+        return size_wrap (bs_size_sub_from_bytes (SIZE (right), bytes));
+    other_size = get_operand (left, &tmp);
+    if (!other_size) {
+        if (PyErr_Occurred ())
+            return NULL;
+        str = PyObject_Str (left);
+        if (!str)
+            return NULL;
+        other_str = PyUnicode_AsUTF8 (str);
+        if (!other_str) {
+            Py_DECREF (str);
+            return NULL;
+        }
+        tmp = other_size = count_temp (bs_size_new_from_str (other_str, &error));
+        Py_DECREF (str);
+        if (error)
+            return raise_error (error);
+    }
+    ret = bs_size_sub (other_size, SIZE (right));
+    bs_size_free (tmp);
+    return size_wrap (ret);
+}
+
+/**
+ * mul_number: (skip)
+ * @inverse: whether to multiply by 1/@other instead
+ *
+ * Multiplies @size by the int, float, Decimal or Fraction number @other (or
+ * its inverse) exactly, truncating the result towards zero.
+ */
+static PyObject* mul_number (const BSSize size, PyObject *other, bool inverse) {
+    PyObject *num_obj = NULL;
+    PyObject *den_obj = NULL;
+    BSSize num = NULL;
+    BSSize den = NULL;
+    BSError *error = NULL;
+    BSSize ret = NULL;
+
+    if (!get_ratio (other, inverse ? &den_obj : &num_obj, inverse ? &num_obj : &den_obj))
+        return NULL;
+    num = count_temp (size_new_from_long (num_obj));
+    if (num)
+        den = count_temp (size_new_from_long (den_obj));
+    if (den)
+        ret = bs_size_mul_rational (size, num, den, &error);
+
+    Py_DECREF (num_obj);
+    Py_DECREF (den_obj);
+    bs_size_free (num);
+    bs_size_free (den);
+    if (error)
+        return raise_error (error);
+    return ret ? size_wrap (ret) : NULL;
+}
+
+static PyObject* Size_mul (PyObject *left, PyObject *right) {
+    PyObject *self = NULL;
+    PyObject *other = NULL;
+    uint64_t times = 0;
+    int64_t small = 0;
+    int number = 0;
+
+    if (Size_Check (left)) {
+        self = left;
+        other = right;
+    } else {
+        self = right;
+        other = left;
+    }
+
+    /* None is treated as Size(0) */
+    if (other == Py_None || Size_Check (other)) {
+        PyErr_SetString (PyExc_ValueError, "Cannot multiply Size by Size. It just doesn't make sense.");
+        return NULL;
+    }
+    if (get_u64 (other, &times))
+        return size_wrap (bs_size_mul_int (SIZE (self), times));
+    if (get_i64 (other, &small))
+        return size_wrap (bs_size_mul_int64 (SIZE (self), small));
+
+    number = is_number (other);
+    if (number < 0)
+        return NULL;
+    if (!number) {
+        /* not NotImplemented, Size would be used as the count for sequences */
+        PyErr_Format (PyExc_TypeError, "Cannot multiply Size by '%s'", Py_TYPE (other)->tp_name);
+        return NULL;
+    }
+    return mul_number (SIZE (self), other, false);
+}
+
+/**
+ * get_divisor: (skip)
+ *
+ * Gets the operand for the division operations, a size in @size_out for Size
+ * and None, @u64 if it's an int that fits into 64 bits or @number_out if it's
+ * any other number (in which case the division is done by multiplying by its
+ * inverse).
+ *
+ * Returns: 1 if @other is supported, 0 if not and -1 with an exception raised
+ */
+static int get_divisor (PyObject *other, BSSize *size_out, bool *number_out, uint64_t *u64) {
+    int number = 0;
+
+    *size_out = NULL;
+    *number_out = false;
+
+    if (Size_Check (other)) {
+        *size_out = SIZE (other);
+        return 1;
+    }
+    if (other == Py_None) {
+        *size_out = zero_size;
+        return 1;
+    }
+    if (get_u64 (other, u64))
+        return 1;
+
+    number = is_number (other);
+    if (number > 0)
+        *number_out = true;
+    return number;
+}
+
+/**
+ * div_number: (skip)
+ *
+ * Divides @size by the number @other (@divisor if it fits into 64 bits)
+ * truncating the result towards zero.
+ */
+static PyObject* div_number (const BSSize size, PyObject *other, bool number, uint64_t divisor) {
+    BSError *error = NULL;
+    BSSize ret = NULL;
+
+    if (number)
+        return mul_number (size, other, true);
+
+    ret = bs_size_div_int (size, divisor, &error);
+    if (!error)
+        return size_wrap (ret);
+    if (error->code != BS_ERROR_OVER)
+        return raise_error (error);
+
+    /* divisor bigger than ULONG_MAX */
+    bs_clear_error (&error);
+    return mul_number (size, other, true);
+}
+
+static PyObject* Size_true_divide (PyObject *left, PyObject *right) {
+    BSSize other = NULL;
+    bool number = false;
+    uint64_t divisor = 0;
+    BSError *error = NULL;
+    char *str = NULL;
+    double dbl = 0.0;
+    int supported = 0;
+
+    if (!Size_Check (left))
+        Py_RETURN_NOTIMPLEMENTED;
+
+    supported = get_divisor (right, &other, &number, &divisor);
+    if (supported < 0)
+        return NULL;
+    if (!supported)
+        Py_RETURN_NOTIMPLEMENTED;
+
+    /* dividing by a number gives a Size */
+    if (!other)
+        return div_number (SIZE (left), right, number, divisor);
+
+    if (default_digits == BS_DIGITS_DOUBLE) {
+        dbl = bs_size_true_div_double (SIZE (left), other, &error);
+        if (error)
+            return raise_error (error);
+        return PyFloat_FromDouble (dbl);
+    }
+
+    if (default_digits == DIGITS_FULL)
+        str = bs_size_true_div (SIZE (left), other, &error);
+    else
+        str = bs_size_true_div_prec (SIZE (left), other, default_digits, &error);
+    if (error)
+        return raise_error (error);
+    return decimal_from_str (str);
+}
+
+/**
+ * safe_floordiv: (skip)
+ *
+ * Returns: the (int) result of @size // @other
+ */
+static PyObject* safe_floordiv (const BSSize size, const BSSize other) {
+    int sgn = 0;
+    uint64_t val = 0;
+    BSError *error = NULL;
+    PyObject *ret = NULL;
+    BSSize quot = NULL;
+
+    val = bs_size_div (size, other, &sgn, &error);
+    if (!error) {
+        ret = PyLong_FromUnsignedLongLong (val);
+        if (ret && sgn < 0) {
+            Py_SETREF (ret, PyNumber_Negative (ret));
+        }
+        return ret;
+    }
+    if (error->code != BS_ERROR_OVER)
+        return raise_error (error);
+    bs_clear_error (&error);
+
+    /* doesn't fit into 64 bits, get it as a size (truncated in the same way) */
+    quot = count_temp (bs_size_new_from_rational (size, other, &error));
+    if (error)
+        return raise_error (error);
+    ret = size_to_long (quot);
+    bs_size_free (quot);
+    return ret;
+}
+
+static PyObject* Size_floor_divide (PyObject *left, PyObject *right) {
+    BSSize other = NULL;
+    bool number = false;
+    uint64_t divisor = 0;
+    int supported = 0;
+
+    if (!Size_Check (left))
+        Py_RETURN_NOTIMPLEMENTED;
+
+    supported = get_divisor (right, &other, &number, &divisor);
+    if (supported < 0)
+        return NULL;
+    if (!supported)
+        Py_RETURN_NOTIMPLEMENTED;
+
+    if (other)
+        return safe_floordiv (SIZE (left), other);
+    return div_number (SIZE (left), right, number, divisor);
+}
+
+static PyObject* Size_remainder (PyObject *left, PyObject *right) {
+    BSSize other_size = NULL;
+    BSError *error = NULL;
+    BSSize ret = NULL;
+
+    if (!Size_Check (left))
+        Py_RETURN_NOTIMPLEMENTED;
+
+    if (right == Py_None)
+        other_size = zero_size;
+    else if (!Size_Check (right)) {
+        PyErr_SetString (PyExc_ValueError, "modulo operation only supported between two Size instances");
+        return NULL;
+    }
+
+    ret = bs_size_mod (SIZE (left), other_size ? other_size : SIZE (right), &error);
+    if (error)
+        return raise_error (error);
+    return size_wrap (ret);
+}
+
+static PyObject* Size_divmod (PyObject *left, PyObject *right) {
+    PyObject *rdiv = NULL;
+    PyObject *rmod = NULL;
+
+    if (!Size_Check (left))
+        Py_RETURN_NOTIMPLEMENTED;
+
+    rdiv = Size_floor_divide (left, right);
+    if (!rdiv || rdiv == Py_NotImplemented)
+        return rdiv;
+    if (Size_Check (right) || right == Py_None)
+        rmod = Size_remainder (left, right);
+    else
+        rmod = Size_remainder (left, rdiv);
+    if (!rmod) {
+        Py_DECREF (rdiv);
+        return NULL;
+    }
+
+    return Py_BuildValue ("(NN)", rdiv, rmod);
+}
+
+
+static PyMethodDef Size_methods[] = {
+    {"get_bytes", (PyCFunction) Size_get_bytes, METH_NOARGS, NULL},
+    {"convert_to", (PyCFunction) (void (*) (void)) Size_convert_to, METH_VARARGS | METH_KEYWORDS,
+     "Convert the size to the given unit\n\n"
+     ":param digits: number of significant digits of the result (see\n"
+     "               :func:`set_default_digits` which also gives the default)\n"
+     ":param bool exact: whether to return the exact result as a\n"
+     "                   :class:`~fractions.Fraction` or not\n"
+     ":returns: the size in @unit as a :class:`~decimal.Decimal` number\n"
+     "          (:class:`float` if @digits is :data:`DIGITS_DOUBLE` or\n"
+     "          :class:`~fractions.Fraction` if @exact is ``True``)\n"},
+    {"ratio", (PyCFunction) Size_ratio, METH_O,
+     "Get the exact ratio of this size and the @other size\n\n"
+     ":param other: the size to divide this size by\n"
+     ":type other: :class:`Size`\n"
+     ":rtype: :class:`~fractions.Fraction`\n"},
+    {"human_readable", (PyCFunction) (void (*) (void)) Size_human_readable, METH_VARARGS | METH_KEYWORDS, NULL},
+    {"round_to_nearest", (PyCFunction) (void (*) (void)) Size_round_to_nearest, METH_VARARGS | METH_KEYWORDS, NULL},
+    {"cmp", (PyCFunction) (void (*) (void)) Size_cmp, METH_VARARGS | METH_KEYWORDS, NULL},
+    {"__deepcopy__", (PyCFunction) Size_deepcopy, METH_O, NULL},
+    {"__reduce__", (PyCFunction) Size_reduce, METH_NOARGS, NULL},
+    {NULL, NULL, 0, NULL}
+};
+
+static PyNumberMethods Size_as_number = {
+    .nb_add = Size_add,
+    .nb_subtract = Size_sub,
+    .nb_multiply = Size_mul,
+    .nb_remainder = Size_remainder,
+    .nb_divmod = Size_divmod,
+    .nb_negative = (unaryfunc) Size_neg,
+    .nb_absolute = (unaryfunc) Size_abs,
+    .nb_bool = (inquiry) Size_bool,
+    .nb_int = (unaryfunc) Size_int,
+    .nb_float = (unaryfunc) Size_float,
+    .nb_floor_divide = Size_floor_divide,
+    .nb_true_divide = Size_true_divide,
+    .nb_index = (unaryfunc) Size_int,
+};
+
+static PyTypeObject SizeType = {
+    PyVarObject_HEAD_INIT (NULL, 0)
+    .tp_name = "bytesize.Size",
+    .tp_doc = "Size in bytes",
+    .tp_basicsize = sizeof (SizeObject),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,
+    .tp_new = Size_new,
+    .tp_init = (initproc) Size_init,
+    .tp_dealloc = (destructor) Size_dealloc,
+    .tp_repr = (reprfunc) Size_repr,
+    .tp_str = (reprfunc) Size_str,
+    .tp_hash = (hashfunc) Size_hash,
+    .tp_richcompare = Size_richcompare,
+    .tp_as_number = &Size_as_number,
+    .tp_methods = Size_methods,
+};
+
+
+
+/* SizeAccumulator, a mutable size changed in place by the augmented
+   assignment operators (it uses SizeObject too) */
+
+static PyObject* Accumulator_new (PyTypeObject *type, PyObject *args __attribute__((unused)),
+                                  PyObject *kwds __attribute__((unused))) {
+    SizeObject *self = NULL;
+    BSSize size = NULL;
+
+    self = (SizeObject *) type->tp_alloc (type, 0);
+    if (!self)
+        return NULL;
+    /* unlike Size, this one is modified so it cannot share zero_size */
+    size = bs_size_new ();
+    if (!size) {
+        Py_DECREF (self);
+        return PyErr_NoMemory ();
+    }
+    size_set (self, size);
+
+    return (PyObject *) self;
+}
+
+/**
+ * accumulator_take: (skip)
+ *
+ * Makes @self own the size of the Size @result (which is released) for the
+ * operations that cannot be done in place.
+ *
+ * Returns: (transfer full): @self or %NULL if @result is %NULL
+ */
+static PyObject* accumulator_take (SizeObject *self, PyObject *result) {
+    SizeObject *res = (SizeObject *) result;
+    BSSize size = NULL;
+    bool counted = false;
+
+    if (!result)
+        return NULL;
+    size = self->size;
+    counted = self->counted;
+    self->size = res->size;
+    self->counted = res->counted;
+    res->size = size;
+    res->counted = counted;
+    Py_DECREF (result);
+
+    Py_INCREF (self);
+    return (PyObject *) self;
+}
+
+/**
+ * accumulate: (skip)
+ * @sub: whether to subtract @other instead of adding it
+ *
+ * Adds the Size, number or None (treated as Size(0)) @other to @self in
+ * place.
+ */
+static PyObject* accumulate (SizeObject *self, PyObject *other, bool sub) {
+    BSSize other_size = NULL;
+    BSSize tmp = NULL;
+    uint64_t bytes = 0;
+    int64_t small = 0;
+
+    if (get_u64 (other, &bytes)) {
+        if (sub)
+            bs_size_shrink_bytes (self->size, bytes);
+        else
+            bs_size_grow_bytes (self->size, bytes);
+    } else if (get_i64 (other, &small)) {
+        /* negative (the non-negative ones are handled above) */
+        if (sub)
+            bs_size_grow_bytes (self->size, -(uint64_t) small);
+        else
+            bs_size_shrink_bytes (self->size, -(uint64_t) small);
+    } else {
+        other_size = get_operand (other, &tmp);
+        if (!other_size) {
+            if (PyErr_Occurred ())
+                return NULL;
+            Py_RETURN_NOTIMPLEMENTED;
+        }
+        if (sub)
+            bs_size_shrink (self->size, other_size);
+        else
+            bs_size_grow (self->size, other_size);
+        bs_size_free (tmp);
+    }
+
+    Py_INCREF (self);
+    return (PyObject *) self;
+}
+
+static PyObject* Accumulator_iadd (PyObject *self, PyObject *other) {
+    return accumulate ((SizeObject *) self, other, false);
+}
+
+static PyObject* Accumulator_isub (PyObject *self, PyObject *other) {
+    return accumulate ((SizeObject *) self, other, true);
+}
+
+static PyObject* Accumulator_imul (PyObject *self, PyObject *other) {
+    uint64_t times = 0;
+    int64_t small = 0;
+    int number = 0;
+
+    if (get_u64 (other, &times)) {
+        bs_size_grow_mul_int (SIZE (self), times);
+        Py_INCREF (self);
+        return self;
+    }
+    if (get_i64 (other, &small))
+        return accumulator_take ((SizeObject *) self, size_wrap (bs_size_mul_int64 (SIZE (self), small)));
+
+    number = is_number (other);
+    if (number < 0)
+        return NULL;
+    if (!number)
+        Py_RETURN_NOTIMPLEMENTED;
+    return accumulator_take ((SizeObject *) self, mul_number (SIZE (self), other, false));
+}
+
+static PyObject* Accumulator_ifloordiv (PyObject *self, PyObject *other) {
+    uint64_t divisor = 0;
+    BSError *error = NULL;
+    int number = 0;
+
+    if (get_u64 (other, &divisor)) {
+        bs_size_shrink_div_int (SIZE (self), divisor, &error);
+        if (!error) {
+            Py_INCREF (self);
+            return self;
+        }
+        if (error->code != BS_ERROR_OVER)
+            return raise_error (error);
+        /* divisor bigger than ULONG_MAX */
+        bs_clear_error (&error);
+    } else {
+        number = is_number (other);
+        if (number < 0)
+            return NULL;
+        if (!number)
+            Py_RETURN_NOTIMPLEMENTED;
+    }
+    return accumulator_take ((SizeObject *) self, mul_number (SIZE (self), other, true));
+}
+
+static PyObject* Accumulator_to_size (SizeObject *self, PyObject *Py_UNUSED (ignored)) {
+    return size_wrap (bs_size_new_from_size (self->size));
+}
+
+static PyObject* Accumulator_repr (SizeObject *self) {
+    PyObject *hr = NULL;
+    PyObject *ret = NULL;
+
+    hr = human_readable (self, BS_BUNIT_B, -1, false);
+    if (!hr)
+        return NULL;
+    ret = PyUnicode_FromFormat ("SizeAccumulator (%U)", hr);
+    Py_DECREF (hr);
+    return ret;
+}
+
+static PyMethodDef Accumulator_methods[] = {
+    {"get_bytes", (PyCFunction) Size_get_bytes, METH_NOARGS, NULL},
+    {"to_size", (PyCFunction) Accumulator_to_size, METH_NOARGS,
+     "Get the current value as a new (immutable) :class:`Size`\n"},
+    {NULL, NULL, 0, NULL}
+};
+
+static PyNumberMethods Accumulator_as_number = {
+    .nb_inplace_add = Accumulator_iadd,
+    .nb_inplace_subtract = Accumulator_isub,
+    .nb_inplace_multiply = Accumulator_imul,
+    .nb_inplace_floor_divide = Accumulator_ifloordiv,
+    .nb_bool = (inquiry) Size_bool,
+    .nb_int = (unaryfunc) Size_int,
+};
+
+static PyTypeObject AccumulatorType = {
+    PyVarObject_HEAD_INIT (NULL, 0)
+    .tp_name = "bytesize.SizeAccumulator",
+    .tp_doc = "Mutable size for accumulating the results of many operations",
+    .tp_basicsize = sizeof (SizeObject),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT,
+    .tp_new = Accumulator_new,
+    .tp_init = (initproc) Size_init,
+    .tp_dealloc = (destructor) Size_dealloc,
+    .tp_repr = (reprfunc) Accumulator_repr,
+    .tp_str = (reprfunc) Size_str,
+    .tp_as_number = &Accumulator_as_number,
+    .tp_methods = Accumulator_methods,
+};
+
+
+/* module functions used by bytesize.py */
+
+static PyObject* set_error_classes (PyObject *module __attribute__((unused)), PyObject *args) {
+    PyObject *base = NULL;
+    PyObject *clss[BS_ERROR_FAIL] = { NULL, NULL, NULL };
+
+    if (!PyArg_ParseTuple (args, "OOOO:_set_error_classes", &base,
+                           &clss[BS_ERROR_INVALID_SPEC], &clss[BS_ERROR_OVER], &clss[BS_ERROR_ZERO_DIV]))
+        return NULL;
+
+    Py_INCREF (base);
+    Py_XSETREF (size_error_cls, base);
+    for (int i = 0; i < BS_ERROR_FAIL; i++) {
+        Py_INCREF (clss[i]);
+        Py_XSETREF (error_clss[i], clss[i]);
+    }
+
+    Py_RETURN_NONE;
+}
+
+static PyObject* set_default_digits (PyObject *module __attribute__((unused)), PyObject *digits) {
+    long val = DIGITS_FULL;
+
+    if (digits != Py_None) {
+        val = PyLong_AsLong (digits);
+        if (val == -1 && PyErr_Occurred ())
+            return NULL;
+    }
+    default_digits = (int) val;
+
+    Py_RETURN_NONE;
+}
+
+static PyObject* set_alloc_debug (PyObject *module __attribute__((unused)), PyObject *enabled) {
+    int val = PyObject_IsTrue (enabled);
+
+    if (val < 0)
+        return NULL;
+    alloc_debug = val;
+
+    Py_RETURN_NONE;
+}
+
+static PyObject* get_alloc_count (PyObject *module __attribute__((unused)), PyObject *Py_UNUSED (ignored)) {
+    return PyLong_FromSsize_t (alloc_count);
+}
+
+static PyObject* get_alloc_total (PyObject *module __attribute__((unused)), PyObject *Py_UNUSED (ignored)) {
+    return PyLong_FromSsize_t (alloc_total);
+}
+
+/**
+ * free_sizes: (skip)
+ *
+ * Frees the array of @sizes from get_sizes() (and the temporary sizes in it)
+ * and releases @seq.
+ */
+static void free_sizes (PyObject *seq, BSSize *sizes, Py_ssize_t n_sizes) {
+    PyObject **items = PySequence_Fast_ITEMS (seq);
+    Py_ssize_t i = 0;
+
+    for (i=0; i < n_sizes; i++)
+        if (sizes[i] && !Size_Check (items[i]))
+            bs_size_free (sizes[i]);
+    PyMem_Free (sizes);
+    Py_DECREF (seq);
+}
+
+/**
+ * get_sizes: (skip)
+ * @seq: (out): place for the sequence of the items of @iterable (a new
+ *              reference, see free_sizes())
+ * @n_sizes: (out): place for the number of the sizes
+ *
+ * Gets the items of @iterable (Size instances or anything Size() accepts) as
+ * an array of BSSize. Only the items that are not Size instances need a new
+ * (temporary) size.
+ *
+ * Returns: (transfer full): the array of sizes to be freed with free_sizes()
+ *                           or %NULL with an exception raised
+ */
+static BSSize* get_sizes (PyObject *iterable, PyObject **seq, Py_ssize_t *n_sizes) {
+    PyObject **items = NULL;
+    BSSize *sizes = NULL;
+    Py_ssize_t i = 0;
+
+    *seq = PySequence_Fast (iterable, "sizes must be iterable");
+    if (!*seq)
+        return NULL;
+    *n_sizes = PySequence_Fast_GET_SIZE (*seq);
+    items = PySequence_Fast_ITEMS (*seq);
+
+    sizes = PyMem_Calloc (*n_sizes ? *n_sizes : 1, sizeof (BSSize));
+    if (!sizes) {
+        Py_CLEAR (*seq);
+        PyErr_NoMemory ();
+        return NULL;
+    }
+
+    for (i=0; i < *n_sizes; i++) {
+        if (Size_Check (items[i]))
+            sizes[i] = SIZE (items[i]);
+        else {
+            sizes[i] = count_temp (size_new_from_spec (items[i]));
+            if (!sizes[i]) {
+                free_sizes (*seq, sizes, *n_sizes);
+                *seq = NULL;
+                return NULL;
+            }
+        }
+    }
+
+    return sizes;
+}
+
+static PyObject* sum_sizes (PyObject *module __attribute__((unused)), PyObject *iterable) {
+    PyObject *seq = NULL;
+    Py_ssize_t n_sizes = 0;
+    BSSize *sizes = NULL;
+    BSSize ret = NULL;
+
+    sizes = get_sizes (iterable, &seq, &n_sizes);
+    if (!sizes)
+        return NULL;
+    ret = bs_size_sum (sizes, n_sizes);
+    free_sizes (seq, sizes, n_sizes);
+
+    return size_wrap (ret);
+}
+
+/**
+ * extreme_size: (skip)
+ * @max: whether to get the biggest size instead of the smallest one
+ */
+static PyObject* extreme_size (PyObject *iterable, bool max) {
+    PyObject *seq = NULL;
+    Py_ssize_t n_sizes = 0;
+    BSSize *sizes = NULL;
+    BSSize ret = NULL;
+
+    sizes = get_sizes (iterable, &seq, &n_sizes);
+    if (!sizes)
+        return NULL;
+    if (n_sizes == 0) {
+        free_sizes (seq, sizes, n_sizes);
+        PyErr_Format (PyExc_ValueError, "%s() arg is an empty iterable", max ? "max_size" : "min_size");
+        return NULL;
+    }
+    ret = max ? bs_size_max (sizes, n_sizes) : bs_size_min (sizes, n_sizes);
+    free_sizes (seq, sizes, n_sizes);
+
+    return size_wrap (ret);
+}
+
+static PyObject* min_size (PyObject *module __attribute__((unused)), PyObject *iterable) {
+    return extreme_size (iterable, false);
+}
+
+static PyObject* max_size (PyObject *module __attribute__((unused)), PyObject *iterable) {
+    return extreme_size (iterable, true);
+}
+
+static PyObject* mean_size (PyObject *module __attribute__((unused)), PyObject *args) {
+    PyObject *iterable = NULL;
+    int rounding = BS_ROUND_DIR_HALF_UP;
+    PyObject *seq = NULL;
+    Py_ssize_t n_sizes = 0;
+    BSSize *sizes = NULL;
+    BSError *error = NULL;
+    BSSize ret = NULL;
+
+    if (!PyArg_ParseTuple (args, "O|i:mean_size", &iterable, &rounding))
+        return NULL;
+
+    sizes = get_sizes (iterable, &seq, &n_sizes);
+    if (!sizes)
+        return NULL;
+    ret = bs_size_mean (sizes, n_sizes, (BSRoundDir) rounding, &error);
+    free_sizes (seq, sizes, n_sizes);
+    if (error)
+        return raise_error (error);
+
+    return size_wrap (ret);
+}
+
+static PyObject* validate_size_str (PyObject *module __attribute__((unused)), PyObject *spec) {
+    const char *spec_str = NULL;
+    BSMagnitude magnitude = BS_MAGNITUDE_INT64;
+    BSErrorInfo error;
+
+    spec_str = PyUnicode_AsUTF8 (spec);
+    if (!spec_str)
+        return NULL;
+
+    /* the current locale like bs_size_new_from_str(), no error objects needed */
+    if (!bs_size_validate_str (spec_str, uselocale ((locale_t) 0), &magnitude, &error))
+        Py_RETURN_NONE;
+
+    return PyLong_FromLong (magnitude);
+}
+
+static PyMethodDef module_methods[] = {
+    {"_set_error_classes", set_error_classes, METH_VARARGS, NULL},
+    {"_set_default_digits", set_default_digits, METH_O, NULL},
+    {"_set_alloc_debug", set_alloc_debug, METH_O, NULL},
+    {"_get_alloc_count", get_alloc_count, METH_NOARGS, NULL},
+    {"_get_alloc_total", get_alloc_total, METH_NOARGS, NULL},
+    {"sum_sizes", sum_sizes, METH_O, NULL},
+    {"min_size", min_size, METH_O, NULL},
+    {"max_size", max_size, METH_O, NULL},
+    {"mean_size", mean_size, METH_VARARGS, NULL},
+    {"validate_size_str", validate_size_str, METH_O, NULL},
+    {NULL, NULL, 0, NULL}
+};
+
+static struct PyModuleDef bytesize_module = {
+    PyModuleDef_HEAD_INIT,
+    .m_name = "_bytesize",
+    .m_doc = "Native implementation of the bytesize.Size type",
+    .m_size = -1,
+    .m_methods = module_methods,
+};
+
+static PyObject* import_attr (const char *module_name, const char *attr) {
+    PyObject *module = NULL;
+    PyObject *ret = NULL;
+
+    module = PyImport_ImportModule (module_name);
+    if (!module)
+        return NULL;
+    ret = PyObject_GetAttrString (module, attr);
+    Py_DECREF (module);
+    return ret;
+}
+
+PyMODINIT_FUNC PyInit__bytesize (void) {
+    PyObject *module = NULL;
+
+    decimal_type = import_attr ("decimal", "Decimal");
+    if (!decimal_type)
+        return NULL;
+    fraction_type = import_attr ("fractions", "Fraction");
+    if (!fraction_type)
+        return NULL;
+
+    if (PyType_Ready (&SizeType) < 0)
+        return NULL;
+    if (PyType_Ready (&AccumulatorType) < 0)
+        return NULL;
+
+    if (!zero_size) {
+        zero_size = bs_size_new ();
+        if (!zero_size)
+            return PyErr_NoMemory ();
+    }
+    for (size_t i = 0; i < N_UNITS && !unit_sizes[i]; i++) {
+        bool decimal = unit_strs[i].unit.dunit >= BS_DUNIT_B;
+        int power = decimal ? unit_strs[i].unit.dunit - BS_DUNIT_B : unit_strs[i].unit.bunit;
+
+        unit_sizes[i] = bs_size_new_from_bytes (1, 1);
+        if (!unit_sizes[i])
+            return PyErr_NoMemory ();
+        for (int j = 0; j < power; j++)
+            bs_size_grow_mul_int (unit_sizes[i], decimal ? 1000 : 1024);
+    }
+
+    module = PyModule_Create (&bytesize_module);
+    if (!module)
+        return NULL;
+
+    Py_INCREF (&SizeType);
+    if (PyModule_AddObject (module, "Size", (PyObject *) &SizeType) < 0) {
+        Py_DECREF (&SizeType);
+        Py_DECREF (module);
+        return NULL;
+    }
+    Py_INCREF (&AccumulatorType);
+    if (PyModule_AddObject (module, "SizeAccumulator", (PyObject *) &AccumulatorType) < 0) {
+        Py_DECREF (&AccumulatorType);
+        Py_DECREF (module);
+        return NULL;
+    }
+
+    return module;
+}
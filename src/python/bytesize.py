@@ -1,7 +1,15 @@
 import ctypes
 from ctypes import POINTER, byref
 
+import builtins
+import os
+import re
+import sys
+import threading
+
+from collections import OrderedDict
 from decimal import Decimal
+from fractions import Fraction
 
 import locale
 
@@ -21,6 +29,15 @@ in Python.
 
 c_bytesize = ctypes.CDLL("libbytesize.so.1")
 
+# strings returned by libbytesize need to be freed with the C library's free()
+_c_free = ctypes.CDLL(None).free
+_c_free.restype = None
+_c_free.argtypes = [ctypes.c_void_p]
+
+_c_uselocale = ctypes.CDLL(None).uselocale
+_c_uselocale.restype = ctypes.c_void_p
+_c_uselocale.argtypes = [ctypes.c_void_p]
+
 B = 0
 KiB = 1
 MiB = 2
@@ -43,8 +60,21 @@ ROUND_UP = 0
 ROUND_DOWN = 1
 ROUND_HALF_UP = 2
 
+# results of the batch functions of SizeStruct for the individual elements
+BATCH_OK = 0
+BATCH_INVALID_SPEC = 1
+BATCH_OVER = 2
+
+# magnitude classes of sizes (see validate_size_str())
+MAGNITUDE_INT64 = 0
+MAGNITUDE_UINT64 = 1
+MAGNITUDE_BIG = 2
+
 MAXUINT64 = 2**64 - 1
 
+# compute with doubles instead of the full precision (see set_default_digits())
+DIGITS_DOUBLE = 0
+
 unit_strs = {
     "B": B, "KiB": KiB, "MiB": MiB, "GiB": GiB, "TiB": TiB, "PiB": PiB, "EiB": EiB, "ZiB": ZiB, "YiB": YiB,
     "KB": KB, "MB": MB, "GB": GB, "TB": TB, "PB": PB, "EB": EB, "ZB": ZB, "YB": YB,
@@ -55,10 +85,36 @@ def unit_str(unit, xlate=False):
         if u == unit:
             return _(u_str) if xlate else u_str
 
+_DUNIT_B = 20
+
+def _unit_pow(unit):
+    if isinstance(unit, int):
+        if B <= unit <= YiB:
+            return 1024 ** unit
+        if _DUNIT_B <= unit <= YB:
+            return 1000 ** (unit - _DUNIT_B)
+    raise InvalidSpecError("Invalid unit spec given")
+
+# the units by both their values and names
+_units_by_spec = dict(unit_strs)
+_units_by_spec.update((unit, unit) for unit in unit_strs.values())
+
+def _round_to_unit(round_to):
+    """Get the unit @round_to (not a Size) stands for as the argument of
+    round_to_nearest()"""
+    try:
+        return _units_by_spec[round_to]
+    except (KeyError, TypeError):
+        raise ValueError("Invalid size specification: '%s'"  % round_to)
+
 class SizeErrorStruct(ctypes.Structure):
     _fields_ = [("code", ctypes.c_int),
                 ("msg", ctypes.c_char_p)]
 
+class SizeErrorInfoStruct(ctypes.Structure):
+    _fields_ = [("code", ctypes.c_int),
+                ("msg", ctypes.c_char_p)]
+
 class SizeError(Exception):
     pass
 
@@ -81,14 +137,189 @@ def get_error(err):
     c_bytesize.bs_clear_error(byref(err))
     raise ex
 
+def get_error_info(err):
+    """Raise the error reported to the SizeErrorInfoStruct @err"""
+    raise _error_code_clss[err.code](str(err.msg, "utf-8"))
+
+# allocation accounting (see set_alloc_debug())
+_alloc_debug = os.environ.get("LIBBYTESIZE_DEBUG_ALLOC", "") not in ("", "0")
+_alloc_lock = threading.Lock()
+_alloc_counts = {"sizes": 0, "strings": 0, "size_allocs": 0}
+
+def set_alloc_debug(enabled):
+    """Enable or disable counting of the objects allocated by libbytesize
+
+    When enabled (also possible by setting the ``LIBBYTESIZE_DEBUG_ALLOC``
+    environment variable), the bindings count the ``BSSize`` instances and C
+    strings they own so that tests can check that nothing leaks and how many
+    allocations operations need, see :func:`get_alloc_counts`. Only objects
+    allocated while enabled are counted.
+
+    """
+    global _alloc_debug
+    _alloc_debug = bool(enabled)
+    if _bytesize is not None:
+        _bytesize._set_alloc_debug(_alloc_debug)
+
+def get_alloc_counts():
+    """Get the numbers of live ``BSSize`` instances and C strings
+
+    :returns: a dictionary with the ``"sizes"`` and ``"strings"`` counts of
+              objects allocated by libbytesize and not freed yet and the
+              ``"size_allocs"`` count of all the ``BSSize`` instances
+              allocated so far (including the temporary ones)
+    :rtype: dict
+
+    """
+    with _alloc_lock:
+        counts = dict(_alloc_counts)
+    if _bytesize is not None:
+        counts["sizes"] += _bytesize._get_alloc_count()
+        counts["size_allocs"] += _bytesize._get_alloc_total()
+    return counts
+
+def _count_alloc(kind, delta):
+    with _alloc_lock:
+        _alloc_counts[kind] += delta
+
+def _take_size(ptr):
+    """Take ownership of a newly allocated BSSize instance"""
+    ret = ptr.contents
+    if _alloc_debug:
+        with _alloc_lock:
+            _alloc_counts["sizes"] += 1
+            _alloc_counts["size_allocs"] += 1
+        ret._counted = True
+    return ret
+
+def _size_array(sizes):
+    """Get the SizeStruct instances in @sizes as a C array"""
+    # an array of addresses is much faster to create than one of pointer()
+    # objects, the caller keeps the sizes alive while the array is used
+    arr = (ctypes.c_void_p * len(sizes))(*map(ctypes.addressof, sizes))
+    return ctypes.cast(arr, POINTER(POINTER(SizeStruct)))
+
+def _parse_batch(fn, c_type, strs, loc):
+    """Parse @strs with the batch function @fn into a list of @c_type numbers
+    and a list of the statuses"""
+    n_strs = len(strs)
+    results = (c_type * n_strs)()
+    statuses = (ctypes.c_int * n_strs)()
+    # None entries are passed as NULL, reported as BATCH_INVALID_SPEC
+    c_strs = (ctypes.c_char_p * n_strs)(*(None if s is None else bytes(s, "utf-8") for s in strs))
+    fn(c_strs, n_strs, loc, results, statuses)
+    return (list(results), list(statuses))
+
+def _take_c_str(ret, func, args):
+    """Take a newly allocated string returned by @func and free it
+
+    Used as the 'errcheck' function of the functions returning strings that
+    need to be freed by the caller. Returns the string as bytes (like with the
+    ctypes.c_char_p return type).
+
+    """
+    if ret is None:
+        return None
+    counted = _alloc_debug
+    if counted:
+        _count_alloc("strings", 1)
+    try:
+        return ctypes.string_at(ret)
+    finally:
+        _c_free(ret)
+        if counted:
+            _count_alloc("strings", -1)
+
+# number of significant digits used by Size.convert_to() and Size / Size,
+# None means the full precision of the library
+_default_digits = None
+
+def set_default_digits(digits):
+    """Set the default precision of :meth:`Size.convert_to` and ``Size / Size``
+
+    :param digits: number of significant digits of the results, ``None`` for
+                   the full precision (the default) or :data:`DIGITS_DOUBLE`
+                   to compute with doubles (fast, but only double precision)
+    :type digits: int or None
+
+    With :data:`DIGITS_DOUBLE`, the results are :class:`float` instead of
+    :class:`~decimal.Decimal` numbers.
+
+    """
+    global _default_digits
+    if digits is not None and (not isinstance(digits, int) or digits < 0):
+        raise ValueError("digits has to be a non-negative integer number or None")
+    _default_digits = digits
+    if _bytesize is not None:
+        _bytesize._set_default_digits(digits)
+
+def get_default_digits():
+    """Get the default precision of :meth:`Size.convert_to` and ``Size / Size``
+
+    See :func:`set_default_digits`.
+
+    """
+    return _default_digits
+
+def set_batch_threads(n_threads):
+    """Set how many threads the batch functions of libbytesize may use
+
+    :param n_threads: maximum number of threads to split big batches across,
+                      ``0`` for the number of online CPUs (the default is 1)
+    :type n_threads: int
+
+    The batch functions (:meth:`SizeStruct.parse_int64_batch`,...) run without
+    the GIL held, so other Python threads keep running while the (possibly
+    multiple) threads of libbytesize process a batch. The results are the same
+    no matter how many threads are used.
+
+    """
+    if not isinstance(n_threads, int) or not 0 <= n_threads <= 2**32 - 1:
+        raise ValueError("n_threads has to be a non-negative integer number")
+    c_bytesize.bs_set_batch_threads(n_threads)
+
+def get_batch_threads():
+    """Get how many threads the batch functions of libbytesize may use
+
+    See :func:`set_batch_threads`.
+
+    """
+    return c_bytesize.bs_get_batch_threads()
+
+# size of the buffer big sizes are exported to first
+_EXPORT_BUF_LEN = 32
+
+# initial size of the per-thread buffers the *_buf functions write to
+_STR_BUF_LEN = 256
+_str_bufs = threading.local()
+
+def _get_buf_str(fn, args, err=None):
+    """Call the *_buf function @fn with @args and return the string it wrote
+
+    The buffer is reused by all calls from the same thread and only grows if
+    a longer string is needed.
+
+    """
+    buf = getattr(_str_bufs, "buf", None)
+    if buf is None:
+        buf = _str_bufs.buf = ctypes.create_string_buffer(_STR_BUF_LEN)
+    err_args = (byref(err),) if err is not None else ()
+    ret = fn(*args, buf, len(buf), *err_args)
+    if ret >= len(buf):
+        buf = _str_bufs.buf = ctypes.create_string_buffer(ret + 1)
+        ret = fn(*args, buf, len(buf), *err_args)
+    if ret < 0:
+        return None
+    return str(buf.value, "utf-8")
+
 class SizeStruct(ctypes.Structure):
     @classmethod
     def new(cls):
-        return c_bytesize.bs_size_new().contents
+        return _take_size(c_bytesize.bs_size_new())
 
     @classmethod
     def new_from_bytes(cls, byts, sgn):
-        return c_bytesize.bs_size_new_from_bytes(byts, sgn).contents
+        return _take_size(c_bytesize.bs_size_new_from_bytes(byts, sgn))
 
     @classmethod
     def new_from_str(cls, s):
@@ -96,11 +327,136 @@ class SizeStruct(ctypes.Structure):
         s = bytes(s, "utf-8")
         ret = c_bytesize.bs_size_new_from_str(s, byref(err))
         get_error(err)
-        return ret.contents
+        return _take_size(ret)
+
+    @classmethod
+    def new_from_str_l(cls, s, loc):
+        err = POINTER(SizeErrorStruct)()
+        s = bytes(s, "utf-8")
+        ret = c_bytesize.bs_size_new_from_str_l(s, loc, byref(err))
+        get_error(err)
+        return _take_size(ret)
+
+    @classmethod
+    def validate_str(cls, s, loc=None):
+        err = SizeErrorInfoStruct()
+        magnitude = ctypes.c_int()
+        if c_bytesize.bs_size_validate_str(bytes(s, "utf-8"), loc, byref(magnitude), byref(err)):
+            return (magnitude.value, None)
+        return (None, str(err.msg, "utf-8"))
+
+    @classmethod
+    def parse_u64(cls, s, loc=None):
+        err = SizeErrorInfoStruct()
+        ret = ctypes.c_uint64()
+        if not c_bytesize.bs_parse_u64(bytes(s, "utf-8"), loc, byref(ret), byref(err)):
+            get_error_info(err)
+        return ret.value
+
+    @classmethod
+    def parse_i64(cls, s, loc=None):
+        err = SizeErrorInfoStruct()
+        ret = ctypes.c_int64()
+        if not c_bytesize.bs_parse_i64(bytes(s, "utf-8"), loc, byref(ret), byref(err)):
+            get_error_info(err)
+        return ret.value
+
+    @classmethod
+    def format_u64_human(cls, byts, min_unit, max_places, loc=None):
+        return _get_buf_str(c_bytesize.bs_format_u64_human, (byts, min_unit, max_places, loc))
+
+    @classmethod
+    def convert_u64(cls, byts, unit):
+        err = SizeErrorInfoStruct()
+        ret = c_bytesize.bs_convert_u64(byts, unit, byref(err))
+        if err.msg:
+            get_error_info(err)
+        return ret
+
+    @classmethod
+    def round_u64(cls, byts, round_to, dir):
+        err = SizeErrorInfoStruct()
+        ret = ctypes.c_uint64()
+        if not c_bytesize.bs_round_u64(byts, round_to, dir, byref(ret), byref(err)):
+            get_error_info(err)
+        return ret.value
 
     @classmethod
     def new_from_size(cls, sz):
-        return c_bytesize.bs_size_new_from_size(sz).contents
+        return _take_size(c_bytesize.bs_size_new_from_size(sz))
+
+    @classmethod
+    def new_from_double(cls, d):
+        err = POINTER(SizeErrorStruct)()
+        ret = c_bytesize.bs_size_new_from_double(d, byref(err))
+        get_error(err)
+        return _take_size(ret)
+
+    @classmethod
+    def new_from_rational(cls, num, den):
+        err = POINTER(SizeErrorStruct)()
+        ret = c_bytesize.bs_size_new_from_rational(num, den, byref(err))
+        get_error(err)
+        return _take_size(ret)
+
+    @classmethod
+    def import_bytes(cls, byts, sgn):
+        return _take_size(c_bytesize.bs_size_import(byts, len(byts), -1, sgn))
+
+    @classmethod
+    def sum(cls, sizes):
+        return _take_size(c_bytesize.bs_size_sum(_size_array(sizes), len(sizes)))
+
+    @classmethod
+    def min(cls, sizes):
+        ret = c_bytesize.bs_size_min(_size_array(sizes), len(sizes))
+        return _take_size(ret) if ret else None
+
+    @classmethod
+    def max(cls, sizes):
+        ret = c_bytesize.bs_size_max(_size_array(sizes), len(sizes))
+        return _take_size(ret) if ret else None
+
+    @classmethod
+    def mean(cls, sizes, dir):
+        err = POINTER(SizeErrorStruct)()
+        ret = c_bytesize.bs_size_mean(_size_array(sizes), len(sizes), dir, byref(err))
+        get_error(err)
+        return _take_size(ret)
+
+    @classmethod
+    def parse_int64_batch(cls, strs, loc=None):
+        return _parse_batch(c_bytesize.bs_size_parse_int64_batch, ctypes.c_int64, strs, loc)
+
+    @classmethod
+    def parse_uint64_batch(cls, strs, loc=None):
+        return _parse_batch(c_bytesize.bs_size_parse_uint64_batch, ctypes.c_uint64, strs, loc)
+
+    @classmethod
+    def human_readable_batch(cls, sizes, min_unit, max_places, loc=None):
+        arr = _size_array(sizes)
+        buf_len = 32 * len(sizes)
+        while True:
+            buf = ctypes.create_string_buffer(buf_len)
+            total = c_bytesize.bs_size_human_readable_batch(arr, len(sizes), min_unit, max_places, loc, buf, buf_len, None)
+            if total <= buf_len:
+                break
+            buf_len = total
+        return [s.decode("utf-8") for s in buf.raw[:total].split(b"\0")[:-1]]
+
+    @classmethod
+    def convert_to_double_batch(cls, sizes, unit):
+        err = POINTER(SizeErrorStruct)()
+        results = (ctypes.c_double * len(sizes))()
+        c_bytesize.bs_size_convert_to_double_batch(_size_array(sizes), len(sizes), unit, results, byref(err))
+        get_error(err)
+        return list(results)
+
+    @classmethod
+    def round_to_nearest_batch(cls, sizes, round_to, dir):
+        err = POINTER(SizeErrorStruct)()
+        c_bytesize.bs_size_round_to_nearest_batch(_size_array(sizes), len(sizes), round_to, dir, byref(err))
+        get_error(err)
 
     def __del__(self):
         # XXX: For some reason c_bytesize may be None here (probably when python
@@ -108,6 +464,8 @@ class SizeStruct(ctypes.Structure):
         #      stage. Let's just prevent ignored exceptions from happening.
         if c_bytesize:
             c_bytesize.bs_size_free(self)
+            if getattr(self, "_counted", False):
+                _count_alloc("sizes", -1)
 
     def get_bytes(self):
         sgn = ctypes.c_int(0)
@@ -117,13 +475,23 @@ class SizeStruct(ctypes.Structure):
         return (ret, sgn.value)
 
     def get_bytes_str(self):
-        return str(c_bytesize.bs_size_get_bytes_str(self), "utf-8")
+        return _get_buf_str(c_bytesize.bs_size_get_bytes_str_buf, (self,))
+
+    def export_bytes(self):
+        """Get the absolute value (as little-endian bytes) and the sign"""
+        sgn = ctypes.c_int(0)
+        buf = ctypes.create_string_buffer(_EXPORT_BUF_LEN)
+        ret = c_bytesize.bs_size_export(self, buf, len(buf), -1, byref(sgn))
+        if ret > len(buf):
+            buf = ctypes.create_string_buffer(ret)
+            c_bytesize.bs_size_export(self, buf, len(buf), -1, None)
+        return (buf.raw[:ret], sgn.value)
 
     def add(self, sz):
-        return c_bytesize.bs_size_add(self, sz).contents
+        return _take_size(c_bytesize.bs_size_add(self, sz))
 
     def add_bytes(self, b):
-        return c_bytesize.bs_size_add_bytes(self, b).contents
+        return _take_size(c_bytesize.bs_size_add_bytes(self, b))
 
     def grow(self, sz):
         c_bytesize.bs_size_grow(self, sz)
@@ -134,10 +502,10 @@ class SizeStruct(ctypes.Structure):
         return self
 
     def sub(self, sz):
-        return c_bytesize.bs_size_sub(self, sz).contents
+        return _take_size(c_bytesize.bs_size_sub(self, sz))
 
     def sub_bytes(self, b):
-        return c_bytesize.bs_size_sub_bytes(self, b).contents
+        return _take_size(c_bytesize.bs_size_sub_bytes(self, b))
 
     def shrink(self, sz):
         c_bytesize.bs_size_shrink(self, sz)
@@ -147,19 +515,44 @@ class SizeStruct(ctypes.Structure):
         c_bytesize.bs_size_shrink_bytes(self, b)
         return self
 
+    def sub_from_bytes(self, b):
+        return _take_size(c_bytesize.bs_size_sub_from_bytes(self, b))
+
+    def neg(self):
+        return _take_size(c_bytesize.bs_size_neg(self))
+
     def cmp(self, sz, ign_sgn):
         return c_bytesize.bs_size_cmp(self, sz, ign_sgn)
 
     def cmp_bytes(self, b, ign_sgn):
         return c_bytesize.bs_size_cmp_bytes(self, b, ign_sgn)
 
-    def convert_to(self, unit):
+    def cmp_int64(self, i, ign_sgn):
+        return c_bytesize.bs_size_cmp_int64(self, i, ign_sgn)
+
+    def convert_to(self, unit, digits=None):
         err = POINTER(SizeErrorStruct)()
-        ret = c_bytesize.bs_size_convert_to(self, unit, byref(err))
+        if digits is None:
+            ret = _get_buf_str(c_bytesize.bs_size_convert_to_buf, (self, unit), err)
+        else:
+            ret = _get_buf_str(c_bytesize.bs_size_convert_to_prec_buf, (self, unit, digits), err)
+        get_error(err)
+        return ret
+
+    def convert_to_double(self, unit):
+        err = POINTER(SizeErrorStruct)()
+        ret = c_bytesize.bs_size_convert_to_double(self, unit, byref(err))
         get_error(err)
-        ret = str(ret, "utf-8")
         return ret
 
+    def convert_to_rational(self, unit):
+        num = POINTER(SizeStruct)()
+        den = POINTER(SizeStruct)()
+        err = POINTER(SizeErrorStruct)()
+        c_bytesize.bs_size_convert_to_rational(self, unit, byref(num), byref(den), byref(err))
+        get_error(err)
+        return (_take_size(num), _take_size(den))
+
     def div(self, sz):
         sgn = ctypes.c_int(0)
         err = POINTER(SizeErrorStruct)()
@@ -171,7 +564,7 @@ class SizeStruct(ctypes.Structure):
         err = POINTER(SizeErrorStruct)()
         ret = c_bytesize.bs_size_div_int(self, div, byref(err))
         get_error(err)
-        return ret.contents
+        return _take_size(ret)
 
     def shrink_div_int(self, div):
         err = POINTER(SizeErrorStruct)()
@@ -180,42 +573,82 @@ class SizeStruct(ctypes.Structure):
         return self
 
     def human_readable(self, min_unit, max_places, xlate):
-        return str(c_bytesize.bs_size_human_readable(self, min_unit, max_places, xlate), "utf-8")
+        return _get_buf_str(c_bytesize.bs_size_human_readable_buf, (self, min_unit, max_places, xlate))
+
+    def human_readable_l(self, min_unit, max_places, loc):
+        return _get_buf_str(c_bytesize.bs_size_human_readable_buf_l, (self, min_unit, max_places, loc))
 
     def sgn(self):
         return c_bytesize.bs_size_sgn(self)
 
-    def true_div(self, sz):
+    def true_div(self, sz, digits=None):
         err = POINTER(SizeErrorStruct)()
-        ret = c_bytesize.bs_size_true_div(self, sz, byref(err))
+        if digits is None:
+            ret = _get_buf_str(c_bytesize.bs_size_true_div_buf, (self, sz), err)
+        else:
+            ret = _get_buf_str(c_bytesize.bs_size_true_div_prec_buf, (self, sz, digits), err)
         get_error(err)
-        ret = str(ret, "utf-8")
         return ret
 
-    def true_div_int(self, div):
+    def true_div_int(self, div, digits=None):
         err = POINTER(SizeErrorStruct)()
-        ret = c_bytesize.bs_size_true_div_int(self, div, byref(err))
+        if digits is None:
+            ret = _get_buf_str(c_bytesize.bs_size_true_div_int_buf, (self, div), err)
+        else:
+            ret = _get_buf_str(c_bytesize.bs_size_true_div_int_prec_buf, (self, div, digits), err)
+        get_error(err)
+        return ret
+
+    def true_div_double(self, sz):
+        err = POINTER(SizeErrorStruct)()
+        ret = c_bytesize.bs_size_true_div_double(self, sz, byref(err))
         get_error(err)
-        ret = str(ret, "utf-8")
         return ret
 
+    def true_div_int_double(self, div):
+        err = POINTER(SizeErrorStruct)()
+        ret = c_bytesize.bs_size_true_div_int_double(self, div, byref(err))
+        get_error(err)
+        return ret
+
+    def true_div_rational(self, sz):
+        num = POINTER(SizeStruct)()
+        den = POINTER(SizeStruct)()
+        err = POINTER(SizeErrorStruct)()
+        c_bytesize.bs_size_true_div_rational(self, sz, byref(num), byref(den), byref(err))
+        get_error(err)
+        return (_take_size(num), _take_size(den))
+
     def mod(self, sz):
         err = POINTER(SizeErrorStruct)()
         ret = c_bytesize.bs_size_mod(self, sz, byref(err))
         get_error(err)
-        return ret.contents
+        return _take_size(ret)
+
+    def mul_float_str(self, fl_str, digits=None):
+        err = POINTER(SizeErrorStruct)()
+        fl_str = bytes(fl_str, "utf-8")
+        if digits is None:
+            ret = c_bytesize.bs_size_mul_float_str(self, fl_str, byref(err))
+        else:
+            ret = c_bytesize.bs_size_mul_float_str_prec(self, fl_str, digits, byref(err))
+        get_error(err)
+        return _take_size(ret)
 
-    def mul_float_str(self, fl_str):
+    def mul_float_str_l(self, fl_str, loc):
         err = POINTER(SizeErrorStruct)()
         fl_str = bytes(fl_str, "utf-8")
-        ret = c_bytesize.bs_size_mul_float_str(self, fl_str, byref(err))
+        ret = c_bytesize.bs_size_mul_float_str_l(self, fl_str, loc, byref(err))
         get_error(err)
-        return ret.contents
+        return _take_size(ret)
 
-    def grow_mul_float_str(self, fl_str):
+    def grow_mul_float_str(self, fl_str, digits=None):
         err = POINTER(SizeErrorStruct)()
         fl_str = bytes(fl_str, "utf-8")
-        c_bytesize.bs_size_grow_mul_float_str(self, fl_str, byref(err))
+        if digits is None:
+            c_bytesize.bs_size_grow_mul_float_str(self, fl_str, byref(err))
+        else:
+            c_bytesize.bs_size_grow_mul_float_str_prec(self, fl_str, digits, byref(err))
         get_error(err)
         return self
 
@@ -223,7 +656,7 @@ class SizeStruct(ctypes.Structure):
         err = POINTER(SizeErrorStruct)()
         ret = c_bytesize.bs_size_mul_int(self, i)
         get_error(err)
-        return ret.contents
+        return _take_size(ret)
 
     def grow_mul_int(self, i):
         err = POINTER(SizeErrorStruct)()
@@ -231,11 +664,20 @@ class SizeStruct(ctypes.Structure):
         get_error(err)
         return self
 
+    def mul_int64(self, i):
+        return _take_size(c_bytesize.bs_size_mul_int64(self, i))
+
+    def mul_rational(self, num, den):
+        err = POINTER(SizeErrorStruct)()
+        ret = c_bytesize.bs_size_mul_rational(self, num, den, byref(err))
+        get_error(err)
+        return _take_size(ret)
+
     def round_to_nearest(self, sz, dir):
         err = POINTER(SizeErrorStruct)()
         ret = c_bytesize.bs_size_round_to_nearest(self, sz, dir, byref(err))
         get_error(err)
-        return ret.contents
+        return _take_size(ret)
 
     def __repr__(self):
         return "Size (%s)" % self.human_readable(B, -1, False)
@@ -247,8 +689,22 @@ c_bytesize.bs_size_new_from_bytes.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_new_from_bytes.argtypes = [ctypes.c_ulonglong, ctypes.c_int]
 c_bytesize.bs_size_new_from_str.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_new_from_str.argtypes = [ctypes.c_char_p, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_new_from_str_l.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_new_from_str_l.argtypes = [ctypes.c_char_p, ctypes.c_void_p, POINTER(POINTER(SizeErrorStruct))]
 c_bytesize.bs_size_new_from_size.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_new_from_size.argtypes = [POINTER(SizeStruct)]
+c_bytesize.bs_size_new_from_double.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_new_from_double.argtypes = [ctypes.c_double, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_new_from_rational.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_new_from_rational.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_import.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_import.argtypes = [ctypes.c_char_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int]
+
+## Validation
+c_bytesize.bs_size_validate_str.restype = ctypes.c_bool
+c_bytesize.bs_size_validate_str.argtypes = [ctypes.c_char_p, ctypes.c_void_p, POINTER(ctypes.c_int), POINTER(SizeErrorInfoStruct)]
+c_bytesize.bs_get_last_error_info.restype = POINTER(SizeErrorInfoStruct)
+c_bytesize.bs_get_last_error_info.argtypes = []
 
 ## Destructors
 c_bytesize.bs_size_free.restype = None
@@ -261,12 +717,37 @@ c_bytesize.bs_size_get_bytes.restype = ctypes.c_ulonglong
 c_bytesize.bs_size_get_bytes.argtypes = [POINTER(SizeStruct), POINTER(ctypes.c_int), POINTER(POINTER(SizeErrorStruct))]
 c_bytesize.bs_size_sgn.restype = ctypes.c_int
 c_bytesize.bs_size_sgn.argtypes = [POINTER(SizeStruct)]
-c_bytesize.bs_size_get_bytes_str.restype = ctypes.c_char_p
+c_bytesize.bs_size_get_bytes_str.restype = ctypes.c_void_p
+c_bytesize.bs_size_get_bytes_str.errcheck = _take_c_str
 c_bytesize.bs_size_get_bytes_str.argtypes = [POINTER(SizeStruct)]
-c_bytesize.bs_size_convert_to.restype = ctypes.c_char_p
+c_bytesize.bs_size_convert_to.restype = ctypes.c_void_p
+c_bytesize.bs_size_convert_to.errcheck = _take_c_str
 c_bytesize.bs_size_convert_to.argtypes = [POINTER(SizeStruct), ctypes.c_int, POINTER(POINTER(SizeErrorStruct))]
-c_bytesize.bs_size_human_readable.restype = ctypes.c_char_p
+c_bytesize.bs_size_human_readable.restype = ctypes.c_void_p
+c_bytesize.bs_size_human_readable.errcheck = _take_c_str
 c_bytesize.bs_size_human_readable.argtypes = [POINTER(SizeStruct), ctypes.c_int, ctypes.c_int, ctypes.c_bool]
+c_bytesize.bs_size_export.restype = ctypes.c_size_t
+c_bytesize.bs_size_export.argtypes = [POINTER(SizeStruct), ctypes.c_char_p, ctypes.c_size_t, ctypes.c_int, POINTER(ctypes.c_int)]
+c_bytesize.bs_size_get_bytes_str_buf.restype = ctypes.c_int
+c_bytesize.bs_size_get_bytes_str_buf.argtypes = [POINTER(SizeStruct), ctypes.c_char_p, ctypes.c_size_t]
+c_bytesize.bs_size_convert_to_buf.restype = ctypes.c_int
+c_bytesize.bs_size_convert_to_buf.argtypes = [POINTER(SizeStruct), ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_human_readable_buf.restype = ctypes.c_int
+c_bytesize.bs_size_human_readable_buf.argtypes = [POINTER(SizeStruct), ctypes.c_int, ctypes.c_int, ctypes.c_bool, ctypes.c_char_p, ctypes.c_size_t]
+c_bytesize.bs_size_human_readable_l.restype = ctypes.c_void_p
+c_bytesize.bs_size_human_readable_l.errcheck = _take_c_str
+c_bytesize.bs_size_human_readable_l.argtypes = [POINTER(SizeStruct), ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+c_bytesize.bs_size_human_readable_buf_l.restype = ctypes.c_int
+c_bytesize.bs_size_human_readable_buf_l.argtypes = [POINTER(SizeStruct), ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t]
+c_bytesize.bs_size_convert_to_prec.restype = ctypes.c_void_p
+c_bytesize.bs_size_convert_to_prec.errcheck = _take_c_str
+c_bytesize.bs_size_convert_to_prec.argtypes = [POINTER(SizeStruct), ctypes.c_int, ctypes.c_int, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_convert_to_prec_buf.restype = ctypes.c_int
+c_bytesize.bs_size_convert_to_prec_buf.argtypes = [POINTER(SizeStruct), ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_convert_to_double.restype = ctypes.c_double
+c_bytesize.bs_size_convert_to_double.argtypes = [POINTER(SizeStruct), ctypes.c_int, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_convert_to_rational.restype = ctypes.c_bool
+c_bytesize.bs_size_convert_to_rational.argtypes = [POINTER(SizeStruct), ctypes.c_int, POINTER(POINTER(SizeStruct)), POINTER(POINTER(SizeStruct)), POINTER(POINTER(SizeErrorStruct))]
 
 ## Arithmetic
 c_bytesize.bs_size_add.restype = POINTER(SizeStruct)
@@ -285,24 +766,60 @@ c_bytesize.bs_size_sub_bytes.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_sub_bytes.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong]
 c_bytesize.bs_size_shrink_bytes.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_shrink_bytes.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong]
+c_bytesize.bs_size_sub_from_bytes.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_sub_from_bytes.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong]
+c_bytesize.bs_size_neg.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_neg.argtypes = [POINTER(SizeStruct)]
 c_bytesize.bs_size_mul_int.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_mul_int.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong]
 c_bytesize.bs_size_grow_mul_int.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_grow_mul_int.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong]
+c_bytesize.bs_size_mul_int64.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_mul_int64.argtypes = [POINTER(SizeStruct), ctypes.c_longlong]
+c_bytesize.bs_size_mul_rational.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_mul_rational.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), POINTER(SizeStruct), POINTER(POINTER(SizeErrorStruct))]
 c_bytesize.bs_size_mul_float_str.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_mul_float_str.argtypes = [POINTER(SizeStruct), ctypes.c_char_p, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_mul_float_str_l.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_mul_float_str_l.argtypes = [POINTER(SizeStruct), ctypes.c_char_p, ctypes.c_void_p, POINTER(POINTER(SizeErrorStruct))]
 c_bytesize.bs_size_grow_mul_float_str.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_grow_mul_float_str.argtypes = [POINTER(SizeStruct), ctypes.c_char_p, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_mul_float_str_prec.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_mul_float_str_prec.argtypes = [POINTER(SizeStruct), ctypes.c_char_p, ctypes.c_int, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_grow_mul_float_str_prec.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_grow_mul_float_str_prec.argtypes = [POINTER(SizeStruct), ctypes.c_char_p, ctypes.c_int, POINTER(POINTER(SizeErrorStruct))]
 c_bytesize.bs_size_div.restype = ctypes.c_ulonglong
 c_bytesize.bs_size_div.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), POINTER(ctypes.c_int), POINTER(POINTER(SizeErrorStruct))]
 c_bytesize.bs_size_div_int.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_div_int.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong, POINTER(POINTER(SizeErrorStruct))]
 c_bytesize.bs_size_shrink_div_int.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_shrink_div_int.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong, POINTER(POINTER(SizeErrorStruct))]
-c_bytesize.bs_size_true_div.restype = ctypes.c_char_p
+c_bytesize.bs_size_true_div.restype = ctypes.c_void_p
+c_bytesize.bs_size_true_div.errcheck = _take_c_str
 c_bytesize.bs_size_true_div.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), POINTER(POINTER(SizeErrorStruct))]
-c_bytesize.bs_size_true_div_int.restype = ctypes.c_char_p
+c_bytesize.bs_size_true_div_int.restype = ctypes.c_void_p
+c_bytesize.bs_size_true_div_int.errcheck = _take_c_str
 c_bytesize.bs_size_true_div_int.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_true_div_buf.restype = ctypes.c_int
+c_bytesize.bs_size_true_div_buf.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), ctypes.c_char_p, ctypes.c_size_t, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_true_div_int_buf.restype = ctypes.c_int
+c_bytesize.bs_size_true_div_int_buf.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong, ctypes.c_char_p, ctypes.c_size_t, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_true_div_prec.restype = ctypes.c_void_p
+c_bytesize.bs_size_true_div_prec.errcheck = _take_c_str
+c_bytesize.bs_size_true_div_prec.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), ctypes.c_int, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_true_div_int_prec.restype = ctypes.c_void_p
+c_bytesize.bs_size_true_div_int_prec.errcheck = _take_c_str
+c_bytesize.bs_size_true_div_int_prec.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong, ctypes.c_int, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_true_div_prec_buf.restype = ctypes.c_int
+c_bytesize.bs_size_true_div_prec_buf.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_true_div_int_prec_buf.restype = ctypes.c_int
+c_bytesize.bs_size_true_div_int_prec_buf.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong, ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_true_div_double.restype = ctypes.c_double
+c_bytesize.bs_size_true_div_double.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_true_div_int_double.restype = ctypes.c_double
+c_bytesize.bs_size_true_div_int_double.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_true_div_rational.restype = ctypes.c_bool
+c_bytesize.bs_size_true_div_rational.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), POINTER(POINTER(SizeStruct)), POINTER(POINTER(SizeStruct)), POINTER(POINTER(SizeErrorStruct))]
 c_bytesize.bs_size_mod.restype = POINTER(SizeStruct)
 c_bytesize.bs_size_mod.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), POINTER(POINTER(SizeErrorStruct))]
 c_bytesize.bs_size_round_to_nearest.restype = POINTER(SizeStruct)
@@ -313,6 +830,46 @@ c_bytesize.bs_size_cmp.restype = ctypes.c_int
 c_bytesize.bs_size_cmp.argtypes = [POINTER(SizeStruct), POINTER(SizeStruct), ctypes.c_bool]
 c_bytesize.bs_size_cmp_bytes.restype = ctypes.c_int
 c_bytesize.bs_size_cmp_bytes.argtypes = [POINTER(SizeStruct), ctypes.c_ulonglong, ctypes.c_bool]
+c_bytesize.bs_size_cmp_int64.restype = ctypes.c_int
+c_bytesize.bs_size_cmp_int64.argtypes = [POINTER(SizeStruct), ctypes.c_longlong, ctypes.c_bool]
+
+## Reductions
+c_bytesize.bs_size_sum.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_sum.argtypes = [POINTER(POINTER(SizeStruct)), ctypes.c_size_t]
+c_bytesize.bs_size_min.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_min.argtypes = [POINTER(POINTER(SizeStruct)), ctypes.c_size_t]
+c_bytesize.bs_size_max.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_max.argtypes = [POINTER(POINTER(SizeStruct)), ctypes.c_size_t]
+c_bytesize.bs_size_mean.restype = POINTER(SizeStruct)
+c_bytesize.bs_size_mean.argtypes = [POINTER(POINTER(SizeStruct)), ctypes.c_size_t, ctypes.c_int, POINTER(POINTER(SizeErrorStruct))]
+
+## Batch functions
+c_bytesize.bs_size_parse_int64_batch.restype = ctypes.c_size_t
+c_bytesize.bs_size_parse_int64_batch.argtypes = [POINTER(ctypes.c_char_p), ctypes.c_size_t, ctypes.c_void_p, POINTER(ctypes.c_int64), POINTER(ctypes.c_int)]
+c_bytesize.bs_size_parse_uint64_batch.restype = ctypes.c_size_t
+c_bytesize.bs_size_parse_uint64_batch.argtypes = [POINTER(ctypes.c_char_p), ctypes.c_size_t, ctypes.c_void_p, POINTER(ctypes.c_uint64), POINTER(ctypes.c_int)]
+c_bytesize.bs_size_human_readable_batch.restype = ctypes.c_size_t
+c_bytesize.bs_size_human_readable_batch.argtypes = [POINTER(POINTER(SizeStruct)), ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t, POINTER(ctypes.c_size_t)]
+c_bytesize.bs_size_convert_to_double_batch.restype = ctypes.c_bool
+c_bytesize.bs_size_convert_to_double_batch.argtypes = [POINTER(POINTER(SizeStruct)), ctypes.c_size_t, ctypes.c_int, POINTER(ctypes.c_double), POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_size_round_to_nearest_batch.restype = ctypes.c_bool
+c_bytesize.bs_size_round_to_nearest_batch.argtypes = [POINTER(POINTER(SizeStruct)), ctypes.c_size_t, POINTER(SizeStruct), ctypes.c_int, POINTER(POINTER(SizeErrorStruct))]
+c_bytesize.bs_set_batch_threads.restype = None
+c_bytesize.bs_set_batch_threads.argtypes = [ctypes.c_uint]
+c_bytesize.bs_get_batch_threads.restype = ctypes.c_uint
+c_bytesize.bs_get_batch_threads.argtypes = []
+
+## Scalar functions
+c_bytesize.bs_parse_u64.restype = ctypes.c_bool
+c_bytesize.bs_parse_u64.argtypes = [ctypes.c_char_p, ctypes.c_void_p, POINTER(ctypes.c_uint64), POINTER(SizeErrorInfoStruct)]
+c_bytesize.bs_parse_i64.restype = ctypes.c_bool
+c_bytesize.bs_parse_i64.argtypes = [ctypes.c_char_p, ctypes.c_void_p, POINTER(ctypes.c_int64), POINTER(SizeErrorInfoStruct)]
+c_bytesize.bs_format_u64_human.restype = ctypes.c_int
+c_bytesize.bs_format_u64_human.argtypes = [ctypes.c_uint64, ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t]
+c_bytesize.bs_convert_u64.restype = ctypes.c_double
+c_bytesize.bs_convert_u64.argtypes = [ctypes.c_uint64, ctypes.c_int, POINTER(SizeErrorInfoStruct)]
+c_bytesize.bs_round_u64.restype = ctypes.c_bool
+c_bytesize.bs_round_u64.argtypes = [ctypes.c_uint64, ctypes.c_uint64, ctypes.c_int, POINTER(ctypes.c_uint64), POINTER(SizeErrorInfoStruct)]
 
 
 def _str_to_decimal(num_str):
@@ -322,60 +879,383 @@ def _str_to_decimal(num_str):
 
     return Decimal(num_str)
 
+_object_new = object.__new__
+
+# floats smaller than this have the same integer part as their shortest decimal
+# representation
+_MAX_EXACT_FLOAT = 2.0**53
+
+_MIN_INT64 = -2**63
+
+def _number_to_ratio(val):
+    """Get the exact value of the int, float, Decimal or Fraction number @val
+    as a (numerator, denominator) pair
+
+    Floats are treated as their shortest decimal representation (what
+    :func:`repr` gives).
+
+    """
+    if isinstance(val, int):
+        return (int(val), 1)
+    if isinstance(val, Fraction):
+        return (val.numerator, val.denominator)
+    if isinstance(val, float):
+        val = Decimal(repr(val))
+    if not val.is_finite():
+        raise InvalidSpecError("'%s' is not a valid size" % val)
+    return val.as_integer_ratio()
+
+def _tdiv(num, den):
+    """@num / @den truncated towards zero (like libbytesize does)"""
+    quot = abs(num) // abs(den)
+    return -quot if (num < 0) != (den < 0) else quot
+
+## Parse cache
+# Size(str) can take the numbers of bytes from a bounded LRU cache of the
+# parsed specifications instead of parsing the same ones over and over again
+# (see set_parse_cache_size()). The results depend on the locale (the radix
+# character and the translations of the unit names) so the cache is dropped
+# whenever that changes. The LANGUAGE environment variable is not checked (that
+# would cost more than the parsing itself), call clear_parse_cache() after
+# changing it.
+_parse_cache = OrderedDict()
+_parse_cache_size = 0
+_parse_cache_locale = None
+_parse_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+_parse_cache_lock = threading.Lock()
+
+def _parse_locale():
+    """Get everything the result of parsing a size specification depends on
+    (besides the specification itself)"""
+    return (locale.nl_langinfo(locale.RADIXCHAR), locale.setlocale(locale.LC_MESSAGES))
+
+def set_parse_cache_size(max_size):
+    """Set the maximum number of size specifications cached by :class:`Size`
+
+    :param int max_size: the maximum number of specifications, 0 (the default)
+                         disables the cache
+
+    Only worth it if the same specifications are parsed many times and only
+    used by the pure Python implementation of :class:`Size` (see
+    :func:`set_backend`), the other ones parse the specifications in
+    libbytesize about as fast as they would create the sizes from the cached
+    numbers of bytes.
+
+    """
+    global _parse_cache_size
+    if max_size < 0:
+        raise ValueError("Invalid cache size: %d" % max_size)
+    with _parse_cache_lock:
+        _parse_cache_size = max_size
+        while len(_parse_cache) > max_size:
+            _parse_cache.popitem(last=False)
+            _parse_cache_stats["evictions"] += 1
+
+def get_parse_cache_stats():
+    """Get the statistics of the cache of parsed size specifications
+
+    :returns: numbers of ``"hits"``, ``"misses"``, ``"evictions"`` (to make
+              space for new specifications) and ``"invalidations"`` (because
+              of locale changes) since the last :func:`clear_parse_cache` as
+              well as the current ``"size"`` and ``"max_size"`` of the cache
+    :rtype: dict
+
+    """
+    with _parse_cache_lock:
+        ret = dict(_parse_cache_stats)
+        ret["size"] = len(_parse_cache)
+        ret["max_size"] = _parse_cache_size
+    return ret
+
+def clear_parse_cache():
+    """Drop all the cached size specifications and reset the statistics"""
+    with _parse_cache_lock:
+        _parse_cache.clear()
+        for key in _parse_cache_stats:
+            _parse_cache_stats[key] = 0
+
+def _parse_cache_lookup(spec):
+    """Get the cached number of bytes for @spec (or None) and the locale to
+    store the number with if it's not cached (see _parse_cache_store())"""
+    global _parse_cache_locale
+    loc = _parse_locale()
+    if loc == _parse_cache_locale:
+        # single OrderedDict operations are atomic, no need to lock for the
+        # hits (which makes their count approximate with multiple threads)
+        val = _parse_cache.get(spec)
+        if val is not None:
+            try:
+                _parse_cache.move_to_end(spec)
+            except KeyError:
+                # just dropped by another thread
+                pass
+            _parse_cache_stats["hits"] += 1
+            return (val, loc)
+
+    with _parse_cache_lock:
+        if loc != _parse_cache_locale:
+            if _parse_cache:
+                _parse_cache.clear()
+                _parse_cache_stats["invalidations"] += 1
+            _parse_cache_locale = loc
+        _parse_cache_stats["misses"] += 1
+    return (None, loc)
+
+def _parse_cache_store(spec, loc, val):
+    with _parse_cache_lock:
+        # the locale may have changed in the meantime
+        if loc != _parse_cache_locale or _parse_cache_size == 0:
+            return
+        _parse_cache[spec] = val
+        if len(_parse_cache) > _parse_cache_size:
+            _parse_cache.popitem(last=False)
+            _parse_cache_stats["evictions"] += 1
+
+
+## Size handles
+# Size keeps its BSSize instance as a plain pointer (an int) instead of a
+# SizeStruct instance (which needs its own finalizer and a Python object for
+# the pointer) and frees it itself. The functions it uses are loaded from a
+# separate handle of the library so that their prototypes can take and return
+# the pointers as c_void_p without affecting the SizeStruct API above.
+_c_handles = ctypes.CDLL("libbytesize.so.1")
+_ErrPtr = POINTER(POINTER(SizeErrorStruct))
+_Handle = ctypes.c_void_p
+
+for (_fn_name, _restype, _argtypes) in (
+        ("bs_size_new", _Handle, []),
+        ("bs_size_new_from_bytes", _Handle, [ctypes.c_ulonglong, ctypes.c_int]),
+        ("bs_size_new_from_str", _Handle, [ctypes.c_char_p, _ErrPtr]),
+        ("bs_size_new_from_size", _Handle, [_Handle]),
+        ("bs_size_new_from_double", _Handle, [ctypes.c_double, _ErrPtr]),
+        ("bs_size_new_from_rational", _Handle, [_Handle, _Handle, _ErrPtr]),
+        ("bs_size_import", _Handle, [ctypes.c_char_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int]),
+        ("bs_size_free", None, [_Handle]),
+        ("bs_size_get_bytes", ctypes.c_ulonglong, [_Handle, POINTER(ctypes.c_int), _ErrPtr]),
+        ("bs_size_export", ctypes.c_size_t, [_Handle, ctypes.c_char_p, ctypes.c_size_t, ctypes.c_int, POINTER(ctypes.c_int)]),
+        ("bs_size_convert_to_buf", ctypes.c_int, [_Handle, ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, _ErrPtr]),
+        ("bs_size_convert_to_prec_buf", ctypes.c_int, [_Handle, ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, _ErrPtr]),
+        ("bs_size_convert_to_double", ctypes.c_double, [_Handle, ctypes.c_int, _ErrPtr]),
+        ("bs_size_convert_to_rational", ctypes.c_bool, [_Handle, ctypes.c_int, POINTER(_Handle), POINTER(_Handle), _ErrPtr]),
+        ("bs_size_human_readable_buf", ctypes.c_int, [_Handle, ctypes.c_int, ctypes.c_int, ctypes.c_bool, ctypes.c_char_p, ctypes.c_size_t]),
+        ("bs_size_add", _Handle, [_Handle, _Handle]),
+        ("bs_size_add_bytes", _Handle, [_Handle, ctypes.c_ulonglong]),
+        ("bs_size_sub", _Handle, [_Handle, _Handle]),
+        ("bs_size_sub_bytes", _Handle, [_Handle, ctypes.c_ulonglong]),
+        ("bs_size_sub_from_bytes", _Handle, [_Handle, ctypes.c_ulonglong]),
+        ("bs_size_neg", _Handle, [_Handle]),
+        ("bs_size_mul_int", _Handle, [_Handle, ctypes.c_ulonglong]),
+        ("bs_size_mul_int64", _Handle, [_Handle, ctypes.c_longlong]),
+        ("bs_size_mul_rational", _Handle, [_Handle, _Handle, _Handle, _ErrPtr]),
+        ("bs_size_div", ctypes.c_ulonglong, [_Handle, _Handle, POINTER(ctypes.c_int), _ErrPtr]),
+        ("bs_size_div_int", _Handle, [_Handle, ctypes.c_ulonglong, _ErrPtr]),
+        ("bs_size_true_div_buf", ctypes.c_int, [_Handle, _Handle, ctypes.c_char_p, ctypes.c_size_t, _ErrPtr]),
+        ("bs_size_true_div_prec_buf", ctypes.c_int, [_Handle, _Handle, ctypes.c_int, ctypes.c_char_p, ctypes.c_size_t, _ErrPtr]),
+        ("bs_size_true_div_double", ctypes.c_double, [_Handle, _Handle, _ErrPtr]),
+        ("bs_size_true_div_rational", ctypes.c_bool, [_Handle, _Handle, POINTER(_Handle), POINTER(_Handle), _ErrPtr]),
+        ("bs_size_mod", _Handle, [_Handle, _Handle, _ErrPtr]),
+        ("bs_size_round_to_nearest", _Handle, [_Handle, _Handle, ctypes.c_int, _ErrPtr]),
+        ("bs_size_grow", _Handle, [_Handle, _Handle]),
+        ("bs_size_grow_bytes", _Handle, [_Handle, ctypes.c_ulonglong]),
+        ("bs_size_shrink", _Handle, [_Handle, _Handle]),
+        ("bs_size_shrink_bytes", _Handle, [_Handle, ctypes.c_ulonglong]),
+        ("bs_size_grow_mul_int", _Handle, [_Handle, ctypes.c_ulonglong]),
+        ("bs_size_shrink_div_int", _Handle, [_Handle, ctypes.c_ulonglong, _ErrPtr]),
+        ("bs_size_cmp", ctypes.c_int, [_Handle, _Handle, ctypes.c_bool]),
+        ("bs_size_sgn", ctypes.c_int, [_Handle]),
+        ("bs_size_sum", _Handle, [POINTER(_Handle), ctypes.c_size_t]),
+        ("bs_size_min", _Handle, [POINTER(_Handle), ctypes.c_size_t]),
+        ("bs_size_max", _Handle, [POINTER(_Handle), ctypes.c_size_t]),
+        ("bs_size_mean", _Handle, [POINTER(_Handle), ctypes.c_size_t, ctypes.c_int, _ErrPtr]),
+        ):
+    _fn = getattr(_c_handles, _fn_name)
+    _fn.restype = _restype
+    _fn.argtypes = _argtypes
+del _fn_name, _restype, _argtypes, _fn
+
+_c_size_free = _c_handles.bs_size_free
+
+# handles of the sizes counted by the allocation accounting
+_counted_handles = set()
+
+def _call(fn, *args):
+    """Call @fn with @args and a place for an error and raise the error (if any)"""
+    err = POINTER(SizeErrorStruct)()
+    ret = fn(*args, byref(err))
+    get_error(err)
+    return ret
+
+def _count_size(handle):
+    with _alloc_lock:
+        _alloc_counts["sizes"] += 1
+        _alloc_counts["size_allocs"] += 1
+        _counted_handles.add(handle)
+
+def _adopt(handle):
+    """Create a new Size taking ownership of the BSSize @handle"""
+    ret = _object_new(_CtypesSize)
+    ret._handle = handle
+    ret._bytes = None
+    if _alloc_debug:
+        _count_size(handle)
+    return ret
+
+def _handle_to_int(handle):
+    sgn = ctypes.c_int(2)
+    ret = _c_handles.bs_size_get_bytes(handle, byref(sgn), None)
+    if sgn.value != 2:
+        return ret * sgn.value
+
+    # too big for 64 bits (the sign is not set in such case)
+    buf = ctypes.create_string_buffer(_EXPORT_BUF_LEN)
+    length = _c_handles.bs_size_export(handle, buf, len(buf), -1, byref(sgn))
+    if length > len(buf):
+        buf = ctypes.create_string_buffer(length)
+        _c_handles.bs_size_export(handle, buf, len(buf), -1, None)
+    return int.from_bytes(buf.raw[:length], "little") * sgn.value
+
+def _int_to_handle(val):
+    abs_val = abs(val)
+    sgn = -1 if val < 0 else 1
+    if abs_val <= MAXUINT64:
+        return _c_handles.bs_size_new_from_bytes(abs_val, sgn)
+    byts = abs_val.to_bytes((abs_val.bit_length() + 7) // 8, "little")
+    return _c_handles.bs_size_import(byts, len(byts), -1, sgn)
+
+def _number_to_handle(val):
+    """Create a new BSSize from an int, float, Decimal or Fraction number
+
+    The fractional part of the number is dropped. Floats are treated as their
+    shortest decimal representation (what :func:`repr` gives).
+
+    """
+    if isinstance(val, int):
+        return _int_to_handle(val)
+    if isinstance(val, float) and -_MAX_EXACT_FLOAT < val < _MAX_EXACT_FLOAT:
+        return _call(_c_handles.bs_size_new_from_double, val)
+    num, den = _number_to_ratio(val)
+    num = _adopt(_int_to_handle(num))
+    den = _adopt(_int_to_handle(den))
+    return _call(_c_handles.bs_size_new_from_rational, num._handle, den._handle)
+
+def _rational_handles_to_fraction(fn, *args):
+    """Call @fn with @args and places for the numerator and denominator of the
+    result and return it as a Fraction"""
+    num = _Handle()
+    den = _Handle()
+    _call(fn, *args, byref(num), byref(den))
+    return Fraction(_adopt(num.value).get_bytes(), _adopt(den.value).get_bytes())
+
+def _to_size(val):
+    """Get @val (a Size, SizeStruct or number) as a Size"""
+    if isinstance(val, _CtypesSize):
+        return val
+    if isinstance(val, SizeStruct):
+        return _adopt(_c_handles.bs_size_new_from_size(ctypes.addressof(val)))
+    return _adopt(_number_to_handle(val))
+
 def neutralize_none_operand(fn):
     def fn_with_neutralization(sz, other):
-        return fn(sz, Size(0) if other is None else other)
+        return fn(sz, _ZERO_SIZE if other is None else other)
     return fn_with_neutralization
 
-class Size(object):
+class _CtypesSize(object):
+    __slots__ = ("_handle", "_bytes")
+
     def __init__(self, spec=None):
-        self._c_size = None
+        self._handle = None
+        # the number of bytes, computed on the first use (sizes are immutable)
+        self._bytes = None
         try:
             if isinstance(spec, str):
-                self._c_size = SizeStruct.new_from_str(spec)
+                handle = _call(_c_handles.bs_size_new_from_str, bytes(spec, "utf-8"))
             elif isinstance(spec, int):
-                abs_val = abs(spec)
-                if abs_val == spec:
-                    sgn = 1
-                else:
-                    sgn = -1
-                if abs_val <= MAXUINT64:
-                    self._c_size = SizeStruct.new_from_bytes(abs_val, sgn)
-                else:
-                    self._c_size = SizeStruct.new_from_str(str(spec))
-            elif isinstance(spec, (Decimal, float)):
-                self._c_size = SizeStruct.new_from_str(str(spec))
+                handle = _int_to_handle(spec)
+                self._bytes = int(spec)
+            elif isinstance(spec, (Decimal, float, Fraction)):
+                handle = _number_to_handle(spec)
             elif isinstance(spec, SizeStruct):
-                self._c_size = SizeStruct.new_from_size(spec)
-            elif isinstance(spec, Size):
-                self._c_size = SizeStruct.new_from_size(spec._c_size)
+                handle = _c_handles.bs_size_new_from_size(ctypes.addressof(spec))
+            elif isinstance(spec, _CtypesSize):
+                handle = _c_handles.bs_size_new_from_size(spec._handle)
+                self._bytes = spec._bytes
             elif spec is None:
-                self._c_size = SizeStruct.new()
+                handle = _c_handles.bs_size_new()
+                self._bytes = 0
             else:
                 raise ValueError("Cannot construct new size from '%s'" % spec)
         except SizeError as e:
             raise ValueError(e)
 
+        self._handle = handle
+        if _alloc_debug:
+            _count_size(handle)
+
+    def __del__(self):
+        handle = self._handle
+        # the module may already be torn down when the interpreter exits
+        if handle is None or _c_size_free is None:
+            return
+        self._handle = None
+        _c_size_free(handle)
+        if _counted_handles:
+            with _alloc_lock:
+                if handle in _counted_handles:
+                    _counted_handles.remove(handle)
+                    _alloc_counts["sizes"] -= 1
+
 
     ## METHODS ##
     def get_bytes(self):
-        try:
-            val, sgn = self._c_size.get_bytes()
-            return val * sgn
-        except SizeError:
-            return int(self._c_size.get_bytes_str())
-
-    def convert_to(self, unit):
+        if self._bytes is None:
+            self._bytes = _handle_to_int(self._handle)
+        return self._bytes
+
+    def convert_to(self, unit, digits=None, exact=False):
+        """Convert the size to the given unit
+
+        :param digits: number of significant digits of the result (see
+                       :func:`set_default_digits` which also gives the default)
+        :param bool exact: whether to return the exact result as a
+                           :class:`~fractions.Fraction` or not
+        :returns: the size in @unit as a :class:`~decimal.Decimal` number
+                  (:class:`float` if @digits is :data:`DIGITS_DOUBLE` or
+                  :class:`~fractions.Fraction` if @exact is ``True``)
+
+        """
+        if digits is None:
+            digits = _default_digits
         if isinstance(unit, str):
             real_unit = unit_strs.get(unit)
             if real_unit is None:
                 raise ValueError("Invalid unit specification: '%s'" % unit)
-            ret = self._c_size.convert_to(real_unit)
-        else:
-            ret = self._c_size.convert_to(unit)
+            unit = real_unit
 
+        if exact:
+            return _rational_handles_to_fraction(_c_handles.bs_size_convert_to_rational, self._handle, unit)
+        if digits == DIGITS_DOUBLE:
+            return _call(_c_handles.bs_size_convert_to_double, self._handle, unit)
+
+        err = POINTER(SizeErrorStruct)()
+        if digits is None:
+            ret = _get_buf_str(_c_handles.bs_size_convert_to_buf, (self._handle, unit), err)
+        else:
+            ret = _get_buf_str(_c_handles.bs_size_convert_to_prec_buf, (self._handle, unit, digits), err)
+        get_error(err)
         return _str_to_decimal(ret)
 
+    def ratio(self, other):
+        """Get the exact ratio of this size and the @other size
+
+        :param other: the size to divide this size by
+        :type other: :class:`Size`
+        :rtype: :class:`~fractions.Fraction`
+
+        """
+        if not isinstance(other, _CtypesSize):
+            other = _CtypesSize(other)
+        return _rational_handles_to_fraction(_c_handles.bs_size_true_div_rational, self._handle, other._handle)
+
     def human_readable(self, min_unit=B, max_places=2, xlate=True):
         if isinstance(min_unit, str):
             if min_unit in unit_strs.keys():
@@ -384,58 +1264,64 @@ class Size(object):
                 raise ValueError("Invalid unit specification: '%s'" % min_unit)
         if not isinstance(max_places, int):
             raise ValueError("max_places has to be an integer number")
-        return self._c_size.human_readable(min_unit, max_places, xlate)
+        return _get_buf_str(_c_handles.bs_size_human_readable_buf, (self._handle, min_unit, max_places, xlate))
 
     def round_to_nearest(self, round_to, rounding):
-        if isinstance(round_to, Size):
-            return Size(self._c_size.round_to_nearest(round_to._c_size, rounding))
-
-        size = None
-        # else try to create a SizeStruct instance from it
-        for (unit_str, unit) in unit_strs.items():
-            if round_to in (unit.real, unit_str):
-                size = SizeStruct.new_from_str("1 %s" % unit_str)
-                break
-        if size is not None:
-            return Size(self._c_size.round_to_nearest(size, rounding))
-        else:
-            raise ValueError("Invalid size specification: '%s'"  % round_to)
+        if not isinstance(round_to, _CtypesSize):
+            round_to = _ctypes_unit_sizes[_round_to_unit(round_to)]
+
+        return _adopt(_call(_c_handles.bs_size_round_to_nearest, self._handle, round_to._handle, rounding))
 
     def cmp(self, other, abs_vals=False):
-        if isinstance(other, int):
-            if (other < 0 and abs_vals):
-                other = abs(other)
-            if 0 <= other <= MAXUINT64:
-                return self._c_size.cmp_bytes(other, abs_vals)
-            else:
-                other = SizeStruct.new_from_str(str(other))
-        elif isinstance(other, (Decimal, float)):
-            other = SizeStruct.new_from_str(str(other))
-        elif isinstance(other, Size):
-            other = other._c_size
+        # ints and sizes are compared with the cached numbers of bytes
+        if isinstance(other, _CtypesSize):
+            val1, val2 = self.get_bytes(), other.get_bytes()
+        elif isinstance(other, int):
+            val1, val2 = self.get_bytes(), int(other)
+        elif isinstance(other, (Decimal, float, Fraction, SizeStruct)):
+            other = _to_size(other)
+            return _c_handles.bs_size_cmp(self._handle, other._handle, abs_vals)
         elif other is None:
             return 1
+        else:
+            raise TypeError("Cannot compare Size with '%s'" % type(other).__name__)
 
-        return self._c_size.cmp(other, abs_vals)
+        if abs_vals:
+            val1, val2 = abs(val1), abs(val2)
+        return (val1 > val2) - (val1 < val2)
 
 
     ## INTERNAL METHODS ##
+    # the comparisons of two sizes (used by sorting, sets, dicts,...) go
+    # straight to the numbers of bytes
     def __eq__(self, other):
+        if isinstance(other, _CtypesSize):
+            return self.get_bytes() == other.get_bytes()
         return self.cmp(other, False) == 0
 
     def __ne__(self, other):
+        if isinstance(other, _CtypesSize):
+            return self.get_bytes() != other.get_bytes()
         return self.cmp(other, False) != 0
 
     def __lt__(self, other):
+        if isinstance(other, _CtypesSize):
+            return self.get_bytes() < other.get_bytes()
         return self.cmp(other, False) == -1
 
     def __le__(self, other):
+        if isinstance(other, _CtypesSize):
+            return self.get_bytes() <= other.get_bytes()
         return self.cmp(other, False) in (-1, 0)
 
     def __gt__(self, other):
+        if isinstance(other, _CtypesSize):
+            return self.get_bytes() > other.get_bytes()
         return self.cmp(other, False) == 1
 
     def __ge__(self, other):
+        if isinstance(other, _CtypesSize):
+            return self.get_bytes() >= other.get_bytes()
         return self.cmp(other, False) in (1, 0)
 
     def __bool__(self):
@@ -444,105 +1330,122 @@ class Size(object):
     __nonzero__ = __bool__
 
     def __abs__(self):
-        return Size(abs(self.get_bytes()))
+        if _c_handles.bs_size_sgn(self._handle) < 0:
+            return _adopt(_c_handles.bs_size_neg(self._handle))
+        return _adopt(_c_handles.bs_size_new_from_size(self._handle))
 
     def __neg__(self):
-        return self.__mul__(-1)
+        return _adopt(_c_handles.bs_size_neg(self._handle))
 
     @neutralize_none_operand
     def __add__(self, other):
-        if isinstance(other, int):
-            if other <= MAXUINT64:
-                return Size(self._c_size.add_bytes(other))
-            else:
-                other = SizeStruct.new_from_str(str(other))
-        elif isinstance(other, (Decimal, float)):
-            other = SizeStruct.new_from_str(str(other))
-        elif isinstance(other, Size):
-            other = other._c_size
-        return Size(self._c_size.add(other))
+        if isinstance(other, int) and -MAXUINT64 <= other <= MAXUINT64:
+            if other >= 0:
+                return _adopt(_c_handles.bs_size_add_bytes(self._handle, other))
+            return _adopt(_c_handles.bs_size_sub_bytes(self._handle, -other))
+        # the operand needs to be kept alive during the call
+        other = _to_size(other)
+        return _adopt(_c_handles.bs_size_add(self._handle, other._handle))
 
     # needed to make sum() work with Size arguments
     __radd__ = __add__
 
     @neutralize_none_operand
     def __sub__(self, other):
-        if isinstance(other, int):
-            if other <= MAXUINT64:
-                return Size(self._c_size.sub_bytes(other))
-            else:
-                other = SizeStruct.new_from_str(str(other))
-        elif isinstance(other, (Decimal, float)):
-            other = SizeStruct.new_from_str(str(other))
-        elif isinstance(other, Size):
-            other = other._c_size
-        return Size(self._c_size.sub(other))
+        if isinstance(other, int) and -MAXUINT64 <= other <= MAXUINT64:
+            if other >= 0:
+                return _adopt(_c_handles.bs_size_sub_bytes(self._handle, other))
+            return _adopt(_c_handles.bs_size_add_bytes(self._handle, -other))
+        other = _to_size(other)
+        return _adopt(_c_handles.bs_size_sub(self._handle, other._handle))
 
     @neutralize_none_operand
     def __rsub__(self, other):
-        other = SizeStruct.new_from_str(str(other))
-        return Size(SizeStruct.sub(other, self._c_size))
+        if isinstance(other, int) and 0 <= other <= MAXUINT64:
+            return _adopt(_c_handles.bs_size_sub_from_bytes(self._handle, other))
+        if isinstance(other, (int, Decimal, float, Fraction)):
+            other = _to_size(other)
+        else:
+            other = _adopt(_call(_c_handles.bs_size_new_from_str, bytes(str(other), "utf-8")))
+        return _adopt(_c_handles.bs_size_sub(other._handle, self._handle))
+
+    def _mul_ratio(self, num, den):
+        """Multiply the size by @num / @den (truncating the result towards zero)"""
+        num = _adopt(_int_to_handle(num))
+        den = _adopt(_int_to_handle(den))
+        return _adopt(_call(_c_handles.bs_size_mul_rational, self._handle, num._handle, den._handle))
 
     @neutralize_none_operand
     def __mul__(self, other):
-        if isinstance(other, (Size, SizeStruct)):
+        if isinstance(other, (_CtypesSize, SizeStruct)):
             raise ValueError("Cannot multiply Size by Size. It just doesn't make sense.")
-        elif isinstance(other, (Decimal, float)) or (isinstance(other, int)
-                                                     and other > MAXUINT64 or other < 0):
-            return Size(self._c_size.mul_float_str(str(other)))
-        else:
-            return Size(self._c_size.mul_int(other))
+        if isinstance(other, int):
+            if 0 <= other <= MAXUINT64:
+                return _adopt(_c_handles.bs_size_mul_int(self._handle, other))
+            if _MIN_INT64 <= other < 0:
+                return _adopt(_c_handles.bs_size_mul_int64(self._handle, other))
+            return self._mul_ratio(other, 1)
+        if isinstance(other, (Decimal, float, Fraction)):
+            return self._mul_ratio(*_number_to_ratio(other))
+        # not NotImplemented, Size would be used as the count for sequences
+        raise TypeError("Cannot multiply Size by '%s'" % type(other).__name__)
 
     __rmul__ = __mul__
 
+    def _true_div_str(self, other, digits=None):
+        err = POINTER(SizeErrorStruct)()
+        if digits is None:
+            ret = _get_buf_str(_c_handles.bs_size_true_div_buf, (self._handle, other._handle), err)
+        else:
+            ret = _get_buf_str(_c_handles.bs_size_true_div_prec_buf, (self._handle, other._handle, digits), err)
+        get_error(err)
+        return ret
+
+    def _div_number(self, other):
+        """Divide the size by the number @other (truncating the result towards zero)"""
+        if isinstance(other, int) and 0 <= other <= MAXUINT64:
+            try:
+                return _adopt(_call(_c_handles.bs_size_div_int, self._handle, other))
+            except OverflowError:
+                # divisor bigger than ULONG_MAX
+                pass
+        num, den = _number_to_ratio(other)
+        return self._mul_ratio(den, num)
+
     @neutralize_none_operand
     def __truediv__(self, other):
-        if isinstance(other, int):
-            if other <= MAXUINT64:
-                return Size(self._c_size.true_div_int(other))
-            else:
-                other = SizeStruct.new_from_str(str(other))
-                return Size(self._c_size.true_div(other))
-        elif isinstance(other, (Decimal, float)):
-            return Size(self._c_size.mul_float_str(str(Decimal(1)/Decimal(other))))
+        if isinstance(other, (int, Decimal, float, Fraction)):
+            return self._div_number(other)
 
-        return _str_to_decimal(self._c_size.true_div(other._c_size))
+        if _default_digits == DIGITS_DOUBLE:
+            return _call(_c_handles.bs_size_true_div_double, self._handle, other._handle)
+        return _str_to_decimal(self._true_div_str(other, _default_digits))
 
     def _safe_floordiv(self, other):
+        sgn = ctypes.c_int(0)
         try:
-            val, sgn = self._c_size.div(other._c_size)
-            return val * sgn
-        except OverflowError:
-            return int(float(self._c_size.true_div(other._c_size)))
-
-    def _safe_floordiv_int(self, other):
-        try:
-            return Size(self._c_size.div_int(other))
+            val = _call(_c_handles.bs_size_div, self._handle, other._handle, byref(sgn))
+            return val * sgn.value
         except OverflowError:
-            return Size(float(self._c_size.true_div_int(other)))
+            # doesn't fit into 64 bits
+            return _tdiv(self.get_bytes(), other.get_bytes())
 
     @neutralize_none_operand
     def __floordiv__(self, other):
-        if isinstance(other, (Decimal, float)):
-            return Size(self._c_size.mul_float_str(str(Decimal(1)/Decimal(other))))
-        elif isinstance(other, int):
-            if other <= MAXUINT64:
-                return self._safe_floordiv_int(other)
-            else:
-                other = SizeStruct.new_from_str(str(other))
-                return Size(self._safe_floordiv(other))
+        if isinstance(other, (int, Decimal, float, Fraction)):
+            return self._div_number(other)
         return self._safe_floordiv(other)
 
     @neutralize_none_operand
     def __mod__(self, other):
-        if not isinstance(other, Size):
+        if not isinstance(other, _CtypesSize):
             raise ValueError("modulo operation only supported between two Size instances")
-        return Size(self._c_size.mod(other._c_size))
+        return _adopt(_call(_c_handles.bs_size_mod, self._handle, other._handle))
 
     @neutralize_none_operand
     def __divmod__(self, other):
         rdiv = self.__floordiv__(other)
-        if not isinstance(other, Size):
+        if not isinstance(other, _CtypesSize):
             rmod = self.__mod__(rdiv)
         else:
             rmod = self.__mod__(other)
@@ -565,7 +1468,7 @@ class Size(object):
         return float(self.get_bytes())
 
     def __deepcopy__(self, memo_dict):
-        return Size(self)
+        return _CtypesSize(self)
 
     # pickling support for Size
     # see https://docs.python.org/3/library/pickle.html#object.__reduce__
@@ -574,3 +1477,1164 @@ class Size(object):
 
     def __hash__(self):
         return self.get_bytes()
+
+# used instead of None operands (sizes are immutable so it can be shared)
+_ZERO_SIZE = _CtypesSize(0)
+# used for rounding to units
+_ctypes_unit_sizes = dict((unit, _CtypesSize(_unit_pow(unit))) for unit in unit_strs.values())
+
+_NUMBER_TYPES = (int, Decimal, float, Fraction)
+
+class _CtypesSizeAccumulator(object):
+    """Mutable size for accumulating the results of many operations
+
+    The augmented assignments (``+=``, ``-=``, ``*=`` and ``//=``) change the
+    accumulator in place instead of creating a new :class:`Size` for every
+    step. They take the same operands and give the same results as the
+    corresponding :class:`Size` operations. Use :meth:`to_size` to get the
+    current value as a (new, immutable) :class:`Size`.
+
+    """
+    __slots__ = ("_handle",)
+
+    def __init__(self, spec=None):
+        self._handle = None
+        # take over the BSSize of a new Size (never shared with anything)
+        size = _CtypesSize(spec)
+        self._handle, size._handle = size._handle, None
+
+    __del__ = _CtypesSize.__del__
+
+    def _take(self, size):
+        """Take over the BSSize of the (new) @size for the operations that
+        cannot be done in place"""
+        self._handle, size._handle = size._handle, self._handle
+        return self
+
+    def _accumulate(self, other, sub):
+        if isinstance(other, int) and -MAXUINT64 <= other <= MAXUINT64:
+            if (other >= 0) != sub:
+                _c_handles.bs_size_grow_bytes(self._handle, abs(other))
+            else:
+                _c_handles.bs_size_shrink_bytes(self._handle, abs(other))
+            return self
+        if other is None:
+            other = _ZERO_SIZE
+        elif isinstance(other, _NUMBER_TYPES):
+            # the operand needs to be kept alive during the call
+            other = _to_size(other)
+        elif not isinstance(other, _CtypesSize):
+            return NotImplemented
+        if sub:
+            _c_handles.bs_size_shrink(self._handle, other._handle)
+        else:
+            _c_handles.bs_size_grow(self._handle, other._handle)
+        return self
+
+    def __iadd__(self, other):
+        return self._accumulate(other, False)
+
+    def __isub__(self, other):
+        return self._accumulate(other, True)
+
+    def __imul__(self, other):
+        if isinstance(other, int) and 0 <= other <= MAXUINT64:
+            _c_handles.bs_size_grow_mul_int(self._handle, other)
+            return self
+        if not isinstance(other, _NUMBER_TYPES):
+            return NotImplemented
+        return self._take(self.to_size() * other)
+
+    def __ifloordiv__(self, other):
+        if isinstance(other, int) and 0 <= other <= MAXUINT64:
+            try:
+                _call(_c_handles.bs_size_shrink_div_int, self._handle, other)
+                return self
+            except OverflowError:
+                # divisor bigger than ULONG_MAX
+                pass
+        elif not isinstance(other, _NUMBER_TYPES):
+            return NotImplemented
+        return self._take(self.to_size() // other)
+
+    def to_size(self):
+        """Get the current value as a new (immutable) :class:`Size`"""
+        return _adopt(_c_handles.bs_size_new_from_size(self._handle))
+
+    def get_bytes(self):
+        return _handle_to_int(self._handle)
+
+    def __bool__(self):
+        return _c_handles.bs_size_sgn(self._handle) != 0
+
+    def __int__(self):
+        return self.get_bytes()
+
+    def __repr__(self):
+        return "SizeAccumulator (%s)" % self.to_size().human_readable(B, -1, False)
+
+    def __str__(self):
+        return str(self.to_size())
+
+
+## Pure-Python implementation
+# The "python" backend (see set_backend()) implements Size on top of Python
+# ints without calling libbytesize at all, only the translations of the unit
+# names are taken from the C library's gettext. To give exactly the same
+# results, the parts of libbytesize computing with GMP's floating-point numbers
+# (mpf_t) are emulated here including the truncation GMP does at the level of
+# limbs (of the size used by the GMP libbytesize is linked to). An emulated
+# mpf_t is a (negative, mantissa, size, exponent) tuple standing for
+# mantissa * 2^(_LIMB_BITS * (exponent - size)), size being the number of limbs
+# of the mantissa. The _mpf_*() functions mirror the GMP functions of the same
+# names.
+
+_FLOAT_PREC_BITS = 256
+_BUNIT_UNDEF = 9
+
+def _gmp_limb_bits():
+    """Get the size (in bits) of the limbs of the GMP libbytesize uses"""
+    try:
+        return ctypes.c_int.in_dll(c_bytesize, "__gmp_bits_per_limb").value
+    except ValueError:
+        return 64
+
+_LIMB_BITS = _gmp_limb_bits()
+_MPF_ZERO = (False, 0, 0, 0)
+
+# log10(2) and log2(10)/8 as fixed-point fractions with the precision of a limb
+# (GMP's mp_bases[10])
+_LOGB2_10 = 0x4d104d427de7fbcc >> (64 - _LIMB_BITS)
+_LOG2B_10 = 0x6a4d3c25e68dc57f >> (64 - _LIMB_BITS)
+
+def _n_limbs(val):
+    return (val.bit_length() + _LIMB_BITS - 1) // _LIMB_BITS
+
+def _mpf_prec(bits):
+    """Number of limbs of an mpf_t initialized with @bits of precision"""
+    return (bits + 2 * _LIMB_BITS - 1) // _LIMB_BITS
+
+def _mpf_set_z(val, prec):
+    mant = abs(val)
+    size = exp = _n_limbs(mant)
+    if size > prec + 1:
+        mant >>= _LIMB_BITS * (size - prec - 1)
+        size = prec + 1
+    return (val < 0, mant, size, exp)
+
+def _mpf_div(num1, num2, prec):
+    neg1, mant1, size1, exp1 = num1
+    neg2, mant2, size2, exp2 = num2
+    if size1 == 0:
+        return _MPF_ZERO
+    size = prec + 1
+    zeros = size - (size1 - size2 + 1)
+    if zeros < 0:
+        mant1 >>= _LIMB_BITS * -zeros
+    else:
+        mant1 <<= _LIMB_BITS * zeros
+    quot = mant1 // mant2
+    exp = exp1 - exp2 + 1
+    if quot >> (_LIMB_BITS * (size - 1)) == 0:
+        size -= 1
+        exp -= 1
+    return (neg1 != neg2, quot, size, exp)
+
+def _mpf_div_2exp(num, bits, prec):
+    neg, mant, size, exp = num
+    if size == 0:
+        return _MPF_ZERO
+    if bits % _LIMB_BITS == 0:
+        if size > prec + 1:
+            mant >>= _LIMB_BITS * (size - prec - 1)
+            size = prec + 1
+        return (neg, mant, size, exp - bits // _LIMB_BITS)
+    if size > prec:
+        mant >>= _LIMB_BITS * (size - prec)
+        size = prec
+    mant = (mant << _LIMB_BITS) >> (bits % _LIMB_BITS)
+    exp -= bits // _LIMB_BITS + 1
+    if mant >> (_LIMB_BITS * size):
+        return (neg, mant, size + 1, exp + 1)
+    return (neg, mant, size, exp)
+
+def _mpn_pow_1_highpart(base, exp, prec):
+    """Get the highest @prec limbs of @base^@exp and the number of limbs dropped"""
+    if exp == 0:
+        return (1, 0)
+    val = base
+    ign = 0
+    for i in range(exp.bit_length() - 2, -1, -1):
+        val *= val
+        size = _n_limbs(val)
+        ign <<= 1
+        if size > prec:
+            ign += size - prec
+            val >>= _LIMB_BITS * (size - prec)
+        if (exp >> i) & 1:
+            val *= base
+    size = _n_limbs(val)
+    if size > prec:
+        ign += size - prec
+        val >>= _LIMB_BITS * (size - prec)
+    return (val, ign)
+
+def _mpf_get_str(num, n_digits, prec):
+    """Get the sign, digits and (decimal) exponent of @num rounded to @n_digits
+    significant digits (0 for as many as @prec allows)"""
+    neg, mant, size, exp = num
+    max_digits = ((_LOGB2_10 * _LIMB_BITS * (prec - 1)) >> _LIMB_BITS) + 2
+    if n_digits == 0 or n_digits > max_digits:
+        n_digits = max_digits
+    if size == 0:
+        return (False, "", 0)
+
+    n_limbs = 8 * ((_LOG2B_10 * n_digits) >> _LIMB_BITS) // _LIMB_BITS + 2
+    if size > n_limbs:
+        mant >>= _LIMB_BITS * (size - n_limbs)
+        size = n_limbs
+
+    if exp <= n_limbs:
+        # multiply by a power of 10 to get n_digits digits in the integer part
+        pow_exp = (_LOGB2_10 * _LIMB_BITS * (n_limbs - exp)) >> _LIMB_BITS
+        pow_val, ign = _mpn_pow_1_highpart(10, pow_exp, n_limbs + 1)
+        prod = mant * pow_val
+        off = size - exp - ign
+        if off < 0:
+            prod <<= _LIMB_BITS * -off
+        else:
+            prod >>= _LIMB_BITS * off
+        digits = str(prod)
+        exp = len(digits) - pow_exp
+    else:
+        # or divide by one
+        pow_exp = (_LOGB2_10 * _LIMB_BITS * (exp - n_limbs)) >> _LIMB_BITS
+        pow_val, ign = _mpn_pow_1_highpart(10, pow_exp, n_limbs + 1)
+        digits = str((mant << (_LIMB_BITS * (exp - ign - size))) // pow_val)
+        exp = len(digits) + pow_exp
+
+    if len(digits) > n_digits:
+        if digits[n_digits] >= "5":
+            digits = str(int(digits[:n_digits]) + 1)
+            if len(digits) > n_digits:
+                digits = "1"
+                exp += 1
+        else:
+            digits = digits[:n_digits]
+    return (neg, digits.rstrip("0"), exp)
+
+def _mpf_format_g(num, digits, prec):
+    """Format @num like gmp_printf("%.*Fg") does (with '.' as the radix)"""
+    neg, digit_str, exp = _mpf_get_str(num, max(digits, 1), prec)
+    sign = "-" if neg else ""
+    if exp - 1 < -4 or exp - 1 >= max(digits, 1):
+        frac = "." + digit_str[1:] if len(digit_str) > 1 else ""
+        return "%s%s%se%s%02d" % (sign, digit_str[:1], frac, "-" if exp < 1 else "+", abs(exp - 1))
+    if exp <= 0:
+        if not digit_str:
+            return "0"
+        return "%s0.%s%s" % (sign, "0" * -exp, digit_str)
+    int_part = digit_str[:exp] + "0" * (exp - len(digit_str))
+    if len(digit_str) > exp:
+        return "%s%s.%s" % (sign, int_part, digit_str[exp:])
+    return sign + int_part
+
+def _mpf_format_f(num, places, prec):
+    """Format @num like gmp_printf("%.*Ff") does (with '.' as the radix), but
+    without the trailing zeros"""
+    n_digits = max(places + 2 + num[3] * (_DIGITS_PER_LIMB + (num[3] >= 0)), 1)
+    neg, digit_str, exp = _mpf_get_str(num, n_digits, prec)
+    n_digits = exp + places
+    if n_digits < 0:
+        digit_str = ""
+    elif len(digit_str) > n_digits:
+        if digit_str[n_digits] < "5":
+            digit_str = digit_str[:n_digits].rstrip("0")
+        elif n_digits == 0:
+            digit_str = "1"
+            exp += 1
+        else:
+            digit_str = str(int(digit_str[:n_digits]) + 1)
+            if len(digit_str) > n_digits:
+                digit_str = "1"
+                exp += 1
+            digit_str = digit_str.rstrip("0")
+    if not digit_str:
+        exp = 0
+
+    sign = "-" if neg else ""
+    if exp <= 0:
+        int_part = "0"
+        frac = "0" * -exp + digit_str
+    else:
+        int_part = digit_str[:exp] + "0" * (exp - len(digit_str))
+        frac = digit_str[exp:]
+    if places > 0:
+        return "%s%s.%s" % (sign, int_part, frac)
+    return sign + int_part
+
+def _float_prec(digits):
+    """Get the precision (in limbs) and the number of significant digits
+    libbytesize uses for @digits (None for the full precision)"""
+    if digits is None:
+        return (_mpf_prec(_FLOAT_PREC_BITS), _FLOAT_PREC_BITS // 3)
+    if digits < 0:
+        raise InvalidSpecError("Invalid number of digits: %d" % digits)
+    return (_mpf_prec(digits * 4 + 32), digits)
+
+def _true_div_str(val1, val2, digits=None):
+    """@val1 / @val2 as given by bs_size_true_div_prec() (with '.' as the radix)"""
+    if val2 == 0:
+        raise ZeroDivisionError("Division by zero")
+    prec, digits = _float_prec(digits)
+    quot = _mpf_div(_mpf_set_z(val1, prec), _mpf_set_z(val2, prec), prec)
+    return _mpf_format_g(quot, digits, prec)
+
+def _ratio_to_float(num, den):
+    try:
+        return num / den
+    except builtins.OverflowError:
+        return float("inf") if (num < 0) == (den < 0) else float("-inf")
+
+# number of decimal digits that fit into a limb (GMP's mp_bases[10].chars_per_limb)
+_DIGITS_PER_LIMB = len(str(2 ** _LIMB_BITS)) - 1
+_MPF_SIGNIFICANT_DIGITS = 79
+# maximum length of the unit names in the lookup (see find_unit() in bs_size.c)
+_UNIT_NAME_LEN = 32
+_b_unit_names = ("B", "KiB", "MiB", "GiB", "TiB", "PiB", "EiB", "ZiB", "YiB")
+_d_unit_names = ("B", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
+
+try:
+    _c_dgettext = ctypes.CDLL(None).dgettext
+    _c_dgettext.restype = ctypes.c_char_p
+    _c_dgettext.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
+except AttributeError:
+    _c_dgettext = None
+
+def _xlate_unit_name(name):
+    """Translate the unit @name the same way libbytesize does"""
+    if _c_dgettext is None:
+        return _(name)
+    return str(_c_dgettext(b"libbytesize", name.encode("utf-8")), "utf-8", "replace")
+
+def _unit_key(name):
+    """Lower-case @name character by character (like towlower() does)"""
+    if name.isascii():
+        return name.lower()
+    return "".join(char.lower() if len(char.lower()) == 1 else char for char in name)
+
+_unit_keys = tuple((_unit_key(name), pwr, False) for (pwr, name) in enumerate(_b_unit_names)) + \
+             tuple((_unit_key(name), pwr, True) for (pwr, name) in enumerate(_d_unit_names))
+
+def _find_unit(unit):
+    """Get the (power, decimal) of the unit @unit (or its prefix) refers to"""
+    if len(unit) >= _UNIT_NAME_LEN:
+        return None
+    key = _unit_key(unit)
+    for (name, pwr, decimal) in _unit_keys:
+        if name.startswith(key):
+            return (pwr, decimal)
+    for (names, decimal) in ((_b_unit_names, False), (_d_unit_names, True)):
+        for (pwr, name) in enumerate(names):
+            if _unit_key(_xlate_unit_name(name)).startswith(key):
+                return (pwr, decimal)
+    return None
+
+# the grammar of scan_size_spec() in bs_size.c
+_SPEC_RE = r"[ \t-\r]*([-+]?)([0-9]*)(?:%s([0-9]*))?(?:[eE]([-+]?[0-9]+))?[ \t-\r]*([^ \t-\r]*)[ \t-\r]*\Z"
+_spec_res = dict()
+_LONG_MAX = 2**63 - 1
+
+def _parse_size_spec(spec):
+    """Get the number of bytes @spec stands for (see bs_size_new_from_str())"""
+    spec = spec.split("\0", 1)[0]
+    radix = locale.nl_langinfo(locale.RADIXCHAR)
+    regex = _spec_res.get(radix)
+    if regex is None:
+        point = r"(?:\.|%s)" % re.escape(radix) if radix else r"\."
+        regex = _spec_res[radix] = re.compile(_SPEC_RE % point)
+
+    match = regex.match(spec)
+    if match is None or not (match.group(2) or match.group(3)):
+        raise InvalidSpecError("Failed to parse size spec: %s" % spec)
+    sign, int_digits, frac_digits, exp, unit = match.groups()
+
+    unit_pow = 1
+    if unit:
+        found = _find_unit(unit.replace(".", radix))
+        if found is None:
+            raise InvalidSpecError("Failed to recognize unit from the spec: %s" % spec)
+        unit_pow = (1000 if found[1] else 1024) ** found[0]
+
+    frac_digits = (frac_digits or "").rstrip("0")
+    num = int(int_digits + frac_digits or "0") * unit_pow
+    if num == 0:
+        return 0
+    scale = -len(frac_digits)
+    if exp:
+        # saturates the same way strtol() does
+        scale += max(min(int(exp), _LONG_MAX), -_LONG_MAX)
+    if scale >= 0:
+        num *= 10 ** scale
+    elif -scale > num.bit_length() * 30103 // 100000 + 1:
+        # 10^-scale > num
+        num = 0
+    else:
+        num //= 10 ** -scale
+    return -num if sign == "-" else num
+
+def _number_to_int(val):
+    """Get the number of bytes the int, float, Decimal or Fraction number @val
+    stands for (the same as _number_to_handle() gives)"""
+    if isinstance(val, float):
+        if -_MAX_EXACT_FLOAT < val < _MAX_EXACT_FLOAT:
+            return int(val)
+        val = Decimal(repr(val))
+    if isinstance(val, Decimal) and not val.is_finite():
+        raise InvalidSpecError("'%s' is not a valid size" % val)
+    return int(val)
+
+def _human_readable_unit(val, min_unit):
+    if val == 0:
+        return min_unit
+    val = abs(val)
+    bits = val.bit_length()
+    if val & (val - 1) == 0:
+        # a power of 2
+        bits -= 1
+    unit = (bits + 9) // 10 - 1 if bits > 10 else B
+    return max(min(unit, YiB), min_unit)
+
+def _round_digits(digits, cut):
+    """Round @digits (a list of digit characters) half up to @cut digits"""
+    if cut >= len(digits):
+        return
+    if digits[cut] >= "5":
+        for i in range(cut - 1, -1, -1):
+            if digits[i] == "9":
+                digits[i] = "0"
+            else:
+                digits[i] = chr(ord(digits[i]) + 1)
+                break
+    del digits[cut:]
+
+def _format_fixed_exact(val, shift, places, radix):
+    """Format @val / 2^@shift with @places decimal places (see
+    format_fixed_exact() in bs_size.c), None if the value is too big"""
+    if _LIMB_BITS != 64:
+        # libbytesize only takes this shortcut with 64bit limbs
+        return None
+    mant = abs(val)
+    bits = mant.bit_length() or 1
+    if shift > 120 or bits > 128 or len(radix.encode("utf-8")) > 16:
+        return None
+
+    digits = ["0"]
+    digits.extend(str(mant >> shift))
+    point = len(digits)
+    frac = mant & ((1 << shift) - 1)
+    if frac:
+        # frac / 2^shift == frac * 5^shift / 10^shift
+        digits.extend(str(frac * 5 ** shift).rjust(shift, "0").rstrip("0"))
+
+    if val != 0:
+        if bits > shift:
+            exp = (bits - shift + _LIMB_BITS - 1) // _LIMB_BITS
+        else:
+            exp = -((shift - bits) // _LIMB_BITS)
+        n_digits = places + 3 + exp * (_DIGITS_PER_LIMB + (exp >= 0))
+        n_digits = min(max(n_digits, 1), _MPF_SIGNIFICANT_DIGITS)
+        first = 1
+        while digits[first] == "0":
+            first += 1
+        if first + n_digits < point:
+            return None
+        _round_digits(digits, first + n_digits)
+    _round_digits(digits, point + places)
+
+    start = 1 if digits[0] == "0" else 0
+    num_str = ("-" if val < 0 else "") + "".join(digits[start:point])
+    if places > 0:
+        num_str += radix + ("".join(digits[point:]) or "0")
+    return num_str
+
+def _human_readable(val, min_unit, max_places, xlate):
+    """Get the human-readable representation of @val bytes (see
+    bs_size_human_readable())"""
+    if min_unit == _BUNIT_UNDEF:
+        min_unit = B
+    unit = _human_readable_unit(val, min_unit)
+    places = max_places if max_places >= 0 else _FLOAT_PREC_BITS
+    radix = locale.nl_langinfo(locale.RADIXCHAR) if xlate else "."
+
+    num_str = _format_fixed_exact(val, 10 * unit, places, radix)
+    if num_str is None:
+        # numbers this big are divided step by step (see format_fixed_mpf())
+        prec = _mpf_prec(_FLOAT_PREC_BITS)
+        num = _mpf_div_2exp(_mpf_set_z(val, prec), 10 * min_unit, prec)
+        for _unit in range(min_unit, unit):
+            num = _mpf_div_2exp(num, 10, prec)
+        num_str = _mpf_format_f(num, places, prec)
+        if radix != ".":
+            num_str = num_str.replace(".", radix)
+
+    # remove trailing zeros and the radix char, only single-byte radix chars
+    # are recognized here (the C code compares bytes)
+    if max_places != 0:
+        end = len(num_str)
+        while end > 1 and num_str[end - 1] == "0":
+            end -= 1
+        if end > 1 and num_str[end - 1] == radix and len(radix.encode("utf-8")) == 1:
+            end -= 1
+        num_str = num_str[:end]
+
+    return "%s %s" % (num_str, _xlate_unit_name(_b_unit_names[unit]) if xlate else _b_unit_names[unit])
+
+def _py_operand(val):
+    """Get the number of bytes @val stands for as an operand of _PySize's
+    operations or NotImplemented if @val is not supported"""
+    if isinstance(val, _PySize):
+        return val._bytes
+    if isinstance(val, int):
+        return int(val)
+    if isinstance(val, (Decimal, float, Fraction)):
+        return _number_to_int(val)
+    if val is None:
+        return 0
+    return NotImplemented
+
+def _new_py_size(val):
+    ret = _object_new(_PySize)
+    ret._bytes = val
+    return ret
+
+
+class _PySize(object):
+    __slots__ = ("_bytes",)
+
+    def __init__(self, spec=None):
+        try:
+            if isinstance(spec, str) and _parse_cache_size:
+                (val, loc) = _parse_cache_lookup(spec)
+                if val is None:
+                    val = _parse_size_spec(spec)
+                    _parse_cache_store(spec, loc, val)
+                self._bytes = val
+            elif isinstance(spec, str):
+                self._bytes = _parse_size_spec(spec)
+            elif isinstance(spec, (int, Decimal, float, Fraction)):
+                self._bytes = _number_to_int(spec)
+            elif isinstance(spec, _PySize):
+                self._bytes = spec._bytes
+            elif spec is None:
+                self._bytes = 0
+            else:
+                raise ValueError("Cannot construct new size from '%s'" % spec)
+        except SizeError as e:
+            raise ValueError(e)
+
+
+    ## METHODS ##
+    def get_bytes(self):
+        return self._bytes
+
+    def convert_to(self, unit, digits=None, exact=False):
+        """Convert the size to the given unit
+
+        :param digits: number of significant digits of the result (see
+                       :func:`set_default_digits` which also gives the default)
+        :param bool exact: whether to return the exact result as a
+                           :class:`~fractions.Fraction` or not
+        :returns: the size in @unit as a :class:`~decimal.Decimal` number
+                  (:class:`float` if @digits is :data:`DIGITS_DOUBLE` or
+                  :class:`~fractions.Fraction` if @exact is ``True``)
+
+        """
+        if digits is None:
+            digits = _default_digits
+        if isinstance(unit, str):
+            real_unit = unit_strs.get(unit)
+            if real_unit is None:
+                raise ValueError("Invalid unit specification: '%s'" % unit)
+            unit = real_unit
+
+        unit_pow = _unit_pow(unit)
+        if exact:
+            return Fraction(self._bytes, unit_pow)
+        if digits == DIGITS_DOUBLE:
+            return _ratio_to_float(self._bytes, unit_pow)
+        return Decimal(_true_div_str(self._bytes, unit_pow, digits))
+
+    def ratio(self, other):
+        """Get the exact ratio of this size and the @other size
+
+        :param other: the size to divide this size by
+        :type other: :class:`Size`
+        :rtype: :class:`~fractions.Fraction`
+
+        """
+        if not isinstance(other, _PySize):
+            other = _PySize(other)
+        if other._bytes == 0:
+            raise ZeroDivisionError("Division by zero")
+        return Fraction(self._bytes, other._bytes)
+
+    def human_readable(self, min_unit=B, max_places=2, xlate=True):
+        if isinstance(min_unit, str):
+            if min_unit in unit_strs.keys():
+                min_unit = unit_strs[min_unit]
+            else:
+                raise ValueError("Invalid unit specification: '%s'" % min_unit)
+        if not isinstance(max_places, int):
+            raise ValueError("max_places has to be an integer number")
+        if not B <= min_unit <= _BUNIT_UNDEF:
+            raise ValueError("Invalid unit specification: '%s'" % min_unit)
+        return _human_readable(self._bytes, min_unit, max_places, xlate)
+
+    def round_to_nearest(self, round_to, rounding):
+        if isinstance(round_to, _PySize):
+            round_to = round_to._bytes
+        else:
+            round_to = _unit_pow(_round_to_unit(round_to))
+
+        if round_to == 0:
+            raise ZeroDivisionError("Division by zero")
+        if rounding == ROUND_UP:
+            quot = -(-self._bytes // round_to)
+        elif rounding == ROUND_HALF_UP:
+            quot = (round_to // 2 + self._bytes) // round_to
+        else:
+            quot = self._bytes // round_to
+        return _new_py_size(quot * round_to)
+
+    def cmp(self, other, abs_vals=False):
+        if other is None:
+            return 1
+        val = _py_operand(other)
+        if val is NotImplemented:
+            raise TypeError("Cannot compare Size with '%s'" % type(other).__name__)
+        if abs_vals:
+            return (abs(self._bytes) > abs(val)) - (abs(self._bytes) < abs(val))
+        return (self._bytes > val) - (self._bytes < val)
+
+
+    ## INTERNAL METHODS ##
+    def _cmp(self, other):
+        if other is None:
+            return 1
+        val = _py_operand(other)
+        if val is NotImplemented:
+            return val
+        return (self._bytes > val) - (self._bytes < val)
+
+    def __eq__(self, other):
+        ret = self._cmp(other)
+        return ret if ret is NotImplemented else ret == 0
+
+    def __ne__(self, other):
+        ret = self._cmp(other)
+        return ret if ret is NotImplemented else ret != 0
+
+    def __lt__(self, other):
+        ret = self._cmp(other)
+        return ret if ret is NotImplemented else ret == -1
+
+    def __le__(self, other):
+        ret = self._cmp(other)
+        return ret if ret is NotImplemented else ret in (-1, 0)
+
+    def __gt__(self, other):
+        ret = self._cmp(other)
+        return ret if ret is NotImplemented else ret == 1
+
+    def __ge__(self, other):
+        ret = self._cmp(other)
+        return ret if ret is NotImplemented else ret in (1, 0)
+
+    def __bool__(self):
+        return self._bytes != 0
+
+    __nonzero__ = __bool__
+
+    def __abs__(self):
+        return _new_py_size(abs(self._bytes))
+
+    def __neg__(self):
+        return _new_py_size(-self._bytes)
+
+    def __add__(self, other):
+        val = _py_operand(other)
+        if val is NotImplemented:
+            return val
+        return _new_py_size(self._bytes + val)
+
+    # needed to make sum() work with Size arguments
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        val = _py_operand(other)
+        if val is NotImplemented:
+            return val
+        return _new_py_size(self._bytes - val)
+
+    def __rsub__(self, other):
+        val = _py_operand(other)
+        if val is NotImplemented:
+            val = _parse_size_spec(str(other))
+        return _new_py_size(val - self._bytes)
+
+    def __mul__(self, other):
+        if isinstance(other, _PySize) or other is None:
+            raise ValueError("Cannot multiply Size by Size. It just doesn't make sense.")
+        if isinstance(other, int):
+            return _new_py_size(self._bytes * other)
+        if not isinstance(other, (Decimal, float, Fraction)):
+            # not NotImplemented, Size would be used as the count for sequences
+            raise TypeError("Cannot multiply Size by '%s'" % type(other).__name__)
+        num, den = _number_to_ratio(other)
+        return _new_py_size(_tdiv(self._bytes * num, den))
+
+    __rmul__ = __mul__
+
+    def _div_number(self, other):
+        num, den = _number_to_ratio(other)
+        if num == 0:
+            raise ZeroDivisionError("Division by zero")
+        return _new_py_size(_tdiv(self._bytes * den, num))
+
+    def __truediv__(self, other):
+        if isinstance(other, (int, Decimal, float, Fraction)):
+            return self._div_number(other)
+        if other is None:
+            other = 0
+        elif isinstance(other, _PySize):
+            other = other._bytes
+        else:
+            return NotImplemented
+
+        if _default_digits == DIGITS_DOUBLE:
+            if other == 0:
+                raise ZeroDivisionError("Division by zero")
+            return _ratio_to_float(self._bytes, other)
+        return Decimal(_true_div_str(self._bytes, other, _default_digits))
+
+    def _safe_floordiv(self, other):
+        if other == 0:
+            raise ZeroDivisionError("Division by zero")
+        return _tdiv(self._bytes, other)
+
+    def __floordiv__(self, other):
+        if isinstance(other, (int, Decimal, float, Fraction)):
+            return self._div_number(other)
+        if other is None:
+            return self._safe_floordiv(0)
+        if isinstance(other, _PySize):
+            return self._safe_floordiv(other._bytes)
+        return NotImplemented
+
+    def __mod__(self, other):
+        if other is None:
+            other = 0
+        elif isinstance(other, _PySize):
+            other = other._bytes
+        else:
+            raise ValueError("modulo operation only supported between two Size instances")
+        if other == 0:
+            raise ZeroDivisionError("Division by zero")
+        return _new_py_size(abs(self._bytes) % abs(other))
+
+    def __divmod__(self, other):
+        rdiv = self.__floordiv__(other)
+        if rdiv is NotImplemented:
+            return rdiv
+        if isinstance(other, _PySize) or other is None:
+            rmod = self.__mod__(other)
+        else:
+            rmod = self.__mod__(rdiv)
+
+        return (rdiv, rmod)
+
+    def __repr__(self):
+        return "Size (%s)" % _human_readable(self._bytes, B, -1, False)
+
+    def __str__(self):
+        return _human_readable(self._bytes, B, 2, True)
+
+    def __int__(self):
+        return self._bytes
+
+    def __index__(self):
+        return self._bytes
+
+    def __float__(self):
+        return float(self._bytes)
+
+    def __deepcopy__(self, memo_dict):
+        return _new_py_size(self._bytes)
+
+    # pickling support for Size
+    # see https://docs.python.org/3/library/pickle.html#object.__reduce__
+    def __reduce__(self):
+        return (self.__class__, (self._bytes,))
+
+    def __hash__(self):
+        return self._bytes
+
+# all the implementations of Size present themselves (and are pickled) as
+# bytesize.Size
+_CtypesSize.__name__ = _CtypesSize.__qualname__ = "Size"
+_PySize.__name__ = _PySize.__qualname__ = "Size"
+
+
+class _PySizeAccumulator(object):
+    __doc__ = _CtypesSizeAccumulator.__doc__
+    __slots__ = ("_bytes",)
+
+    def __init__(self, spec=None):
+        self._bytes = _PySize(spec)._bytes
+
+    def __iadd__(self, other):
+        val = _py_operand(other)
+        if val is NotImplemented:
+            return val
+        self._bytes += val
+        return self
+
+    def __isub__(self, other):
+        val = _py_operand(other)
+        if val is NotImplemented:
+            return val
+        self._bytes -= val
+        return self
+
+    def __imul__(self, other):
+        if isinstance(other, int):
+            self._bytes *= other
+        elif isinstance(other, _NUMBER_TYPES):
+            self._bytes = (self.to_size() * other)._bytes
+        else:
+            return NotImplemented
+        return self
+
+    def __ifloordiv__(self, other):
+        if not isinstance(other, _NUMBER_TYPES):
+            return NotImplemented
+        self._bytes = self.to_size()._div_number(other)._bytes
+        return self
+
+    def to_size(self):
+        """Get the current value as a new (immutable) :class:`Size`"""
+        return _new_py_size(self._bytes)
+
+    def get_bytes(self):
+        return self._bytes
+
+    def __bool__(self):
+        return self._bytes != 0
+
+    def __int__(self):
+        return self._bytes
+
+    def __repr__(self):
+        return "SizeAccumulator (%s)" % _human_readable(self._bytes, B, -1, False)
+
+    def __str__(self):
+        return _human_readable(self._bytes, B, 2, True)
+
+
+## Shared sizes
+# Sizes are immutable so the same instances can be used everywhere instead of
+# creating (and parsing) new ones for the same values over and over again.
+# SIZE_ZERO and SIZE_<unit> (SIZE_B, SIZE_KiB,...) are the prebuilt sizes of 0
+# and 1 unit, intern_size() gives the shared sizes for any other values from a
+# bounded LRU cache. Both of them follow set_backend().
+_size_constants = dict()
+
+def _get_size_constants(size_cls):
+    """Get the SIZE_* constants for the @size_cls implementation of Size"""
+    consts = _size_constants.get(size_cls)
+    if consts is None:
+        consts = {"SIZE_ZERO": size_cls(0)}
+        consts.update(("SIZE_" + unit_str, size_cls(_unit_pow(unit))) for (unit_str, unit) in unit_strs.items())
+        _size_constants[size_cls] = consts
+    return consts
+
+_INTERN_CACHE_SIZE = 1024
+_intern_cache_size = _INTERN_CACHE_SIZE
+_intern_cache = OrderedDict()
+_intern_lock = threading.Lock()
+
+def set_intern_cache_size(max_size):
+    """Set the maximum number of sizes kept by :func:`intern_size`
+
+    :param max_size: the maximum number of sizes or ``None`` for the default
+                     (1024), 0 disables the cache
+    :type max_size: int or None
+
+    """
+    global _intern_cache_size
+    if max_size is None:
+        max_size = _INTERN_CACHE_SIZE
+    if max_size < 0:
+        raise ValueError("Invalid cache size: %d" % max_size)
+    with _intern_lock:
+        _intern_cache_size = max_size
+        while len(_intern_cache) > max_size:
+            _intern_cache.popitem(last=False)
+
+def get_intern_cache_size():
+    """Get the maximum number of sizes kept by :func:`intern_size`
+
+    :rtype: int
+
+    """
+    return _intern_cache_size
+
+def clear_intern_cache():
+    """Drop all the sizes kept by :func:`intern_size`"""
+    with _intern_lock:
+        _intern_cache.clear()
+
+def intern_size(spec):
+    """Get a shared :class:`Size` instance for @spec
+
+    :param spec: anything :class:`Size` can be created from
+    :returns: a :class:`Size` equal to ``Size(spec)``, the same instance as
+              the previous calls for the same number of bytes returned as long
+              as it stays in the cache (see :func:`set_intern_cache_size`)
+    :rtype: :class:`Size`
+
+    Useful for the sizes of frequent values used all over the place.
+
+    """
+    size = None
+    if isinstance(spec, int):
+        key = int(spec)
+    else:
+        size = spec if isinstance(spec, Size) else Size(spec)
+        key = size.get_bytes()
+
+    # single OrderedDict operations are atomic, no need to lock for the hits
+    ret = _intern_cache.get(key)
+    if ret is not None:
+        try:
+            _intern_cache.move_to_end(key)
+        except KeyError:
+            # just dropped by another thread
+            pass
+        return ret
+
+    with _intern_lock:
+        ret = _intern_cache.get(key)
+        if ret is not None:
+            return ret
+        if size is None:
+            size = Size(key)
+        if _intern_cache_size > 0:
+            _intern_cache[key] = size
+            if len(_intern_cache) > _intern_cache_size:
+                _intern_cache.popitem(last=False)
+    return size
+
+
+## Backends
+# The native Size type from the _bytesize extension module (if built) is used
+# instead of the ctypes-based implementation above (the same goes for
+# SizeAccumulator) unless the
+# LIBBYTESIZE_PYTHON_BACKEND environment variable or set_backend() says
+# otherwise ("native", "ctypes" or "python").
+_backends = ("native", "ctypes", "python")
+_bytesize = None
+
+def _load_native():
+    global _bytesize
+    if _bytesize is None:
+        if __package__:
+            from . import _bytesize as native
+        else:
+            import _bytesize as native
+        native._set_error_classes(SizeError, InvalidSpecError, OverflowError, ZeroDivisionError)
+        native._set_default_digits(_default_digits)
+        native._set_alloc_debug(_alloc_debug)
+        _bytesize = native
+    return _bytesize.Size, _bytesize.SizeAccumulator
+
+def set_backend(backend):
+    """Set the implementation of :class:`Size` (and :class:`SizeAccumulator`) to use
+
+    :param str backend: ``"native"`` for the compiled extension module,
+                        ``"ctypes"`` for the ctypes bindings of libbytesize or
+                        ``"python"`` for the pure-Python implementation (which
+                        gives the same results as libbytesize)
+    :raises ImportError: if the native implementation is not available
+
+    Only the :class:`Size` instances created after the call use the new
+    implementation so this should be done before any are created. Instances of
+    different implementations don't support operations with each other.
+
+    """
+    global Size, SizeAccumulator, _backend
+    if backend == "native":
+        size_cls, acc_cls = _load_native()
+    elif backend == "ctypes":
+        size_cls, acc_cls = _CtypesSize, _CtypesSizeAccumulator
+    elif backend == "python":
+        size_cls, acc_cls = _PySize, _PySizeAccumulator
+    else:
+        raise ValueError("Unknown backend: '%s' (expected one of %s)" % (backend, ", ".join(_backends)))
+
+    Size = size_cls
+    SizeAccumulator = acc_cls
+    _backend = backend
+    consts = _get_size_constants(size_cls)
+    globals().update(consts)
+    clear_intern_cache()
+    if __package__ and __package__ in sys.modules:
+        # the package re-exports Size, SizeAccumulator and the constants
+        sys.modules[__package__].Size = size_cls
+        sys.modules[__package__].SizeAccumulator = acc_cls
+        vars(sys.modules[__package__]).update(consts)
+
+_backend = os.environ.get("LIBBYTESIZE_PYTHON_BACKEND", "")
+if _backend in ("ctypes", "python"):
+    set_backend(_backend)
+else:
+    try:
+        set_backend("native")
+    except ImportError:
+        if _backend == "native":
+            raise
+        set_backend("ctypes")
+
+def get_backend():
+    """Get the name of the implementation of :class:`Size` in use
+
+    :returns: ``"native"`` for the compiled extension module, ``"ctypes"`` or
+              ``"python"`` (see :func:`set_backend`)
+    :rtype: str
+
+    """
+    return _backend
+
+
+## Reductions
+# Computed by libbytesize in one go (bs_size_sum() and friends) instead of
+# creating a new Size for every step like sum(), min() and max() do.
+def _reduce_handles(fn, sizes, *args):
+    """Call @fn with the C array of BSSize handles of @sizes (with anything else
+    than Size converted to it), its length and @args"""
+    # the converted sizes need to be kept alive during the call
+    sizes = [size if isinstance(size, _CtypesSize) else _CtypesSize(size) for size in sizes]
+    handles = (_Handle * len(sizes))(*(size._handle for size in sizes))
+    return fn(handles, len(sizes), *args)
+
+def _py_values(sizes):
+    return [size._bytes if isinstance(size, _PySize) else _PySize(size)._bytes for size in sizes]
+
+def sum_sizes(sizes):
+    """Get the sum of @sizes
+
+    :param sizes: :class:`Size` instances or anything :class:`Size` can be
+                  created from (numbers of bytes, size specifications,...)
+    :type sizes: iterable
+    :returns: the sum of @sizes (``Size(0)`` if there are none)
+    :rtype: :class:`Size`
+
+    The same as ``sum(sizes, Size(0))``, but without the intermediate sizes.
+
+    """
+    if _backend == "native":
+        return _bytesize.sum_sizes(sizes)
+    if _backend == "ctypes":
+        return _adopt(_reduce_handles(_c_handles.bs_size_sum, sizes))
+    return _new_py_size(sum(_py_values(sizes)))
+
+def _extreme_size(sizes, fn_name):
+    if _backend == "native":
+        return getattr(_bytesize, fn_name)(sizes)
+    if _backend == "ctypes":
+        fn = _c_handles.bs_size_min if fn_name == "min_size" else _c_handles.bs_size_max
+        ret = _reduce_handles(fn, sizes)
+        if ret:
+            return _adopt(ret)
+    else:
+        values = _py_values(sizes)
+        if values:
+            return _new_py_size(min(values) if fn_name == "min_size" else max(values))
+    raise ValueError("%s() arg is an empty iterable" % fn_name)
+
+def min_size(sizes):
+    """Get the smallest of @sizes
+
+    :param sizes: :class:`Size` instances or anything :class:`Size` can be
+                  created from (numbers of bytes, size specifications,...)
+    :type sizes: iterable
+    :rtype: :class:`Size`
+    :raises ValueError: if @sizes is empty
+
+    """
+    return _extreme_size(sizes, "min_size")
+
+def max_size(sizes):
+    """Get the biggest of @sizes
+
+    :param sizes: :class:`Size` instances or anything :class:`Size` can be
+                  created from (numbers of bytes, size specifications,...)
+    :type sizes: iterable
+    :rtype: :class:`Size`
+    :raises ValueError: if @sizes is empty
+
+    """
+    return _extreme_size(sizes, "max_size")
+
+def mean_size(sizes, rounding=ROUND_HALF_UP):
+    """Get the (arithmetic) mean of @sizes
+
+    :param sizes: :class:`Size` instances or anything :class:`Size` can be
+                  created from (numbers of bytes, size specifications,...)
+    :type sizes: iterable
+    :param rounding: which direction to round the result to whole bytes (the
+                     mean itself is computed exactly)
+    :type rounding: one of ROUND_UP, ROUND_DOWN, ROUND_HALF_UP
+    :rtype: :class:`Size`
+    :raises ZeroDivisionError: if @sizes is empty
+
+    """
+    if _backend == "native":
+        return _bytesize.mean_size(sizes, rounding)
+    if _backend == "ctypes":
+        return _adopt(_call(_reduce_handles, _c_handles.bs_size_mean, sizes, rounding))
+
+    values = _py_values(sizes)
+    if not values:
+        raise ZeroDivisionError("Mean of no sizes")
+    # the same as _PySize.round_to_nearest() does
+    if rounding == ROUND_UP:
+        return _new_py_size(-(-sum(values) // len(values)))
+    if rounding == ROUND_HALF_UP:
+        return _new_py_size((len(values) // 2 + sum(values)) // len(values))
+    return _new_py_size(sum(values) // len(values))
+
+## Validation
+_validate_str = c_bytesize.bs_size_validate_str
+
+def validate_size_str(spec):
+    """Check whether @spec is a valid size specification
+
+    :param str spec: the size specification to check (e.g. ``"1.5 GiB"``)
+    :returns: the magnitude class of the size if valid (one of
+              :data:`MAGNITUDE_INT64`, :data:`MAGNITUDE_UINT64` and
+              :data:`MAGNITUDE_BIG`), ``None`` otherwise
+    :rtype: int or None
+
+    Accepts exactly what ``Size(spec)`` does (in the current locale), but creates
+    no :class:`Size` and raises no exception for invalid specifications, which
+    makes it much faster for checking many of them.
+
+    """
+    if _backend == "native":
+        return _bytesize.validate_size_str(spec)
+    magnitude = ctypes.c_int()
+    if _validate_str(bytes(spec, "utf-8"), _c_uselocale(None), byref(magnitude), None):
+        return magnitude.value
+    return None
@@ -0,0 +1,316 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of the Python bindings
+
+Run with the names of the benchmarks to run (all by default), the results are
+reported for all the available implementations of Size (see
+bytesize.set_backend()).
+
+"""
+
+import ctypes
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+
+import bytesize
+
+BACKENDS = ("native", "ctypes", "python")
+
+def _available_backends():
+    orig = bytesize.get_backend()
+    backends = []
+    for backend in BACKENDS:
+        try:
+            bytesize.set_backend(backend)
+        except ImportError:
+            continue
+        backends.append(backend)
+    bytesize.set_backend(orig)
+    return backends
+
+class _MallInfo2(ctypes.Structure):
+    _fields_ = [(name, ctypes.c_size_t) for name in ("arena", "ordblks", "smblks", "hblks", "hblkhd",
+                                                     "usmblks", "fsmblks", "uordblks", "fordblks",
+                                                     "keepcost")]
+
+try:
+    _mallinfo2 = ctypes.CDLL(None).mallinfo2
+    _mallinfo2.restype = _MallInfo2
+    _mallinfo2.argtypes = []
+except AttributeError:
+    _mallinfo2 = None
+
+def _c_heap_used():
+    """Number of bytes allocated with malloc() (if known)"""
+    return _mallinfo2().uordblks if _mallinfo2 else 0
+
+def _timeit(fn, repeat=5):
+    """Best time of @repeat runs of @fn"""
+    best = None
+    for _i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_objects(n_objs=200000):
+    """Memory per Size instance and allocation/free throughput"""
+    # py is the memory allocated by Python for the objects, malloc everything
+    # allocated with malloc() (mostly by libbytesize)
+    print("%-8s %12s %12s %14s %14s" % ("backend", "py B/obj", "malloc B/obj", "alloc obj/s", "free obj/s"))
+    vals = list(range(1, n_objs + 1))
+    for backend in _available_backends():
+        bytesize.set_backend(backend)
+        Size = bytesize.Size
+        gc.collect()
+
+        tracemalloc.start()
+        c_before = _c_heap_used()
+        py_before = tracemalloc.get_traced_memory()[0]
+        sizes = [Size(val) for val in vals]
+        py_used = tracemalloc.get_traced_memory()[0] - py_before
+        c_used = _c_heap_used() - c_before
+        tracemalloc.stop()
+        # the list itself is not part of the sizes
+        py_used -= sys.getsizeof(sizes)
+        del sizes
+
+        sizes = []
+        def alloc():
+            sizes[:] = [Size(val) for val in vals]
+        def free():
+            sizes.clear()
+
+        alloc_time = 0
+        free_time = 0
+        for _i in range(5):
+            alloc_time += _timeit(alloc, 1)
+            free_time += _timeit(free, 1)
+
+        print("%-8s %12.1f %12.1f %14.0f %14.0f" % (backend, py_used / n_objs, c_used / n_objs,
+                                                     5 * n_objs / alloc_time, 5 * n_objs / free_time))
+
+def bench_accumulate(n_ops=200000):
+    """Summing sizes with Size and with SizeAccumulator"""
+    print("%-8s %16s %16s" % ("backend", "Size ops/s", "accumulator ops/s"))
+    for backend in _available_backends():
+        bytesize.set_backend(backend)
+        Size = bytesize.Size
+        sizes = [Size(val) for val in range(n_ops)]
+
+        def with_size():
+            total = Size(0)
+            for size in sizes:
+                total += size
+        def with_accumulator():
+            total = bytesize.SizeAccumulator()
+            for size in sizes:
+                total += size
+            total.to_size()
+
+        print("%-8s %16.0f %16.0f" % (backend, n_ops / _timeit(with_size), n_ops / _timeit(with_accumulator)))
+
+def bench_reductions(n_sizes=100000):
+    """Summing sizes with sum() and with sum_sizes()"""
+    print("%-8s %16s %16s %16s" % ("backend", "sum() sizes/s", "sum_sizes() /s", "max_size() /s"))
+    for backend in _available_backends():
+        bytesize.set_backend(backend)
+        Size = bytesize.Size
+        sizes = [Size(val) for val in range(n_sizes)]
+
+        print("%-8s %16.0f %16.0f %16.0f" % (backend, n_sizes / _timeit(lambda: sum(sizes, Size(0))),
+                                             n_sizes / _timeit(lambda: bytesize.sum_sizes(sizes)),
+                                             n_sizes / _timeit(lambda: bytesize.max_size(sizes))))
+
+def bench_rounding(n_ops=100000):
+    """Rounding to units and creating sizes of frequent values"""
+    print("%-8s %16s %16s %16s" % ("backend", "round to unit/s", "Size(4096) /s", "intern_size() /s"))
+    for backend in _available_backends():
+        bytesize.set_backend(backend)
+        Size = bytesize.Size
+        size = Size("1.5 GiB")
+
+        def round_unit():
+            for _i in range(n_ops):
+                size.round_to_nearest(bytesize.MiB, bytesize.ROUND_UP)
+        def new():
+            for _i in range(n_ops):
+                Size(4096)
+        def intern():
+            for _i in range(n_ops):
+                bytesize.intern_size(4096)
+
+        print("%-8s %16.0f %16.0f %16.0f" % (backend, n_ops / _timeit(round_unit), n_ops / _timeit(new),
+                                             n_ops / _timeit(intern)))
+
+def bench_parsing(n_specs=100000):
+    """Parsing repeated size specifications with and without the parse cache"""
+    # a realistic mix, mostly a few common values and some unique ones
+    common = ["512 MiB", "1 GiB", "4096", "4 KiB", "2 GiB", "100 MiB", "1.5 TiB", "10 GB", "0", "8 MiB"]
+    specs = [common[i % len(common)] if i % 10 else "%d KiB" % i for i in range(n_specs)]
+
+    print("%-8s %16s %16s %10s" % ("backend", "uncached spec/s", "cached spec/s", "hit rate"))
+    for backend in _available_backends():
+        bytesize.set_backend(backend)
+        Size = bytesize.Size
+
+        def parse():
+            for spec in specs:
+                Size(spec)
+
+        bytesize.set_parse_cache_size(0)
+        uncached = n_specs / _timeit(parse)
+        bytesize.clear_parse_cache()
+        bytesize.set_parse_cache_size(256)
+        cached = n_specs / _timeit(parse)
+        stats = bytesize.get_parse_cache_stats()
+        bytesize.set_parse_cache_size(0)
+        bytesize.clear_parse_cache()
+
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = "%.1f %%" % (100.0 * stats["hits"] / lookups) if lookups else "unused"
+        print("%-8s %16.0f %16.0f %10s" % (backend, uncached, cached, hit_rate))
+
+def bench_threads(n_specs=20000, n_threads=(1, 2, 4)):
+    """Parsing and formatting sizes in multiple threads in the current and in the "C" locale"""
+    # libbytesize is called through ctypes (which releases the GIL) so that the
+    # threads can run in parallel, at least while in the library
+    SizeStruct = bytesize.SizeStruct
+    specs = ["%d.5 KiB" % i for i in range(n_specs)]
+
+    def current_locale():
+        for spec in specs:
+            SizeStruct.new_from_str(spec).human_readable(bytesize.KiB, 2, True)
+    def c_locale():
+        for spec in specs:
+            SizeStruct.new_from_str_l(spec, None).human_readable_l(bytesize.KiB, 2, None)
+
+    def run_threads(fn, n):
+        threads = [threading.Thread(target=fn) for _i in range(n)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    print("%-8s %18s %18s" % ("threads", "current locale /s", "C locale /s"))
+    for n in n_threads:
+        cur = min(run_threads(current_locale, n) for _i in range(3))
+        c = min(run_threads(c_locale, n) for _i in range(3))
+        print("%-8d %18.0f %18.0f" % (n, n * n_specs / cur, n * n_specs / c))
+
+def bench_batch(n_sizes=100000):
+    """Parsing, formatting and rounding sizes one by one and with the batch functions"""
+    SizeStruct = bytesize.SizeStruct
+    specs = ["%d.5 KiB" % i for i in range(n_sizes)]
+    sizes = [SizeStruct.new_from_str(spec) for spec in specs]
+    round_to = SizeStruct.new_from_str("1 MiB")
+
+    def parse():
+        for spec in specs:
+            int(SizeStruct.new_from_str_l(spec, None).get_bytes_str())
+    def parse_batch():
+        SizeStruct.parse_int64_batch(specs)
+    def human_readable():
+        for size in sizes:
+            size.human_readable_l(bytesize.KiB, 2, None)
+    def human_readable_batch():
+        SizeStruct.human_readable_batch(sizes, bytesize.KiB, 2)
+    def round_():
+        for size in sizes:
+            size.round_to_nearest(round_to, bytesize.ROUND_UP)
+    def round_batch():
+        # rounds the sizes in place, but rounding is idempotent and done last
+        SizeStruct.round_to_nearest_batch(list(sizes), round_to, bytesize.ROUND_UP)
+
+    print("%-16s %16s %16s" % ("operation", "one by one /s", "batch /s"))
+    for name, one, batch in (("parse", parse, parse_batch),
+                             ("human_readable", human_readable, human_readable_batch),
+                             ("round", round_, round_batch)):
+        print("%-16s %16.0f %16.0f" % (name, n_sizes / _timeit(one), n_sizes / _timeit(batch)))
+
+def bench_batch_threads(n_items=10000000, n_threads=(1, 2, 4, 8)):
+    """Parsing and formatting big batches with multiple threads (see bytesize.set_batch_threads())"""
+    # only the libbytesize calls are measured, the C arrays are created upfront
+    SizeStruct = bytesize.SizeStruct
+    c_bytesize = bytesize.c_bytesize
+    specs = ctypes.create_string_buffer(b"\0".join(b"%d.5 KiB" % i for i in range(n_items)))
+    addrs = (ctypes.c_void_p * n_items)()
+    addr = ctypes.addressof(specs)
+    for i in range(n_items):
+        addrs[i] = addr
+        addr += len(b"%d.5 KiB" % i) + 1
+    strs = ctypes.cast(addrs, ctypes.POINTER(ctypes.c_char_p))
+    results = (ctypes.c_int64 * n_items)()
+
+    # the same sizes repeated, formatting doesn't modify them
+    uniq = [SizeStruct.new_from_str("%d.5 KiB" % i) for i in range(1000)]
+    sizes = (ctypes.c_void_p * n_items)(*(ctypes.addressof(uniq[i % len(uniq)]) for i in range(n_items)))
+    sizes = ctypes.cast(sizes, ctypes.POINTER(ctypes.POINTER(SizeStruct)))
+    buf_len = 16 * n_items
+    buf = ctypes.create_string_buffer(buf_len)
+
+    def parse():
+        c_bytesize.bs_size_parse_int64_batch(strs, n_items, None, results, None)
+    def human_readable():
+        c_bytesize.bs_size_human_readable_batch(sizes, n_items, bytesize.KiB, 2, None, buf, buf_len, None)
+
+    orig = bytesize.get_batch_threads()
+    print("%-8s %16s %16s" % ("threads", "parse /s", "human_readable /s"))
+    for n in n_threads:
+        bytesize.set_batch_threads(n)
+        print("%-8d %16.0f %16.0f" % (n, n_items / _timeit(parse, 3), n_items / _timeit(human_readable, 3)))
+    bytesize.set_batch_threads(orig)
+
+def bench_validation(n_specs=100000):
+    """Checking size specifications (half of them invalid) with Size() and with validate_size_str()"""
+    specs = ["%d KiB" % i if i % 2 else "%d KiBB" % i for i in range(n_specs)]
+
+    def with_validate():
+        for spec in specs:
+            bytesize.validate_size_str(spec)
+
+    print("%-8s %16s %22s" % ("backend", "Size() spec/s", "validate_size_str() /s"))
+    for backend in _available_backends():
+        bytesize.set_backend(backend)
+        Size = bytesize.Size
+
+        def with_size():
+            for spec in specs:
+                try:
+                    Size(spec)
+                except ValueError:
+                    pass
+
+        print("%-8s %16.0f %22.0f" % (backend, n_specs / _timeit(with_size), n_specs / _timeit(with_validate)))
+
+BENCHMARKS = {
+    "objects": bench_objects,
+    "accumulate": bench_accumulate,
+    "reductions": bench_reductions,
+    "rounding": bench_rounding,
+    "parsing": bench_parsing,
+    "threads": bench_threads,
+    "batch": bench_batch,
+    "batch_threads": bench_batch_threads,
+    "validation": bench_validation,
+}
+
+def main(names):
+    for name in names or BENCHMARKS.keys():
+        if name not in BENCHMARKS:
+            print("Unknown benchmark: '%s' (known: %s)" % (name, ", ".join(BENCHMARKS.keys())), file=sys.stderr)
+            return 1
+        print("== %s: %s" % (name, BENCHMARKS[name].__doc__))
+        BENCHMARKS[name]()
+        print()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -3,13 +3,25 @@
 
 import unittest
 import copy
+import gc
 import locale
 import ctypes
+import operator
+import os
+import random
 
 from decimal import Decimal
+from fractions import Fraction
 from locale_utils import get_avail_locales, requires_locales
 
-from bytesize import Size, ROUND_UP, ROUND_DOWN, KiB
+from bytesize import Size, SizeAccumulator, ROUND_UP, ROUND_DOWN, KiB, set_alloc_debug, get_alloc_counts
+from bytesize import DIGITS_DOUBLE, set_default_digits, get_default_digits, ZeroDivisionError, InvalidSpecError
+from bytesize import get_backend, set_backend, sum_sizes, min_size, max_size, mean_size
+from bytesize import intern_size, set_intern_cache_size, get_intern_cache_size, clear_intern_cache
+from bytesize import set_parse_cache_size, get_parse_cache_stats, clear_parse_cache
+from bytesize import MAGNITUDE_INT64, MAGNITUDE_UINT64, MAGNITUDE_BIG, validate_size_str
+
+import bytesize
 
 class SizeTestCase(unittest.TestCase):
 
@@ -64,6 +76,12 @@ class SizeTestCase(unittest.TestCase):
 
         size1 = Size("100 B") + None
         self.assertEqual(size1.get_bytes(), 100)
+
+        size1 = Size("100 B") + (-10)
+        self.assertEqual(size1.get_bytes(), 90)
+
+        size1 = Size("100 B") + Fraction(3, 2)
+        self.assertEqual(size1.get_bytes(), 101)
     #enddef
 
     def testOperatorMinus(self):
@@ -103,6 +121,9 @@ class SizeTestCase(unittest.TestCase):
 
         size1 = Size("100 B") - None
         self.assertEqual(size1.get_bytes(), 100)
+
+        size1 = Size("100 B") - (-10)
+        self.assertEqual(size1.get_bytes(), 110)
     #enddef
 
     def testOperatorMul(self):
@@ -180,8 +201,54 @@ class SizeTestCase(unittest.TestCase):
         actual = size1
         expected = Decimal("1")
         self.assertEqual(actual, expected)
+
+        self.assertEqual(Size("1 KiB") / -2, Size("-512 B"))
+        self.assertEqual(Size("1 KiB") // -2, Size("-512 B"))
+        self.assertEqual(Size(2**70) // 2**65, Size("32 B"))
     #enddef
 
+    def testExactOperands(self):
+        # numbers are used with their exact values, floats with their shortest
+        # decimal representations
+        self.assertEqual(Size(10) * 0.1, Size(1))
+        self.assertEqual(Size(10) * Decimal("0.3"), Size(3))
+        self.assertEqual(Size(100) * Fraction(1, 3), Size(33))
+        self.assertEqual(Fraction(-1, 2) * Size(7), Size(-3))
+        self.assertEqual(Size(10) / 0.1, Size(100))
+        self.assertEqual(Size(10) // Decimal("0.1"), Size(100))
+        self.assertEqual(Size(100) / Fraction(2, 3), Size(150))
+        self.assertEqual(Size(-7) / 2.0, Size(-3))
+
+        big = 10**40 + 7
+        self.assertEqual(Size(big) * -1, Size(-big))
+        self.assertEqual(Size(big) * -2**70, Size(-big * 2**70))
+        self.assertEqual(Size(big) * 2**70, Size(big * 2**70))
+        self.assertEqual(Size(big) / 3, Size(big // 3))
+        self.assertEqual(Size(-big) / 2**70, Size(-(big // 2**70)))
+        self.assertEqual(Size(big) // -10**30, Size(-(big // 10**30)))
+        self.assertEqual(Size(big) // Size(3), big // 3)
+        self.assertEqual(-Size(big), Size(-big))
+        self.assertEqual(abs(Size(-big)), Size(big))
+
+        self.assertEqual(2**64 - Size(1), Size(2**64 - 1))
+        self.assertEqual(-5 - Size(5), Size(-10))
+        self.assertEqual(Size(5) + -(2**64 - 1), Size(6 - 2**64))
+        self.assertEqual(Size(5) - -(2**64 - 1), Size(2**64 + 4))
+        self.assertEqual(Size(-2**63).cmp(-2**63), 0)
+        self.assertEqual(Size(-2**63).cmp(-2**63 + 1), -1)
+        self.assertTrue(Size(-2**70) < -2**63)
+
+        for zero in (0, 0.0, Decimal(0), Fraction(0)):
+            with self.assertRaises(ZeroDivisionError):
+                Size(1) / zero
+            with self.assertRaises(ZeroDivisionError):
+                Size(1) // zero
+        for invalid in (float("nan"), float("inf"), Decimal("-inf")):
+            with self.assertRaises(InvalidSpecError):
+                Size(1) * invalid
+            with self.assertRaises(InvalidSpecError):
+                Size(1) / invalid
+
     def testDivMod(self):
         size1 = Size("120 B")
         q, mod = divmod(size1, Size("100 B"))
@@ -257,6 +324,24 @@ class SizeTestCase(unittest.TestCase):
         # just to make sure Size can be correctly interpreted as int in python 3.10
         ctypes.c_int(Size("1 GiB"))
 
+    def testNumbers(self):
+        self.assertEqual(Size(1.5).get_bytes(), 1)
+        self.assertEqual(Size(-2.5e3).get_bytes(), -2500)
+        self.assertEqual(Size(1.2345678901234567e+20).get_bytes(), 123456789012345670000)
+        self.assertEqual(Size(Decimal("-1.999")).get_bytes(), -1)
+        self.assertEqual(Size(Decimal("1e30")).get_bytes(), 10**30)
+        self.assertEqual(Size(Fraction(10, 3)).get_bytes(), 3)
+
+        for val in (2**64, -2**64, 3**100, -3**100):
+            self.assertEqual(Size(val).get_bytes(), val)
+            self.assertEqual(int(Size(str(val))), val)
+            self.assertEqual(Size(val) + 1, val + 1)
+            self.assertEqual(val - Size(1), val - 1)
+
+        for val in (float("nan"), float("inf"), Decimal("-inf")):
+            with self.assertRaises(ValueError):
+                Size(val)
+
     def testAbs(self):
         size1 = Size("1 GiB")
         self.assertEqual(size1, abs(size1))
@@ -305,6 +390,47 @@ class SizeTestCase(unittest.TestCase):
 
         locale.setlocale(locale.LC_ALL,'en_US.UTF-8')
 
+    def testConvertToDigits(self):
+        size = Size("1 KB")
+        self.assertEqual(size.convert_to("KiB", 3), Decimal("0.977"))
+
+        conv = size.convert_to(KiB, DIGITS_DOUBLE)
+        self.assertIsInstance(conv, float)
+        self.assertEqual(conv, 0.9765625)
+
+        try:
+            set_default_digits(DIGITS_DOUBLE)
+            self.assertEqual(get_default_digits(), DIGITS_DOUBLE)
+            self.assertEqual(size.convert_to("B"), 1000.0)
+            ratio = Size("1 KiB") / Size("3 B")
+            self.assertIsInstance(ratio, float)
+            self.assertEqual(ratio, 1024 / 3)
+
+            # the result is still a Size when dividing by a number
+            self.assertEqual(Size("1 KiB") / 2, Size("512 B"))
+
+            set_default_digits(5)
+            self.assertEqual(Size("1 KiB") / Size("3 B"), Decimal("341.33"))
+        finally:
+            set_default_digits(None)
+
+        self.assertEqual(size.convert_to("B"), Decimal(1000))
+        with self.assertRaises(ValueError):
+            set_default_digits(-1)
+
+    def testConvertToExact(self):
+        conv = Size("1 KB").convert_to("KiB", exact=True)
+        self.assertEqual(conv, Fraction(125, 128))
+
+        conv = Size(2**70 + 1).convert_to(KiB, exact=True)
+        self.assertEqual(conv, Fraction(2**70 + 1, 1024))
+
+    def testRatio(self):
+        self.assertEqual(Size("1 KiB").ratio(Size("3 B")), Fraction(1024, 3))
+        self.assertEqual(Size(-(2**80)).ratio(2**70), Fraction(-1024))
+        with self.assertRaises(ZeroDivisionError):
+            Size("1 KiB").ratio(Size(0))
+
     def testRoundToNearest(self):
         size = Size("1.5 KiB")
         conv = size.round_to_nearest(Size("1 KiB"), rounding=ROUND_UP)
@@ -316,6 +442,520 @@ class SizeTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             size.round_to_nearest(-1, rounding=ROUND_UP)
 
+        self.assertEqual(size.round_to_nearest("KiB", rounding=ROUND_UP), Size("2 KiB"))
+        self.assertEqual(Size("1.5 MB").round_to_nearest(bytesize.MB, rounding=bytesize.ROUND_HALF_UP), Size("2 MB"))
+        self.assertEqual(Size(2**81).round_to_nearest(bytesize.YiB, rounding=ROUND_UP), Size("2 YiB"))
+        with self.assertRaises(ValueError):
+            size.round_to_nearest("kib", rounding=ROUND_UP)
+        with self.assertRaises(ValueError):
+            size.round_to_nearest([KiB], rounding=ROUND_UP)
+
+    def testSizeConstants(self):
+        self.assertEqual(bytesize.SIZE_ZERO, Size(0))
+        self.assertEqual(bytesize.SIZE_B, Size(1))
+        self.assertEqual(bytesize.SIZE_KiB, Size("1 KiB"))
+        self.assertEqual(bytesize.SIZE_YiB, Size(1024**8))
+        self.assertEqual(bytesize.SIZE_MB, Size("1 MB"))
+        self.assertEqual(bytesize.SIZE_YB, Size(1000**8))
+        for unit_str in bytesize.unit_strs:
+            self.assertIsInstance(getattr(bytesize, "SIZE_" + unit_str), Size)
+
+        # the constants follow the implementation of Size
+        self.addCleanup(set_backend, get_backend())
+        set_backend("python")
+        self.assertIsInstance(bytesize.SIZE_MiB, bytesize._PySize)
+        self.assertEqual(bytesize.SIZE_MiB, bytesize.Size("1 MiB"))
+
+    def testInternSize(self):
+        self.addCleanup(set_intern_cache_size, get_intern_cache_size())
+        clear_intern_cache()
+
+        size = intern_size(4096)
+        self.assertEqual(size, Size("4 KiB"))
+        self.assertIsInstance(size, Size)
+        self.assertIs(intern_size(4096), size)
+        self.assertIs(intern_size("4 KiB"), size)
+        self.assertIs(intern_size(Size(4096)), size)
+        self.assertIs(intern_size(Decimal("4096.5")), size)
+        self.assertEqual(intern_size(-2**70), Size(-2**70))
+        self.assertIs(intern_size(Size(-2**70)), intern_size(-2**70))
+        with self.assertRaises(ValueError):
+            intern_size("4 KiBB")
+
+        # least recently used sizes are dropped once the cache is full
+        set_intern_cache_size(2)
+        self.assertEqual(get_intern_cache_size(), 2)
+        size1 = intern_size(1)
+        size2 = intern_size(2)
+        self.assertIs(intern_size(1), size1)
+        intern_size(3)
+        self.assertIs(intern_size(1), size1)
+        self.assertIsNot(intern_size(2), size2)
+
+        set_intern_cache_size(0)
+        self.assertIsNot(intern_size(1), intern_size(1))
+        set_intern_cache_size(None)
+        self.assertEqual(get_intern_cache_size(), 1024)
+        with self.assertRaises(ValueError):
+            set_intern_cache_size(-1)
+
+        clear_intern_cache()
+        self.assertIsNot(intern_size(4096), size)
+
+    def testParseCache(self):
+        self.addCleanup(clear_parse_cache)
+        self.addCleanup(set_parse_cache_size, 0)
+        clear_parse_cache()
+        set_parse_cache_size(2)
+
+        def counts():
+            stats = get_parse_cache_stats()
+            return (stats["hits"], stats["misses"], stats["evictions"], stats["invalidations"], stats["size"])
+
+        for _i in range(3):
+            self.assertEqual(Size("1 KiB"), Size(1024))
+        self.assertEqual(Size(" 1.5 KiB"), Size(1536))
+        self.assertEqual(Size("2 MiB").get_bytes(), 2 * 1024**2)
+        with self.assertRaises(ValueError):
+            Size("1 KiBB")
+        self.assertEqual(get_parse_cache_stats()["max_size"], 2)
+        if get_backend() != "python":
+            # only used by the pure Python implementation
+            self.assertEqual(counts(), (0, 0, 0, 0, 0))
+            return
+        self.assertEqual(counts(), (2, 4, 1, 0, 2))
+
+        # any change of the locale drops the cache
+        locale.setlocale(locale.LC_ALL, "C")
+        self.assertEqual(Size("2 MiB").get_bytes(), 2 * 1024**2)
+        self.assertEqual(counts(), (2, 5, 1, 1, 1))
+
+        set_parse_cache_size(0)
+        self.assertEqual(Size("2 MiB").get_bytes(), 2 * 1024**2)
+        self.assertEqual(counts(), (2, 5, 2, 1, 0))
+        with self.assertRaises(ValueError):
+            set_parse_cache_size(-1)
+
+        clear_parse_cache()
+        self.assertEqual(counts(), (0, 0, 0, 0, 0))
+
+    def testBackend(self):
+        backend = os.environ.get("LIBBYTESIZE_PYTHON_BACKEND")
+        if backend:
+            self.assertEqual(get_backend(), backend)
+        else:
+            self.assertIn(get_backend(), ("native", "ctypes"))
+
+        orig_backend = get_backend()
+        self.addCleanup(set_backend, orig_backend)
+        set_backend("python")
+        self.assertEqual(get_backend(), "python")
+        self.assertIs(bytesize.Size, bytesize._PySize)
+        self.assertEqual(bytesize.Size("1 KiB").get_bytes(), 1024)
+        with self.assertRaises(ValueError):
+            set_backend("fortran")
+        self.assertEqual(get_backend(), "python")
+
+    def testSortAndDeduplicate(self):
+        vals = [-2**70, -1, 0, 1, 1023, 2**63, 2**64, 2**100] * 3
+        sizes = [Size(val) for val in reversed(vals)] + [Size("%d B" % val) for val in vals]
+        self.assertEqual(sorted(sizes), sorted(vals * 2))
+        self.assertEqual(sorted(set(sizes)), sorted(set(vals)))
+        self.assertEqual(set(sizes), set(vals))
+        self.assertEqual(sorted(sizes, reverse=True)[0], Size(2**100))
+        self.assertEqual([bool(size) for size in sizes[:8]], [bool(val) for val in reversed(vals[:8])])
+        self.assertEqual([int(size) for size in sizes], list(reversed(vals)) + vals)
+        self.assertEqual(Size(-2**70).cmp(2**70, abs_vals=True), 0)
+        self.assertEqual(Size(-1).cmp(Size(-2**70), abs_vals=True), -1)
+        self.assertEqual(Size(2**64).cmp(2**64 + 1), -1)
+
+    def testCompactObjects(self):
+        size = Size("1 KiB")
+        self.assertFalse(hasattr(size, "__dict__"))
+
+        set_alloc_debug(True)
+        self.addCleanup(set_alloc_debug, False)
+        before = get_alloc_counts()
+        sizes = [Size(i) + 1 for i in range(10)]
+        self.assertEqual(len(sizes), 10)
+        # freed right away, not by the garbage collector
+        del sizes
+        after = get_alloc_counts()
+        self.assertEqual((after["sizes"], after["strings"]), (before["sizes"], before["strings"]))
+
+    def testAllocBalance(self):
+        set_alloc_debug(True)
+        self.addCleanup(set_alloc_debug, False)
+        before = get_alloc_counts()
+
+        for i in range(100):
+            size = Size("%d.5 KiB" % i)
+            str(size)
+            repr(size)
+            size.convert_to("MiB")
+            size.human_readable(max_places=-1)
+            size = (size + size - 1) * 3
+            size / 2
+            size / Size("1 KiB")
+            size // 3
+            divmod(size, Size("1 B"))
+            size.round_to_nearest(KiB, rounding=ROUND_UP)
+            self.assertTrue(size > i)
+        del size
+        gc.collect()
+
+        after = get_alloc_counts()
+        self.assertEqual((after["sizes"], after["strings"]), (before["sizes"], before["strings"]))
+        self.assertEqual(after["strings"], 0)
+
+    def testAllocsPerOperation(self):
+        set_alloc_debug(True)
+        self.addCleanup(set_alloc_debug, False)
+        # the pure-Python implementation doesn't use BSSize at all
+        expected = 0 if get_backend() == "python" else 1
+
+        size = Size("1.5 KiB")
+        other = Size(512)
+        operations = (("Size + Size", lambda: size + other),
+                      ("Size + int", lambda: size + 10),
+                      ("int + Size", lambda: 10 + size),
+                      ("Size + None", lambda: size + None),
+                      ("Size - Size", lambda: size - other),
+                      ("Size - int", lambda: size - 10),
+                      ("Size - None", lambda: size - None),
+                      ("Size * int", lambda: size * 3),
+                      ("-Size", lambda: -size),
+                      ("abs(Size)", lambda: abs(-size)),
+                      ("Size // int", lambda: size // 3),
+                      ("Size % Size", lambda: size % other),
+                      ("Size / int", lambda: size / 3),
+                      ("Size(Size)", lambda: Size(size)),
+                      ("round_to_nearest", lambda: size.round_to_nearest(other, rounding=ROUND_UP)),
+                      ("round_to_nearest(unit)", lambda: size.round_to_nearest(KiB, rounding=ROUND_UP)))
+        for name, operation in operations:
+            before = get_alloc_counts()["size_allocs"]
+            result = operation()
+            allocs = get_alloc_counts()["size_allocs"] - before
+            if name == "abs(Size)":
+                # -size
+                allocs -= expected
+            self.assertEqual(allocs, expected, name)
+            del result
+
+    def testAccumulator(self):
+        acc = SizeAccumulator(Size("1 KiB"))
+        acc += Size(512)
+        acc += 512
+        acc -= Size("0.5 KiB")
+        acc -= None
+        self.assertEqual(acc.to_size(), Size("1.5 KiB"))
+        acc *= 4
+        acc //= 3
+        self.assertEqual(acc.get_bytes(), 2048)
+        self.assertEqual(int(acc), 2048)
+        acc *= 0.5
+        acc //= Fraction(1, 2)
+        acc += -4096
+        self.assertEqual(acc.to_size(), Size(-2048))
+        self.assertTrue(acc)
+        self.assertEqual(repr(acc), "SizeAccumulator (-2 KiB)")
+        self.assertEqual(str(acc), str(Size(-2048)))
+
+        acc = SizeAccumulator(2**70)
+        acc //= 2**65
+        self.assertEqual(acc.get_bytes(), 32)
+        acc *= -2**70
+        self.assertEqual(acc.get_bytes(), -2**75)
+        acc //= -2**75
+        self.assertEqual(acc.get_bytes(), 1)
+        acc -= 1
+        self.assertFalse(acc)
+        self.assertEqual(SizeAccumulator().get_bytes(), 0)
+
+        # the accumulator never changes the sizes it was given or gave out (they
+        # stay immutable and their hashes don't change)
+        start = Size(10)
+        acc = SizeAccumulator(start)
+        acc += start
+        size = acc.to_size()
+        sizes = {size}
+        acc += 1
+        self.assertEqual(start, Size(10))
+        self.assertEqual(size, Size(20))
+        self.assertIn(Size(20), sizes)
+        self.assertEqual(acc.to_size(), Size(21))
+
+        with self.assertRaises(ZeroDivisionError):
+            acc //= 0
+        with self.assertRaises(TypeError):
+            acc += "1 KiB"
+        with self.assertRaises(TypeError):
+            acc //= Size(2)
+        with self.assertRaises(ValueError):
+            SizeAccumulator("1 KiBB")
+        self.assertEqual(acc.get_bytes(), 21)
+
+    def testReductions(self):
+        sizes = [Size("1 KiB"), 512, "1.5 KiB", Size(-1)]
+        self.assertEqual(sum_sizes(sizes), Size(3071))
+        self.assertEqual(sum_sizes(iter(sizes)), sum(sizes[:2] + [Size("1.5 KiB")] + sizes[3:]))
+        self.assertEqual(sum_sizes([]), Size(0))
+        self.assertIsInstance(sum_sizes([1]), Size)
+        self.assertEqual(min_size(sizes), Size(-1))
+        self.assertEqual(max_size(sizes), Size("1.5 KiB"))
+        self.assertEqual(mean_size(sizes), Size(768))
+        self.assertEqual(mean_size([1, 2]), Size(2))
+        self.assertEqual(mean_size([1, 2], ROUND_DOWN), Size(1))
+        self.assertEqual(mean_size([-1, -2], ROUND_UP), Size(-1))
+        self.assertEqual(sum_sizes([2**64] * 4), Size(2**66))
+
+        with self.assertRaises(ValueError):
+            min_size([])
+        with self.assertRaises(ValueError):
+            max_size(iter([]))
+        with self.assertRaises(ZeroDivisionError):
+            mean_size([])
+        with self.assertRaises(ValueError):
+            sum_sizes([Size(1), "1 KiBB"])
+        with self.assertRaises(TypeError):
+            sum_sizes(10)
+
+    def testAccumulatorAllocs(self):
+        set_alloc_debug(True)
+        self.addCleanup(set_alloc_debug, False)
+
+        before = get_alloc_counts()
+        acc = SizeAccumulator(1)
+        other = Size(5)
+        after_init = get_alloc_counts()["size_allocs"]
+        for i in range(100):
+            acc += other
+            acc += i
+            acc -= 1
+            acc *= 2
+            acc //= 2
+        # all done in place
+        self.assertEqual(get_alloc_counts()["size_allocs"], after_init)
+        self.assertEqual(acc.get_bytes(), 1 + 100 * 5 + sum(range(100)) - 100)
+
+        del acc, other
+        gc.collect()
+        after = get_alloc_counts()
+        self.assertEqual((after["sizes"], after["strings"]), (before["sizes"], before["strings"]))
+
+#endclass
+
+class SizeBackendsTestCase(unittest.TestCase):
+    """Compare the pure-Python implementation of Size with the C library"""
+
+    n_rounds = 2000
+
+    def setUp(self):
+        self.rand = random.Random(self.id())
+        self.size_classes = [bytesize._CtypesSize, bytesize._PySize]
+        self.accumulator_classes = {bytesize._CtypesSize: bytesize._CtypesSizeAccumulator,
+                                    bytesize._PySize: bytesize._PySizeAccumulator}
+        self.backends = {bytesize._CtypesSize: "ctypes", bytesize._PySize: "python"}
+        try:
+            size_cls, acc_cls = bytesize._load_native()
+        except ImportError:
+            pass
+        else:
+            self.size_classes.append(size_cls)
+            self.accumulator_classes[size_cls] = acc_cls
+            self.backends[size_cls] = "native"
+
+    def _rand_int(self):
+        kind = self.rand.random()
+        if kind < 0.1:
+            val = self.rand.choice([0, 1, 1023, 1024, 1025, 2**63, 2**64 - 1, 2**64, 10**40])
+        elif kind < 0.3:
+            val = self.rand.choice([1000, 1024]) ** self.rand.randint(0, 9) * self.rand.randint(1, 2000)
+        else:
+            val = self.rand.getrandbits(self.rand.choice([8, 20, 40, 63, 64, 65, 100, 128, 200, 400]))
+        return self.rand.choice([1, 1, -1]) * val
+
+    def _rand_number(self):
+        kind = self.rand.randint(0, 4)
+        if kind == 0:
+            return self._rand_int()
+        if kind == 1:
+            return self.rand.uniform(-1e6, 1e6) * 10 ** self.rand.randint(-10, 30)
+        if kind == 2:
+            return Decimal("%d.%d" % (self._rand_int(), self.rand.getrandbits(40)))
+        if kind == 3:
+            return Fraction(self._rand_int(), self.rand.randint(1, 10**6))
+        return Decimal("%de%d" % (self.rand.randint(-1000, 1000), self.rand.randint(-30, 30)))
+
+    def _rand_spec(self):
+        units = ["", "B", "b", "k", "KiB", "kib", "M", "MB", "gb", "TiB", "P", "e", "ZB", "y", "YiB",
+                 "KiBB", "iB", "X", "k b"]
+        num = self.rand.choice(["%d" % self._rand_int(), "%d.%d" % (self.rand.randint(0, 10**6), self.rand.getrandbits(30)),
+                                ".%d" % self.rand.randint(0, 999), "%d." % self.rand.randint(0, 999),
+                                "%de%d" % (self.rand.randint(0, 999), self.rand.randint(-30, 30)),
+                                "%d.%dE+%d" % (self.rand.randint(0, 99), self.rand.randint(0, 99), self.rand.randint(0, 5)),
+                                "+%d" % self.rand.randint(0, 99), "-", ".", "e5", ""])
+        space = self.rand.choice(["", " ", "  ", "\t"])
+        return self.rand.choice(["", " "]) + num + space + self.rand.choice(units) + self.rand.choice(["", " "])
+
+    def _normalize(self, result):
+        if isinstance(result, tuple(self.size_classes)):
+            return ("Size", result.get_bytes())
+        if isinstance(result, tuple):
+            return tuple(self._normalize(r) for r in result)
+        if isinstance(result, (float, Decimal)):
+            # also distinguishes -0.0 and 0.0
+            return (type(result), str(result))
+        return result
+
+    def _check_same(self, fn, *args):
+        """Check that @fn gives the same results (or errors) for both implementations"""
+        results = []
+        for size_cls in self.size_classes:
+            try:
+                result = self._normalize(fn(size_cls, *args))
+            except (ValueError, TypeError, ArithmeticError, bytesize.SizeError) as e:
+                result = (type(e), str(e))
+            results.append(result)
+        for result in results[1:]:
+            self.assertEqual(results[0], result, "%s%r" % (fn.__name__, args))
+
+    def testParse(self):
+        for _i in range(self.n_rounds):
+            self._check_same(lambda cls, spec: cls(spec), self._rand_spec())
+        for _i in range(self.n_rounds):
+            self._check_same(lambda cls, num: cls(num), self._rand_number())
+
+    def testArithmetic(self):
+        def binop(cls, op, val1, val2):
+            return op(cls(val1), cls(val2) if isinstance(val2, int) and op is not operator.mul else val2)
+
+        ops = [operator.add, operator.sub, operator.mul, operator.truediv, operator.floordiv, operator.mod,
+               divmod, lambda a, b: a.cmp(b, abs_vals=True), operator.lt]
+        for _i in range(self.n_rounds):
+            val1 = self._rand_int()
+            val2 = self.rand.choice([self._rand_int(), self._rand_number(), self.rand.randint(0, 10), None])
+            op = self.rand.choice(ops)
+            self._check_same(binop, op, val1, val2)
+            self._check_same(lambda cls, val1, val2: val2 - cls(val1), val1, val2)
+            self._check_same(lambda cls, val: (-cls(val), abs(cls(val))), val1)
+
+    def testAccumulator(self):
+        # the in-place operations give the same results as the Size operations
+        ops = [(operator.iadd, operator.add), (operator.isub, operator.sub),
+               (operator.imul, operator.mul), (operator.ifloordiv, operator.floordiv)]
+
+        def accumulate(cls, start, steps):
+            acc = self.accumulator_classes[cls](start)
+            size = cls(start)
+            for iop, op, val, as_size in steps:
+                if as_size:
+                    val = cls(val)
+                self.assertIs(iop(acc, val), acc)
+                size = op(size, val)
+                self.assertEqual(acc.get_bytes(), size.get_bytes())
+            return acc.to_size()
+
+        for _i in range(self.n_rounds // 10):
+            steps = []
+            for _j in range(10):
+                iop, op = self.rand.choice(ops)
+                val = self.rand.choice([self._rand_int(), self._rand_number(), self.rand.randint(0, 10)])
+                as_size = op in (operator.add, operator.sub) and isinstance(val, int) and self.rand.random() < 0.5
+                steps.append((iop, op, val, as_size))
+            self._check_same(accumulate, self._rand_int(), steps)
+
+    def testReductions(self):
+        self.addCleanup(set_backend, get_backend())
+
+        def reduce(cls, fn, vals, *args):
+            set_backend(self.backends[cls])
+            return fn([cls(val) if isinstance(val, int) and val % 2 else val for val in vals], *args)
+
+        for _i in range(self.n_rounds // 10):
+            vals = [self._rand_int() for _j in range(self.rand.randint(0, 20))]
+            if self.rand.random() < 0.2:
+                vals.append(self._rand_spec())
+            for fn in (sum_sizes, min_size, max_size):
+                self._check_same(reduce, fn, vals)
+            self._check_same(reduce, mean_size, vals, self.rand.choice([ROUND_UP, ROUND_DOWN, bytesize.ROUND_HALF_UP]))
+
+    def testConvertAndRound(self):
+        units = list(bytesize.unit_strs.keys())
+        for _i in range(self.n_rounds):
+            val = self._rand_int()
+            unit = self.rand.choice(units)
+            digits = self.rand.choice([None, DIGITS_DOUBLE, 1, 5, 20, 100])
+            self._check_same(lambda cls, val, unit, digits: cls(val).convert_to(unit, digits), val, unit, digits)
+            self._check_same(lambda cls, val, unit, rnd: cls(val).round_to_nearest(unit, rnd),
+                             val, unit, self.rand.choice([ROUND_UP, ROUND_DOWN, bytesize.ROUND_HALF_UP]))
+
+    def testHumanReadable(self):
+        for _i in range(self.n_rounds):
+            val = self._rand_int()
+            min_unit = self.rand.choice([bytesize.B, KiB, bytesize.MiB, bytesize.TiB, bytesize.YiB, "GiB"])
+            places = self.rand.choice([-1, 0, 1, 2, 5, 30])
+            xlate = self.rand.choice([True, False])
+            self._check_same(lambda cls, *args: cls(val).human_readable(*args), min_unit, places, xlate)
+            self._check_same(lambda cls, val: (str(cls(val)), repr(cls(val))), val)
+
+    def testLocales(self):
+        locales = [loc for loc in ("C.utf8", "en_US.utf8", "cs_CZ.utf8", "fr_FR.utf8", "ps_AF.utf8") if loc in get_avail_locales()]
+        if not locales:
+            self.skipTest("no suitable locales available")
+        orig_locale = locale.setlocale(locale.LC_ALL)
+        self.addCleanup(locale.setlocale, locale.LC_ALL, orig_locale)
+        for loc in locales:
+            locale.setlocale(locale.LC_ALL, loc)
+            for _i in range(self.n_rounds // 10):
+                spec = self._rand_spec().replace(".", self.rand.choice([".", ","]))
+                self._check_same(lambda cls, spec: cls(spec), spec)
+                self._check_same(lambda cls, val: cls(val).human_readable(max_places=-1), self._rand_int())
+
+    def testParseCache(self):
+        locales = [loc for loc in ("C", "C.utf8", "en_US.utf8", "cs_CZ.utf8", "fr_FR.utf8") if loc in get_avail_locales()]
+        orig_locale = locale.setlocale(locale.LC_ALL)
+        self.addCleanup(locale.setlocale, locale.LC_ALL, orig_locale)
+        self.addCleanup(clear_parse_cache)
+        self.addCleanup(set_parse_cache_size, 0)
+        set_parse_cache_size(8)
+
+        # a few specifications repeated in different locales (with the
+        # implementations parsing in libbytesize to compare with)
+        specs = [self._rand_spec().replace(".", self.rand.choice([".", ","])) for _i in range(16)]
+        for _i in range(self.n_rounds // 10):
+            if locales and self.rand.random() < 0.1:
+                locale.setlocale(locale.LC_ALL, self.rand.choice(locales))
+            self._check_same(lambda cls, spec: cls(spec), self.rand.choice(specs))
+
+    def testValidateSizeStr(self):
+        locales = [loc for loc in ("C", "C.utf8", "en_US.utf8", "cs_CZ.utf8", "fr_FR.utf8") if loc in get_avail_locales()]
+        orig_locale = locale.setlocale(locale.LC_ALL)
+        self.addCleanup(locale.setlocale, locale.LC_ALL, orig_locale)
+
+        for _i in range(self.n_rounds):
+            if locales and self.rand.random() < 0.01:
+                locale.setlocale(locale.LC_ALL, self.rand.choice(locales))
+            spec = self._rand_spec().replace(".", self.rand.choice([".", ","]))
+            magnitude = validate_size_str(spec)
+            for size_cls in self.size_classes:
+                try:
+                    val = size_cls(spec).get_bytes()
+                except ValueError:
+                    self.assertIsNone(magnitude, spec)
+                    continue
+                if -2**63 <= val < 2**63:
+                    self.assertEqual(magnitude, MAGNITUDE_INT64, spec)
+                elif 0 < val < 2**64:
+                    self.assertEqual(magnitude, MAGNITUDE_UINT64, spec)
+                else:
+                    self.assertEqual(magnitude, MAGNITUDE_BIG, spec)
+
+        # huge exponents are recognized without computing the number
+        self.assertEqual(validate_size_str("1e9999999999999"), MAGNITUDE_BIG)
+        self.assertEqual(validate_size_str("-1e100000000 KiB"), MAGNITUDE_BIG)
+        self.assertEqual(validate_size_str("1e-9999999999999 YiB"), MAGNITUDE_INT64)
+
 #endclass
 
 # script entry point
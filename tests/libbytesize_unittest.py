@@ -6,20 +6,41 @@ import unittest
 import sys
 import ctypes
 import os
+import threading
+import random
+import gc
 
 from locale_utils import get_avail_locales, missing_locales, requires_locales
 
-from bytesize import KiB, GiB, ROUND_UP, ROUND_DOWN, ROUND_HALF_UP, OverflowError, InvalidSpecError
+from bytesize import B, KiB, GiB, YiB, KB, DIGITS_DOUBLE, ROUND_UP, ROUND_DOWN, ROUND_HALF_UP, OverflowError, InvalidSpecError, ZeroDivisionError
 
 # SizeStruct is part of the 'private' API and needs to be imported differently
 # when running from locally build tree and when using installed library
 try:
-    from bytesize import SizeStruct
+    from bytesize import SizeStruct, SizeErrorStruct, c_bytesize, set_alloc_debug, get_alloc_counts
+    from bytesize import BATCH_OK, BATCH_INVALID_SPEC, BATCH_OVER, set_batch_threads, get_batch_threads
+    from bytesize import MAGNITUDE_INT64, MAGNITUDE_UINT64, MAGNITUDE_BIG
 except ImportError:
-    from bytesize.bytesize import SizeStruct
+    from bytesize.bytesize import SizeStruct, SizeErrorStruct, c_bytesize, set_alloc_debug, get_alloc_counts
+    from bytesize.bytesize import BATCH_OK, BATCH_INVALID_SPEC, BATCH_OVER, set_batch_threads, get_batch_threads
+    from bytesize.bytesize import MAGNITUDE_INT64, MAGNITUDE_UINT64, MAGNITUDE_BIG
 
 DEFAULT_LOCALE = "C"
 
+# locale objects for the *_l() functions (LC_ALL_MASK is glibc's value)
+_libc = ctypes.CDLL(None)
+_libc.newlocale.restype = ctypes.c_void_p
+_libc.newlocale.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_void_p]
+_libc.freelocale.restype = None
+_libc.freelocale.argtypes = [ctypes.c_void_p]
+LC_ALL_MASK = 8127
+
+def new_locale(name):
+    loc = _libc.newlocale(LC_ALL_MASK, name.encode(), None)
+    if not loc:
+        raise OSError(ctypes.get_errno(), "Failed to create locale '%s'" % name)
+    return loc
+
 class SizeTestCase(unittest.TestCase):
 
     @classmethod
@@ -171,6 +192,309 @@ class SizeTestCase(unittest.TestCase):
 
     #enddef
 
+    @requires_locales({'cs_CZ.UTF-8'})
+    def testNewFromStrLocaleChange(self):
+        # parsing data is cached per thread, make sure the right radix
+        # character is used after it changes
+        locale.setlocale(locale.LC_ALL, 'C')
+        with self.assertRaises(InvalidSpecError):
+            SizeStruct.new_from_str('1,5 KiB')
+
+        locale.setlocale(locale.LC_ALL, 'cs_CZ.UTF-8')
+        actual = SizeStruct.new_from_str('1,5 KiB').get_bytes()
+        self.assertEqual(actual, (1536, 1))
+
+        locale.setlocale(locale.LC_ALL, 'C')
+        with self.assertRaises(InvalidSpecError):
+            SizeStruct.new_from_str('1,5 KiB')
+        actual = SizeStruct.new_from_str('1.5 KiB').get_bytes()
+        self.assertEqual(actual, (1536, 1))
+    #enddef
+
+    def testNewFromStrUnits(self):
+        # units are matched case-insensitively and can be abbreviated, the
+        # binary ones win over the decimal ones
+        for spec, expected in (("1 k", 1024), ("1 kib", 1024), ("1 KIB", 1024), ("1 kB", 1000),
+                               ("1 Ki", 1024), ("1 e", 1024**6), ("1 m", 1024**2), ("1 b", 1),
+                               ("1 zb", 1000**7), ("1 YiB", 1024**8), ("1 yb", 1000**8)):
+            self.assertEqual(SizeStruct.new_from_str(spec).get_bytes_str(), str(expected), spec)
+
+        for spec in ("1 KiBB", "1 x", "1 KiB B", "1 " + "K" * 100):
+            with self.assertRaises(InvalidSpecError):
+                SizeStruct.new_from_str(spec)
+    #enddef
+
+    def testNewFromStrThreads(self):
+        specs = ['1 KiB', '-1.5 GiB', '10e3 KB', '  .5 MiB ', '1234']
+        expected = [SizeStruct.new_from_str(spec).get_bytes() for spec in specs]
+        results = []
+
+        # the library releases the GIL while parsing so the threads really
+        # parse concurrently
+        def parse():
+            results.append([SizeStruct.new_from_str(spec).get_bytes() for _i in range(200) for spec in specs])
+
+        threads = [threading.Thread(target=parse) for _i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertEqual(result, expected * 200)
+    #enddef
+
+    def testNewFromStrL(self):
+        # None is the "C" locale (without any locale object)
+        for loc in (None, new_locale("C"), new_locale("POSIX")):
+            for spec, expected in (("1.5 KiB", 1536), (" -1.5e1 KB ", -15000), ("1 k", 1024), ("1 kb", 1000),
+                                   ("1 YiB", 1024**8), ("10", 10), (".5 mib", 512 * 1024)):
+                actual = SizeStruct.new_from_str_l(spec, loc).get_bytes_str()
+                self.assertEqual(actual, str(expected), spec)
+
+            for spec in ("1,5 KiB", "1 KiBB", "1 kiB B", "KiB", "1 " + "K" * 100, "1 ḱib"):
+                with self.assertRaises(InvalidSpecError):
+                    SizeStruct.new_from_str_l(spec, loc)
+
+            if loc:
+                _libc.freelocale(loc)
+    #enddef
+
+    @requires_locales({'cs_CZ.UTF-8'})
+    def testNewFromStrLLocaleCsCZ(self):
+        loc = new_locale("cs_CZ.UTF-8")
+        self.addCleanup(_libc.freelocale, loc)
+
+        # only the given locale is used, not the current one
+        actual = SizeStruct.new_from_str_l('1,5 KiB', loc).get_bytes()
+        self.assertEqual(actual, (1536, 1))
+        actual = SizeStruct.new_from_str_l('1.5 KiB', loc).get_bytes()
+        self.assertEqual(actual, (1536, 1))
+        with self.assertRaises(InvalidSpecError):
+            SizeStruct.new_from_str('1,5 KiB')
+
+        locale.setlocale(locale.LC_ALL, 'cs_CZ.UTF-8')
+        with self.assertRaises(InvalidSpecError):
+            SizeStruct.new_from_str_l('1,5 KiB', None)
+        actual = SizeStruct.new_from_str('1,5 KiB').get_bytes()
+        self.assertEqual(actual, (1536, 1))
+    #enddef
+
+    def testLocaleThreads(self):
+        locales = [None] + [loc for loc in ("C.UTF-8", "cs_CZ.UTF-8", "fr_FR.UTF-8")
+                            if not missing_locales({loc}, self.avail_locales)]
+        specs = ['1.5 KiB', '-1.5 GiB', '10e3 KB', '  .5 MiB ', '1234']
+        results = dict()
+
+        # all the threads use different locales at the same time
+        def parse_format(loc_name):
+            loc = new_locale(loc_name) if loc_name else None
+            results[loc_name] = [SizeStruct.new_from_str_l(spec, loc).human_readable_l(KiB, 2, loc)
+                                 for _i in range(100) for spec in specs]
+            if loc:
+                _libc.freelocale(loc)
+
+        threads = [threading.Thread(target=parse_format, args=(loc,)) for loc in locales]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for loc_name in locales:
+            locale.setlocale(locale.LC_ALL, loc_name or "C")
+            expected = [SizeStruct.new_from_str(spec).human_readable(KiB, 2, loc_name is not None) for spec in specs]
+            self.assertEqual(results[loc_name], expected * 100, loc_name)
+    #enddef
+
+    def testNewFromStrParsersEqual(self):
+        """Compare the hand-written parser with the original PCRE2-based one"""
+
+        rnd = random.Random(42)
+        digits = lambda n: "".join(rnd.choice("0123456789") for _i in range(n))
+        space = lambda: rnd.choice(["", "", " ", "  ", "\t", "\n", "\v"])
+        units = ["B", "KiB", "MiB", "GiB", "TiB", "PiB", "EiB", "ZiB", "YiB",
+                 "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB",
+                 "k", "Ki", "m", "e", "kb", "KiBB", "K.B", "x", "1"]
+
+        specs = ["", " ", ".", "e5", "+", "-", "1", "-0", "0.0", "1.", ".5", "1e", "1.e3",
+                 "1..2", "1 K B", "1 KiB junk", "1e-30", "1e30 YB",
+                 "18446744073709551615", "18446744073709551616", "-9223372036854775808 B",
+                 "0000000000000000000000000001 KiB", "1.0000000000000000000000000000 YB"]
+        for _i in range(3000):
+            spec = space() + rnd.choice(["", "", "-", "+", "+-"]) + digits(rnd.choice([0, 1, 2, 5, 10, 19, 20, 30]))
+            if rnd.random() < 0.5:
+                spec += rnd.choice([".", ".", ".."]) + digits(rnd.choice([0, 1, 3, 10, 20]))
+            if rnd.random() < 0.3:
+                spec += rnd.choice("eE") + rnd.choice(["", "-", "+"]) + digits(rnd.choice([0, 1, 2]))
+            spec += space()
+            if rnd.random() < 0.7:
+                spec += rnd.choice([str.lower, str.upper, str])(rnd.choice(units))
+            specs.append(spec + space())
+
+        # the reference parser is only built into a library used by the tests
+        try:
+            ref_bytesize = ctypes.CDLL("libbytesize_reference.so")
+        except OSError:
+            self.skipTest("library with the reference parser not available")
+        ref_bytesize.bs_size_new_from_str_reference.restype = ctypes.c_void_p
+        ref_bytesize.bs_size_new_from_str_reference.argtypes = [ctypes.c_char_p, ctypes.POINTER(ctypes.POINTER(SizeErrorStruct))]
+        ref_bytesize.bs_size_get_bytes_str.restype = ctypes.c_void_p
+        ref_bytesize.bs_size_get_bytes_str.argtypes = [ctypes.c_void_p]
+        ref_bytesize.bs_size_free.argtypes = [ctypes.c_void_p]
+        ref_bytesize.bs_clear_error.argtypes = [ctypes.POINTER(ctypes.POINTER(SizeErrorStruct))]
+
+        def parse(spec):
+            try:
+                return SizeStruct.new_from_str(spec).get_bytes_str()
+            except InvalidSpecError as e:
+                return "error: %s" % e
+
+        def parse_reference(spec):
+            err = ctypes.POINTER(SizeErrorStruct)()
+            size = ref_bytesize.bs_size_new_from_str_reference(spec.encode("utf-8"), ctypes.byref(err))
+            if err:
+                ret = "error: %s" % str(err.contents.msg, "utf-8")
+                ref_bytesize.bs_clear_error(ctypes.byref(err))
+                return ret
+            bytes_str = ref_bytesize.bs_size_get_bytes_str(size)
+            ret = str(ctypes.string_at(bytes_str), "utf-8")
+            _libc.free(ctypes.c_void_p(bytes_str))
+            ref_bytesize.bs_size_free(size)
+            return ret
+
+        for spec in specs:
+            self.assertEqual(parse(spec), parse_reference(spec), "different results for %r" % spec)
+    #enddef
+
+    def testValidateStr(self):
+        self.assertEqual(SizeStruct.validate_str("1.5 KiB"), (MAGNITUDE_INT64, None))
+        self.assertEqual(SizeStruct.validate_str("-8 EiB"), (MAGNITUDE_INT64, None))
+        self.assertEqual(SizeStruct.validate_str("8 EiB"), (MAGNITUDE_UINT64, None))
+        self.assertEqual(SizeStruct.validate_str("18446744073709551615"), (MAGNITUDE_UINT64, None))
+        self.assertEqual(SizeStruct.validate_str("16 EiB"), (MAGNITUDE_BIG, None))
+        self.assertEqual(SizeStruct.validate_str("-8.1 EiB"), (MAGNITUDE_BIG, None))
+        self.assertEqual(SizeStruct.validate_str("1.8446744073709551615e19"), (MAGNITUDE_UINT64, None))
+        self.assertEqual(SizeStruct.validate_str("1.8446744073709551616e19"), (MAGNITUDE_BIG, None))
+
+        # huge exponents are recognized without computing the number
+        for spec in ("1e9999999999999", "-1e9999999999999 YiB", "0.001e100000000", "1e100000000 B"):
+            self.assertEqual(SizeStruct.validate_str(spec), (MAGNITUDE_BIG, None), spec)
+        for spec in ("1e-9999999999999 YiB", "0e9999999999999", "0.000000000000000000000000e9999999999999"):
+            self.assertEqual(SizeStruct.validate_str(spec), (MAGNITUDE_INT64, None), spec)
+        self.assertEqual(SizeStruct.validate_str("1 KiBB"), (None, "Failed to recognize unit from the spec"))
+        self.assertEqual(SizeStruct.validate_str("1,5 KiB"), (None, "Failed to parse size spec"))
+        self.assertEqual(SizeStruct.validate_str(""), (None, "Failed to parse size spec"))
+
+        loc = new_locale("C")
+        self.addCleanup(_libc.freelocale, loc)
+        self.assertEqual(SizeStruct.validate_str("1.5 KiB", loc), (MAGNITUDE_INT64, None))
+        self.assertEqual(SizeStruct.validate_str("1,5 KiB", loc), (None, "Failed to parse size spec"))
+
+        # without a place to store the error to, the thread's last error is set
+        self.assertTrue(c_bytesize.bs_size_validate_str(b"1 KiB", None, None, None))
+        self.assertFalse(c_bytesize.bs_size_validate_str(None, None, None, None))
+        err = c_bytesize.bs_get_last_error_info()
+        self.assertEqual((err.contents.code, err.contents.msg), (0, b"No size spec given"))
+        self.assertFalse(c_bytesize.bs_size_validate_str(b"1 X", None, None, None))
+        self.assertEqual(err.contents.msg, b"Failed to recognize unit from the spec")
+
+        # the error is per-thread
+        errs = []
+        thread = threading.Thread(target=lambda: errs.append(bool(c_bytesize.bs_get_last_error_info())))
+        thread.start()
+        thread.join()
+        self.assertEqual(errs, [False])
+    #enddef
+
+    @requires_locales({'cs_CZ.UTF-8'})
+    def testValidateStrLocaleCsCZ(self):
+        loc = new_locale("cs_CZ.UTF-8")
+        self.addCleanup(_libc.freelocale, loc)
+        self.assertEqual(SizeStruct.validate_str("1,5 KiB", loc), (MAGNITUDE_INT64, None))
+        self.assertEqual(SizeStruct.validate_str("1.5 KiB", loc), (MAGNITUDE_INT64, None))
+    #enddef
+
+    def testParseScalar(self):
+        rand = random.Random(self.id())
+        specs = ["1 KiB", "-1.5 GiB", "x", "1 KiBB", "", "9223372036854775807", "9223372036854775808",
+                 "-9223372036854775808", "-9223372036854775809", "18446744073709551615 B", "16 EiB", "-0",
+                 "0.5", "1,5 KiB", "1e3 MB", "10 EiB", "-8 EiB", "-8.0000000000000000001 EiB",
+                 "000000000000000000001.5 KiB"]
+        specs += ["%d.%d %s" % (rand.getrandbits(rand.choice([8, 30, 54, 63, 64])), rand.randint(0, 999),
+                                rand.choice(["", "B", "k", "KiB", "MB", "GiB", "eb", "YiB"])) for _i in range(200)]
+        for spec in specs:
+            try:
+                expected = int(SizeStruct.new_from_str_l(spec, None).get_bytes_str())
+            except InvalidSpecError as e:
+                for fn in (SizeStruct.parse_u64, SizeStruct.parse_i64):
+                    with self.assertRaisesRegex(InvalidSpecError, "^" + str(e).split(":")[0] + "$"):
+                        fn(spec)
+                continue
+
+            for fn, lo, hi in ((SizeStruct.parse_u64, 0, 2**64 - 1), (SizeStruct.parse_i64, -2**63, 2**63 - 1)):
+                if lo <= expected <= hi:
+                    self.assertEqual(fn(spec), expected, spec)
+                else:
+                    with self.assertRaises(OverflowError):
+                        fn(spec)
+
+        # huge exponents are reported as overflows without computing the number
+        for spec in ("1e9999999999999", "-1e9999999999999 YiB", "0.001e100000000", "1e100000000 B"):
+            for fn in (SizeStruct.parse_u64, SizeStruct.parse_i64):
+                with self.assertRaisesRegex(OverflowError, "too big"):
+                    fn(spec)
+        for spec in ("1e-9999999999999 YiB", "0e9999999999999", "-1e-100000000"):
+            self.assertEqual(SizeStruct.parse_u64(spec), 0)
+            self.assertEqual(SizeStruct.parse_i64(spec), 0)
+
+        loc = new_locale("C")
+        self.addCleanup(_libc.freelocale, loc)
+        self.assertEqual(SizeStruct.parse_u64("1.5 KiB", loc), 1536)
+        self.assertFalse(c_bytesize.bs_parse_u64(None, None, ctypes.byref(ctypes.c_uint64()), None))
+        self.assertEqual(c_bytesize.bs_get_last_error_info().contents.msg, b"No size spec given")
+    #enddef
+
+    @requires_locales({'cs_CZ.UTF-8'})
+    def testParseScalarLocaleCsCZ(self):
+        loc = new_locale("cs_CZ.UTF-8")
+        self.addCleanup(_libc.freelocale, loc)
+        self.assertEqual(SizeStruct.parse_u64("1,5 KiB", loc), 1536)
+        self.assertEqual(SizeStruct.format_u64_human(1536, KiB, 2, loc), "1,5 KiB")
+    #enddef
+
+    def testScalar(self):
+        rand = random.Random(self.id())
+        vals = [0, 1, 1023, 1024, 1536, 2**53 - 1, 2**53 + 1, 2**63 - 1, 2**63, 2**64 - 1]
+        vals += [rand.getrandbits(rand.choice([8, 20, 40, 53, 54, 63, 64])) for _i in range(200)]
+        units = [B, KiB, GiB, YiB, KB, KB + 2, KB + 5, KB + 7]
+        loc = new_locale("C")
+        self.addCleanup(_libc.freelocale, loc)
+
+        for val in vals:
+            size = SizeStruct.new_from_bytes(val, 1)
+            for min_unit, places in ((B, 2), (KiB, 0), (GiB, -1)):
+                self.assertEqual(SizeStruct.format_u64_human(val, min_unit, places),
+                                 size.human_readable_l(min_unit, places, None))
+                self.assertEqual(SizeStruct.format_u64_human(val, min_unit, places, loc),
+                                 size.human_readable_l(min_unit, places, loc))
+            for unit in units:
+                self.assertEqual(SizeStruct.convert_u64(val, unit), size.convert_to_double(unit), (val, unit))
+            for round_to in (1, 3, 4096, 10**9 + 7, 2**63, 2**64 - 1):
+                for rounding in (ROUND_UP, ROUND_DOWN, ROUND_HALF_UP):
+                    expected = int(size.round_to_nearest(SizeStruct.new_from_bytes(round_to, 1), rounding).get_bytes_str())
+                    if expected < 2**64:
+                        self.assertEqual(SizeStruct.round_u64(val, round_to, rounding), expected, (val, round_to))
+                    else:
+                        with self.assertRaises(OverflowError):
+                            SizeStruct.round_u64(val, round_to, rounding)
+
+        with self.assertRaisesRegex(InvalidSpecError, "Invalid unit spec given"):
+            SizeStruct.convert_u64(1, 42)
+        with self.assertRaises(ZeroDivisionError):
+            SizeStruct.round_u64(1, 0, ROUND_UP)
+    #enddef
+
     def testNewFromBytes(self):
         actual = SizeStruct.new_from_bytes(0, 0).get_bytes()
         expected = (0, 0)
@@ -191,6 +515,66 @@ class SizeTestCase(unittest.TestCase):
 
     #enddef
 
+    def testNewFromDouble(self):
+        self.assertEqual(SizeStruct.new_from_double(1024.75).get_bytes(), (1024, 1))
+        self.assertEqual(SizeStruct.new_from_double(-1.5).get_bytes(), (1, -1))
+        self.assertEqual(SizeStruct.new_from_double(0.5).get_bytes(), (0, 0))
+        self.assertEqual(SizeStruct.new_from_double(2.0**80).get_bytes_str(), str(2**80))
+        self.assertEqual(SizeStruct.new_from_double(-2.0**63).get_bytes(), (2**63, -1))
+
+        for val in (float("inf"), float("-inf"), float("nan")):
+            with self.assertRaises(InvalidSpecError):
+                SizeStruct.new_from_double(val)
+    #enddef
+
+    def testNewFromRational(self):
+        num = SizeStruct.new_from_bytes(7, -1)
+        den = SizeStruct.new_from_bytes(2, 1)
+        self.assertEqual(SizeStruct.new_from_rational(num, den).get_bytes(), (3, -1))
+
+        num = SizeStruct.new_from_str("%d B" % -2**63)
+        den = SizeStruct.new_from_bytes(1, -1)
+        self.assertEqual(SizeStruct.new_from_rational(num, den).get_bytes(), (2**63, 1))
+
+        num = SizeStruct.new_from_str("%d B" % (3**100))
+        den = SizeStruct.new_from_str("%d B" % (-(2**90)))
+        self.assertEqual(SizeStruct.new_from_rational(num, den).get_bytes_str(), str(-(3**100 // 2**90)))
+
+        with self.assertRaises(ZeroDivisionError):
+            SizeStruct.new_from_rational(num, SizeStruct.new())
+    #enddef
+
+    def testImportExport(self):
+        for val in (0, 1, 255, 256, 2**63, 2**64 - 1, 2**64, 3**100):
+            for sgn in (1, -1):
+                x = SizeStruct.import_bytes(val.to_bytes(max(1, (val.bit_length() + 7) // 8) + 1, "little"), sgn)
+                self.assertEqual(x.get_bytes_str(), str(sgn * val))
+                self.assertEqual(x.export_bytes(), (val.to_bytes((val.bit_length() + 7) // 8, "little"), sgn if val else 0))
+
+        # most significant byte first
+        x = c_bytesize.bs_size_import(b"\x00\x01\x00", 3, 1, 1).contents
+        self.assertEqual(x.get_bytes(), (256, 1))
+        buf = ctypes.create_string_buffer(2)
+        self.assertEqual(c_bytesize.bs_size_export(x, buf, len(buf), 1, None), 2)
+        self.assertEqual(buf.raw, b"\x01\x00")
+
+        # nothing written if the buffer is too small
+        self.assertEqual(c_bytesize.bs_size_export(x, buf, 1, 1, None), 2)
+        self.assertEqual(buf.raw, b"\x01\x00")
+    #enddef
+
+    def testGetBytesBig(self):
+        x = SizeStruct.new_from_str("%d B" % (2**64 - 1))
+        self.assertEqual(x.get_bytes(), (2**64 - 1, 1))
+        x = SizeStruct.new_from_str("%d B" % -(2**64 - 1))
+        self.assertEqual(x.get_bytes(), (2**64 - 1, -1))
+
+        for val in (2**64, -2**64, -2**70):
+            x = SizeStruct.new_from_str("%d B" % val)
+            with self.assertRaises(OverflowError):
+                x.get_bytes()
+    #enddef
+
     def testNewFromSizeStruct(self):
         tempSizeStruct = SizeStruct.new_from_bytes(17, 1)
         actual = SizeStruct.new_from_size(tempSizeStruct).get_bytes()
@@ -309,6 +693,35 @@ class SizeTestCase(unittest.TestCase):
         self.assertEqual(actual, expected)
     #enddef
 
+    def testSubFromBytes(self):
+        x = SizeStruct.new_from_bytes(8, 1)
+        actual = x.sub_from_bytes(16).get_bytes()
+        expected = (8, 1)
+        self.assertEqual(actual, expected)
+
+        x = SizeStruct.new_from_bytes(8, -1)
+        actual = x.sub_from_bytes(8).get_bytes()
+        expected = (16, 1)
+        self.assertEqual(actual, expected)
+
+        x = SizeStruct.new_from_bytes(2**64 - 1, 1)
+        actual = x.sub_from_bytes(0).get_bytes()
+        expected = (2**64 - 1, -1)
+        self.assertEqual(actual, expected)
+
+        x = SizeStruct.new_from_bytes(2**64 - 1, -1)
+        actual = x.sub_from_bytes(2**64 - 1).get_bytes_str()
+        self.assertEqual(actual, str(2 * (2**64 - 1)))
+    #enddef
+
+    def testNeg(self):
+        for val in (0, 1, -1, 2**63 - 1, -2**63, 2**63, 2**64 - 1, -2**64 + 1, 2**100, -2**100):
+            x = SizeStruct.import_bytes(abs(val).to_bytes(16, "little"), -1 if val < 0 else 1)
+            self.assertEqual(x.neg().get_bytes_str(), str(-val))
+            # the original size is not modified
+            self.assertEqual(x.get_bytes_str(), str(val))
+    #enddef
+
     def testCmp(self):
         x = SizeStruct.new_from_str("1 KiB")
         y = SizeStruct.new_from_str("-1 KiB")
@@ -364,11 +777,80 @@ class SizeTestCase(unittest.TestCase):
         self.assertEqual(cmpResult, 0)
     #enddef
 
+    def testCmpInt64(self):
+        x = SizeStruct.new_from_str("-1 KiB")
+        self.assertEqual(x.cmp_int64(-1025, False), 1)
+        self.assertEqual(x.cmp_int64(-1024, False), 0)
+        self.assertEqual(x.cmp_int64(-1023, False), -1)
+        self.assertEqual(x.cmp_int64(0, False), -1)
+        self.assertEqual(x.cmp_int64(-1024, True), 0)
+        self.assertEqual(x.cmp_int64(1024, True), 0)
+        self.assertEqual(x.cmp_int64(-1023, True), 1)
+
+        x = SizeStruct.new_from_bytes(2**64 - 1, 1)
+        self.assertEqual(x.cmp_int64(2**63 - 1, False), 1)
+        self.assertEqual(x.cmp_int64(-2**63, False), 1)
+        x = SizeStruct.new_from_bytes(2**64 - 1, -1)
+        self.assertEqual(x.cmp_int64(-2**63, False), -1)
+        self.assertEqual(x.cmp_int64(-2**63, True), 1)
+        x = SizeStruct.new_from_bytes(2**63, -1)
+        self.assertEqual(x.cmp_int64(-2**63, False), 0)
+        self.assertEqual(x.cmp_int64(-2**63, True), 0)
+    #enddef
+
     def testConvertTo(self):
         x = SizeStruct.new_from_str("1 KiB")
         x.convert_to(KiB)
     #enddef
 
+    def testConvertToPrec(self):
+        radix = locale.nl_langinfo(locale.RADIXCHAR)
+        x = SizeStruct.new_from_str("1 KB")
+        self.assertEqual(x.convert_to(KiB, 5).replace(radix, "."), "0.97656")
+        self.assertEqual(x.convert_to(KiB, DIGITS_DOUBLE).replace(radix, "."), "0.9765625")
+        self.assertEqual(x.convert_to(KiB, 100).replace(radix, "."), "0.9765625")
+
+        x = SizeStruct.new_from_str("1 B")
+        self.assertEqual(x.convert_to(KB, 3).replace(radix, "."), "0.001")
+        self.assertEqual(float(x.convert_to(KB, DIGITS_DOUBLE).replace(radix, ".")), 0.001)
+
+        # not representable as a double exactly
+        x = SizeStruct.new_from_str("%d B" % (2**64 + 1))
+        self.assertEqual(x.convert_to(GiB, DIGITS_DOUBLE).replace(radix, "."), "17179869184")
+        self.assertEqual(x.convert_to(GiB, 30).replace(radix, "."), "17179869184.0000000009313225746")
+
+        with self.assertRaises(InvalidSpecError):
+            x.convert_to(KiB, -1)
+    #enddef
+
+    def testConvertToDouble(self):
+        x = SizeStruct.new_from_str("1 KB")
+        self.assertEqual(x.convert_to_double(KiB), 0.9765625)
+        self.assertEqual(x.convert_to_double(KB), 1.0)
+
+        # correctly rounded, even for values not fitting into a double
+        for val in (1, 3, -7, 2**53 + 1, 2**64 - 1, 3**50, -(10**30 + 7)):
+            x = SizeStruct.new_from_str("%d B" % val)
+            self.assertEqual(x.convert_to_double(GiB), val / 2**30)
+            self.assertEqual(x.convert_to_double(KB), val / 1000)
+
+        with self.assertRaises(InvalidSpecError):
+            x.convert_to_double(42)
+    #enddef
+
+    def testConvertToRational(self):
+        x = SizeStruct.new_from_str("1 KB")
+        num, den = x.convert_to_rational(KiB)
+        self.assertEqual((num.get_bytes(), den.get_bytes()), ((125, 1), (128, 1)))
+
+        x = SizeStruct.new_from_str("-3 YB")
+        num, den = x.convert_to_rational(KiB)
+        self.assertEqual((num.get_bytes_str(), den.get_bytes()), (str(-3 * 10**24 // 2**10), (1, 1)))
+
+        num, den = SizeStruct.new().convert_to_rational(YiB)
+        self.assertEqual((num.get_bytes(), den.get_bytes()), ((0, 0), (1, 1)))
+    #enddef
+
     def testDiv(self):
         x = SizeStruct.new_from_str("1 KiB")
         y = SizeStruct.new_from_str("-0.1 KiB")
@@ -389,6 +871,12 @@ class SizeTestCase(unittest.TestCase):
         y = SizeStruct.new_from_str("0.1 KiB")
         divResult = x.div(y)
         self.assertEqual(divResult, (10, -1))
+
+        # quotients not fitting into 64 bits are errors regardless of the sign
+        x = SizeStruct.new_from_str("-1 YiB")
+        y = SizeStruct.new_from_str("3 B")
+        with self.assertRaises(OverflowError):
+            x.div(y)
     #enddef
 
     def testDivInt(self):
@@ -435,6 +923,30 @@ class SizeTestCase(unittest.TestCase):
         strSizeStruct = SizeStruct.new_from_str("100 GiB").human_readable(KiB, 0, False)
         self.assertEqual(strSizeStruct, "100 GiB")
 
+        # the bigger unit is only used for values above 1024
+        strSizeStruct = SizeStruct.new_from_str("1 MiB").human_readable(KiB, 2, False)
+        self.assertEqual(strSizeStruct, "1024 KiB")
+
+        strSizeStruct = SizeStruct.new_from_str("-1025 KiB").human_readable(KiB, 2, False)
+        self.assertEqual(strSizeStruct, "-1 MiB")
+
+        strSizeStruct = SizeStruct.new_from_str("2048 YiB").human_readable(KiB, 2, False)
+        self.assertEqual(strSizeStruct, "2048 YiB")
+
+        # rounding is done half up (away from zero)
+        strSizeStruct = SizeStruct.new_from_str("1152 B").human_readable(KiB, 2, False)
+        self.assertEqual(strSizeStruct, "1.13 KiB")
+
+        strSizeStruct = SizeStruct.new_from_str("512 B").human_readable(KiB, 0, False)
+        self.assertEqual(strSizeStruct, "1 KiB")
+
+        strSizeStruct = SizeStruct.new_from_str("-5 B").human_readable(KiB, 2, False)
+        self.assertEqual(strSizeStruct, "-0 KiB")
+
+        # values too big for the integer arithmetics
+        strSizeStruct = SizeStruct.new_from_str("%d B" % (2**130 + 2**120)).human_readable(KiB, 3, False)
+        self.assertEqual(strSizeStruct, "1126999418470400 YiB")
+
         # test that the result of human_readable() can be parsed back
         strSizeStruct = SizeStruct.new_from_str("100 GiB").human_readable(GiB, 0, False)
         self.assertEqual(SizeStruct.new_from_str(strSizeStruct).get_bytes(), (100 * 1024**3, 1))
@@ -451,6 +963,98 @@ class SizeTestCase(unittest.TestCase):
         self.assertEqual(strSizeStruct, "0,98 KiB")
         locale.setlocale(locale.LC_ALL, DEFAULT_LOCALE);
 
+    def testHumanReadableL(self):
+        x = SizeStruct.new_from_str("1 KB")
+        self.assertEqual(x.human_readable_l(KiB, 2, None), "0.98 KiB")
+        loc = new_locale("C")
+        self.assertEqual(x.human_readable_l(KiB, 2, loc), "0.98 KiB")
+        _libc.freelocale(loc)
+
+        # too big for the integer arithmetics
+        x = SizeStruct.new_from_str("%d B" % (2**130 + 2**120 + 2**116))
+        self.assertEqual(x.human_readable_l(KiB, 3, None), "1127068137947136 YiB")
+        self.assertEqual(x.human_readable_l(YiB, -1, None), x.human_readable(YiB, -1, False))
+    #enddef
+
+    @requires_locales({'cs_CZ.UTF-8'})
+    def testHumanReadableLLocaleCsCZ(self):
+        loc = new_locale("cs_CZ.UTF-8")
+        self.addCleanup(_libc.freelocale, loc)
+
+        x = SizeStruct.new_from_str("1 KB")
+        self.assertEqual(x.human_readable_l(KiB, 2, loc), "0,98 KiB")
+        self.assertEqual(x.human_readable(KiB, 2, True), "0.98 KiB")
+
+        locale.setlocale(locale.LC_ALL, 'cs_CZ.UTF-8')
+        self.assertEqual(x.human_readable_l(KiB, 2, None), "0.98 KiB")
+
+        x = SizeStruct.new_from_str("%d B" % (2**130 + 2**120 + 2**116))
+        self.assertEqual(x.human_readable_l(YiB, 5, loc), x.human_readable(YiB, 5, True))
+    #enddef
+
+    def testStrBuf(self):
+        x = SizeStruct.new_from_str("-1 KiB")
+
+        # snprintf-like semantics -- always terminated, full length returned
+        buf = ctypes.create_string_buffer(4)
+        ret = c_bytesize.bs_size_get_bytes_str_buf(x, buf, len(buf))
+        self.assertEqual(ret, 5)
+        self.assertEqual(buf.value, b"-10")
+
+        buf = ctypes.create_string_buffer(6)
+        ret = c_bytesize.bs_size_get_bytes_str_buf(x, buf, len(buf))
+        self.assertEqual(ret, 5)
+        self.assertEqual(buf.value, b"-1024")
+
+        ret = c_bytesize.bs_size_human_readable_buf(x, KiB, 2, False, None, 0)
+        self.assertEqual(ret, len("-1 KiB"))
+
+        # longer than the buffers used internally
+        x = SizeStruct.new_from_str("1 KiB")
+        self.assertEqual(x.human_readable(KiB, 1000, False), "1 KiB")
+        self.assertEqual(x.add(SizeStruct.new_from_str("1 B")).human_readable(KiB, 1000, False),
+                         "1.0009765625 KiB")
+        x = SizeStruct.new_from_str("1" * 1000)
+        self.assertEqual(x.get_bytes_str(), "1" * 1000)
+        self.assertEqual(x.true_div_int(1), x.convert_to(0))
+
+        # errors
+        buf = ctypes.create_string_buffer(32)
+        ret = c_bytesize.bs_size_convert_to_buf(x, 42, buf, len(buf), None)
+        self.assertEqual(ret, -1)
+        with self.assertRaises(InvalidSpecError):
+            x.convert_to(42)
+    #enddef
+
+    def testAllocBalance(self):
+        set_alloc_debug(True)
+        self.addCleanup(set_alloc_debug, False)
+        before = get_alloc_counts()
+
+        x = SizeStruct.new_from_str("1.5 KiB")
+        y = SizeStruct.new_from_bytes(2**64 - 1, -1)
+        self.assertEqual(get_alloc_counts()["sizes"], before["sizes"] + 2)
+
+        # the functions returning newly allocated strings give bytes and free
+        # the original strings
+        self.assertEqual(c_bytesize.bs_size_get_bytes_str(x), b"1536")
+        self.assertEqual(c_bytesize.bs_size_human_readable(x, KiB, 2, False), b"1.5 KiB")
+        self.assertEqual(c_bytesize.bs_size_convert_to(x, KiB, None), b"1.5")
+        self.assertEqual(c_bytesize.bs_size_true_div(x, x, None), b"1")
+        self.assertEqual(c_bytesize.bs_size_true_div_int(x, 3, None), b"512")
+        self.assertIsNone(c_bytesize.bs_size_true_div_int(x, 0, None))
+
+        for _i in range(100):
+            x.add(y).sub(x).mul_int(3).div_int(2).mod(x).round_to_nearest(x, ROUND_UP)
+            x.get_bytes_str()
+            x.human_readable(KiB, -1, True)
+        del x, y
+        gc.collect()
+
+        after = get_alloc_counts()
+        self.assertEqual((after["sizes"], after["strings"]), (before["sizes"], before["strings"]))
+    #enddef
+
     def testSgn(self):
         sgn = SizeStruct.new_from_str("12 KiB").sgn()
         self.assertEqual(sgn, 1)
@@ -474,6 +1078,49 @@ class SizeTestCase(unittest.TestCase):
         self.assertAlmostEqual(divResult, 1024.0)
     #enddef
 
+    def testTrueDivPrec(self):
+        radix = locale.nl_langinfo(locale.RADIXCHAR)
+        x = SizeStruct.new_from_str("1 KiB")
+        y = SizeStruct.new_from_str("3 B")
+        self.assertEqual(x.true_div(y, 4).replace(radix, "."), "341.3")
+        self.assertEqual(float(x.true_div(y, DIGITS_DOUBLE).replace(radix, ".")), 1024 / 3)
+        self.assertEqual(x.true_div_int(3, 4).replace(radix, "."), "341.3")
+        self.assertEqual(float(x.true_div_int(3, DIGITS_DOUBLE).replace(radix, ".")), 1024 / 3)
+
+        # the same digits as with the full precision
+        self.assertTrue(x.true_div(y).startswith(x.true_div(y, 20)[:-1]))
+
+        with self.assertRaises(ZeroDivisionError):
+            x.true_div(SizeStruct.new(), DIGITS_DOUBLE)
+        with self.assertRaises(ZeroDivisionError):
+            x.true_div_int(0, 10)
+    #enddef
+
+    def testTrueDivDouble(self):
+        for (val1, val2) in ((1024, 3), (-1, 7), (2**64 + 1, 2**64 - 1), (3**60, -(5**30)), (0, -5),
+                             (-239515636320654201497, 7840489138830645955755595391471603208)):
+            x = SizeStruct.new_from_str("%d B" % val1)
+            y = SizeStruct.new_from_str("%d B" % val2)
+            self.assertEqual(x.true_div_double(y), val1 / val2)
+            if 0 < val2 <= 2**64 - 1:
+                self.assertEqual(x.true_div_int_double(val2), val1 / val2)
+
+        with self.assertRaises(ZeroDivisionError):
+            x.true_div_double(SizeStruct.new())
+        with self.assertRaises(ZeroDivisionError):
+            x.true_div_int_double(0)
+    #enddef
+
+    def testTrueDivRational(self):
+        x = SizeStruct.new_from_str("1 KiB")
+        y = SizeStruct.new_from_str("-24 B")
+        num, den = x.true_div_rational(y)
+        self.assertEqual((num.get_bytes(), den.get_bytes()), ((128, -1), (3, 1)))
+
+        with self.assertRaises(ZeroDivisionError):
+            x.true_div_rational(SizeStruct.new())
+    #enddef
+
     def testMod(self):
         x = SizeStruct.new_from_str("1024 B")
         y = SizeStruct.new_from_str("1000 B")
@@ -522,6 +1169,47 @@ class SizeTestCase(unittest.TestCase):
         self.assertEqual(actual, (12, -1))
     #enddef
 
+    def testMulFloatStrL(self):
+        x = SizeStruct.new_from_str("8 B")
+        actual = x.mul_float_str_l("1.51", None).get_bytes()
+        self.assertEqual(actual, (12, 1))
+        with self.assertRaises(InvalidSpecError):
+            x.mul_float_str_l("1,51", None)
+    #enddef
+
+    @requires_locales({'cs_CZ.UTF-8'})
+    def testMulFloatStrLLocaleCsCZ(self):
+        loc = new_locale("cs_CZ.UTF-8")
+        self.addCleanup(_libc.freelocale, loc)
+
+        x = SizeStruct.new_from_str("8 B")
+        for num_str in ("1,51", "1.51"):
+            actual = x.mul_float_str_l(num_str, loc).get_bytes()
+            self.assertEqual(actual, (12, 1))
+        with self.assertRaises(InvalidSpecError):
+            x.mul_float_str("1,51")
+    #enddef
+
+    def testMulFloatStrPrec(self):
+        x = SizeStruct.new_from_str("8 B")
+        self.assertEqual(x.mul_float_str("1.51", 10).get_bytes(), (12, 1))
+        self.assertEqual(x.mul_float_str("-1.51", DIGITS_DOUBLE).get_bytes(), (12, -1))
+        self.assertEqual(x.mul_float_str("1e3", DIGITS_DOUBLE).get_bytes(), (8000, 1))
+
+        x = SizeStruct.new_from_str("1 EiB")
+        self.assertEqual(x.mul_float_str("1024", DIGITS_DOUBLE).get_bytes_str(), str(2**70))
+
+        x = SizeStruct.new_from_str("8 B")
+        x.grow_mul_float_str("0.5", DIGITS_DOUBLE)
+        self.assertEqual(x.get_bytes(), (4, 1))
+        x.grow_mul_float_str("0.5", 5)
+        self.assertEqual(x.get_bytes(), (2, 1))
+
+        for fl_str in ("0x10", "inf", "nan", "1.5 B", ""):
+            with self.assertRaises(InvalidSpecError):
+                x.mul_float_str(fl_str, DIGITS_DOUBLE)
+    #enddef
+
     def testMulInt(self):
         x = SizeStruct.new_from_str("8 B")
         y = 2
@@ -548,6 +1236,185 @@ class SizeTestCase(unittest.TestCase):
         self.assertEqual(actual, expected)
     #enddef
 
+    def testMulInt64(self):
+        x = SizeStruct.new_from_str("8 B")
+        actual = x.mul_int64(-2).get_bytes()
+        expected = (16, -1)
+        self.assertEqual(actual, expected)
+
+        # beyond 64 bits
+        x = SizeStruct.new_from_bytes(8, -1)
+        actual = x.mul_int64(-2**62).get_bytes_str()
+        expected = str(2**65)
+        self.assertEqual(actual, expected)
+
+        x = SizeStruct.new_from_bytes(2**63, -1)
+        self.assertEqual(x.mul_int64(-1).get_bytes(), (2**63, 1))
+        self.assertEqual(x.mul_int64(-2**63).get_bytes_str(), str(2**126))
+        self.assertEqual(x.mul_int64(0).get_bytes(), (0, 0))
+    #enddef
+
+    def testMulRational(self):
+        def size(val):
+            return SizeStruct.import_bytes(abs(val).to_bytes(32, "little"), -1 if val < 0 else 1)
+
+        for (val, num, den) in ((10, 1, 10), (10, 3, 10), (-10, 3, 10), (10, -3, 10), (10, 3, -10),
+                                (7, 0, 5), (2**63, -2**63, -1), (-2**63, -1, 1), (2**63 - 1, 2**63 - 1, 3),
+                                (2**100 + 1, 3, 2**64), (-2**100, 2**70, -2**80 + 1), (2**64, 1, 2**128)):
+            expected = abs(val * num) // abs(den) * (-1 if (val * num < 0) != (den < 0) else 1)
+            actual = size(val).mul_rational(size(num), size(den)).get_bytes_str()
+            self.assertEqual(actual, str(expected), "%d * %d / %d" % (val, num, den))
+
+        with self.assertRaises(ZeroDivisionError):
+            size(10).mul_rational(size(1), size(0))
+    #enddef
+
+    def testReductions(self):
+        def size(val):
+            return SizeStruct.import_bytes(abs(val).to_bytes(32, "little"), -1 if val < 0 else 1)
+
+        for vals in ([], [0], [1, 2, 3], [-5, 3], [2**63 - 1, 1, -2], [2**63 - 1] * 5 + [-2**63] * 3,
+                     [2**100, -1, 2**64, -2**100 - 5], [-2**63, -2**63, 7], [4, 4, 1, 4]):
+            sizes = [size(val) for val in vals]
+            self.assertEqual(SizeStruct.sum(sizes).get_bytes_str(), str(sum(vals)), vals)
+            if not vals:
+                self.assertIsNone(SizeStruct.min(sizes))
+                self.assertIsNone(SizeStruct.max(sizes))
+                with self.assertRaises(ZeroDivisionError):
+                    SizeStruct.mean(sizes, ROUND_DOWN)
+                continue
+            self.assertEqual(SizeStruct.min(sizes).get_bytes_str(), str(min(vals)), vals)
+            self.assertEqual(SizeStruct.max(sizes).get_bytes_str(), str(max(vals)), vals)
+            total, count = sum(vals), len(vals)
+            self.assertEqual(SizeStruct.mean(sizes, ROUND_DOWN).get_bytes_str(), str(total // count), vals)
+            self.assertEqual(SizeStruct.mean(sizes, ROUND_UP).get_bytes_str(), str(-(-total // count)), vals)
+            self.assertEqual(SizeStruct.mean(sizes, ROUND_HALF_UP).get_bytes_str(),
+                             str((total + count // 2) // count), vals)
+    #enddef
+
+    def testParseBatch(self):
+        specs = ["1 KiB", " -1.5 GiB", "x", "10e3 KB", "1 KiBB", "9223372036854775807", "9223372036854775808",
+                 "-9223372036854775808", "-9223372036854775809", "18446744073709551615 B", "16 EiB", "-0",
+                 "0.00000000000000000001e20", "1 k", ""]
+        for fn, lo, hi in ((SizeStruct.parse_int64_batch, -2**63, 2**63 - 1),
+                           (SizeStruct.parse_uint64_batch, 0, 2**64 - 1)):
+            results, statuses = fn(specs)
+            for spec, result, status in zip(specs, results, statuses):
+                try:
+                    expected = int(SizeStruct.new_from_str(spec).get_bytes_str())
+                except InvalidSpecError:
+                    self.assertEqual((result, status), (0, BATCH_INVALID_SPEC), spec)
+                    continue
+                if lo <= expected <= hi:
+                    self.assertEqual((result, status), (expected, BATCH_OK), spec)
+                else:
+                    self.assertEqual((result, status), (0, BATCH_OVER), spec)
+
+        self.assertEqual(SizeStruct.parse_int64_batch([]), ([], []))
+        self.assertEqual(SizeStruct.parse_int64_batch(["1.5 KiB", "1,5 KiB"], None),
+                         ([1536, 0], [BATCH_OK, BATCH_INVALID_SPEC]))
+        self.assertEqual(SizeStruct.parse_uint64_batch(["1 KiB", None, "2 B"]),
+                         ([1024, 0, 2], [BATCH_OK, BATCH_INVALID_SPEC, BATCH_OK]))
+    #enddef
+
+    @requires_locales({'cs_CZ.UTF-8'})
+    def testParseBatchLocaleCsCZ(self):
+        loc = new_locale("cs_CZ.UTF-8")
+        self.addCleanup(_libc.freelocale, loc)
+        self.assertEqual(SizeStruct.parse_int64_batch(["1,5 KiB", "1.5 KiB", "2 MiB"], loc),
+                         ([1536, 1536, 2 * 1024**2], [BATCH_OK] * 3))
+    #enddef
+
+    def testHumanReadableBatch(self):
+        vals = [0, 1, -1000, 1536, 2**40 + 2**30, -2**70, 2**130 + 2**120 + 2**116]
+        sizes = [SizeStruct.import_bytes(abs(val).to_bytes(32, "little"), -1 if val < 0 else 1) for val in vals]
+        for min_unit, places in ((B, 2), (KiB, 0), (KiB, -1), (GiB, 5)):
+            expected = [size.human_readable(min_unit, places, False) for size in sizes]
+            self.assertEqual(SizeStruct.human_readable_batch(sizes, min_unit, places), expected)
+            loc = new_locale("C")
+            self.assertEqual(SizeStruct.human_readable_batch(sizes, min_unit, places, loc), expected)
+            _libc.freelocale(loc)
+
+        # snprintf-like semantics of the packed buffer
+        arr = (ctypes.POINTER(SizeStruct) * 2)(*(ctypes.pointer(size) for size in sizes[3:5]))
+        buf = ctypes.create_string_buffer(12)
+        offsets = (ctypes.c_size_t * 2)()
+        total = c_bytesize.bs_size_human_readable_batch(arr, 2, B, 2, None, buf, 10, offsets)
+        self.assertEqual(total, len("1.5 KiB\0" "1 TiB\0"))
+        self.assertEqual(list(offsets), [0, 8])
+        self.assertEqual(buf.raw, b"1.5 KiB\0" b"1\0\0\0")
+
+        self.assertEqual(SizeStruct.human_readable_batch([], B, 2), [])
+    #enddef
+
+    def testConvertToDoubleBatch(self):
+        vals = [0, 1, -1000, 1536, 2**60 + 1, -2**100]
+        sizes = [SizeStruct.import_bytes(abs(val).to_bytes(16, "little"), -1 if val < 0 else 1) for val in vals]
+        for unit in (B, KiB, YiB, KB):
+            self.assertEqual(SizeStruct.convert_to_double_batch(sizes, unit),
+                             [size.convert_to_double(unit) for size in sizes])
+        with self.assertRaises(InvalidSpecError):
+            SizeStruct.convert_to_double_batch(sizes, 42)
+    #enddef
+
+    def testRoundToNearestBatch(self):
+        vals = [0, 1, -1, 1500, -1500, 2**63 - 1, -2**63, 2**100 + 7]
+        def sizes():
+            return [SizeStruct.import_bytes(abs(val).to_bytes(16, "little"), -1 if val < 0 else 1) for val in vals]
+
+        for round_to in (SizeStruct.new_from_str("1 KiB"), SizeStruct.new_from_str("-3"),
+                         SizeStruct.new_from_bytes(2**64 - 1, 1)):
+            for rounding in (ROUND_UP, ROUND_DOWN, ROUND_HALF_UP):
+                expected = [size.round_to_nearest(round_to, rounding).get_bytes_str() for size in sizes()]
+                batch = sizes()
+                SizeStruct.round_to_nearest_batch(batch, round_to, rounding)
+                self.assertEqual([size.get_bytes_str() for size in batch], expected)
+
+        batch = sizes()
+        with self.assertRaises(ZeroDivisionError):
+            SizeStruct.round_to_nearest_batch(batch, SizeStruct.new(), ROUND_UP)
+        self.assertEqual([size.get_bytes_str() for size in batch], [str(val) for val in vals])
+    #enddef
+
+    def testBatchThreads(self):
+        self.assertEqual(get_batch_threads(), 1)
+        self.addCleanup(set_batch_threads, 1)
+        with self.assertRaises(ValueError):
+            set_batch_threads(-1)
+
+        # big enough to be split into multiple chunks
+        n = 5 * 4096 + 3
+        specs = ["%d.%d KiB" % (i, i % 10) if i % 97 else "invalid" for i in range(n)]
+        sizes = [SizeStruct.new_from_str("%d" % (i * 1234567)) for i in range(n)]
+        round_to = SizeStruct.new_from_str("1 MiB")
+
+        def run_all():
+            parsed = SizeStruct.parse_int64_batch(specs)
+            formatted = SizeStruct.human_readable_batch(sizes, KiB, 2)
+            converted = SizeStruct.convert_to_double_batch(sizes, KiB)
+            rounded = [SizeStruct.new_from_size(size) for size in sizes]
+            SizeStruct.round_to_nearest_batch(rounded, round_to, ROUND_HALF_UP)
+            return (parsed, formatted, converted, [size.get_bytes_str() for size in rounded])
+
+        def human_readable_raw(buf_len):
+            arr = (ctypes.POINTER(SizeStruct) * n)(*(ctypes.pointer(size) for size in sizes))
+            buf = ctypes.create_string_buffer(buf_len)
+            offsets = (ctypes.c_size_t * n)()
+            total = c_bytesize.bs_size_human_readable_batch(arr, n, KiB, 2, None, buf, buf_len, offsets)
+            return (total, buf.raw, list(offsets))
+
+        expected = run_all()
+        total = human_readable_raw(1)[0]
+        buf_lens = (1, 100, total // 2, total // 2 + 1, total - 1, total)
+        expected_raw = [human_readable_raw(buf_len) for buf_len in buf_lens]
+
+        for n_threads in (4, 0):
+            set_batch_threads(n_threads)
+            self.assertEqual(get_batch_threads(), n_threads)
+            self.assertEqual(run_all(), expected)
+            self.assertEqual([human_readable_raw(buf_len) for buf_len in buf_lens], expected_raw)
+    #enddef
+
     def testRoundToNearest(self):
         x = SizeStruct.new_from_str("1500 B")
         roundTo = SizeStruct.new_from_str("1 KiB")
@@ -660,6 +1527,36 @@ class SizeTestCase(unittest.TestCase):
         self.assertEqual(actual, expected)
     #enddef
 
+    def testGrowBeyond64Bits(self):
+        # values are moved to GMP numbers (and back) when crossing 64 bits
+        x = SizeStruct.new_from_bytes(2**63 - 1, 1)
+        x.grow_bytes(2)
+        self.assertEqual(x.get_bytes_str(), str(2**63 + 1))
+        self.assertEqual(x.cmp_bytes(2**63, False), 1)
+        x.grow_mul_int(2**63)
+        self.assertEqual(x.get_bytes_str(), str((2**63 + 1) * 2**63))
+        x.shrink_div_int(2**63)
+        x.shrink_bytes(2**64 - 1)
+        self.assertEqual(x.get_bytes(), (2**63 - 2, -1))
+
+        x = SizeStruct.new_from_bytes(2**63, -1)
+        self.assertEqual(x.get_bytes_str(), str(-2**63))
+        y = x.sub_bytes(1)
+        self.assertEqual(y.get_bytes_str(), str(-2**63 - 1))
+        self.assertEqual(x.cmp(y, False), 1)
+        self.assertEqual(x.cmp(y, True), -1)
+        self.assertEqual(y.add(x).get_bytes_str(), str(-2**64 - 1))
+        self.assertEqual(y.sub(x).get_bytes(), (1, -1))
+        self.assertEqual(y.mod(x).get_bytes(), (1, 1))
+        self.assertEqual(y.div(x), (1, 1))
+
+        x = SizeStruct.new_from_bytes(2**63 - 1, 1)
+        y = SizeStruct.new_from_bytes(2**62 + 1, 1)
+        self.assertEqual(x.round_to_nearest(y, ROUND_UP).get_bytes_str(), str(2 * (2**62 + 1)))
+        self.assertEqual(x.round_to_nearest(y, ROUND_HALF_UP).get_bytes_str(), str(2 * (2**62 + 1)))
+        self.assertEqual(x.round_to_nearest(y, ROUND_DOWN).get_bytes_str(), str(2**62 + 1))
+    #enddef
+
     def testGrowMulFloatStr(self):
         x = SizeStruct.new_from_str("8 B")
         x.grow_mul_float_str("1.51")
@@ -8,9 +8,9 @@ fi
 : "${top_builddir:=$top_srcdir}"
 
 if [ -z "$PYTHONPATH" ]; then
-    PYTHONPATH="${top_srcdir}/src/python"
+    PYTHONPATH="${top_srcdir}/src/python:${top_builddir}/src/python/.libs"
 else
-    PYTHONPATH="${PYTHONPATH}:${top_srcdir}/src/python"
+    PYTHONPATH="${PYTHONPATH}:${top_srcdir}/src/python:${top_builddir}/src/python/.libs"
 fi
 
 if [ -z "$LD_LIBRARY_PATH" ]; then